@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: budget classification of 100k transactions, legacy per-keyword
+substring loops vs the classification_engine KeywordMatcher.
+
+Usage: python bench_classification.py [--transactions 100000] [--unique-ratio 0.2]
+"""
+
+import argparse
+import random
+import time
+
+from classification_engine import (
+    DEBT_LABELS,
+    FIXED_COST_LABELS,
+    RECURRING_KEYWORDS,
+    BUDGET_KEYWORD_MATCHER,
+    RECURRING_KEYWORD_MATCHER,
+    has_recurring_keyword,
+)
+from enrichment_service import EnrichmentService
+
+MERCHANTS = [
+    ("TESCO STORES 3412", ["groceries", "shopping"]),
+    ("KLARNA*ASOS", ["bnpl", "shopping"]),
+    ("NETFLIX.COM", ["streaming", "entertainment"]),
+    ("TFL TRAVEL CH", ["transport", "travel"]),
+    ("DD BRITISH GAS", ["utilities", "gas"]),
+    ("PRET A MANGER", ["food", "coffee"]),
+    ("VODAFONE LTD", ["phone", "mobile"]),
+    ("SALARY ACME LTD", ["salary", "income"]),
+    ("AMAZON MKTPLACE PMTS", ["shopping", "retail"]),
+    ("BARCLAYCARD PAYMENT", ["credit card", "payment"]),
+]
+
+
+def legacy_classify(description, labels, is_recurring, entry_type):
+    combined_text = description + " " + " ".join([l.lower() for l in labels])
+    for kw in DEBT_LABELS:
+        if kw in combined_text:
+            return "debt"
+    for kw in FIXED_COST_LABELS:
+        if kw in combined_text:
+            return "fixed"
+    if is_recurring and entry_type == "outgoing":
+        return "fixed"
+    if entry_type == "outgoing":
+        return "discretionary"
+    return "income"
+
+
+def legacy_is_recurring(desc_lower):
+    return any(kw in desc_lower for kw in RECURRING_KEYWORDS)
+
+
+def build_corpus(count, unique_ratio, seed=28):
+    """Merchant-heavy corpus; unique_ratio of rows get a unique reference suffix"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        description, labels = rng.choice(MERCHANTS)
+        if rng.random() < unique_ratio:
+            description = f"{description} REF{i:07d}"
+        entry_type = "incoming" if description.startswith("SALARY") else "outgoing"
+        corpus.append((description.lower(), labels, entry_type))
+    return corpus
+
+
+def run_legacy(corpus):
+    out = []
+    for desc_lower, labels, entry_type in corpus:
+        is_recurring = legacy_is_recurring(desc_lower)
+        out.append(legacy_classify(desc_lower, labels, is_recurring, entry_type))
+    return out
+
+
+def run_engine(corpus, service):
+    # Start cold so each run pays for its own cache misses
+    BUDGET_KEYWORD_MATCHER.clear_cache()
+    RECURRING_KEYWORD_MATCHER.clear_cache()
+    out = []
+    for desc_lower, labels, entry_type in corpus:
+        is_recurring = has_recurring_keyword(desc_lower)
+        out.append(service._classify_by_keywords(desc_lower, labels, is_recurring, entry_type))
+    return out
+
+
+def timed(fn, *args, repeats=3):
+    """Best of `repeats` runs, so one noisy run doesn't decide the comparison"""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--unique-ratio", type=float, default=0.2,
+                        help="Fraction of rows with a unique description (defeats memoisation)")
+    args = parser.parse_args()
+
+    service = EnrichmentService()
+
+    print("=" * 80)
+    print(f"BENCHMARK: budget classification, {args.transactions:,} transactions")
+    print("=" * 80)
+
+    for unique_ratio in sorted({0.0, args.unique_ratio, 1.0}):
+        corpus = build_corpus(args.transactions, unique_ratio)
+        legacy, legacy_s = timed(run_legacy, corpus)
+        engine, engine_s = timed(run_engine, corpus, service)
+        assert engine == legacy, "keyword matcher diverged from legacy output"
+        per_tx_legacy = legacy_s / len(corpus) * 1e6
+        per_tx_engine = engine_s / len(corpus) * 1e6
+        print(f"\nunique descriptions: {unique_ratio:.0%}")
+        print(f"  legacy loops : {legacy_s:7.3f}s ({per_tx_legacy:5.2f} µs/tx)")
+        print(f"  engine       : {engine_s:7.3f}s ({per_tx_engine:5.2f} µs/tx)")
+        print(f"  speedup      : {legacy_s / engine_s:5.2f}x  (outputs identical)")
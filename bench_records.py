@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-transaction cost of the pipeline's record types, Pydantic models vs slotted records.
+
+Compares building the normalised input and enriched output for each
+transaction and dumping it to a response dict with:
+  - validated Pydantic models (TrueLayerIngestModel / NtropyOutputModel)
+  - Pydantic model_construct (no validation, still a Pydantic instance)
+  - slotted dataclasses (IngestRecord / EnrichedRecord), what the service uses
+and the memory held by a list of enriched transactions of each kind.
+
+Usage: python bench_records.py [--transactions 100000]
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from enrichment_service import (
+    EnrichedRecord,
+    EnrichmentService,
+    IngestRecord,
+    NtropyOutputModel,
+    TrueLayerIngestModel,
+)
+
+DESCRIPTIONS = [
+    "TESCO STORES 3412", "KLARNA*ASOS", "NETFLIX.COM", "TFL TRAVEL CH", "DD BRITISH GAS",
+    "PRET A MANGER", "VODAFONE LTD", "SALARY ACME LTD", "BARCLAYCARD PAYMENT",
+]
+
+
+def build_inputs(count, seed=39):
+    """(ingest fields, output fields) pairs produced by the real fallback pipeline"""
+    rng = random.Random(seed)
+    service = EnrichmentService()
+    pairs = []
+    for i in range(count):
+        raw = {
+            "transaction_id": f"tx_{i}",
+            "description": rng.choice(DESCRIPTIONS),
+            "amount": rng.choice([-12.34, 2500.0, -64.0, -9.99]),
+            "transaction_type": rng.choice(["DEBIT", "CREDIT", "DIRECT_DEBIT"]),
+            "transaction_classification": rng.choice([["Shopping"], ["Bills and Utilities"], []]),
+            "timestamp": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T09:00:00Z",
+        }
+        norm = service.normalize_truelayer_transaction(raw)
+        ingest_fields = {name: getattr(norm, name) for name in IngestRecord.__slots__}
+        output_fields = service._create_fallback_output(norm).model_dump()
+        pairs.append((ingest_fields, output_fields))
+    service.close()
+    return pairs
+
+
+def run_validated(pairs):
+    out = []
+    for ingest_fields, output_fields in pairs:
+        TrueLayerIngestModel(**ingest_fields)
+        out.append(NtropyOutputModel(**output_fields).model_dump())
+    return out
+
+
+def run_construct(pairs):
+    out = []
+    for ingest_fields, output_fields in pairs:
+        TrueLayerIngestModel.model_construct(**ingest_fields)
+        out.append(NtropyOutputModel.model_construct(**output_fields).model_dump())
+    return out
+
+
+def run_records(pairs):
+    out = []
+    for ingest_fields, output_fields in pairs:
+        IngestRecord(**ingest_fields)
+        out.append(EnrichedRecord(**output_fields).model_dump())
+    return out
+
+
+def held_bytes(factory, pairs):
+    """Bytes retained by a list of enriched objects, as measured by tracemalloc"""
+    gc.collect()
+    tracemalloc.start()
+    objects = [factory(output_fields) for _, output_fields in pairs]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transactions", type=int, default=100_000)
+    args = parser.parse_args()
+
+    pairs = build_inputs(args.transactions)
+
+    print("=" * 80)
+    print(f"BENCHMARK: record types, {args.transactions:,} transactions (build input + output, dump output)")
+    print("=" * 80)
+
+    validated, validated_s = timed(run_validated, pairs)
+    constructed, construct_s = timed(run_construct, pairs)
+    records, records_s = timed(run_records, pairs)
+    assert records == validated == constructed, "record dumps diverged from the Pydantic models"
+
+    validated_mem = held_bytes(lambda fields: NtropyOutputModel(**fields), pairs)
+    construct_mem = held_bytes(lambda fields: NtropyOutputModel.model_construct(**fields), pairs)
+    records_mem = held_bytes(lambda fields: EnrichedRecord(**fields), pairs)
+
+    count = len(pairs)
+    print(f"\n{'':28}{'µs/tx':>10}{'bytes/tx held':>16}")
+    print(f"  {'pydantic validated':26}{validated_s / count * 1e6:10.2f}{validated_mem / count:16.0f}")
+    print(f"  {'pydantic model_construct':26}{construct_s / count * 1e6:10.2f}{construct_mem / count:16.0f}")
+    print(f"  {'slotted records':26}{records_s / count * 1e6:10.2f}{records_mem / count:16.0f}")
+    print(f"\n  records vs validated: {validated_s / records_s:.2f}x faster, "
+          f"{(validated_mem - records_mem) / count:.0f} bytes/tx less held  (dumps identical)")
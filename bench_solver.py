@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark: payment plan solves, comparing objective modes (weighted vs lexicographic) or model formulations (division vs linear).
+
+Runs each portfolio in a fixed corpus (1-3 cards, tight to loose budgets,
+both strategies with a tie-breaker) both ways and reports wall time, how
+each search ended, and the primary and tie-breaker terms of the plan found,
+so a faster variant can't win by returning a worse plan.
+
+Usage: python bench_solver.py [--compare objective|formulation] [--time-limit 30] [--workers N] [--portfolios 8]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from datetime import date
+
+from solver_engine import (
+    FORMULATION_DIVISION,
+    FORMULATION_LINEAR,
+    OBJECTIVE_LEXICOGRAPHIC,
+    OBJECTIVE_WEIGHTED,
+    Account,
+    AccountType,
+    Budget,
+    DebtPortfolio,
+    MinPaymentRule,
+    OptimizationStrategy,
+    PaymentShape,
+    SolveOptions,
+    UserPreferences,
+    solve_payment_plan,
+)
+
+# (cards as (balance_cents, apr_bps), monthly budget in cents, strategy)
+CORPUS = [
+    ([(250000, 2299)], 60000, OptimizationStrategy.MINIMIZE_TOTAL_INTEREST),
+    ([(250000, 2299)], 15000, OptimizationStrategy.MINIMIZE_TOTAL_INTEREST),
+    ([(250000, 2299), (90000, 2999)], 60000, OptimizationStrategy.MINIMIZE_TOTAL_INTEREST),
+    ([(250000, 2299), (90000, 2999)], 60000, OptimizationStrategy.TARGET_MAX_BUDGET),
+    ([(420000, 1999), (60000, 3499)], 40000, OptimizationStrategy.MINIMIZE_TOTAL_INTEREST),
+    ([(120000, 2499), (120000, 2499)], 30000, OptimizationStrategy.MINIMIZE_TOTAL_INTEREST),
+    ([(350000, 2299), (180000, 2999), (520000, 1899)], 60000, OptimizationStrategy.MINIMIZE_TOTAL_INTEREST),
+    ([(350000, 2299), (180000, 2999), (520000, 1899)], 90000, OptimizationStrategy.TARGET_MAX_BUDGET),
+]
+
+# --compare: the SolveOptions field and its two values (the current default first)
+COMPARISONS = {
+    "objective": ("objective_mode", (OBJECTIVE_WEIGHTED, OBJECTIVE_LEXICOGRAPHIC)),
+    "formulation": ("formulation", (FORMULATION_DIVISION, FORMULATION_LINEAR)),
+}
+
+
+def build_portfolio(cards, budget_cents, strategy, options):
+    return DebtPortfolio(
+        accounts=[
+            Account(
+                lender_name=f"Card {i + 1}",
+                account_type=AccountType.CREDIT_CARD,
+                current_balance_cents=balance,
+                apr_standard_bps=apr,
+                min_payment_rule=MinPaymentRule(fixed_cents=2500, percentage_bps=100, includes_interest=True),
+                payment_due_day=5,
+            )
+            for i, (balance, apr) in enumerate(cards)
+        ],
+        budget=Budget(monthly_budget_cents=budget_cents),
+        preferences=UserPreferences(strategy=strategy, payment_shape=PaymentShape.OPTIMIZED_MONTH_TO_MONTH),
+        plan_start_date=date(2025, 1, 1),
+        solve_options=options,
+    )
+
+
+def terms(plan, strategy):
+    """(primary, tie-breaker) objective terms of a plan, in the strategy's order"""
+    interest = sum(row.interest_charged_cents for row in plan)
+    balances = sum(row.ending_balance_cents for row in plan)
+    return (interest, balances) if strategy == OptimizationStrategy.MINIMIZE_TOTAL_INTEREST else (balances, interest)
+
+
+def run(cards, budget_cents, strategy, option, value, time_limit, workers):
+    options = SolveOptions(max_time_seconds=time_limit, num_workers=workers, **{option: value})
+    portfolio = build_portfolio(cards, budget_cents, strategy, options)
+    start = time.perf_counter()
+    # The engine narrates every model it builds; keep the table readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = solve_payment_plan(portfolio)
+    elapsed = time.perf_counter() - start
+    return result, elapsed, terms(result.plan, strategy) if result.plan else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--compare", choices=sorted(COMPARISONS), default="objective")
+    parser.add_argument("--time-limit", type=float, default=30.0, help="Per-solve budget in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="CP-SAT workers (default: one per core)")
+    parser.add_argument("--portfolios", type=int, default=len(CORPUS), help="Run the first N corpus portfolios")
+    args = parser.parse_args()
+
+    option, variants = COMPARISONS[args.compare]
+    baseline, candidate = variants
+
+    print("=" * 100)
+    print(f"BENCHMARK: {baseline} vs {candidate} {args.compare}, {args.portfolios} portfolio(s), "
+          f"{args.time_limit:g}s budget")
+    print("=" * 100)
+    print(f"{'portfolio':<34} {args.compare:<14} {'time':>7}  {'ended':<11} {'primary':>12} {'tie-breaker':>13}")
+
+    totals = {variant: 0.0 for variant in variants}
+    better_plans = {variant: 0 for variant in variants}
+    for cards, budget_cents, strategy in CORPUS[:args.portfolios]:
+        label = f"{len(cards)} card(s), £{budget_cents // 100}/mo, " + \
+            ("interest" if strategy == OptimizationStrategy.MINIMIZE_TOTAL_INTEREST else "asap")
+        found = {}
+        for variant in variants:
+            result, elapsed, plan_terms = run(cards, budget_cents, strategy, option, variant,
+                                              args.time_limit, args.workers)
+            totals[variant] += elapsed
+            found[variant] = plan_terms
+            primary, tie_breaker = plan_terms if plan_terms else ("-", "-")
+            print(f"{label:<34} {variant:<14} {elapsed:6.2f}s  {result.termination_reason:<11} "
+                  f"{primary:>12} {tie_breaker:>13}")
+            label = ""
+        if found[baseline] and found[candidate] and found[baseline] != found[candidate]:
+            better_plans[min(found, key=lambda variant: found[variant])] += 1
+
+    print(f"\ntotal time   : {baseline} {totals[baseline]:.2f}s, {candidate} {totals[candidate]:.2f}s")
+    print(f"better plan  : {baseline} {better_plans[baseline]}, {candidate} {better_plans[candidate]} "
+          f"(by primary, then tie-breaker; rest identical)")
@@ -0,0 +1,447 @@
+# budget_store.py - Persistent per-user budget aggregates
+# Monthly sums per direction and category, updated incrementally after each sync
+
+import calendar
+import threading
+from datetime import date
+from typing import Any, Collection, Dict, Iterable, List, Optional, Tuple
+
+from local_store import open_database
+from recurrence_detector import merchant_key
+
+
+BUDGET_DB_NAME = "budget_aggregates.db"
+
+# A pending transaction is merged into a booked one with the same merchant and
+# amount that books up to this many days later
+PENDING_MATCH_DAYS = 7
+
+# Transaction IDs / match keys per lookup query (SQLite's variable limit is 999)
+LOOKUP_CHUNK_SIZE = 500
+
+def _month_index(month: str) -> int:
+    year, mon = month.split("-")
+    return int(year) * 12 + int(mon) - 1
+
+
+def _month_from_index(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _month_end(month: str) -> date:
+    year, mon = (int(part) for part in month.split("-"))
+    return date(year, mon, calendar.monthrange(year, mon)[1])
+
+
+def _months_covered(first_day: date, last_day: date) -> float:
+    """Calendar months between two dates, inclusive, partial months as their share of days"""
+    covered = 0.0
+    day = first_day
+    while day <= last_day:
+        month_end = _month_end(day.isoformat()[:7])
+        days_in_month = month_end.day
+        covered += ((min(month_end, last_day) - day).days + 1) / days_in_month
+        day = date.fromordinal(month_end.toordinal() + 1)
+    return covered
+
+
+def pending_match_merchant(description: str) -> str:
+    """
+    Merchant part of the key pairing a pending row with its booked copy.
+    Pending descriptions often lose the reference/location suffix of the
+    booked row, so only the leading merchant word is compared.
+    """
+    key = merchant_key(description)
+    return key.split(" ", 1)[0] if key else description.lower()
+
+
+class _StoredRows:
+    """
+    The stored transactions one add_transactions call can touch, indexed by ID
+    and match key, kept up to date in memory as the call writes them so the
+    incoming rows can be matched against each other as well as the store.
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]]):
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_key: Dict[str, List[str]] = {}
+        for row in rows:
+            if row["transaction_id"] not in self._by_id:
+                self.put(row)
+
+    def get(self, transaction_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(transaction_id)
+
+    def put(self, row: Dict[str, Any]) -> None:
+        previous = self._by_id.get(row["transaction_id"])
+        self._by_id[row["transaction_id"]] = row
+        if previous is None or previous["match_key"] != row["match_key"]:
+            self._by_key.setdefault(row["match_key"], []).append(row["transaction_id"])
+
+    def _matching(self, row: Dict[str, Any], pending: int, first_day: str, last_day: str) -> List[Dict[str, Any]]:
+        """Counted rows with row's match key, dated between the two days, earliest first"""
+        candidates = [self._by_id[tx_id] for tx_id in self._by_key.get(row["match_key"], [])]
+        return sorted(
+            (candidate for candidate in candidates
+             if candidate["match_key"] == row["match_key"] and candidate["pending"] == pending
+             and candidate["superseded_by"] is None and first_day <= candidate["tx_date"] <= last_day),
+            key=lambda candidate: (candidate["tx_date"], candidate["transaction_id"])
+        )
+
+    def booked_copy(self, pending_row: Dict[str, Any]) -> Optional[str]:
+        """ID of a recorded booked row this pending row became, if it hasn't absorbed one already"""
+        ordinal = date.fromisoformat(pending_row["tx_date"]).toordinal()
+        last_day = date.fromordinal(ordinal + PENDING_MATCH_DAYS).isoformat()
+        absorbed = {self._by_id[tx_id]["superseded_by"] for tx_id in self._by_key.get(pending_row["match_key"], [])}
+        for booked in self._matching(pending_row, 0, pending_row["tx_date"], last_day):
+            if booked["transaction_id"] not in absorbed:
+                return booked["transaction_id"]
+        return None
+
+    def pending_copy(self, booked_row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The earliest recorded, still counted pending row this booked row replaces"""
+        ordinal = date.fromisoformat(booked_row["tx_date"]).toordinal()
+        first_day = date.fromordinal(ordinal - PENDING_MATCH_DAYS).isoformat()
+        found = self._matching(booked_row, 1, first_day, booked_row["tx_date"])
+        return found[0] if found else None
+
+
+class BudgetAggregateStore:
+    """
+    Per-user monthly totals keyed by (month, entry_type, budget_category).
+
+    Each transaction's own date, category and amount are stored next to the
+    totals, so a resent transaction replaces its earlier contribution rather
+    than being ignored or counted twice: a background sync can resend
+    overlapping history safely, rows classified locally (needs_reenrichment)
+    are corrected once the provider classifies them, and a pending row is
+    retracted when its booked copy arrives under a new ID. Breakdowns read
+    one row per month and bucket, so any window is O(months) regardless of
+    how many transactions the user has.
+    """
+
+    def __init__(self, db_name: str = BUDGET_DB_NAME):
+        self._conn = open_database(db_name)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            legacy = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'budget_seen_transactions'"
+            ).fetchone()
+            if legacy:
+                # Only IDs were kept, so the old totals can't be corrected; the next sync rebuilds them
+                print("[BudgetStore] Dropping write-once aggregates; totals are rebuilt on the next sync")
+                self._conn.executescript("""
+                    DROP TABLE budget_seen_transactions;
+                    DROP TABLE IF EXISTS budget_monthly;
+                """)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS budget_monthly (
+                    user_id TEXT NOT NULL,
+                    month TEXT NOT NULL,
+                    entry_type TEXT NOT NULL,
+                    budget_category TEXT NOT NULL,
+                    amount_cents INTEGER NOT NULL DEFAULT 0,
+                    tx_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, month, entry_type, budget_category)
+                );
+                CREATE TABLE IF NOT EXISTS budget_transactions (
+                    user_id TEXT NOT NULL,
+                    transaction_id TEXT NOT NULL,
+                    tx_date TEXT NOT NULL,
+                    entry_type TEXT NOT NULL,
+                    budget_category TEXT NOT NULL,
+                    amount_cents INTEGER NOT NULL,
+                    needs_reenrichment INTEGER NOT NULL DEFAULT 0,
+                    pending INTEGER NOT NULL DEFAULT 0,
+                    match_key TEXT NOT NULL,
+                    superseded_by TEXT,
+                    PRIMARY KEY (user_id, transaction_id)
+                );
+                CREATE INDEX IF NOT EXISTS budget_transactions_by_date
+                    ON budget_transactions (user_id, tx_date);
+            """)
+
+    def add_transactions(
+        self,
+        user_id: str,
+        records: Iterable[Dict[str, Any]],
+        pending_ids: Collection[str] = ()
+    ) -> int:
+        """
+        Fold enriched transactions (NtropyOutputModel dicts) into the monthly
+        totals. Transactions without a usable date are skipped.
+
+        - A transaction already recorded replaces its earlier contribution if
+          its date, category or amount changed, except that a locally
+          classified row (needs_reenrichment) never overwrites a provider
+          classification.
+        - A booked transaction retracts one recorded pending transaction for
+          the same merchant and amount dated up to PENDING_MATCH_DAYS before
+          it; a pending row whose booked copy is already recorded isn't
+          counted. A retracted row stays retracted when it is resent pending.
+
+        The stored rows involved are read with a few IN (...) queries per
+        LOOKUP_CHUNK_SIZE rows and written back with executemany. Async
+        callers go through EnrichmentService.store_budget_transactions, which
+        runs this on a worker thread.
+
+        Args:
+            pending_ids: IDs of the records that are still pending
+
+        Returns:
+            Number of transactions newly applied or changed
+        """
+        rows: List[Dict[str, Any]] = []
+        for record in records:
+            tx_date = (record.get("transaction_date") or "")[:10]
+            try:
+                date.fromisoformat(tx_date)
+            except ValueError:
+                continue
+            rows.append({
+                "transaction_id": record["transaction_id"],
+                "tx_date": tx_date,
+                "entry_type": record["entry_type"],
+                "budget_category": record["budget_category"],
+                "amount_cents": record["amount_cents"],
+                "needs_reenrichment": int(bool(record.get("needs_reenrichment"))),
+                "pending": int(record["transaction_id"] in pending_ids),
+                "match_key": "|".join([
+                    pending_match_merchant(record.get("original_description") or ""),
+                    record["entry_type"],
+                    str(record["amount_cents"]),
+                ]),
+            })
+        if not rows:
+            return 0
+
+        applied = 0
+        deltas: Dict[Tuple[str, str, str], List[int]] = {}
+        changed: Dict[str, Dict[str, Any]] = {}
+
+        def fold(row: Dict[str, Any], sign: int) -> None:
+            key = (row["tx_date"][:7], row["entry_type"], row["budget_category"])
+            delta = deltas.setdefault(key, [0, 0])
+            delta[0] += sign * row["amount_cents"]
+            delta[1] += sign
+
+        with self._lock, self._conn:
+            stored = _StoredRows(self._load(user_id, rows))
+
+            def write(row: Dict[str, Any], superseded_by: Optional[str]) -> None:
+                columns = {**row, "superseded_by": superseded_by}
+                stored.put(columns)
+                changed[row["transaction_id"]] = columns
+
+            for row in rows:
+                existing = stored.get(row["transaction_id"])
+
+                if existing is None:
+                    superseded_by = stored.booked_copy(row) if row["pending"] else None
+                    write(row, superseded_by)
+                    if superseded_by is not None:
+                        continue
+                    if not row["pending"]:
+                        retracted = stored.pending_copy(row)
+                        if retracted is not None:
+                            write(retracted, row["transaction_id"])
+                            fold(retracted, -1)
+                    fold(row, 1)
+                    applied += 1
+                    continue
+
+                counted = existing["superseded_by"] is None
+                if not counted and row["pending"]:
+                    continue
+                if row["needs_reenrichment"] and not existing["needs_reenrichment"]:
+                    continue
+                if counted and all(existing[column] == value for column, value in row.items()):
+                    continue
+                if counted:
+                    fold(existing, -1)
+                # A retracted pending row only comes back if it books under its own ID
+                write(row, None)
+                fold(row, 1)
+                applied += 1
+
+            if changed:
+                names = list(next(iter(changed.values())))
+                self._conn.executemany(
+                    f"""
+                    INSERT INTO budget_transactions (user_id, {", ".join(names)})
+                    VALUES (?{", ?" * len(names)})
+                    ON CONFLICT (user_id, transaction_id) DO UPDATE SET
+                        {", ".join(f"{name} = excluded.{name}" for name in names if name != "transaction_id")}
+                    """,
+                    [(user_id, *(columns[name] for name in names)) for columns in changed.values()]
+                )
+            self._conn.executemany(
+                """
+                INSERT INTO budget_monthly (user_id, month, entry_type, budget_category, amount_cents, tx_count)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, month, entry_type, budget_category) DO UPDATE SET
+                    amount_cents = amount_cents + excluded.amount_cents,
+                    tx_count = tx_count + excluded.tx_count
+                """,
+                [(user_id, month, entry_type, category, cents, count)
+                 for (month, entry_type, category), (cents, count) in deltas.items()
+                 if cents or count]
+            )
+            self._conn.execute("DELETE FROM budget_monthly WHERE user_id = ? AND tx_count <= 0", (user_id,))
+        return applied
+
+    def _load(self, user_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        The stored rows add_transactions needs for a set of incoming rows, a
+        few queries per LOOKUP_CHUNK_SIZE rows: the rows themselves by ID, the
+        still counted pending rows a booked row might retract, and every row
+        sharing a match key with an incoming pending row (its booked copy and
+        whatever that copy already absorbed).
+        """
+        columns = ", ".join(list(rows[0]) + ["superseded_by"])
+        ids = [row["transaction_id"] for row in rows]
+        match_keys = sorted({row["match_key"] for row in rows})
+        pending_keys = sorted({row["match_key"] for row in rows if row["pending"]})
+        queries = [
+            (f"SELECT {columns} FROM budget_transactions WHERE user_id = ? AND transaction_id IN ({{}})", ids),
+            (f"SELECT {columns} FROM budget_transactions WHERE user_id = ? AND pending = 1"
+             " AND superseded_by IS NULL AND match_key IN ({})", match_keys),
+            (f"SELECT {columns} FROM budget_transactions WHERE user_id = ? AND match_key IN ({{}})", pending_keys),
+        ]
+        loaded: List[Dict[str, Any]] = []
+        for query, values in queries:
+            for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+                chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+                loaded.extend(
+                    dict(row) for row in
+                    self._conn.execute(query.format(", ".join("?" * len(chunk))), (user_id, *chunk))
+                )
+        return loaded
+
+    def monthly_totals(
+        self,
+        user_id: str,
+        start_month: Optional[str] = None,
+        end_month: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Raw monthly rows for the user, oldest first"""
+        query = "SELECT month, entry_type, budget_category, amount_cents, tx_count FROM budget_monthly WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if start_month:
+            query += " AND month >= ?"
+            params.append(start_month)
+        if end_month:
+            query += " AND month <= ?"
+            params.append(end_month)
+        query += " ORDER BY month"
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def latest_month(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(month) AS month FROM budget_monthly WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row["month"] if row else None
+
+    def breakdown(
+        self,
+        user_id: str,
+        months: Optional[int] = None,
+        end_month: Optional[str] = None,
+        as_of: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """
+        Monthly averages over a window of the user's history.
+
+        Args:
+            months: Calendar months in the window (None = all history)
+            end_month: Last month of the window, YYYY-MM (default: latest with data)
+            as_of: Date the history was synced up to (default: today)
+
+        Totals are divided by the months the data actually covers inside the
+        window (at least one), with partial edge months counted by their days:
+        coverage runs from the first transaction date to the end of the last
+        month with data, or to as_of if that month isn't over yet. A user with
+        one month of history isn't averaged over three, and history from 20
+        March to 5 April, synced on 5 April, isn't averaged over two.
+        """
+        end_month = end_month or self.latest_month(user_id)
+        start_month = None
+        if end_month and months:
+            start_month = _month_from_index(_month_index(end_month) - max(1, months) + 1)
+
+        rows = self.monthly_totals(user_id, start_month, end_month) if end_month else []
+
+        totals = {"income": 0, "fixed": 0, "discretionary": 0, "debt": 0}
+        transaction_count = 0
+        for row in rows:
+            bucket = "income" if row["entry_type"] == "incoming" else row["budget_category"]
+            if bucket in totals:
+                totals[bucket] += row["amount_cents"]
+            transaction_count += row["tx_count"]
+
+        if rows:
+            first_month, last_month = rows[0]["month"], rows[-1]["month"]
+            first_day, last_day = self._date_span(user_id, first_month, last_month)
+            covered_to = min(_month_end(last_month), max(as_of or date.today(), last_day))
+            days_analyzed = (covered_to - first_day).days + 1
+            months_analyzed = round(max(1.0, _months_covered(first_day, covered_to)), 2)
+        else:
+            first_month = last_month = None
+            days_analyzed = months_analyzed = 0
+
+        divisor = max(1.0, months_analyzed)
+        monthly_income = round(totals["income"] / divisor)
+        monthly_fixed = round(totals["fixed"] / divisor)
+        monthly_discretionary = round(totals["discretionary"] / divisor)
+        monthly_debt = round(totals["debt"] / divisor)
+
+        return {
+            "averageMonthlyIncomeCents": monthly_income,
+            "fixedCostsCents": monthly_fixed,
+            "discretionaryCents": monthly_discretionary,
+            "debtPaymentsCents": monthly_debt,
+            "safeToSpendCents": max(0, monthly_income - monthly_fixed - monthly_debt),
+            "transactionCount": transaction_count,
+            "monthsAnalyzed": months_analyzed,
+            "daysAnalyzed": days_analyzed,
+            "fromMonth": first_month,
+            "toMonth": last_month,
+        }
+
+    def _date_span(self, user_id: str, first_month: str, last_month: str) -> Tuple[date, date]:
+        """First and last counted transaction dates between two months, inclusive"""
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT MIN(tx_date) AS first_day, MAX(tx_date) AS last_day FROM budget_transactions
+                WHERE user_id = ? AND superseded_by IS NULL AND tx_date >= ? AND tx_date < ?
+                """,
+                (user_id, f"{first_month}-01", f"{_month_from_index(_month_index(last_month) + 1)}-01")
+            ).fetchone()
+        return date.fromisoformat(row["first_day"]), date.fromisoformat(row["last_day"])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ============== Shared Store ==============
+
+_shared_store: Optional[BudgetAggregateStore] = None
+
+
+def get_budget_store() -> BudgetAggregateStore:
+    """Process-wide store, opened on first use"""
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = BudgetAggregateStore()
+    return _shared_store
+
+
+def close_budget_store() -> None:
+    global _shared_store
+    if _shared_store is not None:
+        _shared_store.close()
+        _shared_store = None
@@ -0,0 +1,265 @@
+# classification_engine.py - Keyword matching engine for budget classification
+# Shared by the Ntropy and fallback paths in enrichment_service.py
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from recurrence_detector import SeriesWindow, detect_recurrence
+
+
+# ============== Classification Constants ==============
+
+# Labels that indicate potential debt payments
+DEBT_LABELS = [
+    'loan', 'mortgage', 'finance', 'bnpl', 'buy now pay later',
+    'credit card', 'overdraft', 'klarna', 'clearpay', 'afterpay',
+    'laybuy', 'paypal credit', 'very pay', 'littlewoods', 'studio',
+    'car finance', 'personal loan', 'debt collection', 'debt recovery'
+]
+
+# Labels that indicate fixed/recurring costs
+FIXED_COST_LABELS = [
+    'utilities', 'utility', 'gas', 'electric', 'electricity', 'water',
+    'council tax', 'insurance', 'home insurance', 'car insurance',
+    'life insurance', 'health insurance', 'subscription', 'membership',
+    'gym', 'streaming', 'netflix', 'spotify', 'amazon prime', 'disney+',
+    'rent', 'mortgage payment', 'broadband', 'internet', 'phone', 'mobile',
+    'tv license', 'childcare', 'nursery', 'school fees'
+]
+
+# Labels for discretionary spending
+DISCRETIONARY_LABELS = [
+    'food', 'dining', 'restaurant', 'takeaway', 'fast food', 'coffee',
+    'shopping', 'retail', 'clothing', 'electronics', 'entertainment',
+    'leisure', 'travel', 'holiday', 'gambling', 'betting', 'lottery'
+]
+
+# Description fragments that indicate a recurring payment when Ntropy is unavailable
+RECURRING_KEYWORDS = [
+    'dd ', 'direct debit', 'standing order', 's/o',
+    'subscription', 'monthly', 'recurring'
+]
+
+# Distinct texts remembered per matcher (least recently used evicted first).
+# Labels and merchant descriptions repeat heavily across a history, so most
+# lookups never reach the compiled patterns. 0 disables the memo.
+MATCH_CACHE_SIZE = 16384
+
+
+# ============== Keyword Matcher ==============
+
+def _keyword_pattern(keywords: List[str]) -> "re.Pattern[str]":
+    """
+    One regex matching any of the keywords, built from their prefix trie
+    ('car finance' and 'clearpay' share one 'c' branch) so the regex engine
+    tries each position of the text once per distinct next character rather
+    than once per keyword. A keyword that is a prefix of another ends the
+    branch: finding the shorter one already decides the bucket.
+    """
+    trie: Dict[str, Any] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def branch(node: Dict[str, Any]) -> str:
+        if "" in node:
+            return ""
+        alternatives = [re.escape(char) + branch(child) for char, child in sorted(node.items())]
+        return alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+
+    return re.compile(branch(trie))
+
+
+class KeywordMatcher:
+    """
+    Priority-ordered keyword buckets, compiled once.
+
+    match(text) returns the first bucket (in the order given) that has any
+    of its keywords as a substring of text, or None - the same answer as
+    scanning each keyword list in turn with `keyword in text`.
+
+    One compiled pattern over every keyword (_keyword_pattern) decides in a
+    single scan whether any bucket matches, which is the usual answer for
+    bank descriptions. Only then are the buckets' own patterns tried in
+    priority order, since a single alternation reports the leftmost keyword
+    rather than the highest-priority bucket; the last bucket needs no scan
+    of its own. Answers are memoised in a bounded LRU cache, so repeated
+    labels and merchants are one lookup; on text it hasn't seen the scans
+    cost about what the old substring loops did (see bench_classification.py).
+    """
+
+    def __init__(self, buckets: List[Tuple[str, List[str]]], cache_size: int = MATCH_CACHE_SIZE):
+        self.buckets = [name for name, _ in buckets]
+        self._any = _keyword_pattern([keyword for _, keywords in buckets for keyword in keywords])
+        self._patterns: Tuple[Tuple[str, "re.Pattern[str]"], ...] = tuple(
+            (name, _keyword_pattern(keywords)) for name, keywords in buckets[:-1]
+        )
+        self._last = self.buckets[-1]
+        # match(text) -> bucket name or None; the cache (if any) wraps the scan directly
+        self._cache_size = cache_size
+        self.match: Callable[[str], Optional[str]] = (
+            lru_cache(maxsize=cache_size)(self._match_uncached) if cache_size else self._match_uncached
+        )
+
+    def _match_uncached(self, text: str) -> Optional[str]:
+        if self._any.search(text) is None:
+            return None
+        for name, pattern in self._patterns:
+            if pattern.search(text):
+                return name
+        return self._last
+
+    def clear_cache(self) -> None:
+        if self._cache_size:
+            self.match.cache_clear()
+
+
+# Debt keywords win over fixed-cost keywords, as in the original triage order
+BUDGET_KEYWORD_MATCHER = KeywordMatcher([
+    ("debt", DEBT_LABELS),
+    ("fixed", FIXED_COST_LABELS),
+])
+
+# Matched against bare descriptions, which mostly carry unique references:
+# a memo would almost never hit, and one scan of seven keywords is cheaper
+RECURRING_KEYWORD_MATCHER = KeywordMatcher([
+    ("recurring", RECURRING_KEYWORDS),
+], cache_size=0)
+
+
+def match_budget_keywords(text: str) -> Optional[str]:
+    """Return 'debt', 'fixed' or None for lowercase text"""
+    return BUDGET_KEYWORD_MATCHER.match(text)
+
+
+def has_recurring_keyword(description_lower: str) -> bool:
+    """True if a lowercase description looks like a direct debit / standing order"""
+    return RECURRING_KEYWORD_MATCHER.match(description_lower) is not None
+
+
+# ============== Columnar Fallback Classification ==============
+
+@dataclass
+class TransactionColumns:
+    """Normalised transactions as parallel arrays (one entry per transaction)"""
+    transaction_ids: List[str] = field(default_factory=list)
+    descriptions: List[str] = field(default_factory=list)
+    amounts: List[float] = field(default_factory=list)
+    transaction_types: List[str] = field(default_factory=list)  # uppercase TrueLayer types
+    dates: List[str] = field(default_factory=list)
+    labels: List[List[str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.transaction_ids)
+
+
+@dataclass
+class FallbackClassification:
+    """
+    Result of classifying TransactionColumns in bulk. Row objects are only
+    built on request via records(), at the output boundary.
+    """
+    columns: TransactionColumns
+    amount_cents: List[int]
+    entry_types: List[str]
+    is_recurring: List[bool]
+    budget_categories: List[str]
+    recurrence_frequencies: List[Optional[str]]
+    recurrence_days: List[Optional[int]]
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def totals(self) -> Dict[str, int]:
+        """Sum amount_cents per bucket ('income' covers all incoming transactions)"""
+        totals = {"income": 0, "fixed": 0, "discretionary": 0, "debt": 0}
+        for cents, entry_type, category in zip(self.amount_cents, self.entry_types, self.budget_categories):
+            totals["income" if entry_type == "incoming" else category] += cents
+        return totals
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Yield one dict per transaction, shaped like NtropyOutputModel.model_dump()"""
+        cols = self.columns
+        for i in range(len(cols)):
+            yield {
+                "transaction_id": cols.transaction_ids[i],
+                "original_description": cols.descriptions[i],
+                "merchant_clean_name": None,  # No merchant info without Ntropy
+                "merchant_logo_url": None,
+                "merchant_website_url": None,
+                "labels": cols.labels[i],
+                "is_recurring": self.is_recurring[i],
+                "recurrence_frequency": self.recurrence_frequencies[i],
+                "recurrence_day": self.recurrence_days[i],
+                "amount_cents": self.amount_cents[i],
+                "entry_type": self.entry_types[i],
+                "budget_category": self.budget_categories[i],
+                "transaction_date": cols.dates[i],
+                "needs_reenrichment": False,
+            }
+
+
+def classify_fallback_columns(
+    columns: TransactionColumns,
+    detect_series: bool = True,
+    window: Optional[SeriesWindow] = None
+) -> FallbackClassification:
+    """
+    Classify a whole set of normalised transactions without Ntropy, one column
+    at a time: same rules as EnrichmentService._create_fallback_output, but no
+    per-row model construction or validation.
+
+    With detect_series, recurring payments are also found from the history
+    itself (recurrence_detector), so a bill with no 'DD' in its description is
+    still marked recurring and budgeted as a fixed cost. Pass the whole
+    history in one call, or share a SeriesWindow across the calls when it
+    arrives in pieces.
+    """
+    descriptions_lower = [d.lower() for d in columns.descriptions]
+    keyword_recurring = [has_recurring_keyword(d) for d in descriptions_lower]
+    # Only CREDIT is incoming; every other (or unknown) type is treated as outgoing
+    entry_types = ["incoming" if t == "CREDIT" else "outgoing" for t in columns.transaction_types]
+    amount_cents = [int(a * 100) for a in columns.amounts]
+    keyword_buckets = [
+        match_budget_keywords(desc + " " + " ".join(labels).lower())
+        for desc, labels in zip(descriptions_lower, columns.labels)
+    ]
+
+    if detect_series:
+        detected_frequencies, recurrence_days = (window.detect if window else detect_recurrence)(
+            columns.descriptions, amount_cents, entry_types, columns.dates
+        )
+    else:
+        detected_frequencies = recurrence_days = [None] * len(columns)
+
+    is_recurring = [
+        keyword or detected is not None
+        for keyword, detected in zip(keyword_recurring, detected_frequencies)
+    ]
+    # Keyword-only matches keep the historical 'monthly' guess
+    recurrence_frequencies = [
+        detected if detected is not None else "monthly" if keyword else None
+        for keyword, detected in zip(keyword_recurring, detected_frequencies)
+    ]
+
+    budget_categories = [
+        bucket if bucket is not None
+        else "income" if entry_type != "outgoing"
+        else "fixed" if recurring
+        else "discretionary"
+        for bucket, entry_type, recurring in zip(keyword_buckets, entry_types, is_recurring)
+    ]
+
+    return FallbackClassification(
+        columns=columns,
+        amount_cents=amount_cents,
+        entry_types=entry_types,
+        is_recurring=is_recurring,
+        budget_categories=budget_categories,
+        recurrence_frequencies=recurrence_frequencies,
+        recurrence_days=list(recurrence_days),
+    )
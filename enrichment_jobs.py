@@ -0,0 +1,244 @@
+# enrichment_jobs.py - Resumable enrichment jobs
+# Checkpoints finished results so a dropped stream resumes without paying for them again
+
+import json
+import threading
+import time
+import uuid
+from typing import Any, AsyncGenerator, Dict, List, Optional, Set
+
+from enrichment_service import EnrichmentService, EnrichedRecord, DEFAULT_STREAM_CHUNK_SIZE
+from local_store import open_database
+
+
+JOBS_DB_NAME = "enrichment_jobs.db"
+
+# Finished or abandoned jobs (inputs and checkpoints) are purged after this long
+JOB_RETENTION_SECONDS = 24 * 60 * 60
+
+
+class JobNotFoundError(KeyError):
+    pass
+
+
+class JobAlreadyRunningError(RuntimeError):
+    """Another connection is already driving this job"""
+    pass
+
+
+# ============== Job Store ==============
+
+class EnrichmentJobStore:
+    """
+    SQLite-backed jobs: the raw input, the stream options, and every enriched
+    result checkpointed by position in the deduplicated input.
+
+    Job status moves running → complete, or to interrupted / failed when the
+    stream ends early; any non-complete job can be resumed.
+    """
+
+    def __init__(self, db_name: str = JOBS_DB_NAME):
+        self._conn = open_database(db_name)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS enrichment_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    transaction_count INTEGER NOT NULL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS enrichment_job_inputs (
+                    job_id TEXT PRIMARY KEY,
+                    transactions TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS enrichment_job_results (
+                    job_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    result TEXT NOT NULL,
+                    PRIMARY KEY (job_id, position)
+                );
+            """)
+
+    def create_job(self, user_id: str, raw_transactions: List[Dict[str, Any]], options: Dict[str, Any]) -> str:
+        self.purge_expired()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO enrichment_jobs (job_id, user_id, status, options, transaction_count, created_at, updated_at)"
+                " VALUES (?, ?, 'running', ?, ?, ?, ?)",
+                (job_id, user_id, json.dumps(options), len(raw_transactions), now, now)
+            )
+            self._conn.execute(
+                "INSERT INTO enrichment_job_inputs (job_id, transactions) VALUES (?, ?)",
+                (job_id, json.dumps(raw_transactions))
+            )
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job summary including how many results are checkpointed"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM enrichment_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            completed = self._conn.execute(
+                "SELECT COUNT(*) FROM enrichment_job_results WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["completed"] = completed
+        return job
+
+    def load_inputs(self, job_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT transactions FROM enrichment_job_inputs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            raise JobNotFoundError(job_id)
+        return json.loads(row["transactions"])
+
+    def load_results(self, job_id: str) -> List[Dict[str, Any]]:
+        """Checkpointed results from position 0 up to the first gap"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT position, result FROM enrichment_job_results WHERE job_id = ? ORDER BY position",
+                (job_id,)
+            ).fetchall()
+        results = []
+        for expected_position, row in enumerate(rows):
+            if row["position"] != expected_position:
+                break
+            results.append(json.loads(row["result"]))
+        return results
+
+    def save_results(self, job_id: str, start_position: int, results: List[Dict[str, Any]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO enrichment_job_results (job_id, position, result) VALUES (?, ?, ?)",
+                [(job_id, start_position + offset, json.dumps(result)) for offset, result in enumerate(results)]
+            )
+            self._conn.execute(
+                "UPDATE enrichment_jobs SET updated_at = ? WHERE job_id = ?", (time.time(), job_id)
+            )
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE enrichment_jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def purge_expired(self, max_age_seconds: float = JOB_RETENTION_SECONDS) -> int:
+        cutoff = time.time() - max_age_seconds
+        with self._lock, self._conn:
+            expired = [row["job_id"] for row in self._conn.execute(
+                "SELECT job_id FROM enrichment_jobs WHERE updated_at < ?", (cutoff,)
+            )]
+            for table in ("enrichment_job_results", "enrichment_job_inputs", "enrichment_jobs"):
+                self._conn.executemany(f"DELETE FROM {table} WHERE job_id = ?", [(job_id,) for job_id in expired])
+        return len(expired)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ============== Job Runner ==============
+
+# Jobs currently being driven by a connection in this process
+_running_jobs: Set[str] = set()
+
+
+async def stream_enrichment_job(
+    service: EnrichmentService,
+    store: EnrichmentJobStore,
+    job_id: str
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Run (or resume) a job, yielding the same events as
+    EnrichmentService.enrich_transactions_streaming after a leading
+    {"type": "job", ...} event.
+
+    Checkpointed results are replayed without calling Ntropy again, and each
+    newly enriched batch is checkpointed before it is emitted, so a dropped
+    connection loses no paid work.
+    """
+    job = store.get_job(job_id)
+    if job is None:
+        raise JobNotFoundError(job_id)
+    if job_id in _running_jobs:
+        raise JobAlreadyRunningError(job_id)
+
+    _running_jobs.add(job_id)
+    finished = False
+    try:
+        raw_transactions = store.load_inputs(job_id)
+        completed = [EnrichedRecord(**record) for record in store.load_results(job_id)]
+        options = job["options"]
+        if job["status"] != "complete":
+            store.set_status(job_id, "running")
+
+        yield {
+            "type": "job",
+            "job_id": job_id,
+            "status": job["status"],
+            "resumed": bool(completed),
+            "completed": len(completed),
+            "total": job["transaction_count"],
+        }
+
+        def checkpoint(start_position: int, results: List[EnrichedRecord]) -> None:
+            store.save_results(job_id, start_position, [r.model_dump() for r in results])
+
+        async for event in service.enrich_transactions_streaming(
+            raw_transactions=raw_transactions,
+            user_id=job["user_id"],
+            stream_transactions=options.get("stream_transactions", False),
+            chunk_size=options.get("chunk_size", DEFAULT_STREAM_CHUNK_SIZE),
+            analysis_months=options.get("analysis_months", 3),
+            completed=completed,
+            on_batch=checkpoint,
+            deadline_ms=options.get("deadline_ms")
+        ):
+            if event["type"] == "complete":
+                store.set_status(job_id, "complete")
+                finished = True
+            yield event
+    except Exception as e:
+        store.set_status(job_id, "failed", str(e))
+        finished = True
+        raise
+    finally:
+        if not finished:
+            # Client disconnected mid-stream; keep checkpoints for a resume
+            store.set_status(job_id, "interrupted")
+        _running_jobs.discard(job_id)
+
+
+def is_job_running(job_id: str) -> bool:
+    return job_id in _running_jobs
+
+
+# ============== Shared Store ==============
+
+_shared_job_store: Optional[EnrichmentJobStore] = None
+
+
+def get_job_store() -> EnrichmentJobStore:
+    global _shared_job_store
+    if _shared_job_store is None:
+        _shared_job_store = EnrichmentJobStore()
+    return _shared_job_store
+
+
+def close_job_store() -> None:
+    global _shared_job_store
+    if _shared_job_store is not None:
+        _shared_job_store.close()
+        _shared_job_store = None
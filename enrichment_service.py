@@ -3,13 +3,34 @@
 # Version: 1.2 - With concurrent processing and streaming support
 
 import os
+import sys
 import hashlib
 import asyncio
-from typing import List, Dict, Any, Optional, AsyncGenerator, Callable
+import threading
+from collections import deque
+from typing import List, Dict, Any, Optional, AsyncGenerator, AsyncIterator, Callable, Collection, Deque, Set, Tuple
+from dataclasses import dataclass, field
+from datetime import date
 from pydantic import BaseModel, Field
 from concurrent.futures import ThreadPoolExecutor
 import time
 
+# Keyword lists and the shared keyword matchers (lists re-exported for existing callers)
+from classification_engine import (
+    DEBT_LABELS,
+    FIXED_COST_LABELS,
+    DISCRETIONARY_LABELS,
+    RECURRING_KEYWORDS,
+    match_budget_keywords,
+    has_recurring_keyword,
+    TransactionColumns,
+    FallbackClassification,
+    classify_fallback_columns,
+)
+from merchant_cache import MERCHANT_CACHE, MerchantCache, MerchantCacheEntry, merchant_fingerprint
+from recurrence_detector import SeriesWindow, detect_recurrence, merchant_key
+from budget_store import PENDING_MATCH_DAYS, BudgetAggregateStore, get_budget_store, pending_match_merchant
+
 # Ntropy SDK import
 NTROPY_AVAILABLE = False
 NtropySDK = None
@@ -22,16 +43,38 @@ try:
 except ImportError as e:
     print(f"[EnrichmentService] Warning: ntropy-sdk not available ({e}), running in fallback mode")
 
-# Thread pool for concurrent Ntropy API calls
+# Thread pool size for concurrent Ntropy API calls (one pool per EnrichmentService)
 # Ntropy rate limit: max 10 concurrent enrichment operations, 500 credits/sec refill
 # Source: https://docs.ntropy.com/api/rate-limits
-_executor = ThreadPoolExecutor(max_workers=10)
+NTROPY_MAX_CONCURRENCY = 10
+
+# Longest warm_up() waits for every worker thread to start
+WARM_UP_TIMEOUT_SECONDS = 5.0
+
+# Set (with no NTROPY_API_KEY) to enrich against the local stand-in in mock_ntropy.py
+NTROPY_MOCK_ENV = "NTROPY_MOCK"
+
+MOCK_SDK_WARNING = (
+    "Transactions are labelled by the local mock (mock_ntropy.py), not Ntropy: merchants, "
+    "labels and recurrence are made up. For load tests and development only."
+)
+
+# Enriched transactions per "transactions" event when results are streamed incrementally
+DEFAULT_STREAM_CHUNK_SIZE = 50
 
+# Batches allowed in flight while a streamed upload is still being received
+DEFAULT_INGEST_INFLIGHT_BATCHES = 4
+
+# Rows classified together by the fallback path of a streamed upload
+FALLBACK_INGEST_BATCH_SIZE = 500
+
+# Users enriched at the same time by the multi-user batch endpoint
+DEFAULT_BATCH_CONCURRENT_USERS = 8
 
 # ============== Pydantic Models for Type Safety ==============
 
 class TrueLayerIngestModel(BaseModel):
-    """Validated input from TrueLayer transaction data"""
+    """Validated input from TrueLayer transaction data (schema; the pipeline uses IngestRecord)"""
     transaction_id: str
     description: str
     amount: float
@@ -42,7 +85,7 @@ class TrueLayerIngestModel(BaseModel):
     timestamp: str  # ISO format
     
 class NtropyOutputModel(BaseModel):
-    """Output model after Ntropy enrichment"""
+    """Output model after Ntropy enrichment (schema; the pipeline uses EnrichedRecord)"""
     transaction_id: str
     original_description: str
     merchant_clean_name: Optional[str] = None
@@ -56,34 +99,209 @@ class NtropyOutputModel(BaseModel):
     entry_type: str  # 'incoming' or 'outgoing'
     budget_category: str  # 'debt', 'fixed', 'discretionary'
     transaction_date: str
+    needs_reenrichment: bool = False  # Classified locally because the deadline ran out
+
+
+# ============== Internal Records ==============
+# Per-transaction objects on the normalise/classify hot path. Same fields as the
+# models above, but plain slotted dataclasses: nothing is validated per row
+# (normalize_truelayer_transaction coerces raw input itself), and they dump to
+# the same dicts as the models without a validation round trip.
+
+@dataclass(slots=True)
+class IngestRecord:
+    """Normalised TrueLayer transaction (fields of TrueLayerIngestModel)"""
+    transaction_id: str
+    description: str
+    amount: float
+    currency: str = "GBP"
+    transaction_type: Optional[str] = None
+    transaction_category: Optional[str] = None
+    transaction_classification: Optional[List[str]] = None
+    timestamp: str = ""
+
+
+@dataclass(slots=True, kw_only=True)
+class EnrichedRecord:
+    """Enriched transaction (fields of NtropyOutputModel)"""
+    transaction_id: str
+    original_description: str
+    merchant_clean_name: Optional[str] = None
+    merchant_logo_url: Optional[str] = None
+    merchant_website_url: Optional[str] = None
+    labels: List[str] = field(default_factory=list)
+    is_recurring: bool = False
+    recurrence_frequency: Optional[str] = None
+    recurrence_day: Optional[int] = None
+    amount_cents: int
+    entry_type: str
+    budget_category: str
+    transaction_date: str
+    needs_reenrichment: bool = False
+
+    def model_dump(self) -> Dict[str, Any]:
+        """Same dict as NtropyOutputModel.model_dump()"""
+        return {
+            "transaction_id": self.transaction_id,
+            "original_description": self.original_description,
+            "merchant_clean_name": self.merchant_clean_name,
+            "merchant_logo_url": self.merchant_logo_url,
+            "merchant_website_url": self.merchant_website_url,
+            "labels": list(self.labels),
+            "is_recurring": self.is_recurring,
+            "recurrence_frequency": self.recurrence_frequency,
+            "recurrence_day": self.recurrence_day,
+            "amount_cents": self.amount_cents,
+            "entry_type": self.entry_type,
+            "budget_category": self.budget_category,
+            "transaction_date": self.transaction_date,
+            "needs_reenrichment": self.needs_reenrichment,
+        }
+
+    def to_model(self) -> NtropyOutputModel:
+        """Validate into the public schema (only needed for untrusted callers)"""
+        return NtropyOutputModel(**self.model_dump())
+
+
+def _coerce_description(description: Any) -> str:
+    """Raw descriptions aren't validated at the API boundary; make them a string"""
+    if isinstance(description, str):
+        return description
+    return "" if description is None else str(description)
+
 
+def _deadline_from_ms(deadline_ms: Optional[int]) -> Optional[float]:
+    """Absolute time.monotonic() deadline for a relative budget in milliseconds"""
+    return time.monotonic() + deadline_ms / 1000 if deadline_ms else None
 
-# ============== Classification Constants ==============
 
-# Labels that indicate potential debt payments
-DEBT_LABELS = [
-    'loan', 'mortgage', 'finance', 'bnpl', 'buy now pay later',
-    'credit card', 'overdraft', 'klarna', 'clearpay', 'afterpay',
-    'laybuy', 'paypal credit', 'very pay', 'littlewoods', 'studio',
-    'car finance', 'personal loan', 'debt collection', 'debt recovery'
-]
+def _truncate_timestamp(timestamp: str) -> str:
+    """Truncate an ISO timestamp to its YYYY-MM-DD date"""
+    if "T" in timestamp:
+        return timestamp.split("T")[0]
+    return timestamp[:10] if len(timestamp) >= 10 else timestamp
 
-# Labels that indicate fixed/recurring costs
-FIXED_COST_LABELS = [
-    'utilities', 'utility', 'gas', 'electric', 'electricity', 'water',
-    'council tax', 'insurance', 'home insurance', 'car insurance',
-    'life insurance', 'health insurance', 'subscription', 'membership',
-    'gym', 'streaming', 'netflix', 'spotify', 'amazon prime', 'disney+',
-    'rent', 'mortgage payment', 'broadband', 'internet', 'phone', 'mobile',
-    'tv license', 'childcare', 'nursery', 'school fees'
-]
 
-# Labels for discretionary spending
-DISCRETIONARY_LABELS = [
-    'food', 'dining', 'restaurant', 'takeaway', 'fast food', 'coffee',
-    'shopping', 'retail', 'clothing', 'electronics', 'entertainment',
-    'leisure', 'travel', 'holiday', 'gambling', 'betting', 'lottery'
-]
+def _transaction_content(raw_tx: Dict[str, Any]) -> str:
+    tx_type = raw_tx.get("transaction_type", "")
+    return "|".join([
+        str(raw_tx.get("description", "")),
+        f"{float(raw_tx.get('amount', 0)):.2f}",
+        str(raw_tx.get("currency", "GBP")),
+        tx_type.upper() if isinstance(tx_type, str) else "",
+        _truncate_timestamp(raw_tx.get("timestamp", "")),
+    ])
+
+
+def _content_transaction_id(raw_tx: Dict[str, Any], occurrence: int = 0) -> str:
+    """
+    Stable ID for a transaction that arrived without one, derived from its
+    content and `occurrence`: how many identical rows came before it in the
+    same delivery. Unlike hash(), it is the same in every process and run.
+    Two identical purchases in one delivery get different IDs; the same
+    delivery sent again maps onto the same IDs.
+    """
+    content = _transaction_content(raw_tx)
+    if occurrence:
+        content += f"|#{occurrence}"
+    return "tx_" + hashlib.sha256(content.encode()).hexdigest()[:24]
+
+
+def _raw_transaction_id(raw_tx: Dict[str, Any]) -> str:
+    """ID of a single row; rows of a delivery are numbered by _TransactionIds"""
+    return raw_tx.get("transaction_id") or _content_transaction_id(raw_tx)
+
+
+class _TransactionIds:
+    """
+    Assigns IDs to the rows of one delivery, in order: a row's own
+    transaction_id, or its content ID numbered by the identical ID-less rows
+    seen before it.
+    """
+
+    def __init__(self):
+        self._occurrences: Dict[str, int] = {}
+
+    def __call__(self, raw_tx: Dict[str, Any]) -> str:
+        tx_id = raw_tx.get("transaction_id")
+        if tx_id:
+            return tx_id
+        content = _transaction_content(raw_tx)
+        occurrence = self._occurrences.get(content, 0)
+        self._occurrences[content] = occurrence + 1
+        return _content_transaction_id(raw_tx, occurrence)
+
+    def with_id(self, raw_tx: Dict[str, Any]) -> Dict[str, Any]:
+        """The row itself if it has an ID, otherwise a copy carrying its assigned one"""
+        tx_id = self(raw_tx)
+        return raw_tx if raw_tx.get("transaction_id") else {**raw_tx, "transaction_id": tx_id}
+
+
+def _is_pending(raw_tx: Dict[str, Any]) -> bool:
+    status = raw_tx.get("status")
+    return raw_tx.get("pending") is True or (isinstance(status, str) and status.lower() == "pending")
+
+
+def _pending_match_key(raw_tx: Dict[str, Any]) -> Tuple[str, int]:
+    # The leading merchant word (pending descriptions often lose the booked
+    # row's suffix) plus the exact signed amount
+    return (pending_match_merchant(raw_tx.get("description", "")), int(round(raw_tx.get("amount", 0) * 100)))
+
+
+def _date_ordinal(raw_tx: Dict[str, Any]) -> Optional[int]:
+    try:
+        return date.fromisoformat(_truncate_timestamp(raw_tx.get("timestamp", ""))).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+# ============== Budget Accumulator ==============
+
+class BudgetAccumulator:
+    """
+    Running budget totals and detected debts over enriched transactions.
+    Lets the streaming pipeline aggregate batch by batch without holding
+    the full enriched list in memory.
+    """
+
+    def __init__(self):
+        self.income_total = 0
+        self.fixed_total = 0
+        self.discretionary_total = 0
+        self.debt_total = 0
+        self.transaction_count = 0
+        self.detected_debts: List[Dict[str, Any]] = []
+        self._seen_debts = set()
+
+    def add(self, tx: EnrichedRecord) -> None:
+        """Fold a single enriched transaction into the running totals"""
+        self.transaction_count += 1
+
+        if tx.entry_type == "incoming":
+            self.income_total += tx.amount_cents
+        elif tx.budget_category == "fixed":
+            self.fixed_total += tx.amount_cents
+        elif tx.budget_category == "discretionary":
+            self.discretionary_total += tx.amount_cents
+        elif tx.budget_category == "debt":
+            self.debt_total += tx.amount_cents
+
+        if tx.budget_category == "debt":
+            key = (tx.merchant_clean_name or tx.original_description, tx.amount_cents)
+            if key not in self._seen_debts:
+                self._seen_debts.add(key)
+                self.detected_debts.append({
+                    "description": tx.original_description,
+                    "merchant_name": tx.merchant_clean_name,
+                    "amount_cents": tx.amount_cents,
+                    "logo_url": tx.merchant_logo_url,
+                    "is_recurring": tx.is_recurring,
+                    "recurrence_frequency": tx.recurrence_frequency
+                })
+
+    def add_all(self, txs: List[EnrichedRecord]) -> None:
+        for tx in txs:
+            self.add(tx)
 
 
 # ============== Enrichment Service ==============
@@ -94,12 +312,39 @@ class EnrichmentService:
     ingest → convert → enrich → classify
     """
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the Ntropy SDK with the provided API key"""
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: int = NTROPY_MAX_CONCURRENCY,
+        merchant_cache: Optional[MerchantCache] = None,
+        budget_store: Optional[BudgetAggregateStore] = None,
+        sdk: Any = None
+    ):
+        """
+        Initialize the Ntropy SDK with the provided API key.
+        
+        An sdk object can be injected instead (e.g. mock_ntropy.MockNtropySDK);
+        with NTROPY_MOCK set and no API key, the local mock is used.
+        """
         self.api_key = api_key or os.environ.get("NTROPY_API_KEY")
         self.sdk = None
+        self._local_sdk = False
+        self.max_concurrency = max_concurrency
+        self.merchant_cache = merchant_cache if merchant_cache is not None else MERCHANT_CACHE
+        self._budget_store = budget_store
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ntropy")
+        self._closed = False
         
-        if NTROPY_AVAILABLE and self.api_key and NtropySDK:
+        if sdk is None and not self.api_key and os.environ.get(NTROPY_MOCK_ENV):
+            from mock_ntropy import MockNtropySDK
+            sdk = MockNtropySDK.from_env()
+        
+        if sdk is not None:
+            self.sdk = sdk
+            self._local_sdk = True
+            print(f"[EnrichmentService] Using injected SDK {type(sdk).__name__}")
+            self._warn_if_mock()
+        elif NTROPY_AVAILABLE and self.api_key and NtropySDK:
             try:
                 self.sdk = NtropySDK(self.api_key)
                 print("[EnrichmentService] Ntropy SDK initialized successfully")
@@ -109,7 +354,92 @@ class EnrichmentService:
         else:
             print("[EnrichmentService] Running in fallback mode (no Ntropy enrichment)")
     
-    def normalize_truelayer_transaction(self, raw_tx: Dict[str, Any]) -> TrueLayerIngestModel:
+    @property
+    def budget_store(self) -> BudgetAggregateStore:
+        """Per-user aggregate store (the shared on-disk one unless injected)"""
+        if self._budget_store is None:
+            self._budget_store = get_budget_store()
+        return self._budget_store
+    
+    async def store_budget_transactions(
+        self,
+        user_id: str,
+        records: List[Dict[str, Any]],
+        pending_ids: Collection[str] = ()
+    ) -> int:
+        """budget_store.add_transactions on a worker thread, so SQLite writes don't block the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.budget_store.add_transactions, user_id, records, pending_ids
+        )
+    
+    @property
+    def closed(self) -> bool:
+        """True once close() has shut the worker pool down"""
+        return self._closed
+    
+    @property
+    def uses_ntropy(self) -> bool:
+        """True when transactions go to Ntropy (or an injected stand-in)"""
+        return self.sdk is not None and (NTROPY_AVAILABLE or self._local_sdk)
+    
+    @property
+    def mode(self) -> str:
+        return "ntropy" if self.uses_ntropy else "fallback"
+    
+    @property
+    def uses_mock(self) -> bool:
+        """True when the SDK is the local mock, whose labels are fake"""
+        return getattr(self.sdk, "is_mock", False) is True
+    
+    def _warn_if_mock(self) -> None:
+        if self.uses_mock:
+            print(f"[EnrichmentService] !!! WARNING: {MOCK_SDK_WARNING}", file=sys.stderr)
+    
+    def warm_up(self) -> None:
+        """
+        Start every worker thread up front so the first request doesn't pay
+        for thread creation. The SDK instance (and its HTTP session) is kept
+        for the life of the service, so connections stay warm between requests.
+        """
+        # Each task holds its thread until all have started; tasks that returned
+        # at once would let the pool reuse one idle thread for the rest
+        started = threading.Barrier(self.max_concurrency)
+        warmups = [self._executor.submit(started.wait, WARM_UP_TIMEOUT_SECONDS) for _ in range(self.max_concurrency)]
+        for future in warmups:
+            future.result()
+        print(f"[EnrichmentService] Warmed up in {self.mode} mode with {self.max_concurrency} workers")
+        self._warn_if_mock()
+    
+    def health(self) -> Dict[str, Any]:
+        """Readiness details for the health probe"""
+        health = {
+            "status": "closed" if self._closed else "healthy",
+            "mode": self.mode,
+            "sdk_initialized": self.sdk is not None,
+            "mock_sdk": self.uses_mock,
+            "max_concurrency": self.max_concurrency,
+            "merchant_cache": self.merchant_cache.stats(),
+        }
+        if self.uses_mock:
+            self._warn_if_mock()
+            health["warning"] = MOCK_SDK_WARNING
+        return health
+    
+    def close(self) -> None:
+        """Stop the worker pool and release the SDK's HTTP resources"""
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        close_sdk = getattr(self.sdk, "close", None)
+        if callable(close_sdk):
+            try:
+                close_sdk()
+            except Exception as e:
+                print(f"[EnrichmentService] Error closing Ntropy SDK: {e}")
+        print("[EnrichmentService] Shut down")
+    
+    def normalize_truelayer_transaction(self, raw_tx: Dict[str, Any]) -> IngestRecord:
         """
         Phase 1: Normalize raw TrueLayer transaction data
         - Determine entry type from amount sign OR transaction_type field
@@ -125,18 +455,14 @@ class EnrichmentService:
         tx_type_upper = tx_type.upper() if isinstance(tx_type, str) else ""
         
         # Normalize amount to positive
-        normalized_amount = abs(amount)
+        normalized_amount = float(abs(amount))
         
         # Truncate timestamp to date
-        timestamp = raw_tx.get("timestamp", "")
-        if "T" in timestamp:
-            date_str = timestamp.split("T")[0]
-        else:
-            date_str = timestamp[:10] if len(timestamp) >= 10 else timestamp
+        date_str = _truncate_timestamp(raw_tx.get("timestamp", ""))
         
-        return TrueLayerIngestModel(
-            transaction_id=raw_tx.get("transaction_id", str(hash(raw_tx.get("description", "")))),
-            description=raw_tx.get("description", ""),
+        return IngestRecord(
+            transaction_id=_raw_transaction_id(raw_tx),
+            description=_coerce_description(raw_tx.get("description", "")),
             amount=normalized_amount,
             currency=raw_tx.get("currency", "GBP"),
             transaction_type=tx_type_upper,  # Store normalized uppercase type
@@ -145,11 +471,74 @@ class EnrichmentService:
             timestamp=date_str
         )
     
+    def deduplicate_transactions(
+        self,
+        raw_transactions: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Drop duplicates before anything is enriched or counted.
+        
+        - Rows sharing a transaction_id are kept once; a booked copy replaces
+          a pending one. Rows without one are given their content ID
+          (_TransactionIds), so identical ID-less rows in one delivery are
+          separate purchases and are all kept.
+        - A pending row (status "pending" or pending: true) is dropped when a
+          booked row for the same merchant and amount books within
+          PENDING_MATCH_DAYS after it. Each booked row absorbs one pending row.
+        
+        Returns:
+            (kept raw transactions in their original order, each with a
+            transaction_id, number removed)
+        """
+        kept: List[Dict[str, Any]] = []
+        position_by_id: Dict[str, int] = {}
+        assign_id = _TransactionIds()
+        for raw_tx in raw_transactions:
+            raw_tx = assign_id.with_id(raw_tx)
+            tx_id = raw_tx["transaction_id"]
+            position = position_by_id.get(tx_id)
+            if position is None:
+                position_by_id[tx_id] = len(kept)
+                kept.append(raw_tx)
+            elif _is_pending(kept[position]) and not _is_pending(raw_tx):
+                kept[position] = raw_tx
+        
+        pending_positions = [i for i, raw_tx in enumerate(kept) if _is_pending(raw_tx)]
+        if pending_positions:
+            booked_by_key: Dict[Tuple[str, int], List[Tuple[int, int]]] = {}
+            for i, raw_tx in enumerate(kept):
+                ordinal = _date_ordinal(raw_tx)
+                if ordinal is not None and not _is_pending(raw_tx):
+                    booked_by_key.setdefault(_pending_match_key(raw_tx), []).append((ordinal, i))
+            for candidates in booked_by_key.values():
+                candidates.sort()
+            
+            absorbed: Set[int] = set()
+            dropped: Set[int] = set()
+            for i in pending_positions:
+                ordinal = _date_ordinal(kept[i])
+                if ordinal is None:
+                    continue
+                for booked_ordinal, booked_position in booked_by_key.get(_pending_match_key(kept[i]), []):
+                    if booked_position in absorbed:
+                        continue
+                    if 0 <= booked_ordinal - ordinal <= PENDING_MATCH_DAYS:
+                        absorbed.add(booked_position)
+                        dropped.add(i)
+                        break
+            if dropped:
+                kept = [raw_tx for i, raw_tx in enumerate(kept) if i not in dropped]
+        
+        removed = len(raw_transactions) - len(kept)
+        if removed:
+            print(f"[EnrichmentService] Removed {removed} duplicate transactions before enrichment")
+        return kept, removed
+    
     def _hash_user_id(self, user_id: str) -> str:
         """Create a hashed account holder ID for Ntropy recurrence detection"""
         return hashlib.sha256(user_id.encode()).hexdigest()[:32]
     
-    def _determine_entry_type(self, norm_tx: TrueLayerIngestModel) -> str:
+    def _determine_entry_type(self, norm_tx: IngestRecord) -> str:
         """
         Determine if a transaction is incoming (income) or outgoing (expense).
         
@@ -196,23 +585,258 @@ class EnrichmentService:
     async def _enrich_concurrent(
         self, 
         tx_data_list: List[Dict[str, Any]], 
-        loop: asyncio.AbstractEventLoop
-    ) -> List[Optional[Dict[str, Any]]]:
+        loop: asyncio.AbstractEventLoop,
+        deadline: Optional[float] = None
+    ) -> Tuple[List[Optional[Dict[str, Any]]], Set[int]]:
         """
         Enrich transactions concurrently using thread pool.
         Significantly faster than sequential processing.
+        
+        Returns:
+            (results, indices of calls still unfinished at the deadline). Unfinished
+            calls are cancelled if they haven't started and their result is None.
         """
         tasks = [
-            loop.run_in_executor(_executor, self._enrich_single_sync, tx_data)
+            loop.run_in_executor(self._executor, self._enrich_single_sync, tx_data)
             for tx_data in tx_data_list
         ]
-        return await asyncio.gather(*tasks)
+        if deadline is None:
+            return await asyncio.gather(*tasks), set()
+        
+        if tasks:
+            await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+        timed_out = set()
+        results: List[Optional[Dict[str, Any]]] = []
+        for i, task in enumerate(tasks):
+            if task.done() and not task.cancelled():
+                results.append(task.result())
+            else:
+                task.cancel()
+                timed_out.add(i)
+                results.append(None)
+        return results, timed_out
+    
+    def _build_ntropy_payload(self, norm_tx: IngestRecord, account_holder_id: str) -> Dict[str, Any]:
+        """Build the Ntropy create() arguments for a normalized transaction"""
+        return {
+            "id": norm_tx.transaction_id,
+            "description": norm_tx.description,
+            "amount": norm_tx.amount,
+            "entry_type": self._determine_entry_type(norm_tx),
+            "currency": norm_tx.currency,
+            "date": norm_tx.timestamp,
+            "account_holder_id": account_holder_id,
+        }
+    
+    def _build_enriched_output(
+        self,
+        norm_tx: IngestRecord,
+        enriched_dict: Optional[Dict[str, Any]],
+        series: Optional[Tuple[str, Optional[int]]] = None
+    ) -> EnrichedRecord:
+        """
+        Merge an Ntropy result into our output model, falling back if
+        enrichment failed. A series detected in the user's own rows (see
+        _detect_series) stands in when Ntropy doesn't call it recurring, so
+        the row is budgeted the same as one served from the merchant cache.
+        """
+        if enriched_dict is None:
+            return self._create_fallback_output(norm_tx)
+        
+        labels = enriched_dict.get('labels', []) or []
+        merchant = enriched_dict.get('merchant', {}) or {}
+        recurrence = enriched_dict.get('recurrence', {}) or {}
+        
+        is_recurring = recurrence.get('is_recurring', False)
+        if is_recurring:
+            recurrence_frequency, recurrence_day = recurrence.get('frequency'), recurrence.get('day_of_month')
+        elif series is not None:
+            is_recurring = True
+            recurrence_frequency, recurrence_day = series
+        else:
+            recurrence_frequency = recurrence_day = None
+        entry_type = self._determine_entry_type(norm_tx)
+        
+        # Phase 3: Classify
+        budget_category = self.classify_transaction(
+            labels=labels,
+            is_recurring=is_recurring,
+            entry_type=entry_type
+        )
+        
+        # Remember the merchant-level part (not recurrence, which is per user)
+        self.merchant_cache.put(
+            merchant_fingerprint(norm_tx.description, entry_type),
+            MerchantCacheEntry(
+                merchant_name=merchant.get('name'),
+                logo_url=merchant.get('logo'),
+                website_url=merchant.get('website'),
+                labels=tuple(labels),
+                budget_category=match_budget_keywords(" ".join(labels).lower()),
+            )
+        )
+        
+        return EnrichedRecord(
+            transaction_id=norm_tx.transaction_id,
+            original_description=norm_tx.description,
+            merchant_clean_name=merchant.get('name'),
+            merchant_logo_url=merchant.get('logo'),
+            merchant_website_url=merchant.get('website'),
+            labels=labels,
+            is_recurring=is_recurring,
+            recurrence_frequency=recurrence_frequency,
+            recurrence_day=recurrence_day,
+            amount_cents=int(norm_tx.amount * 100),
+            entry_type=entry_type,
+            budget_category=budget_category,
+            transaction_date=norm_tx.timestamp
+        )
+    
+    def _build_cached_output(
+        self,
+        norm_tx: IngestRecord,
+        entry: MerchantCacheEntry,
+        series: Optional[Tuple[str, Optional[int]]] = None
+    ) -> EnrichedRecord:
+        """Build output from a merchant cache hit, without calling Ntropy"""
+        # Recurrence isn't cached (it is per user): use the series detected in
+        # the user's own rows, else the fallback path's description check
+        if series is not None:
+            is_recurring = True
+            recurrence_frequency, recurrence_day = series
+        else:
+            is_recurring = has_recurring_keyword(norm_tx.description.lower())
+            recurrence_frequency, recurrence_day = ("monthly" if is_recurring else None), None
+        entry_type = self._determine_entry_type(norm_tx)
+        budget_category = entry.budget_category or self.classify_transaction([], is_recurring, entry_type)
+        
+        return EnrichedRecord(
+            transaction_id=norm_tx.transaction_id,
+            original_description=norm_tx.description,
+            merchant_clean_name=entry.merchant_name,
+            merchant_logo_url=entry.logo_url,
+            merchant_website_url=entry.website_url,
+            labels=list(entry.labels),
+            is_recurring=is_recurring,
+            recurrence_frequency=recurrence_frequency,
+            recurrence_day=recurrence_day,
+            amount_cents=int(norm_tx.amount * 100),
+            entry_type=entry_type,
+            budget_category=budget_category,
+            transaction_date=norm_tx.timestamp
+        )
+    
+    def _detect_series(
+        self,
+        normalized: List[IngestRecord],
+        window: Optional[SeriesWindow] = None
+    ) -> Dict[str, Tuple[str, Optional[int]]]:
+        """
+        Recurring series in the user's own rows, as (frequency, day) by
+        transaction ID. Pass a SeriesWindow when the history arrives in pieces.
+        """
+        frequencies, days = (window.detect if window else detect_recurrence)(
+            [n.description for n in normalized],
+            [int(n.amount * 100) for n in normalized],
+            [self._determine_entry_type(n) for n in normalized],
+            [n.timestamp for n in normalized],
+        )
+        return {
+            n.transaction_id: (frequency, day)
+            for n, frequency, day in zip(normalized, frequencies, days) if frequency is not None
+        }
+    
+    async def _enrich_batch(
+        self,
+        batch: List[IngestRecord],
+        user_id: str,
+        loop: asyncio.AbstractEventLoop,
+        deadline: Optional[float] = None,
+        series: Optional[Dict[str, Tuple[str, Optional[int]]]] = None
+    ) -> List[EnrichedRecord]:
+        """
+        Enrich and classify one batch of normalized transactions with Ntropy.
+        
+        The merchant cache is consulted first, and only one transaction per
+        unseen merchant in the batch goes to Ntropy; the rest reuse its result.
+        The cache holds merchant metadata only, so recurrence always comes from
+        the user's own rows: pass `series` (from _detect_series over the whole
+        history), otherwise series are detected within the batch.
+        Transactions still waiting on Ntropy at the deadline are classified
+        locally and flagged needs_reenrichment.
+        """
+        if series is None:
+            series = self._detect_series(batch)
+        account_holder_id = self._hash_user_id(user_id)
+        fingerprints = [merchant_fingerprint(n.description, self._determine_entry_type(n)) for n in batch]
+        cached = [self.merchant_cache.get(key) for key in fingerprints]
+        
+        # One provider call per unseen fingerprint (every row without a fingerprint is sent)
+        to_enrich: List[int] = []
+        first_for_key: Dict[Any, int] = {}
+        for i, (key, entry) in enumerate(zip(fingerprints, cached)):
+            if entry is not None:
+                continue
+            if key is None or key not in first_for_key:
+                if key is not None:
+                    first_for_key[key] = i
+                to_enrich.append(i)
+        
+        tx_data_list = [self._build_ntropy_payload(batch[i], account_holder_id) for i in to_enrich]
+        enriched_batch, timed_out = (
+            await self._enrich_concurrent(tx_data_list, loop, deadline) if tx_data_list else ([], set())
+        )
+        
+        results: List[Optional[EnrichedRecord]] = [None] * len(batch)
+        answers: Dict[Any, Optional[Dict[str, Any]]] = {}
+        late: List[int] = []
+        late_keys = set()
+        for position, (i, enriched_dict) in enumerate(zip(to_enrich, enriched_batch)):
+            if position in timed_out:
+                late.append(i)
+                late_keys.add(fingerprints[i])
+            else:
+                answers[fingerprints[i]] = enriched_dict
+                results[i] = self._build_enriched_output(batch[i], enriched_dict, series.get(batch[i].transaction_id))
+        
+        for i, norm_tx in enumerate(batch):
+            if results[i] is not None or i in late:
+                continue
+            detected = series.get(norm_tx.transaction_id)
+            if cached[i] is not None:
+                results[i] = self._build_cached_output(norm_tx, cached[i], detected)
+            elif fingerprints[i] in late_keys:
+                # Waiting on a representative call that missed the deadline
+                late.append(i)
+            else:
+                # Same merchant as a row sent in this batch: share its answer
+                # (a failed call falls back)
+                results[i] = self._build_enriched_output(norm_tx, answers.get(fingerprints[i]), detected)
+        
+        if late:
+            late.sort()
+            for i, fallback in zip(late, self._deadline_fallback([batch[i] for i in late])):
+                results[i] = fallback
+        return results
+    
+    def _deadline_fallback(self, normalized_transactions: List[IngestRecord]) -> List[EnrichedRecord]:
+        """Classify transactions locally because the deadline expired, flagged for later re-enrichment"""
+        results = self._fallback_classification(normalized_transactions)
+        for result in results:
+            result.needs_reenrichment = True
+        return results
     
     async def enrich_transactions_streaming(
         self,
         raw_transactions: List[Dict[str, Any]],
         user_id: str,
-        progress_callback: Optional[Callable[[int, int, str], None]] = None
+        progress_callback: Optional[Callable[[int, int, str], None]] = None,
+        stream_transactions: bool = False,
+        chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+        analysis_months: int = 3,
+        completed: Optional[List[EnrichedRecord]] = None,
+        on_batch: Optional[Callable[[int, List[EnrichedRecord]], None]] = None,
+        deadline_ms: Optional[int] = None
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
         Stream enrichment progress with real-time updates.
@@ -222,169 +846,289 @@ class EnrichmentService:
             raw_transactions: List of raw TrueLayer transaction dicts
             user_id: User ID for recurrence detection
             progress_callback: Optional callback(current, total, status)
+            stream_transactions: Emit enriched transactions in chunks as they finish
+                instead of collecting them into the final event
+            chunk_size: Transactions per "transactions" event when streaming results
+            analysis_months: Window of the user's stored history for budget_analysis
+            completed: Results already produced for the first len(completed)
+                deduplicated transactions (a resumed job); they are replayed,
+                not enriched again
+            on_batch: Optional callback(start_position, results) after each newly
+                enriched batch, used to checkpoint jobs
+            deadline_ms: Time budget for Ntropy. Once it runs out, everything not
+                yet enriched is classified locally and flagged needs_reenrichment
             
         Yields:
             Progress events: {"type": "progress", "current": N, "total": M, "status": "enriching"}
+            Transaction chunks (stream_transactions only): {"type": "transactions", "transactions": [...]}
             Complete event: {"type": "complete", "result": {...}}
+              With stream_transactions the result carries only budget_analysis,
+              detected_debts and transaction_count. Both forms include
+              duplicates_removed and needs_reenrichment_count.
         """
-        total = len(raw_transactions)
+        deadline = _deadline_from_ms(deadline_ms)
         start_time = time.time()
+        start_ms = int(start_time * 1000)
+        chunk_size = max(1, chunk_size)
         
-        # Phase 1: Normalize
-        yield {"type": "progress", "current": 0, "total": total, "status": "extracting", "startTime": int(start_time * 1000)}
+        # Phase 1: Deduplicate and normalize
+        raw_transactions, duplicates_removed = self.deduplicate_transactions(raw_transactions)
+        total = len(raw_transactions)
+        pending_ids = {tx["transaction_id"] for tx in raw_transactions if _is_pending(tx)}
+        yield {"type": "progress", "current": 0, "total": total, "status": "extracting", "startTime": start_ms}
         
         normalized = [self.normalize_truelayer_transaction(tx) for tx in raw_transactions]
         
         # Phase 2: Enrich with Ntropy
-        results: List[NtropyOutputModel] = []
+        # Budget totals are accumulated as batches finish. In streaming mode the
+        # enriched rows are only held until their chunk has been emitted.
+        accumulator = BudgetAccumulator()
+        results: List[EnrichedRecord] = []
+        pending_chunk: List[EnrichedRecord] = []
         
-        if self.sdk and NTROPY_AVAILABLE:
-            yield {"type": "progress", "current": 0, "total": total, "status": "enriching", "startTime": int(start_time * 1000)}
+        if self.uses_ntropy:
+            yield {"type": "progress", "current": 0, "total": total, "status": "enriching", "startTime": start_ms}
             
             loop = asyncio.get_event_loop()
+            # Recurrence for rows served from the merchant cache, across the whole history
+            series = self._detect_series(normalized)
             
             # Process in batches of 10 for better progress visibility
             batch_size = 10
-            for batch_start in range(0, total, batch_size):
-                batch_end = min(batch_start + batch_size, total)
-                batch = normalized[batch_start:batch_end]
-                
-                # Prepare batch data
-                tx_data_list = []
-                for norm_tx in batch:
-                    entry_type = self._determine_entry_type(norm_tx)
-                    tx_data_list.append({
-                        "id": norm_tx.transaction_id,
-                        "description": norm_tx.description,
-                        "amount": norm_tx.amount,
-                        "entry_type": entry_type,
-                        "currency": norm_tx.currency,
-                        "date": norm_tx.timestamp,
-                        "account_holder_id": self._hash_user_id(user_id),
-                    })
-                
-                # Enrich batch concurrently
-                enriched_batch = await self._enrich_concurrent(tx_data_list, loop)
+            status = "enriching"
+        else:
+            # Fallback mode - classify the whole history at once (recurring
+            # series can only be detected across all of it), then emit in chunks
+            yield {"type": "progress", "current": 0, "total": total, "status": "classifying", "startTime": start_ms}
+            fallback_results = self._fallback_classification(normalized)
+            batch_size = chunk_size
+            status = "classifying"
+        
+        completed = (completed or [])[:total]
+        
+        async def result_batches():
+            # Replayed results first (already checkpointed and aggregated), then new work
+            if completed:
+                yield completed, True
+            for batch_start in range(len(completed), total, batch_size):
+                batch = normalized[batch_start:batch_start + batch_size]
                 
-                # Process results
-                for i, enriched_dict in enumerate(enriched_batch):
-                    norm_tx = batch[i]
-                    
-                    if enriched_dict is None:
-                        results.append(self._create_fallback_output(norm_tx))
-                    else:
-                        labels = enriched_dict.get('labels', []) or []
-                        merchant = enriched_dict.get('merchant', {}) or {}
-                        recurrence = enriched_dict.get('recurrence', {}) or {}
-                        
-                        entry_type = self._determine_entry_type(norm_tx)
-                        budget_category = self.classify_transaction(
-                            labels=labels,
-                            is_recurring=recurrence.get('is_recurring', False),
-                            entry_type=entry_type
-                        )
-                        
-                        results.append(NtropyOutputModel(
-                            transaction_id=norm_tx.transaction_id,
-                            original_description=norm_tx.description,
-                            merchant_clean_name=merchant.get('name'),
-                            merchant_logo_url=merchant.get('logo'),
-                            merchant_website_url=merchant.get('website'),
-                            labels=labels,
-                            is_recurring=recurrence.get('is_recurring', False),
-                            recurrence_frequency=recurrence.get('frequency'),
-                            recurrence_day=recurrence.get('day_of_month'),
-                            amount_cents=int(norm_tx.amount * 100),
-                            entry_type=entry_type,
-                            budget_category=budget_category,
-                            transaction_date=norm_tx.timestamp
-                        ))
+                if self.uses_ntropy:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        # Out of time: classify everything left locally, in one go
+                        remaining = self._deadline_fallback(normalized[batch_start:])
+                        print(f"[EnrichmentService] Deadline reached, {len(remaining)} transactions left for re-enrichment")
+                        if on_batch:
+                            on_batch(batch_start, remaining)
+                        yield remaining, False
+                        return
+                    batch_results = await self._enrich_batch(batch, user_id, loop, deadline, series)
+                else:
+                    batch_results = fallback_results[batch_start:batch_start + batch_size]
                 
-                # Emit progress update
-                current = len(results)
-                yield {
-                    "type": "progress", 
-                    "current": current, 
-                    "total": total, 
-                    "status": "enriching",
-                    "startTime": int(start_time * 1000)
-                }
-        else:
-            # Fallback mode
-            yield {"type": "progress", "current": 0, "total": total, "status": "classifying", "startTime": int(start_time * 1000)}
-            results = self._fallback_classification(normalized)
+                if on_batch:
+                    on_batch(batch_start, batch_results)
+                yield batch_results, False
+        
+        needs_reenrichment_count = 0
+        async for batch_results, replayed in result_batches():
+            accumulator.add_all(batch_results)
+            needs_reenrichment_count += sum(1 for r in batch_results if r.needs_reenrichment)
+            if not replayed:
+                await self.store_budget_transactions(user_id, [r.model_dump() for r in batch_results], pending_ids)
+            
+            if stream_transactions:
+                pending_chunk.extend(batch_results)
+                while len(pending_chunk) >= chunk_size:
+                    chunk, pending_chunk = pending_chunk[:chunk_size], pending_chunk[chunk_size:]
+                    yield {"type": "transactions", "transactions": [r.model_dump() for r in chunk]}
+            else:
+                results.extend(batch_results)
+            
+            # Emit progress update
+            current = accumulator.transaction_count
+            if progress_callback:
+                progress_callback(current, total, status)
+            yield {
+                "type": "progress", 
+                "current": current, 
+                "total": total, 
+                "status": status,
+                "startTime": start_ms
+            }
+        
+        if pending_chunk:
+            yield {"type": "transactions", "transactions": [r.model_dump() for r in pending_chunk]}
+            pending_chunk = []
         
         # Phase 3: Compute budget analysis
-        yield {"type": "progress", "current": total, "total": total, "status": "classifying", "startTime": int(start_time * 1000)}
+        yield {"type": "progress", "current": total, "total": total, "status": "classifying", "startTime": start_ms}
         
-        budget_analysis = self._compute_budget_breakdown(results)
-        detected_debts = self._extract_detected_debts(results)
+        budget_analysis = self.budget_store.breakdown(user_id, months=analysis_months)
+        detected_debts = accumulator.detected_debts
         
         # Final result
+        if stream_transactions:
+            yield {
+                "type": "complete",
+                "result": {
+                    "budget_analysis": budget_analysis,
+                    "detected_debts": detected_debts,
+                    "transaction_count": accumulator.transaction_count,
+                    "duplicates_removed": duplicates_removed,
+                    "needs_reenrichment_count": needs_reenrichment_count
+                }
+            }
+        else:
+            yield {
+                "type": "complete",
+                "result": {
+                    "enriched_transactions": [r.model_dump() for r in results],
+                    "budget_analysis": budget_analysis,
+                    "detected_debts": detected_debts,
+                    "duplicates_removed": duplicates_removed,
+                    "needs_reenrichment_count": needs_reenrichment_count
+                }
+            }
+    
+    async def enrich_transaction_source(
+        self,
+        raw_source: AsyncIterator[Dict[str, Any]],
+        user_id: str,
+        chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+        max_inflight_batches: int = DEFAULT_INGEST_INFLIGHT_BATCHES,
+        analysis_months: int = 3
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Enrich transactions from an async source while it is still producing.
+        
+        Each raw transaction is normalized as soon as it arrives, and full
+        batches are dispatched to enrichment immediately, so network reads,
+        parsing and provider latency overlap. Results are emitted in arrival
+        order as incremental "transactions" events.
+        
+        In fallback mode rows are classified in batches of
+        FALLBACK_INGEST_BATCH_SIZE. In both modes recurring series are
+        detected against a bounded window of each merchant's earlier rows
+        (SeriesWindow), so memory doesn't grow with the length of the upload.
+        
+        Repeated transaction IDs are skipped as they arrive. Pending rows are
+        streamed as they come; the budget store retracts each one when its
+        booked copy arrives.
+        
+        Args:
+            raw_source: Async iterator of raw TrueLayer transaction dicts
+            user_id: User ID for recurrence detection
+            chunk_size: Transactions per "transactions" event
+            max_inflight_batches: Enrichment batches allowed to run ahead of the reader
+            analysis_months: Window of the user's stored history for budget_analysis
+            
+        Yields:
+            Progress events: {"type": "progress", "current": N, "total": received_so_far, "status": "enriching"}
+            Transaction chunks: {"type": "transactions", "transactions": [...]}
+            Complete event: {"type": "complete", "result": {"budget_analysis", "detected_debts",
+                "transaction_count", "duplicates_removed"}}
+        """
+        start_ms = int(time.time() * 1000)
+        chunk_size = max(1, chunk_size)
+        max_inflight_batches = max(1, max_inflight_batches)
+        
+        use_ntropy = self.uses_ntropy
+        status = "enriching" if use_ntropy else "classifying"
+        batch_size = 10 if use_ntropy else FALLBACK_INGEST_BATCH_SIZE
+        loop = asyncio.get_event_loop()
+        
+        accumulator = BudgetAccumulator()
+        inflight: Deque[asyncio.Future] = deque()
+        pending_chunk: List[EnrichedRecord] = []
+        batch: List[IngestRecord] = []
+        series_window = SeriesWindow()
+        seen_ids: Set[str] = set()
+        pending_ids: Set[str] = set()
+        assign_id = _TransactionIds()
+        received = 0
+        duplicates_removed = 0
+        
+        def dispatch(current_batch: List[IngestRecord]) -> asyncio.Future:
+            if use_ntropy:
+                series = self._detect_series(current_batch, series_window)
+                return asyncio.ensure_future(self._enrich_batch(current_batch, user_id, loop, series=series))
+            done = loop.create_future()
+            done.set_result(self._fallback_classification(current_batch, series_window))
+            return done
+        
+        async def collect(batch_results: List[EnrichedRecord]) -> List[Dict[str, Any]]:
+            # Fold a finished batch in and return any chunk events that are now full
+            nonlocal pending_chunk
+            accumulator.add_all(batch_results)
+            await self.store_budget_transactions(user_id, [r.model_dump() for r in batch_results], pending_ids)
+            pending_chunk.extend(batch_results)
+            events = []
+            while len(pending_chunk) >= chunk_size:
+                chunk, pending_chunk = pending_chunk[:chunk_size], pending_chunk[chunk_size:]
+                events.append({"type": "transactions", "transactions": [r.model_dump() for r in chunk]})
+            events.append({
+                "type": "progress",
+                "current": accumulator.transaction_count,
+                "total": received - duplicates_removed,
+                "status": status,
+                "startTime": start_ms
+            })
+            return events
+        
+        yield {"type": "progress", "current": 0, "total": 0, "status": "extracting", "startTime": start_ms}
+        
+        try:
+            async for raw_tx in raw_source:
+                received += 1
+                raw_tx = assign_id.with_id(raw_tx)
+                tx_id = raw_tx["transaction_id"]
+                if tx_id in seen_ids:
+                    duplicates_removed += 1
+                    continue
+                seen_ids.add(tx_id)
+                if _is_pending(raw_tx):
+                    pending_ids.add(tx_id)
+                
+                batch.append(self.normalize_truelayer_transaction(raw_tx))
+                if len(batch) < batch_size:
+                    continue
+                
+                inflight.append(dispatch(batch))
+                batch = []
+                
+                # Emit whatever has already finished, in order, then apply
+                # backpressure to the reader once too many batches are queued
+                while inflight and (inflight[0].done() or len(inflight) > max_inflight_batches):
+                    for event in await collect(await inflight.popleft()):
+                        yield event
+            
+            if batch:
+                inflight.append(dispatch(batch))
+                batch = []
+            
+            while inflight:
+                for event in await collect(await inflight.popleft()):
+                    yield event
+        finally:
+            # Client went away or the source failed - don't leave enrichment running
+            for future in inflight:
+                future.cancel()
+        
+        if pending_chunk:
+            yield {"type": "transactions", "transactions": [r.model_dump() for r in pending_chunk]}
+            pending_chunk = []
+        
         yield {
             "type": "complete",
             "result": {
-                "enriched_transactions": [r.model_dump() for r in results],
-                "budget_analysis": budget_analysis,
-                "detected_debts": detected_debts
+                "budget_analysis": self.budget_store.breakdown(user_id, months=analysis_months),
+                "detected_debts": accumulator.detected_debts,
+                "transaction_count": accumulator.transaction_count,
+                "duplicates_removed": duplicates_removed
             }
         }
     
-    def _compute_budget_breakdown(self, enriched: List[NtropyOutputModel], analysis_months: int = 3) -> Dict[str, Any]:
-        """Compute budget breakdown from enriched transactions"""
-        income_total = 0
-        fixed_total = 0
-        discretionary_total = 0
-        debt_total = 0
-        
-        for tx in enriched:
-            if tx.entry_type == "incoming":
-                income_total += tx.amount_cents
-            elif tx.budget_category == "fixed":
-                fixed_total += tx.amount_cents
-            elif tx.budget_category == "discretionary":
-                discretionary_total += tx.amount_cents
-            elif tx.budget_category == "debt":
-                debt_total += tx.amount_cents
-        
-        # Monthly averages
-        months = max(1, analysis_months)
-        monthly_income = income_total // months
-        monthly_fixed = fixed_total // months
-        monthly_discretionary = discretionary_total // months
-        monthly_debt = debt_total // months
-        
-        safe_to_spend = max(0, monthly_income - monthly_fixed - monthly_debt)
-        
-        return {
-            "averageMonthlyIncomeCents": monthly_income,
-            "fixedCostsCents": monthly_fixed,
-            "discretionaryCents": monthly_discretionary,
-            "debtPaymentsCents": monthly_debt,
-            "safeToSpendCents": safe_to_spend
-        }
-    
-    def _extract_detected_debts(self, enriched: List[NtropyOutputModel]) -> List[Dict[str, Any]]:
-        """Extract detected debt payments from enriched transactions"""
-        debts = []
-        seen = set()
-        
-        for tx in enriched:
-            if tx.budget_category == "debt":
-                key = (tx.merchant_clean_name or tx.original_description, tx.amount_cents)
-                if key not in seen:
-                    seen.add(key)
-                    debts.append({
-                        "description": tx.original_description,
-                        "merchant_name": tx.merchant_clean_name,
-                        "amount_cents": tx.amount_cents,
-                        "logo_url": tx.merchant_logo_url,
-                        "is_recurring": tx.is_recurring,
-                        "recurrence_frequency": tx.recurrence_frequency
-                    })
-        
-        return debts
-    
     def classify_transaction(
         self,
         labels: List[str],
@@ -398,18 +1142,13 @@ class EnrichmentService:
         Bucket B: "fixed" - Recurring bills and subscriptions  
         Bucket C: "discretionary" - Variable spending
         """
-        labels_lower = [l.lower() for l in labels]
-        labels_text = " ".join(labels_lower)
-        
-        # Bucket A: Check for debt indicators
-        for debt_keyword in DEBT_LABELS:
-            if debt_keyword in labels_text:
-                return "debt"
+        labels_text = " ".join(labels).lower()
         
-        # Bucket B: Check for fixed costs OR recurring non-debt
-        for fixed_keyword in FIXED_COST_LABELS:
-            if fixed_keyword in labels_text:
-                return "fixed"
+        # Bucket A: debt indicators, then Bucket B: fixed costs
+        # (one memoised keyword matcher; debt keywords take priority)
+        keyword_bucket = match_budget_keywords(labels_text)
+        if keyword_bucket is not None:
+            return keyword_bucket
         
         # If it's recurring but not matched above, assume fixed cost
         if is_recurring and entry_type == "outgoing":
@@ -425,19 +1164,32 @@ class EnrichmentService:
     async def enrich_transactions(
         self,
         raw_transactions: List[Dict[str, Any]],
-        user_id: str
-    ) -> List[NtropyOutputModel]:
+        user_id: str,
+        deduplicate: bool = True,
+        deadline_ms: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ) -> List[EnrichedRecord]:
         """
-        Main enrichment pipeline: ingest → normalize → enrich → classify
+        Main enrichment pipeline: ingest → dedupe → normalize → enrich → classify
         
         Args:
             raw_transactions: List of raw TrueLayer transaction dicts
             user_id: User ID for recurrence detection
+            deduplicate: Drop duplicates first (pass False if the caller already has)
+            deadline_ms: Time budget for Ntropy; transactions not enriched by then are
+                classified locally and flagged needs_reenrichment
+            batch_size: Send at most this many transactions to Ntropy at a time
+                (default: all at once). Bounds this user's share of the worker
+                pool when several users are enriched together.
             
         Returns:
             List of enriched and classified transactions
         """
-        results: List[NtropyOutputModel] = []
+        results: List[EnrichedRecord] = []
+        deadline = _deadline_from_ms(deadline_ms)
+        
+        if deduplicate:
+            raw_transactions, _ = self.deduplicate_transactions(raw_transactions)
         
         # Phase 1: Normalize all transactions
         normalized = [
@@ -446,74 +1198,20 @@ class EnrichmentService:
         ]
         
         # Phase 2: Enrich with Ntropy (if available)
-        if self.sdk and NTROPY_AVAILABLE:
+        if self.uses_ntropy:
             try:
-                # Prepare transaction data for concurrent processing
-                tx_data_list = []
-                for norm_tx in normalized:
-                    entry_type = self._determine_entry_type(norm_tx)
-                    tx_data_list.append({
-                        "id": norm_tx.transaction_id,
-                        "description": norm_tx.description,
-                        "amount": norm_tx.amount,
-                        "entry_type": entry_type,
-                        "currency": norm_tx.currency,
-                        "date": norm_tx.timestamp,
-                        "account_holder_id": self._hash_user_id(user_id),
-                    })
-                
-                print(f"[EnrichmentService] Enriching {len(tx_data_list)} transactions with Ntropy (concurrent)...")
+                print(f"[EnrichmentService] Enriching {len(normalized)} transactions with Ntropy (concurrent)...")
                 
                 # Use concurrent processing for speed
                 loop = asyncio.get_event_loop()
-                enriched_batch = await self._enrich_concurrent(tx_data_list, loop)
-                
-                # Process enriched results
-                for i, enriched_dict in enumerate(enriched_batch):
-                    norm_tx = normalized[i]
-                    
-                    # Skip if enrichment failed for this transaction
-                    if enriched_dict is None:
-                        results.append(self._create_fallback_output(norm_tx))
-                        continue
-                    
-                    # enriched_dict is already a dict from _enrich_concurrent
-                    labels = enriched_dict.get('labels', []) or []
-                    merchant = enriched_dict.get('merchant', {}) or {}
-                    recurrence = enriched_dict.get('recurrence', {}) or {}
-                    
-                    merchant_name = merchant.get('name')
-                    logo_url = merchant.get('logo')
-                    website_url = merchant.get('website')
-                    
-                    is_recurring = recurrence.get('is_recurring', False)
-                    recurrence_freq = recurrence.get('frequency')
-                    recurrence_day = recurrence.get('day_of_month')
-                    
-                    entry_type = self._determine_entry_type(norm_tx)
-                    
-                    # Phase 3: Classify
-                    budget_category = self.classify_transaction(
-                        labels=labels,
-                        is_recurring=is_recurring,
-                        entry_type=entry_type
-                    )
-                    
-                    results.append(NtropyOutputModel(
-                        transaction_id=norm_tx.transaction_id,
-                        original_description=norm_tx.description,
-                        merchant_clean_name=merchant_name,
-                        merchant_logo_url=logo_url,
-                        merchant_website_url=website_url,
-                        labels=labels,
-                        is_recurring=is_recurring,
-                        recurrence_frequency=recurrence_freq,
-                        recurrence_day=recurrence_day,
-                        amount_cents=int(norm_tx.amount * 100),
-                        entry_type=entry_type,
-                        budget_category=budget_category,
-                        transaction_date=norm_tx.timestamp
-                    ))
+                series = self._detect_series(normalized)
+                step = batch_size or max(1, len(normalized))
+                for batch_start in range(0, len(normalized), step):
+                    if deadline is not None and time.monotonic() >= deadline:
+                        results.extend(self._deadline_fallback(normalized[batch_start:]))
+                        break
+                    batch = normalized[batch_start:batch_start + step]
+                    results.extend(await self._enrich_batch(batch, user_id, loop, deadline, series))
                 
                 print(f"[EnrichmentService] Successfully enriched {len(results)} transactions")
                 
@@ -528,18 +1226,15 @@ class EnrichmentService:
         
         return results
     
-    def _create_fallback_output(self, norm_tx: TrueLayerIngestModel) -> NtropyOutputModel:
+    def _create_fallback_output(self, norm_tx: IngestRecord) -> EnrichedRecord:
         """Create a fallback output for a single transaction when Ntropy enrichment fails"""
         labels = norm_tx.transaction_classification or []
         desc_lower = norm_tx.description.lower()
-        is_recurring = any(kw in desc_lower for kw in [
-            'dd ', 'direct debit', 'standing order', 's/o',
-            'subscription', 'monthly', 'recurring'
-        ])
+        is_recurring = has_recurring_keyword(desc_lower)
         entry_type = self._determine_entry_type(norm_tx)
         budget_category = self._classify_by_keywords(desc_lower, labels, is_recurring, entry_type)
         
-        return NtropyOutputModel(
+        return EnrichedRecord(
             transaction_id=norm_tx.transaction_id,
             original_description=norm_tx.description,
             merchant_clean_name=None,
@@ -557,49 +1252,50 @@ class EnrichmentService:
     
     def _fallback_classification(
         self,
-        normalized_transactions: List[TrueLayerIngestModel]
-    ) -> List[NtropyOutputModel]:
+        normalized_transactions: List[IngestRecord],
+        window: Optional[SeriesWindow] = None
+    ) -> List[EnrichedRecord]:
         """
         Fallback when Ntropy is unavailable - use TrueLayer classifications
-        and keyword matching for basic categorization
+        and keyword matching for basic categorization. Pass a SeriesWindow
+        when the history arrives in pieces.
         """
-        results = []
-        
-        for norm_tx in normalized_transactions:
-            # Use TrueLayer classification as labels
-            labels = norm_tx.transaction_classification or []
-            
-            # Basic keyword matching on description
-            desc_lower = norm_tx.description.lower()
-            
-            # Detect recurring based on common patterns
-            is_recurring = any(kw in desc_lower for kw in [
-                'dd ', 'direct debit', 'standing order', 's/o',
-                'subscription', 'monthly', 'recurring'
-            ])
-            
-            entry_type = self._determine_entry_type(norm_tx)
-            
-            # Enhanced classification using description keywords
-            budget_category = self._classify_by_keywords(desc_lower, labels, is_recurring, entry_type)
+        columns = TransactionColumns(
+            transaction_ids=[n.transaction_id for n in normalized_transactions],
+            descriptions=[n.description for n in normalized_transactions],
+            amounts=[n.amount for n in normalized_transactions],
+            transaction_types=[n.transaction_type or "" for n in normalized_transactions],
+            dates=[n.timestamp for n in normalized_transactions],
+            labels=[n.transaction_classification or [] for n in normalized_transactions],
+        )
+        return [EnrichedRecord(**record) for record in classify_fallback_columns(columns, window=window).records()]
+    
+    def normalize_truelayer_columns(self, raw_transactions: List[Dict[str, Any]]) -> TransactionColumns:
+        """
+        Phase 1 for the columnar fallback path: the same rules as
+        normalize_truelayer_transaction, written straight into column arrays
+        without building a model per transaction.
+        """
+        columns = TransactionColumns()
+        for raw_tx in raw_transactions:
+            description = _coerce_description(raw_tx.get("description", ""))
+            tx_type = raw_tx.get("transaction_type", "")
             
-            results.append(NtropyOutputModel(
-                transaction_id=norm_tx.transaction_id,
-                original_description=norm_tx.description,
-                merchant_clean_name=None,  # No merchant info without Ntropy
-                merchant_logo_url=None,
-                merchant_website_url=None,
-                labels=labels,
-                is_recurring=is_recurring,
-                recurrence_frequency="monthly" if is_recurring else None,
-                recurrence_day=None,
-                amount_cents=int(norm_tx.amount * 100),
-                entry_type=entry_type,
-                budget_category=budget_category,
-                transaction_date=norm_tx.timestamp
-            ))
-        
-        return results
+            columns.transaction_ids.append(_raw_transaction_id(raw_tx))
+            columns.descriptions.append(description)
+            columns.amounts.append(float(abs(raw_tx.get("amount", 0))))
+            columns.transaction_types.append(tx_type.upper() if isinstance(tx_type, str) else "")
+            columns.dates.append(_truncate_timestamp(raw_tx.get("timestamp", "")))
+            columns.labels.append(raw_tx.get("transaction_classification") or [])
+        return columns
+    
+    def classify_fallback_columns(
+        self,
+        raw_transactions: List[Dict[str, Any]],
+        detect_series: bool = True
+    ) -> FallbackClassification:
+        """Normalize and classify raw transactions in bulk without Ntropy"""
+        return classify_fallback_columns(self.normalize_truelayer_columns(raw_transactions), detect_series)
     
     def _classify_by_keywords(
         self,
@@ -609,17 +1305,12 @@ class EnrichmentService:
         entry_type: str
     ) -> str:
         """Classify using keyword matching on description"""
-        combined_text = description + " " + " ".join([l.lower() for l in labels])
-        
-        # Check for debt
-        for kw in DEBT_LABELS:
-            if kw in combined_text:
-                return "debt"
+        combined_text = description + " " + " ".join(labels).lower()
         
-        # Check for fixed costs
-        for kw in FIXED_COST_LABELS:
-            if kw in combined_text:
-                return "fixed"
+        # Check for debt, then fixed costs
+        keyword_bucket = match_budget_keywords(combined_text)
+        if keyword_bucket is not None:
+            return keyword_bucket
         
         # Recurring outgoing = fixed
         if is_recurring and entry_type == "outgoing":
@@ -632,64 +1323,161 @@ class EnrichmentService:
         return "income"
 
 
+# ============== Shared Service Instance ==============
+
+_shared_service: Optional[EnrichmentService] = None
+
+
+def get_enrichment_service() -> EnrichmentService:
+    """
+    Process-wide EnrichmentService. The API creates it at startup (see the
+    lifespan in main.py); other callers get it lazily on first use.
+    """
+    global _shared_service
+    if _shared_service is None or _shared_service._closed:
+        _shared_service = EnrichmentService()
+    return _shared_service
+
+
+def close_enrichment_service() -> None:
+    """Shut down the shared service, if one was created"""
+    global _shared_service
+    if _shared_service is not None:
+        _shared_service.close()
+        _shared_service = None
+
+
 # ============== Batch Processing Helper ==============
 
 async def enrich_and_analyze_budget(
     raw_transactions: List[Dict[str, Any]],
     user_id: str,
-    analysis_months: int = 3
+    analysis_months: int = 3,
+    service: Optional[EnrichmentService] = None,
+    deadline_ms: Optional[int] = None,
+    batch_size: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     High-level function to enrich transactions and compute budget breakdown
     
+    The enriched transactions are folded into the user's persistent monthly
+    aggregates, and the breakdown is read back from there: it covers the last
+    analysis_months of everything synced so far, averaged over the months the
+    data actually spans.
+    
     Returns:
         Dict containing:
         - enriched_transactions: List of enriched transaction data
         - budget_analysis: Computed budget figures
         - detected_debts: List of potential debt payments for user confirmation
+        - duplicates_removed: Duplicate transactions dropped before enrichment
+        - needs_reenrichment_count: Transactions classified locally because
+          deadline_ms ran out (flagged needs_reenrichment)
     """
-    service = EnrichmentService()
+    service = service or get_enrichment_service()
     
-    # Enrich all transactions
-    enriched = await service.enrich_transactions(raw_transactions, user_id)
+    # Duplicates would cost provider credits and be counted twice in the totals
+    raw_transactions, duplicates_removed = service.deduplicate_transactions(raw_transactions)
     
-    # Compute budget breakdown
-    total_income_cents = 0
-    total_fixed_cents = 0
-    total_discretionary_cents = 0
-    detected_debts = []
+    if service.uses_ntropy:
+        # Enrich all transactions
+        enriched = await service.enrich_transactions(
+            raw_transactions, user_id, deduplicate=False, deadline_ms=deadline_ms, batch_size=batch_size
+        )
+        enriched_records = [tx.model_dump() for tx in enriched]
+    else:
+        # Columnar fast path: classify the whole history in bulk and only
+        # build plain dicts for the response
+        print("[EnrichmentService] Using columnar fallback classification (no Ntropy)")
+        enriched_records = list(service.classify_fallback_columns(raw_transactions).records())
     
-    for tx in enriched:
-        if tx.entry_type == "incoming":
-            total_income_cents += tx.amount_cents
-        elif tx.budget_category == "debt":
-            detected_debts.append({
-                "description": tx.original_description,
-                "merchant_name": tx.merchant_clean_name or tx.original_description,
-                "logo_url": tx.merchant_logo_url,
-                "amount_cents": tx.amount_cents,
-                "is_recurring": tx.is_recurring,
-                "recurrence_frequency": tx.recurrence_frequency,
-                "transaction_id": tx.transaction_id
-            })
-        elif tx.budget_category == "fixed":
-            total_fixed_cents += tx.amount_cents
-        elif tx.budget_category == "discretionary":
-            total_discretionary_cents += tx.amount_cents
+    # Update the stored aggregates; resent transactions replace their earlier contribution
+    pending_ids = {tx["transaction_id"] for tx in raw_transactions if _is_pending(tx)}
+    await service.store_budget_transactions(user_id, enriched_records, pending_ids)
+    breakdown = service.budget_store.breakdown(user_id, months=analysis_months)
     
-    # Calculate monthly averages
-    avg_income = total_income_cents // analysis_months
-    avg_fixed = total_fixed_cents // analysis_months
-    avg_discretionary = total_discretionary_cents // analysis_months
+    detected_debts = [
+        {
+            "description": tx["original_description"],
+            "merchant_name": tx["merchant_clean_name"] or tx["original_description"],
+            "logo_url": tx["merchant_logo_url"],
+            "amount_cents": tx["amount_cents"],
+            "is_recurring": tx["is_recurring"],
+            "recurrence_frequency": tx["recurrence_frequency"],
+            "transaction_id": tx["transaction_id"]
+        }
+        for tx in enriched_records
+        if tx["entry_type"] != "incoming" and tx["budget_category"] == "debt"
+    ]
+    
+    avg_income = breakdown["averageMonthlyIncomeCents"]
+    avg_fixed = breakdown["fixedCostsCents"]
     
     return {
-        "enriched_transactions": [tx.model_dump() for tx in enriched],
+        "enriched_transactions": enriched_records,
         "budget_analysis": {
             "averageMonthlyIncomeCents": avg_income,
             "fixedCostsCents": avg_fixed,
-            "discretionaryCents": avg_discretionary,
+            "discretionaryCents": breakdown["discretionaryCents"],
+            "debtPaymentsCents": breakdown["debtPaymentsCents"],
             "safeToSpendCents": avg_income - avg_fixed,
-            "transactionCount": len(enriched)
+            "transactionCount": len(enriched_records),
+            "monthsAnalyzed": breakdown["monthsAnalyzed"]
         },
-        "detected_debts": detected_debts
+        "detected_debts": detected_debts,
+        "duplicates_removed": duplicates_removed,
+        "needs_reenrichment_count": sum(1 for tx in enriched_records if tx["needs_reenrichment"])
     }
+
+
+async def enrich_and_analyze_budgets(
+    user_requests: List[Dict[str, Any]],
+    service: Optional[EnrichmentService] = None,
+    max_concurrent_users: int = DEFAULT_BATCH_CONCURRENT_USERS,
+    deadline_ms: Optional[int] = None
+) -> AsyncGenerator[Tuple[str, Any], None]:
+    """
+    Run enrich_and_analyze_budget for many users over the shared worker pool,
+    yielding (user_id, result) as each user finishes (result is the Exception
+    if that user failed).
+    
+    Fairness: up to max_concurrent_users run at once, and each keeps at most
+    one batch of max_concurrency transactions queued on the pool. The pool's
+    FIFO queue therefore serves the active users round-robin, one batch each,
+    so a user with years of history can't starve the rest while the pool
+    stays fully busy.
+    
+    Args:
+        user_requests: [{"user_id": ..., "transactions": [...], "analysis_months": 3}, ...]
+        deadline_ms: Time budget per user, counted from when that user starts
+    """
+    service = service or get_enrichment_service()
+    slots = asyncio.Semaphore(max(1, max_concurrent_users))
+    finished: asyncio.Queue = asyncio.Queue()
+    
+    async def run_user(user_request: Dict[str, Any]) -> None:
+        user_id = user_request["user_id"]
+        async with slots:
+            try:
+                result = await enrich_and_analyze_budget(
+                    raw_transactions=user_request["transactions"],
+                    user_id=user_id,
+                    analysis_months=user_request.get("analysis_months", 3),
+                    service=service,
+                    deadline_ms=deadline_ms,
+                    batch_size=service.max_concurrency
+                )
+            except Exception as e:
+                print(f"[EnrichmentService] Batch enrichment failed for user {user_id}: {e}")
+                result = e
+        await finished.put((user_id, result))
+    
+    tasks = [asyncio.ensure_future(run_user(user_request)) for user_request in user_requests]
+    try:
+        for _ in range(len(tasks)):
+            yield await finished.get()
+    finally:
+        # Caller stopped listening - don't keep enriching for nobody
+        for task in tasks:
+            task.cancel()
+
@@ -0,0 +1,142 @@
+# event_stream.py - Paced delivery of streaming enrichment events
+# Coalesces progress frames, keeps idle connections alive, and bounds what each client buffers
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, Optional
+
+
+# At most one progress frame per interval; newer progress replaces an unsent one
+DEFAULT_PROGRESS_INTERVAL_MS = 250
+
+# Comment frame sent when nothing else has been sent for this long, so proxies
+# and load balancers don't drop a connection waiting on a slow provider
+DEFAULT_HEARTBEAT_SECONDS = 15.0
+
+# Events produced but not yet sent; when the client falls behind, the producer
+# (and so the enrichment feeding it) waits instead of piling up frames in memory
+DEFAULT_MAX_BUFFERED_EVENTS = 16
+
+SSE_HEARTBEAT = ": keep-alive\n\n"
+
+# Events after which an unsent progress frame is no longer worth sending
+_TERMINAL_EVENTS = ("complete", "error")
+
+_END = object()
+
+
+class _ProducerFailed:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def sse_frame(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+def ndjson_line(event: Dict[str, Any]) -> str:
+    return json.dumps(event) + "\n"
+
+
+async def paced_stream(
+    events: AsyncIterator[Dict[str, Any]],
+    encode: Callable[[Dict[str, Any]], str],
+    progress_interval_ms: int = DEFAULT_PROGRESS_INTERVAL_MS,
+    heartbeat_frame: Optional[str] = None,
+    heartbeat_seconds: float = DEFAULT_HEARTBEAT_SECONDS,
+    max_buffered: int = DEFAULT_MAX_BUFFERED_EVENTS
+) -> AsyncGenerator[str, None]:
+    """
+    Encode events for the wire, paced for the client.
+
+    - {"type": "progress"} events are sent at most once per
+      progress_interval_ms; only the latest unsent one is kept. It is flushed
+      before the next other event, or dropped if that event is terminal.
+    - Every other event is encoded and sent immediately, in order.
+    - With heartbeat_frame, it is sent after heartbeat_seconds of silence.
+    - Events are pulled from `events` by a separate task into a queue of
+      max_buffered entries, so a slow client applies backpressure.
+
+    If the consumer stops early (client disconnect), the producer is cancelled
+    and `events` is closed before this generator finishes closing, so its
+    cleanup (releasing a job for resume) has run by the time the response ends.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_buffered))
+    interval = max(0, progress_interval_ms) / 1000
+
+    async def produce() -> None:
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(_ProducerFailed(e))
+            return
+        await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    getter: Optional[asyncio.Task] = None
+    pending_progress: Optional[Dict[str, Any]] = None
+    last_progress_sent = float("-inf")
+    last_sent = time.monotonic()
+
+    try:
+        while True:
+            now = time.monotonic()
+            waits = []
+            if pending_progress is not None:
+                waits.append(last_progress_sent + interval - now)
+            if heartbeat_frame is not None:
+                waits.append(last_sent + heartbeat_seconds - now)
+            timeout = max(0.0, min(waits)) if waits else None
+
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=timeout)
+            now = time.monotonic()
+
+            if not done:
+                if pending_progress is not None and now >= last_progress_sent + interval:
+                    yield encode(pending_progress)
+                    pending_progress = None
+                    last_progress_sent = last_sent = now
+                elif heartbeat_frame is not None and now >= last_sent + heartbeat_seconds:
+                    yield heartbeat_frame
+                    last_sent = now
+                continue
+
+            event = getter.result()
+            getter = None
+            if event is _END:
+                break
+            if isinstance(event, _ProducerFailed):
+                raise event.error
+
+            if event.get("type") == "progress":
+                if now - last_progress_sent >= interval:
+                    yield encode(event)
+                    pending_progress = None
+                    last_progress_sent = last_sent = now
+                else:
+                    pending_progress = event
+                continue
+
+            if pending_progress is not None and event.get("type") not in _TERMINAL_EVENTS:
+                yield encode(pending_progress)
+                last_progress_sent = now
+            pending_progress = None
+            yield encode(event)
+            last_sent = time.monotonic()
+    finally:
+        if getter is not None:
+            getter.cancel()
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+        # A producer cancelled while waiting on the queue leaves `events` suspended
+        # at a yield; left to the garbage collector, its finally runs too late
+        aclose = getattr(events, "aclose", None)
+        if aclose is not None:
+            await aclose()
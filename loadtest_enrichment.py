@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Load test: drive /enrich-transactions and /enrich-transactions-stream against the local Ntropy stand-in.
+
+By default the API runs in-process with a mock_ntropy.MockNtropySDK injected
+as the shared enrichment service. With --base-url, requests go to a running
+server instead (start it with NTROPY_MOCK=1 and the NTROPY_MOCK_* settings).
+
+Usage: python loadtest_enrichment.py [--endpoint both] [--requests 40] [--concurrency 8]
+                                     [--transactions 200] [--latency-ms 120] [--latency-sigma 0.5]
+                                     [--error-rate 0.0] [--rate-limit-rate 0.0] [--base-url URL]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+
+import httpx
+
+MERCHANTS = [
+    ("TESCO STORES", -23.40), ("KLARNA*ASOS", -45.00), ("NETFLIX.COM", -10.99),
+    ("TFL TRAVEL CH", -7.80), ("DD BRITISH GAS", -64.00), ("PRET A MANGER", -6.25),
+    ("VODAFONE LTD", -18.00), ("SALARY ACME LTD", 2450.00), ("AMAZON MKTPLACE PMTS", -31.99),
+    ("BARCLAYCARD PAYMENT", -120.00), ("STANDING ORDER RENT", -950.00),
+]
+WORDS = ["alder", "birch", "cedar", "delta", "ember", "fjord", "grove", "heron", "iris", "juniper"]
+
+
+def build_transactions(request_index, count, unique_ratio, rng):
+    """One user's history; unique_ratio of rows name a merchant no other row uses"""
+    transactions = []
+    for i in range(count):
+        description, amount = rng.choice(MERCHANTS)
+        if rng.random() < unique_ratio:
+            # merchant_key ignores digits, so make the merchant unique with letters
+            description = f"SHOP {rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(WORDS)}"
+        day = 1 + i % 28
+        month = 1 + (i // 28) % 12
+        transactions.append({
+            "transaction_id": f"lt_{request_index}_{i}",
+            "description": description,
+            "amount": amount,
+            "currency": "GBP",
+            "transaction_type": "CREDIT" if amount > 0 else "DEBIT",
+            "timestamp": f"2025-{month:02d}-{day:02d}T09:00:00Z",
+        })
+    return transactions
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+async def call_enrich(client, payload):
+    response = await client.post("/enrich-transactions", json=payload)
+    response.raise_for_status()
+    return len(response.json()["enriched_transactions"])
+
+
+async def call_stream(client, payload):
+    """Read the SSE stream to the complete event; returns the enriched count"""
+    async with client.stream("POST", "/enrich-transactions-stream", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event["type"] == "complete":
+                return len(event["result"]["enriched_transactions"])
+            if event["type"] == "error":
+                raise RuntimeError(event["message"])
+    raise RuntimeError("stream ended without a complete event")
+
+
+async def run_endpoint(client, endpoint, args):
+    call = call_enrich if endpoint == "enrich" else call_stream
+    rng = random.Random(args.seed)
+    payloads = [
+        {"user_id": f"loadtest_user_{i}",
+         "transactions": build_transactions(i, args.transactions, args.unique_ratio, rng)}
+        for i in range(args.requests)
+    ]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failures = 0
+    enriched = 0
+
+    async def one(payload):
+        nonlocal failures, enriched
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                count = await call(client, payload)
+            except Exception as e:
+                failures += 1
+                print(f"[Load Test] {endpoint} request failed: {e}")
+                return
+            latencies.append(time.perf_counter() - start)
+            enriched += count
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(payload) for payload in payloads))
+    wall_s = time.perf_counter() - wall_start
+
+    return {
+        "requests": len(payloads),
+        "failures": failures,
+        "wall_s": wall_s,
+        "requests_per_s": len(latencies) / wall_s if wall_s else 0.0,
+        "transactions_per_s": enriched / wall_s if wall_s else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def install_mock_service(args):
+    """Point the in-process API at a fresh service backed by the mock provider"""
+    import enrichment_service
+    from budget_store import BudgetAggregateStore
+    from local_store import IN_MEMORY
+    from merchant_cache import MerchantCache
+    from mock_ntropy import MockNtropyConfig, MockNtropySDK
+
+    sdk = MockNtropySDK(MockNtropyConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_in_flight=args.max_in_flight,
+        seed=args.seed,
+    ))
+    enrichment_service.close_enrichment_service()
+    service = enrichment_service.EnrichmentService(
+        max_concurrency=args.max_concurrency,
+        merchant_cache=MerchantCache(capacity=0 if args.no_cache else args.cache_size),
+        budget_store=BudgetAggregateStore(IN_MEMORY),
+        sdk=sdk,
+    )
+    service.warm_up()
+    enrichment_service._shared_service = service
+    return service, sdk
+
+
+async def main(args):
+    endpoints = ["enrich", "stream"] if args.endpoint == "both" else [args.endpoint]
+    sdk = service = None
+
+    if args.base_url:
+        transport, base_url = None, args.base_url
+    else:
+        # Keep job checkpoints out of the working tree
+        os.environ.setdefault("RESOLVE_STATE_DIR", tempfile.mkdtemp(prefix="resolve-loadtest-"))
+        service, sdk = install_mock_service(args)
+        import main as api
+        transport, base_url = httpx.ASGITransport(app=api.app), "http://loadtest"
+
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    print("=" * 80)
+    print(f"LOAD TEST: {args.requests} requests x {args.transactions} transactions, "
+          f"concurrency {args.concurrency}, target {args.base_url or 'in-process + mock Ntropy'}")
+    if sdk is not None:
+        print(f"mock provider: {args.latency_ms:.0f}ms median (sigma {args.latency_sigma}), "
+              f"errors {args.error_rate:.1%}, 429s {args.rate_limit_rate:.1%}, "
+              f"service workers {args.max_concurrency}")
+    print("=" * 80)
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout) as client:
+        for endpoint in endpoints:
+            if service is not None:
+                # Each endpoint starts cold so they pay for the same provider calls
+                service.merchant_cache.clear()
+            calls_before = sdk.stats()["calls"] if sdk else 0
+            report = await run_endpoint(client, endpoint, args)
+            print(f"\n/{'enrich-transactions' if endpoint == 'enrich' else 'enrich-transactions-stream'}")
+            print(f"  requests     : {report['requests']} ({report['failures']} failed) in {report['wall_s']:.2f}s")
+            print(f"  throughput   : {report['requests_per_s']:.2f} req/s, {report['transactions_per_s']:,.0f} tx/s")
+            print(f"  latency      : p50 {report['p50_ms']:.0f}ms, p95 {report['p95_ms']:.0f}ms, "
+                  f"p99 {report['p99_ms']:.0f}ms")
+            if sdk is not None:
+                stats = sdk.stats()
+                print(f"  provider     : {stats['calls'] - calls_before} calls "
+                      f"(totals: {stats['errors']} errors, {stats['rate_limited']} 429s, "
+                      f"peak {stats['peak_in_flight']} in flight)")
+                print(f"  merchant cache: {service.merchant_cache.stats()}")
+
+    print("\nmemory")
+    if args.tracemalloc:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  python heap  : {current / 2**20:.1f} MiB now, {peak / 2**20:.1f} MiB peak")
+    print(f"  max RSS      : {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+    if service is not None:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--endpoint", choices=["enrich", "stream", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--transactions", type=int, default=200, help="Transactions per request")
+    parser.add_argument("--unique-ratio", type=float, default=0.3,
+                        help="Fraction of rows with a merchant seen nowhere else (cache misses)")
+    parser.add_argument("--latency-ms", type=float, default=120.0, help="Median mock provider latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal spread (0 = fixed)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls answered 429")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Mock provider answers 429 above this many concurrent calls")
+    parser.add_argument("--max-concurrency", type=int, default=10, help="Service worker threads")
+    parser.add_argument("--cache-size", type=int, default=50000)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the merchant cache")
+    parser.add_argument("--tracemalloc", action="store_true", help="Track Python heap (slows the run)")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=38)
+    parser.add_argument("--base-url", default=None, help="Target a running server instead of in-process")
+    asyncio.run(main(parser.parse_args()))
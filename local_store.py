@@ -0,0 +1,36 @@
+# local_store.py - Local SQLite state shared by the Python services
+# One directory of small databases (budget aggregates, job checkpoints, ...)
+
+import os
+import sqlite3
+
+
+# Where databases live; override in deployments (and tests) with RESOLVE_STATE_DIR
+STATE_DIR_ENV = "RESOLVE_STATE_DIR"
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".resolve-state")
+
+# Pass as the database name to get a private in-memory database
+IN_MEMORY = ":memory:"
+
+
+def state_dir() -> str:
+    """Directory for local databases, created on first use"""
+    path = os.environ.get(STATE_DIR_ENV) or DEFAULT_STATE_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def open_database(name: str) -> sqlite3.Connection:
+    """
+    Open (or create) a database in the state directory.
+
+    The connection may be used from any thread; callers serialise access
+    with their own lock. WAL keeps readers from blocking the writer.
+    """
+    path = name if name == IN_MEMORY or os.path.isabs(name) else os.path.join(state_dir(), name)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    if path != IN_MEMORY:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
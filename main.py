@@ -4,15 +4,47 @@ import sys
 import asyncio
 import time
 import json
-from fastapi import FastAPI, HTTPException
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
-from typing import Optional, List, Dict, Any
+from pydantic import ConfigDict
+from starlette.requests import ClientDisconnect
+from datetime import date
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable, Tuple
 
 # Import our Pydantic schemas
 import schemas
 
 # Import the enrichment service
-from enrichment_service import EnrichmentService, enrich_and_analyze_budget, NtropyOutputModel
+from enrichment_service import (
+    EnrichmentService,
+    get_enrichment_service,
+    close_enrichment_service,
+    enrich_and_analyze_budget,
+    enrich_and_analyze_budgets,
+    NtropyOutputModel,
+    DEFAULT_STREAM_CHUNK_SIZE,
+    DEFAULT_INGEST_INFLIGHT_BATCHES,
+    DEFAULT_BATCH_CONCURRENT_USERS,
+)
+from budget_store import get_budget_store, close_budget_store
+from enrichment_jobs import get_job_store, close_job_store, stream_enrichment_job, is_job_running
+from event_stream import DEFAULT_PROGRESS_INTERVAL_MS, SSE_HEARTBEAT, ndjson_line, paced_stream, sse_frame
+from plan_jobs import (
+    cancel_plan_jobs,
+    close_plan_job_store,
+    get_plan_job_store,
+    is_plan_job_running,
+    start_plan_job,
+)
+from solver_runtime import (
+    PRIORITIES,
+    PRIORITY_INTERACTIVE,
+    SolverSaturatedError,
+    get_solver_runtime,
+    close_solver_runtime,
+    portfolio_key,
+)
 
 # Import the solver function AND the necessary dataclasses
 # (We need the dataclasses to pass the correct type to the solver)
@@ -20,7 +52,19 @@ try:
     # Assuming solver_engine.py is in the same directory
     from solver_engine import (
         generate_payment_plan,
+        solve_payment_plan,
+        solve_plan_alternatives,
+        solve_pareto_frontier,
+        DEFAULT_FRONTIER_POINTS,
+        PlanSolveResult,
+        SolveHandle,
+        Incumbent,
+        TERMINATION_CANCELLED,
+        TERMINATION_OPTIMAL,
+        TERMINATION_GAP_LIMIT,
+        TERMINATION_TIME_LIMIT,
         DebtPortfolio as SolverDebtPortfolio, # Rename to avoid clash
+        SolveOptions as SolverSolveOptions,
         Account as SolverAccount,
         MinPaymentRule as SolverMinPaymentRule,
         DebtBucket as SolverDebtBucket,
@@ -38,11 +82,30 @@ except ImportError as e:
     raise e # Re-raise the original ImportError
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create one shared EnrichmentService at startup so the Ntropy SDK and its
+    worker pool are reused by every request, and shut it down cleanly on exit.
+    """
+    service = get_enrichment_service()
+    service.warm_up()
+    app.state.enrichment_service = service
+    yield
+    close_enrichment_service()
+    close_budget_store()
+    close_job_store()
+    await cancel_plan_jobs()
+    close_plan_job_store()
+    close_solver_runtime()
+
+
 # Create the FastAPI app instance
 app = FastAPI(
     title="Resolve API",
     description="API for generating optimized debt repayment plans.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # --- Health Check Endpoint ---
@@ -54,6 +117,46 @@ async def health_check():
     """
     return {"status": "healthy", "service": "resolve-optimization-engine"}
 
+
+@app.get("/health/enrichment")
+async def enrichment_health_check(request: Request):
+    """
+    Readiness probe for the shared enrichment service.
+    Reports whether Ntropy is in use or the service is in fallback mode.
+    
+    Probes the service the lifespan started rather than going through
+    get_enrichment_service(), which would quietly replace a closed one:
+    503 before startup and once shutdown has closed it.
+    """
+    service = getattr(request.app.state, "enrichment_service", None)
+    if service is None:
+        raise HTTPException(status_code=503, detail={"status": "not_started"})
+    health = service.health()
+    if health["status"] != "healthy":
+        raise HTTPException(status_code=503, detail=health)
+    return health
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    """
+    Process-wide counters (merchant cache hit rate, solver coalescing, ...).
+    
+    Like /health/enrichment, reads the service the lifespan started, so a
+    scrape never builds a fresh service with empty counters: 503 before
+    startup and after shutdown.
+    """
+    service = getattr(request.app.state, "enrichment_service", None)
+    if service is None:
+        raise HTTPException(status_code=503, detail={"status": "not_started"})
+    if service.closed:
+        raise HTTPException(status_code=503, detail={"status": "closed"})
+    return {
+        "merchant_cache": service.merchant_cache.stats(),
+        "solver": get_solver_runtime().stats(),
+    }
+
+
 # --- Helper Function for Data Conversion ---
 def convert_schema_to_solver_portfolio(
     portfolio_schema: schemas.DebtPortfolio
@@ -91,64 +194,239 @@ def convert_schema_to_solver_portfolio(
     # Convert the UserPreferences schema to its dataclass
     solver_prefs = SolverUserPreferences(**portfolio_schema.preferences.model_dump())
 
+    # Per-request solve controls, if any (otherwise the solver's defaults)
+    solver_options = SolverSolveOptions(**portfolio_schema.solve_options.model_dump()) \
+        if portfolio_schema.solve_options else SolverSolveOptions()
+
     # Assemble the final SolverDebtPortfolio
     return SolverDebtPortfolio(
         accounts=solver_accounts,
         budget=solver_budget,
         preferences=solver_prefs,
-        plan_start_date=portfolio_schema.plan_start_date
+        plan_start_date=portfolio_schema.plan_start_date,
+        solve_options=solver_options
     )
 
+def solve_portfolio(
+    portfolio_input: schemas.DebtPortfolio,
+    handle: Optional[SolveHandle] = None,
+    on_incumbent: Optional[Callable[[Incumbent], None]] = None
+) -> schemas.OptimizationPlanResponse:
+    """
+    Converts a validated portfolio, runs the solver, and converts the result
+    back. Raises ValueError / NotImplementedError for inputs the solver rejects.
+    `handle` lets the runtime stop the search when no client is waiting;
+    `on_incumbent` receives improving plans during the search (plan jobs).
+    """
+    # 1. Convert Pydantic input schemas to the solver's dataclasses
+    print("Converting Pydantic schemas to solver dataclasses...")
+    solver_portfolio = convert_schema_to_solver_portfolio(portfolio_input)
+
+    # 2. Call the solver engine
+    print("Calling solver engine...")
+    result = solve_payment_plan(solver_portfolio, handle=handle, on_incumbent=on_incumbent)
+    print(f"Solver finished: {result.status} ({result.termination_reason}).")
+
+    # 3. Process the results
+    return _plan_response(result, solver_portfolio.solve_options.max_time_seconds)
+
+
+def solve_portfolio_alternatives(
+    portfolio_input: schemas.DebtPortfolio,
+    handle: Optional[SolveHandle] = None,
+    count: int = 2
+) -> schemas.OptimizationPlanResponse:
+    """
+    Like solve_portfolio, plus up to `count` meaningfully different
+    alternatives found by short follow-up searches after the best plan.
+    """
+    solver_portfolio = convert_schema_to_solver_portfolio(portfolio_input)
+    print(f"Calling solver engine for the best plan and {count} alternative(s)...")
+    result, alternatives = solve_plan_alternatives(solver_portfolio, count, handle=handle)
+    print(f"Solver finished: {result.status} ({result.termination_reason}), {len(alternatives)} alternative(s).")
+
+    response = _plan_response(result, solver_portfolio.solve_options.max_time_seconds)
+    best_objective = result.stats.objective_value if result.stats else None
+    response.alternatives = [
+        schemas.PlanAlternative(
+            rank=rank,
+            objective_value=alternative.objective_value,
+            objective_increase=(alternative.objective_value - best_objective) / max(1.0, abs(best_objective)),
+            total_interest_cents=sum(monthly.interest_charged_cents for monthly in alternative.plan),
+            payoff_month=max((monthly.month for monthly in alternative.plan), default=0),
+            difference_cents=alternative.difference_cents,
+            termination_reason=alternative.termination_reason,
+            plan=[schemas.MonthlyResult.model_validate(monthly.__dict__) for monthly in alternative.plan],
+        )
+        for rank, alternative in enumerate(alternatives, start=1)
+    ]
+    return response
+
+
+def solve_portfolio_frontier(
+    portfolio_input: schemas.DebtPortfolio,
+    handle: Optional[SolveHandle] = None,
+    points: int = DEFAULT_FRONTIER_POINTS
+) -> schemas.ParetoFrontierResponse:
+    """
+    Converts a validated portfolio and approximates its interest vs. peak
+    monthly payment frontier with parallel capped solves.
+    """
+    solver_portfolio = convert_schema_to_solver_portfolio(portfolio_input)
+    print(f"Calling solver engine for a {points}-point Pareto frontier...")
+    started = time.monotonic()
+    frontier = solve_pareto_frontier(solver_portfolio, points, handle=handle)
+    return schemas.ParetoFrontierResponse(
+        points=[
+            schemas.FrontierPoint(
+                payment_cap_cents=point.payment_cap_cents,
+                status=point.status,
+                termination_reason=point.termination_reason,
+                total_interest_cents=point.total_interest_cents,
+                peak_payment_cents=point.peak_payment_cents,
+                average_payment_cents=point.average_payment_cents,
+                payoff_month=point.payoff_month,
+                on_frontier=point.on_frontier,
+                solve_stats=schemas.SolveStats.model_validate(point.stats.__dict__) if point.stats else None,
+                plan=[schemas.MonthlyResult.model_validate(monthly.__dict__) for monthly in point.plan]
+                if point.plan is not None else None,
+            )
+            for point in frontier
+        ],
+        wall_time_seconds=time.monotonic() - started,
+    )
+
+
+def _plan_response(result: PlanSolveResult, time_budget: float) -> schemas.OptimizationPlanResponse:
+    """Converts the solver's result back to the API response"""
+    solve_stats = schemas.SolveStats.model_validate(result.stats.__dict__) if result.stats else None
+
+    if result.plan is not None:
+        # Convert solver's dataclass results back to Pydantic models
+        print("Converting solver results back to Pydantic schemas...")
+        plan_output = [
+            # Use .model_validate() and the dataclass's __dict__
+            schemas.MonthlyResult.model_validate(monthly.__dict__)
+            for monthly in result.plan
+        ]
+
+        if result.termination_reason == TERMINATION_OPTIMAL:
+            message = "Optimization plan generated successfully."
+        elif result.termination_reason == TERMINATION_GAP_LIMIT:
+            message = "Plan generated within the requested optimality gap."
+        elif result.termination_reason == TERMINATION_CANCELLED:
+            message = "Solve was cancelled; this is the best plan found before it stopped."
+        else:
+            message = f"Best plan found within the {time_budget:g}s time budget; it may not be optimal."
+
+        print(f"Plan generated successfully. Status: {result.status}")
+        return schemas.OptimizationPlanResponse(
+            status=result.status,
+            message=message,
+            plan=plan_output,
+            termination_reason=result.termination_reason,
+            solve_stats=solve_stats
+        )
+    else:
+        print("Solver failed to find a solution.")
+        if result.termination_reason == TERMINATION_TIME_LIMIT:
+            message = f"No payment plan was found within the {time_budget:g}s time budget."
+        elif result.termination_reason == TERMINATION_CANCELLED:
+            message = "Solve was cancelled before a plan was found."
+        else:
+            message = "Could not find a feasible payment plan within the given constraints and time limit."
+        return schemas.OptimizationPlanResponse(
+            status=result.status,
+            message=message,
+            plan=None,
+            termination_reason=result.termination_reason,
+            solve_stats=solve_stats
+        )
+
+
+# How often a waiting /generate-plan checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
+# Most alternatives /generate-plan will search for in one request
+MAX_PLAN_ALTERNATIVES = 5
+
+# Most points /pareto-frontier will solve in one request
+MAX_FRONTIER_POINTS = 12
+
+
+class ClientDisconnected(Exception):
+    """The client went away before its result was ready"""
+
+
+async def _until_disconnected(request: Request, awaitable, poll_seconds: float = DISCONNECT_POLL_SECONDS):
+    """
+    Await `awaitable`, cancelling it and raising ClientDisconnected if the
+    client disconnects first. Plain (non-streaming) endpoints aren't
+    cancelled on disconnect, so the request is polled while we wait.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
 # --- API Endpoint ---
 @app.post("/generate-plan", response_model=schemas.OptimizationPlanResponse)
-async def create_payment_plan(portfolio_input: schemas.DebtPortfolio):
+async def create_payment_plan(
+    request: Request,
+    portfolio_input: schemas.DebtPortfolio,
+    priority: str = Query(default=PRIORITY_INTERACTIVE, pattern="^(" + "|".join(PRIORITIES) + ")$"),
+    alternatives: int = Query(default=0, ge=0, le=MAX_PLAN_ALTERNATIVES),
+):
     """
     Receives debt portfolio details, generates an optimized payment plan,
     and returns the plan or an error status.
+    
+    The solve runs off the event loop. An identical portfolio already being
+    solved (double-click, client retry) is joined rather than solved again.
+    
+    Solves are admitted by priority (?priority=interactive|background).
+    When the solver is saturated the request fails fast with 429 (background
+    shed first) or 503 (queue full), with a Retry-After header.
+    
+    portfolio.solve_options bounds the search (time budget, gap limits,
+    workers); termination_reason and solve_stats report how it ended. A plan
+    cut short by the time budget comes back with status FEASIBLE.
+    
+    If the client disconnects (user navigated away, Node timed out) and no
+    one else is waiting on the same solve, the search is stopped and its
+    worker freed; see cancelled_solves in /metrics.
+    
+    ?alternatives=k also returns up to k good plans that differ meaningfully
+    from the best one, from short follow-up searches on the same model.
     """
     print("Received request to /generate-plan")
+    handle = SolveHandle()
+    if alternatives:
+        key = f"{portfolio_key(portfolio_input)}:alternatives={alternatives}"
+        args = (solve_portfolio_alternatives, portfolio_input, handle, alternatives)
+    else:
+        key = portfolio_key(portfolio_input)
+        args = (solve_portfolio, portfolio_input, handle)
     try:
-        # 1. Convert Pydantic input schemas to the solver's dataclasses
-        print("Converting Pydantic schemas to solver dataclasses...")
-        solver_portfolio = convert_schema_to_solver_portfolio(portfolio_input)
-
-        # 2. Call the solver engine
-        print("Calling solver engine...")
-        plan_results: Optional[List[SolverMonthlyResult]] = generate_payment_plan(
-            solver_portfolio
-        )
-        print("Solver finished.")
-
-
-        # 3. Process the results
-        if plan_results is not None:
-            solver_status = "OPTIMAL" 
-
-            # --- THIS IS THE FIX ---
-            # Convert solver's dataclass results back to Pydantic models
-            print("Converting solver results back to Pydantic schemas...")
-            plan_output = [
-                # Use .model_validate() and the dataclass's __dict__
-                schemas.MonthlyResult.model_validate(result.__dict__) 
-                for result in plan_results
-            ]
-            # --- END OF FIX ---
-            
-            print(f"Plan generated successfully. Status: {solver_status}")
-            return schemas.OptimizationPlanResponse(
-                status=solver_status, 
-                message="Optimization plan generated successfully.",
-                plan=plan_output
-            )
-        else:
-            solver_status = "INFEASIBLE" 
-            print("Solver failed to find a solution.")
-            return schemas.OptimizationPlanResponse(
-                status=solver_status, 
-                message="Could not find a feasible payment plan within the given constraints and time limit.",
-                plan=None
-            )
+        plan_response, _ = await _until_disconnected(request, get_solver_runtime().run(
+            key, *args, priority=priority, handle=handle
+        ))
+        return plan_response
 
+    except ClientDisconnected:
+        print("Client disconnected; abandoning its solve.")
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except SolverSaturatedError as se:
+        print(f"Solver saturated ({se.status_code}): {se}")
+        raise HTTPException(status_code=se.status_code, detail=str(se), headers={"Retry-After": str(se.retry_after)})
     except ValueError as ve:
         print(f"Input validation error: {ve}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -160,19 +438,160 @@ async def create_payment_plan(portfolio_input: schemas.DebtPortfolio):
         raise HTTPException(status_code=500, detail="An internal server error occurred during plan generation.")
 
 
+@app.post("/pareto-frontier", response_model=schemas.ParetoFrontierResponse)
+async def create_pareto_frontier(
+    request: Request,
+    portfolio_input: schemas.DebtPortfolio,
+    priority: str = Query(default=PRIORITY_INTERACTIVE, pattern="^(" + "|".join(PRIORITIES) + ")$"),
+    points: int = Query(default=DEFAULT_FRONTIER_POINTS, ge=2, le=MAX_FRONTIER_POINTS),
+):
+    """
+    Trade-off between total interest and peak monthly payment, for a chart.
+
+    Point 1 is the least-interest plan within the budget; the rest cap every
+    month's total payment at evenly spaced lower amounts and minimize
+    interest under the cap. The capped solves run in parallel, warm-started
+    from the least-interest plan, and the whole frontier stays within
+    portfolio.solve_options.max_time_seconds (points within a 1% gap).
+    The strategy's objective is replaced by total interest; its constraints
+    (payment shape, promo deadlines) still apply.
+
+    Admission, coalescing and disconnect handling are as for /generate-plan.
+    """
+    print("Received request to /pareto-frontier")
+    handle = SolveHandle()
+    try:
+        frontier, _ = await _until_disconnected(request, get_solver_runtime().run(
+            f"{portfolio_key(portfolio_input)}:frontier={points}",
+            solve_portfolio_frontier, portfolio_input, handle, points,
+            priority=priority, handle=handle
+        ))
+        return frontier
+
+    except ClientDisconnected:
+        print("Client disconnected; abandoning its frontier solve.")
+        raise HTTPException(status_code=499, detail="Client closed request")
+    except SolverSaturatedError as se:
+        print(f"Solver saturated ({se.status_code}): {se}")
+        raise HTTPException(status_code=se.status_code, detail=str(se), headers={"Retry-After": str(se.retry_after)})
+    except ValueError as ve:
+        print(f"Input validation error: {ve}")
+        raise HTTPException(status_code=400, detail=str(ve))
+    except NotImplementedError as nie:
+        print(f"Solver error: {nie}")
+        raise HTTPException(status_code=400, detail=str(nie))
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}", file=sys.stderr)
+        raise HTTPException(status_code=500, detail="An internal server error occurred during frontier generation.")
+
+
+# --- Plan Job Endpoints ---
+class PlanJobRequest(schemas.BaseModel):
+    """A portfolio to solve in the background"""
+    portfolio: schemas.DebtPortfolio
+    user_id: Optional[str] = None
+    priority: str = schemas.Field(default=PRIORITY_INTERACTIVE, pattern="^(" + "|".join(PRIORITIES) + ")$")
+    # Return the stored (or in-progress) plan for an identical portfolio instead of solving again
+    reuse: bool = True
+
+
+def _plan_job_response(job: Dict[str, Any], reused: Optional[bool] = None) -> Dict[str, Any]:
+    job["attached"] = is_plan_job_running(job["job_id"])
+    if reused is not None:
+        job["reused"] = reused
+    return job
+
+
+@app.post("/plan-jobs", status_code=202)
+async def create_plan_job(request: PlanJobRequest):
+    """
+    Starts solving a portfolio in the background and returns the job at once;
+    poll GET /plan-jobs/{job_id} for the incumbent and the final result.
+    
+    Jobs and their plans are kept in a local SQLite store, so a finished plan
+    can be read back (GET /plan-jobs/latest?user_id=...) after a worker
+    restart without solving again. With reuse (the default), the user's
+    finished or in-progress job for an identical portfolio is returned.
+    
+    A saturated solver answers 429/503 with Retry-After, as /generate-plan does.
+    """
+    print(f"[Plan Jobs] Received job for user {request.user_id} ({len(request.portfolio.accounts)} accounts)")
+    try:
+        job, reused = await start_plan_job(
+            get_plan_job_store(), request.portfolio, solve_portfolio,
+            user_id=request.user_id, priority=request.priority, reuse=request.reuse
+        )
+    except SolverSaturatedError as se:
+        print(f"[Plan Jobs] Solver saturated ({se.status_code}): {se}")
+        raise HTTPException(status_code=se.status_code, detail=str(se), headers={"Retry-After": str(se.retry_after)})
+    return _plan_job_response(job, reused)
+
+
+@app.get("/plan-jobs/latest")
+async def get_latest_plan_job(user_id: str = Query(..., min_length=1)):
+    """The user's most recently finished plan job, read from the job store"""
+    job = get_plan_job_store().latest_complete(user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No finished plan for user {user_id}")
+    return _plan_job_response(job)
+
+
+@app.get("/plan-jobs/{job_id}")
+async def get_plan_job(job_id: str):
+    """
+    Status of a plan job: queued / running / complete / failed / rejected /
+    interrupted, the incumbent (best plan found so far, with its objective,
+    bound and gap) while running, and the OptimizationPlanResponse once complete.
+    """
+    job = get_plan_job_store().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Plan job {job_id} not found")
+    return _plan_job_response(job)
+
+
 # --- Transaction Enrichment Endpoint ---
+class RawTransaction(schemas.BaseModel):
+    """
+    One raw TrueLayer transaction as sent to the enrichment endpoints. Types
+    are checked strictly (no numeric IDs, string amounts or null currency);
+    other TrueLayer fields pass through to the pipeline untouched.
+    """
+    model_config = ConfigDict(extra="allow", strict=True)
+    
+    transaction_id: Optional[str] = None  # Derived from the content when missing
+    description: Optional[str] = None  # Normalised to "" when missing
+    amount: float
+    currency: str = "GBP"
+    transaction_type: Optional[str] = None  # DEBIT/CREDIT
+    transaction_category: Optional[str] = None
+    transaction_classification: Optional[List[str]] = None
+    timestamp: str  # ISO format
+    status: Optional[str] = None  # "pending" rows are merged into their booked copies
+    pending: Optional[bool] = None
+
+
+def _raw_transactions(transactions: List[RawTransaction]) -> List[Dict[str, Any]]:
+    """Validated transactions as the dicts the client sent (the pipeline normalises them itself)"""
+    return [tx.model_dump(exclude_unset=True) for tx in transactions]
+
+
 class EnrichmentRequest(schemas.BaseModel):
     """Request for transaction enrichment"""
-    transactions: List[Dict[str, Any]]
+    transactions: List[RawTransaction]
     user_id: str
     analysis_months: int = 3
+    # Overall time budget for Ntropy; what isn't enriched by then is classified
+    # locally and flagged needs_reenrichment
+    deadline_ms: Optional[int] = schemas.Field(default=None, ge=1, le=600000)
 
 class EnrichmentResponse(schemas.BaseModel):
     """Response from transaction enrichment"""
     success: bool
-    enriched_transactions: List[Dict[str, Any]]
+    enriched_transactions: List[NtropyOutputModel]
     budget_analysis: Dict[str, Any]
     detected_debts: List[Dict[str, Any]]
+    duplicates_removed: int = 0
+    needs_reenrichment_count: int = 0
     message: Optional[str] = None
 
 
@@ -191,9 +610,11 @@ async def enrich_transactions(request: EnrichmentRequest):
     
     try:
         result = await enrich_and_analyze_budget(
-            raw_transactions=request.transactions,
+            raw_transactions=_raw_transactions(request.transactions),
             user_id=request.user_id,
-            analysis_months=request.analysis_months
+            analysis_months=request.analysis_months,
+            service=get_enrichment_service(),
+            deadline_ms=request.deadline_ms
         )
         
         print(f"[Enrichment] Successfully enriched transactions. Found {len(result['detected_debts'])} potential debts.")
@@ -203,6 +624,8 @@ async def enrich_transactions(request: EnrichmentRequest):
             enriched_transactions=result["enriched_transactions"],
             budget_analysis=result["budget_analysis"],
             detected_debts=result["detected_debts"],
+            duplicates_removed=result["duplicates_removed"],
+            needs_reenrichment_count=result["needs_reenrichment_count"],
             message=f"Enriched {len(result['enriched_transactions'])} transactions"
         )
         
@@ -211,12 +634,111 @@ async def enrich_transactions(request: EnrichmentRequest):
         raise HTTPException(status_code=500, detail=f"Enrichment failed: {str(e)}")
 
 
+# --- Multi-User Batch Enrichment Endpoint ---
+class UserTransactionSet(schemas.BaseModel):
+    """One user's transactions within a batch enrichment request"""
+    user_id: str
+    transactions: List[RawTransaction]
+    analysis_months: int = 3
+
+class BatchEnrichmentRequest(schemas.BaseModel):
+    """Request for enriching many users in one background sync run"""
+    users: List[UserTransactionSet] = schemas.Field(..., min_length=1)
+    max_concurrent_users: int = schemas.Field(default=DEFAULT_BATCH_CONCURRENT_USERS, ge=1, le=64)
+    # Per-user time budget for Ntropy (see EnrichmentRequest.deadline_ms)
+    deadline_ms: Optional[int] = schemas.Field(default=None, ge=1, le=600000)
+
+
+@app.post("/enrich-transactions-batch")
+async def enrich_transactions_batch(request: BatchEnrichmentRequest):
+    """
+    Enriches many users' transactions in one call, sharing the Ntropy worker
+    pool fairly between them, and streams NDJSON as each user finishes:
+    - {"type": "user_result", "user_id": "...", "success": true, "result": {...}}
+      (result has the same fields as the /enrich-transactions response)
+    - {"type": "user_result", "user_id": "...", "success": false, "message": "..."}
+    - {"type": "complete", "users": N, "succeeded": N, "failed": N, "elapsedMs": ...}
+    """
+    print(f"[Enrichment Batch] Starting batch enrichment for {len(request.users)} users")
+    
+    service = get_enrichment_service()
+    
+    async def generate_lines():
+        start = time.time()
+        succeeded = failed = 0
+        async for user_id, result in enrich_and_analyze_budgets(
+            [{**user.model_dump(), "transactions": _raw_transactions(user.transactions)} for user in request.users],
+            service=service,
+            max_concurrent_users=request.max_concurrent_users,
+            deadline_ms=request.deadline_ms
+        ):
+            if isinstance(result, Exception):
+                failed += 1
+                event = {"type": "user_result", "user_id": user_id, "success": False,
+                         "message": f"Enrichment failed: {result}"}
+            else:
+                succeeded += 1
+                event = {"type": "user_result", "user_id": user_id, "success": True, "result": result}
+            yield json.dumps(event) + "\n"
+        
+        print(f"[Enrichment Batch] Finished {succeeded + failed} users ({failed} failed)")
+        yield json.dumps({
+            "type": "complete",
+            "users": succeeded + failed,
+            "succeeded": succeeded,
+            "failed": failed,
+            "elapsedMs": int((time.time() - start) * 1000)
+        }) + "\n"
+    
+    return StreamingResponse(
+        generate_lines(),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 # --- Streaming Enrichment Endpoint ---
 class StreamingEnrichmentRequest(schemas.BaseModel):
     """Request for streaming transaction enrichment"""
-    transactions: List[Dict[str, Any]]
+    transactions: List[RawTransaction]
     user_id: str
     analysis_months: int = 3
+    # Emit enriched transactions in chunks as they finish instead of in the final event
+    stream_transactions: bool = False
+    chunk_size: int = schemas.Field(default=DEFAULT_STREAM_CHUNK_SIZE, ge=1, le=1000)
+    # Overall time budget for Ntropy (see EnrichmentRequest.deadline_ms)
+    deadline_ms: Optional[int] = schemas.Field(default=None, ge=1, le=600000)
+    # Progress events are coalesced to at most one per interval (0 = send every one)
+    progress_interval_ms: int = schemas.Field(default=DEFAULT_PROGRESS_INTERVAL_MS, ge=0, le=60000)
+
+
+def _sse_job_stream(job_id: str, log_prefix: str, progress_interval_ms: int) -> StreamingResponse:
+    """SSE response that runs or resumes an enrichment job"""
+    service = get_enrichment_service()
+    
+    async def generate_events():
+        try:
+            # Closing this stream closes the job's at once, so it can be resumed right away
+            async with aclosing(stream_enrichment_job(service, get_job_store(), job_id)) as job_events:
+                async for event in job_events:
+                    yield event
+        except Exception as e:
+            print(f"{log_prefix} Error in job {job_id}: {e}", file=sys.stderr)
+            yield {'type': 'error', 'message': str(e), 'job_id': job_id}
+    
+    return StreamingResponse(
+        paced_stream(generate_events(), sse_frame, progress_interval_ms, heartbeat_frame=SSE_HEARTBEAT),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+            "X-Job-Id": job_id
+        }
+    )
 
 
 @app.post("/enrich-transactions-stream")
@@ -224,32 +746,358 @@ async def enrich_transactions_streaming(request: StreamingEnrichmentRequest):
     """
     Streams enrichment progress as Server-Sent Events.
     
+    Every request is a resumable job: the first event carries its job_id,
+    and finished results are checkpointed as they complete. If the
+    connection drops, GET /enrichment-jobs/{job_id}/stream replays them and
+    enriches only what is left.
+    
+    Progress is sent at most once per progress_interval_ms, and a
+    ": keep-alive" comment is sent when the stream has been idle for a while.
+    
     Returns SSE stream with events:
+    - {"type": "job", "job_id": "...", "resumed": false, "completed": 0, "total": M}
     - {"type": "progress", "current": N, "total": M, "status": "...", "startTime": ...}
+    - {"type": "transactions", "transactions": [...]}  (only with stream_transactions)
     - {"type": "complete", "result": {...}}
     - {"type": "error", "message": "..."}
     """
     print(f"[Enrichment Stream] Starting streaming enrichment for {len(request.transactions)} transactions")
     
-    service = EnrichmentService()
+    job_id = get_job_store().create_job(
+        user_id=request.user_id,
+        raw_transactions=_raw_transactions(request.transactions),
+        options={
+            "stream_transactions": request.stream_transactions,
+            "chunk_size": request.chunk_size,
+            "analysis_months": request.analysis_months,
+            "deadline_ms": request.deadline_ms,
+        }
+    )
+    return _sse_job_stream(job_id, "[Enrichment Stream]", request.progress_interval_ms)
+
+
+@app.get("/enrichment-jobs/{job_id}")
+async def get_enrichment_job(job_id: str):
+    """Status of an enrichment job and how many results are checkpointed"""
+    job = get_job_store().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Enrichment job {job_id} not found")
+    job["attached"] = is_job_running(job_id)
+    return job
+
+
+@app.get("/enrichment-jobs/{job_id}/stream")
+async def resume_enrichment_job(
+    job_id: str,
+    progress_interval_ms: int = Query(default=DEFAULT_PROGRESS_INTERVAL_MS, ge=0, le=60000),
+):
+    """
+    Attach to an enrichment job: replays checkpointed results, then continues
+    with the remaining transactions. Events match /enrich-transactions-stream.
+    A finished job is replayed in full without any enrichment calls.
+    """
+    if get_job_store().get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Enrichment job {job_id} not found")
+    if is_job_running(job_id):
+        raise HTTPException(status_code=409, detail=f"Enrichment job {job_id} is already streaming to another client")
+    print(f"[Enrichment Stream] Resuming job {job_id}")
+    return _sse_job_stream(job_id, "[Enrichment Stream]", progress_interval_ms)
+
+
+@app.post("/enrich-transactions-ndjson")
+async def enrich_transactions_ndjson(request: StreamingEnrichmentRequest):
+    """
+    Streams enrichment as newline-delimited JSON, one event per line.
+    
+    Enriched transactions are always emitted incrementally so the caller can
+    persist rows as they arrive:
+    - {"type": "progress", ...}
+    - {"type": "transactions", "transactions": [...]}
+    - {"type": "complete", "result": {"budget_analysis": ..., "detected_debts": ..., "transaction_count": N}}
+    - {"type": "error", "message": "..."}
+    """
+    print(f"[Enrichment NDJSON] Starting incremental enrichment for {len(request.transactions)} transactions")
     
-    async def generate_events():
+    service = get_enrichment_service()
+    
+    async def generate_lines():
         try:
             async for event in service.enrich_transactions_streaming(
-                raw_transactions=request.transactions,
-                user_id=request.user_id
+                raw_transactions=_raw_transactions(request.transactions),
+                user_id=request.user_id,
+                stream_transactions=True,
+                chunk_size=request.chunk_size,
+                analysis_months=request.analysis_months,
+                deadline_ms=request.deadline_ms
             ):
-                yield f"data: {json.dumps(event)}\n\n"
+                yield event
         except Exception as e:
-            print(f"[Enrichment Stream] Error: {e}", file=sys.stderr)
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            print(f"[Enrichment NDJSON] Error: {e}", file=sys.stderr)
+            yield {'type': 'error', 'message': str(e)}
     
     return StreamingResponse(
-        generate_events(),
-        media_type="text/event-stream",
+        paced_stream(generate_lines(), ndjson_line, request.progress_interval_ms),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+# --- Streaming Upload Enrichment Endpoint ---
+async def _iter_ndjson_body(request: Request) -> AsyncIterator[Dict[str, Any]]:
+    """Yield JSON objects from an NDJSON request body as the bytes arrive."""
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _parse_ndjson_transaction(line, line_number)
+    if buffer.strip():
+        yield _parse_ndjson_transaction(buffer, line_number + 1)
+
+
+def _parse_ndjson_transaction(line: bytes, line_number: int) -> Dict[str, Any]:
+    try:
+        tx = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"Line {line_number}: invalid JSON ({e})") from e
+    if not isinstance(tx, dict):
+        raise ValueError(f"Line {line_number}: expected one transaction object per line, got {type(tx).__name__}")
+    return tx
+
+
+class _UploadStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for endpoints that keep reading the request body while
+    responding. Starlette's default disconnect listener consumes `receive`
+    concurrently, which would swallow body chunks the endpoint still needs;
+    here a disconnect surfaces through request.stream() instead. Background
+    tasks still run once the response is sent.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+@app.post("/enrich-transactions-upload")
+async def enrich_transactions_upload(
+    request: Request,
+    user_id: str = Query(..., min_length=1),
+    chunk_size: int = Query(default=DEFAULT_STREAM_CHUNK_SIZE, ge=1, le=1000),
+    max_inflight_batches: int = Query(default=DEFAULT_INGEST_INFLIGHT_BATCHES, ge=1, le=64),
+    analysis_months: int = Query(default=3, ge=1, le=120),
+    progress_interval_ms: int = Query(default=DEFAULT_PROGRESS_INTERVAL_MS, ge=0, le=60000),
+):
+    """
+    Enriches an NDJSON upload (one raw TrueLayer transaction per line) while
+    the body is still arriving, and streams NDJSON events back.
+    
+    Transactions are normalized and dispatched to enrichment batch by batch,
+    so multi-year imports don't wait for the whole body to be parsed first.
+    Response events match /enrich-transactions-ndjson. A line that isn't a
+    JSON object ends the stream with an error event naming the line; a final
+    line needs no trailing newline.
+    """
+    print(f"[Enrichment Upload] Starting streamed upload enrichment for user {user_id}")
+    
+    service = get_enrichment_service()
+    
+    async def generate_lines():
+        try:
+            async for event in service.enrich_transaction_source(
+                raw_source=_iter_ndjson_body(request),
+                user_id=user_id,
+                chunk_size=chunk_size,
+                max_inflight_batches=max_inflight_batches,
+                analysis_months=analysis_months
+            ):
+                yield event
+        except ClientDisconnect:
+            # Nobody left to read an error; enrichment in flight was cancelled
+            print(f"[Enrichment Upload] Client disconnected mid-upload for user {user_id}")
+        except Exception as e:
+            print(f"[Enrichment Upload] Error: {e}", file=sys.stderr)
+            yield {'type': 'error', 'message': str(e)}
+    
+    return _UploadStreamingResponse(
+        paced_stream(generate_lines(), ndjson_line, progress_interval_ms),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+# --- Budget Aggregates Endpoint ---
+@app.get("/budget-breakdown/{user_id}")
+async def get_budget_breakdown(
+    user_id: str,
+    months: Optional[int] = Query(default=3, ge=1, le=120),
+    end_month: Optional[str] = Query(default=None, pattern=r"^\d{4}-\d{2}$"),
+):
+    """
+    Budget breakdown from the user's stored monthly aggregates, without
+    re-enriching anything. Reads one row per month, so any window is instant.
+    
+    Query params:
+    - months: Calendar months in the window (default 3)
+    - end_month: Last month of the window as YYYY-MM (default: latest synced month)
+    """
+    breakdown = get_budget_store().breakdown(user_id, months=months, end_month=end_month)
+    if breakdown["monthsAnalyzed"] == 0:
+        raise HTTPException(status_code=404, detail=f"No synced transactions for user {user_id} in this window")
+    return breakdown
+
+
+# --- Onboarding Pipeline Endpoint ---
+class OnboardingPlanRequest(schemas.BaseModel):
+    """Raw transactions plus confirmed accounts, from enrichment through to a plan"""
+    user_id: str
+    transactions: List[RawTransaction]
+    analysis_months: int = 3
+    deadline_ms: Optional[int] = schemas.Field(default=None, ge=1, le=600000)
+    # Confirmed account details (detected debts are reported, not added automatically)
+    accounts: List[schemas.Account] = schemas.Field(..., min_length=1)
+    preferences: schemas.UserPreferences
+    plan_start_date: Optional[date] = None
+    # Overrides the derived budget (safeToSpendCents); future changes and lump sums still apply
+    monthly_budget_cents: Optional[int] = schemas.Field(default=None, ge=0)
+    future_changes: List[Tuple[date, int]] = schemas.Field(default_factory=list)
+    lump_sum_payments: List[Tuple[date, int]] = schemas.Field(default_factory=list)
+    solve_options: Optional[schemas.SolveOptions] = None
+    # Return enriched rows in the "enriched" stage (off if the caller doesn't persist them)
+    include_transactions: bool = True
+
+
+@app.post("/onboarding-plan")
+async def onboarding_plan(request: OnboardingPlanRequest):
+    """
+    One call for onboarding: enrich → budget → DebtPortfolio → solve, without
+    the caller shipping the enriched payload back to build the portfolio.
+    
+    Streams NDJSON, one line per stage as it finishes:
+    - {"type": "enriched", "transaction_count": N, "duplicates_removed": D, "needs_reenrichment_count": R, "enriched_transactions": [...]}
+    - {"type": "budget", "budget_analysis": {...}, "detected_debts": [...], "monthly_budget_cents": B}
+    - {"type": "portfolio", "account_count": A, "total_balance_cents": T, "monthly_budget_cents": B, "plan_start_date": "..."}
+    - {"type": "plan", "status": "OPTIMAL", "message": "...", "plan": [...]}
+    - {"type": "complete", "elapsed_ms": ..., "stage_ms": {...}}  (stage_ms per stage,
+      excluding time spent waiting for the client to read the previous event)
+    - {"type": "error", "stage": "...", "message": "..."}  (ends the stream)
+    
+    The derived monthly budget is the budget analysis safeToSpendCents (the
+    figure Node applies as the user's budget) unless monthly_budget_cents is set.
+    """
+    print(f"[Onboarding] Starting pipeline for user {request.user_id}: "
+          f"{len(request.transactions)} transactions, {len(request.accounts)} accounts")
+    
+    service = get_enrichment_service()
+    
+    async def generate_stages():
+        started = time.perf_counter()
+        stage_ms: Dict[str, int] = {}
+        stage = "enriched"
+        
+        def finish(name: str, since: float) -> None:
+            stage_ms[name] = int((time.perf_counter() - since) * 1000)
+        
+        try:
+            mark = time.perf_counter()
+            result = await enrich_and_analyze_budget(
+                raw_transactions=_raw_transactions(request.transactions),
+                user_id=request.user_id,
+                analysis_months=request.analysis_months,
+                service=service,
+                deadline_ms=request.deadline_ms
+            )
+            finish("enriched", mark)
+            enriched_event = {
+                "type": "enriched",
+                "transaction_count": len(result["enriched_transactions"]),
+                "duplicates_removed": result["duplicates_removed"],
+                "needs_reenrichment_count": result["needs_reenrichment_count"],
+            }
+            if request.include_transactions:
+                enriched_event["enriched_transactions"] = result["enriched_transactions"]
+            yield enriched_event
+            # Time spent waiting for the client to read an event belongs to no stage
+            mark = time.perf_counter()
+            
+            stage = "budget"
+            budget_analysis = result["budget_analysis"]
+            monthly_budget_cents = (
+                request.monthly_budget_cents if request.monthly_budget_cents is not None
+                else max(0, budget_analysis["safeToSpendCents"])
+            )
+            budget_event = {
+                "type": "budget",
+                "budget_analysis": budget_analysis,
+                "detected_debts": result["detected_debts"],
+                "monthly_budget_cents": monthly_budget_cents,
+            }
+            finish("budget", mark)
+            yield budget_event
+            mark = time.perf_counter()
+            
+            stage = "portfolio"
+            portfolio = schemas.DebtPortfolio(
+                accounts=request.accounts,
+                budget=schemas.Budget(
+                    monthly_budget_cents=monthly_budget_cents,
+                    future_changes=request.future_changes,
+                    lump_sum_payments=request.lump_sum_payments,
+                ),
+                preferences=request.preferences,
+                solve_options=request.solve_options,
+                **({"plan_start_date": request.plan_start_date} if request.plan_start_date else {})
+            )
+            finish("portfolio", mark)
+            yield {
+                "type": "portfolio",
+                "account_count": len(portfolio.accounts),
+                "total_balance_cents": sum(a.current_balance_cents for a in portfolio.accounts),
+                "monthly_budget_cents": monthly_budget_cents,
+                "plan_start_date": portfolio.plan_start_date.isoformat(),
+            }
+            mark = time.perf_counter()
+            
+            stage = "plan"
+            # A client disconnect cancels this stream, which stops the solve
+            handle = SolveHandle()
+            plan_response, _ = await get_solver_runtime().run(
+                portfolio_key(portfolio), solve_portfolio, portfolio, handle, handle=handle
+            )
+            finish("plan", mark)
+            yield {"type": "plan", **plan_response.model_dump(mode="json")}
+            
+            yield {
+                "type": "complete",
+                "elapsed_ms": int((time.perf_counter() - started) * 1000),
+                "stage_ms": stage_ms,
+            }
+            print(f"[Onboarding] Pipeline for user {request.user_id} finished: {plan_response.status}")
+        except SolverSaturatedError as e:
+            print(f"[Onboarding] Solver saturated ({e.status_code}): {e}", file=sys.stderr)
+            yield {"type": "error", "stage": stage, "message": str(e), "retry_after": e.retry_after}
+        except Exception as e:
+            print(f"[Onboarding] Error in stage {stage}: {e}", file=sys.stderr)
+            yield {"type": "error", "stage": stage, "message": str(e)}
+    
+    return StreamingResponse(
+        paced_stream(generate_stages(), ndjson_line),
+        media_type="application/x-ndjson",
         headers={
             "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
             "X-Accel-Buffering": "no"
         }
     )
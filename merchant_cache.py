@@ -0,0 +1,95 @@
+# merchant_cache.py - Process-wide merchant normalisation cache
+# Remembers what Ntropy said about a merchant so repeat descriptions skip the provider
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from recurrence_detector import merchant_key
+
+
+# Distinct (direction, merchant) fingerprints kept in memory
+MERCHANT_CACHE_SIZE = 50000
+
+
+@dataclass(frozen=True)
+class MerchantCacheEntry:
+    """Merchant-level enrichment - nothing user- or transaction-specific"""
+    merchant_name: Optional[str]
+    logo_url: Optional[str]
+    website_url: Optional[str]
+    labels: Tuple[str, ...] = field(default_factory=tuple)
+    budget_category: Optional[str] = None  # From labels alone ('debt'/'fixed'), if any
+
+
+def merchant_fingerprint(description: str, entry_type: str) -> Optional[Tuple[str, str]]:
+    """Cache key for a description, or None if it has no recognisable merchant"""
+    key = merchant_key(description)
+    return (entry_type, key) if key else None
+
+
+class MerchantCache:
+    """
+    Bounded, thread-safe LRU of merchant enrichment keyed by merchant_fingerprint().
+    Shared by every request in the process, so popular merchants
+    ("TFL TRAVEL CH", "NETFLIX.COM", ...) are enriched once.
+    """
+
+    def __init__(self, capacity: int = MERCHANT_CACHE_SIZE):
+        self.capacity = capacity
+        self._entries: "OrderedDict[Tuple[str, str], MerchantCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Optional[Tuple[str, str]]) -> Optional[MerchantCacheEntry]:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def peek(self, key: Optional[Tuple[str, str]]) -> Optional[MerchantCacheEntry]:
+        """Look up without touching recency or hit statistics"""
+        if key is None:
+            return None
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: Optional[Tuple[str, str]], entry: MerchantCacheEntry) -> None:
+        if key is None or self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+MERCHANT_CACHE = MerchantCache()
@@ -0,0 +1,204 @@
+# mock_ntropy.py - Local stand-in for the Ntropy SDK
+# Deterministic labels with configurable latency, errors and 429s, for load tests
+
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from recurrence_detector import merchant_key
+
+
+# ============== Configuration ==============
+
+@dataclass
+class MockNtropyConfig:
+    """
+    Latency is lognormal around latency_ms (sigma 0 = fixed latency).
+    error_rate / rate_limit_rate are per-call probabilities; max_in_flight,
+    if set, also answers 429 whenever more calls than that are in flight,
+    like Ntropy's concurrent-operation limit.
+    """
+    latency_ms: float = 120.0
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    max_in_flight: Optional[int] = None
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "MockNtropyConfig":
+        max_in_flight = os.environ.get("NTROPY_MOCK_MAX_IN_FLIGHT")
+        return cls(
+            latency_ms=float(os.environ.get("NTROPY_MOCK_LATENCY_MS", cls.latency_ms)),
+            latency_sigma=float(os.environ.get("NTROPY_MOCK_LATENCY_SIGMA", cls.latency_sigma)),
+            error_rate=float(os.environ.get("NTROPY_MOCK_ERROR_RATE", cls.error_rate)),
+            rate_limit_rate=float(os.environ.get("NTROPY_MOCK_429_RATE", cls.rate_limit_rate)),
+            max_in_flight=int(max_in_flight) if max_in_flight else None,
+            seed=int(os.environ.get("NTROPY_MOCK_SEED", cls.seed)),
+        )
+
+
+class MockProviderError(Exception):
+    status_code = 500
+
+
+class MockRateLimitError(MockProviderError):
+    status_code = 429
+
+
+# ============== Deterministic Labels ==============
+
+# (description substring, merchant name, website, labels, recurrence frequency)
+MERCHANT_CATALOGUE: List[Tuple[str, Optional[str], Optional[str], List[str], Optional[str]]] = [
+    ("netflix", "Netflix", "netflix.com", ["subscription", "streaming"], "monthly"),
+    ("spotify", "Spotify", "spotify.com", ["subscription", "music"], "monthly"),
+    ("klarna", "Klarna", "klarna.com", ["bnpl", "buy now pay later"], None),
+    ("barclaycard", "Barclaycard", "barclaycard.co.uk", ["credit card", "payment"], "monthly"),
+    ("british gas", "British Gas", "britishgas.co.uk", ["utilities", "gas"], "monthly"),
+    ("vodafone", "Vodafone", "vodafone.co.uk", ["phone", "mobile"], "monthly"),
+    ("rent", None, None, ["rent", "housing"], "monthly"),
+    ("tesco", "Tesco", "tesco.com", ["groceries", "shopping"], None),
+    ("amazon", "Amazon", "amazon.co.uk", ["shopping", "retail"], None),
+    ("tfl", "Transport for London", "tfl.gov.uk", ["transport", "travel"], None),
+    ("pret", "Pret A Manger", "pret.co.uk", ["food", "coffee"], None),
+    ("salary", None, None, ["salary", "income"], "monthly"),
+]
+
+# Labels for merchants outside the catalogue, picked by description hash
+GENERIC_LABELS = [
+    ["shopping"], ["food", "restaurants"], ["entertainment"], ["travel"],
+    ["services"], ["health"], ["home"], ["transfer"],
+]
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def mock_enrichment(description: str, entry_type: str, date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    The enrichment the mock returns for a transaction. Depends only on the
+    arguments, so repeated runs (and the merchant cache) see identical output.
+    """
+    lowered = description.lower()
+    for needle, name, website, labels, frequency in MERCHANT_CATALOGUE:
+        if needle in lowered:
+            break
+    else:
+        key = merchant_key(description)
+        name = key.title() if key else None
+        website = f"{key.split()[0]}.example" if key else None
+        labels = GENERIC_LABELS[_stable_hash(key or lowered) % len(GENERIC_LABELS)]
+        frequency = None
+
+    day_of_month = None
+    if frequency == "monthly" and date and len(date) >= 10:
+        day_of_month = int(date[8:10])
+
+    return {
+        "id": None,
+        "entry_type": entry_type,
+        "labels": list(labels),
+        "merchant": {
+            "name": name,
+            "logo": f"https://logos.example/{website}.png" if website else None,
+            "website": website,
+        },
+        "recurrence": {
+            "is_recurring": frequency is not None,
+            "frequency": frequency,
+            "day_of_month": day_of_month,
+        },
+    }
+
+
+class MockEnrichedTransaction:
+    def __init__(self, data: Dict[str, Any]):
+        self._data = data
+
+    def model_dump(self) -> Dict[str, Any]:
+        return self._data
+
+
+# ============== SDK Stand-in ==============
+
+class MockTransactions:
+    """Drop-in for SDK.transactions: create(**kwargs) blocks like the real call"""
+
+    def __init__(self, config: MockNtropyConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.peak_in_flight = 0
+
+    def _draw(self) -> Tuple[float, float]:
+        with self._lock:
+            latency = self.config.latency_ms
+            if self.config.latency_sigma > 0:
+                latency *= math.exp(self._rng.gauss(0.0, self.config.latency_sigma))
+            return latency / 1000.0, self._rng.random()
+
+    def create(self, **kwargs) -> MockEnrichedTransaction:
+        latency_s, outcome = self._draw()
+        with self._lock:
+            self.calls += 1
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+            over_limit = self.config.max_in_flight is not None and self._in_flight > self.config.max_in_flight
+        try:
+            if over_limit or outcome < self.config.rate_limit_rate:
+                with self._lock:
+                    self.rate_limited += 1
+                raise MockRateLimitError("429 Too Many Requests")
+
+            time.sleep(latency_s)
+            if outcome < self.config.rate_limit_rate + self.config.error_rate:
+                with self._lock:
+                    self.errors += 1
+                raise MockProviderError("500 Internal Server Error")
+
+            data = mock_enrichment(kwargs["description"], kwargs["entry_type"], kwargs.get("date"))
+            data["id"] = kwargs.get("id")
+            return MockEnrichedTransaction(data)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "rate_limited": self.rate_limited,
+                "peak_in_flight": self.peak_in_flight,
+            }
+
+
+class MockNtropySDK:
+    """Local stand-in for ntropy_sdk.SDK, injected via EnrichmentService(sdk=...)"""
+
+    # Its labels are made up; EnrichmentService warns whenever this is in use
+    is_mock = True
+
+    def __init__(self, config: Optional[MockNtropyConfig] = None):
+        self.config = config or MockNtropyConfig()
+        self.transactions = MockTransactions(self.config)
+
+    @classmethod
+    def from_env(cls) -> "MockNtropySDK":
+        return cls(MockNtropyConfig.from_env())
+
+    def stats(self) -> Dict[str, Any]:
+        return self.transactions.stats()
+
+    def close(self) -> None:
+        pass
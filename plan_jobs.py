@@ -0,0 +1,339 @@
+# plan_jobs.py - Asynchronous plan solves
+# Solves in the background, recording the incumbent and the final plan in SQLite so results outlive the worker
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from dataclasses import asdict
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+import schemas
+from local_store import open_database
+from solver_engine import Incumbent, SolveHandle
+from solver_runtime import PRIORITY_INTERACTIVE, SolverSaturatedError, get_solver_runtime, portfolio_key
+
+
+PLAN_JOBS_DB_NAME = "plan_jobs.db"
+
+# Jobs (and their plans) are purged this long after their last update
+PLAN_JOB_RETENTION_SECONDS = 30 * 24 * 60 * 60
+
+# Job statuses
+JOB_QUEUED = "queued"            # Waiting for solver capacity
+JOB_RUNNING = "running"          # Searching; incumbent holds the best plan so far
+JOB_COMPLETE = "complete"        # result holds the OptimizationPlanResponse
+JOB_FAILED = "failed"            # The solver rejected the portfolio or errored
+JOB_REJECTED = "rejected"        # Solver saturated; resubmit after retry_after seconds
+JOB_INTERRUPTED = "interrupted"  # The worker stopped before the solve finished; resubmit
+
+_ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# solve_fn(portfolio, handle, on_incumbent) -> OptimizationPlanResponse
+PlanSolveFn = Callable[[schemas.DebtPortfolio, SolveHandle, Callable[[Incumbent], None]], schemas.OptimizationPlanResponse]
+
+
+# ============== Job Store ==============
+
+class PlanJobStore:
+    """
+    SQLite-backed plan jobs: the portfolio, the latest incumbent reported by
+    the search, and the final response once the solve finishes.
+
+    Status moves queued → running → complete (or failed). Jobs a previous
+    process left queued or running are marked interrupted when the store opens.
+    """
+
+    def __init__(self, db_name: str = PLAN_JOBS_DB_NAME):
+        self._conn = open_database(db_name)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS plan_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    user_id TEXT,
+                    portfolio_key TEXT NOT NULL,
+                    priority TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    portfolio TEXT NOT NULL,
+                    incumbent TEXT,
+                    result TEXT,
+                    error TEXT,
+                    retry_after INTEGER,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS plan_jobs_by_key ON plan_jobs (portfolio_key, updated_at);
+                CREATE INDEX IF NOT EXISTS plan_jobs_by_user ON plan_jobs (user_id, updated_at);
+            """)
+            interrupted = self._conn.execute(
+                f"UPDATE plan_jobs SET status = ?, updated_at = ? WHERE status IN ({','.join('?' * len(_ACTIVE_STATUSES))})",
+                (JOB_INTERRUPTED, time.time(), *_ACTIVE_STATUSES)
+            ).rowcount
+        if interrupted:
+            print(f"[Plan Jobs] Marked {interrupted} unfinished job(s) from a previous worker interrupted")
+
+    def create_job(self, portfolio: schemas.DebtPortfolio, user_id: Optional[str], priority: str) -> str:
+        self.purge_expired()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO plan_jobs (job_id, user_id, portfolio_key, priority, status, portfolio, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, portfolio_key(portfolio), priority, JOB_QUEUED,
+                 portfolio.model_dump_json(), now, now)
+            )
+        return job_id
+
+    def get_job(self, job_id: str, include_portfolio: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM plan_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_job(row, include_portfolio) if row is not None else None
+
+    def find_job(self, key: str, user_id: Optional[str], statuses: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """Most recent job for this portfolio and user in one of `statuses`"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT * FROM plan_jobs WHERE portfolio_key = ? AND user_id IS ?"
+                f" AND status IN ({','.join('?' * len(statuses))}) ORDER BY updated_at DESC LIMIT 1",
+                (key, user_id, *statuses)
+            ).fetchone()
+        return self._to_job(row) if row is not None else None
+
+    def latest_complete(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """The user's most recently finished plan"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM plan_jobs WHERE user_id = ? AND status = ? ORDER BY updated_at DESC LIMIT 1",
+                (user_id, JOB_COMPLETE)
+            ).fetchone()
+        return self._to_job(row) if row is not None else None
+
+    def mark_running(self, job_ids: Iterable[str]) -> None:
+        """Queued jobs move to running; jobs that already finished are left alone"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE plan_jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                [(JOB_RUNNING, now, job_id, JOB_QUEUED) for job_id in job_ids]
+            )
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None, retry_after: Optional[int] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE plan_jobs SET status = ?, error = ?, retry_after = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, retry_after, time.time(), job_id)
+            )
+
+    def save_incumbent(self, job_ids: Iterable[str], incumbent: Dict[str, Any]) -> None:
+        """Records the incumbent for jobs still being solved"""
+        payload, now = json.dumps(incumbent), time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"UPDATE plan_jobs SET incumbent = ?, updated_at = ? WHERE job_id = ?"
+                f" AND status IN ({','.join('?' * len(_ACTIVE_STATUSES))})",
+                [(payload, now, job_id, *_ACTIVE_STATUSES) for job_id in job_ids]
+            )
+
+    def save_result(self, job_id: str, result: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE plan_jobs SET status = ?, result = ?, error = NULL, updated_at = ? WHERE job_id = ?",
+                (JOB_COMPLETE, json.dumps(result), time.time(), job_id)
+            )
+
+    def purge_expired(self, max_age_seconds: float = PLAN_JOB_RETENTION_SECONDS) -> int:
+        cutoff = time.time() - max_age_seconds
+        with self._lock, self._conn:
+            return self._conn.execute(
+                f"DELETE FROM plan_jobs WHERE updated_at < ? AND status NOT IN ({','.join('?' * len(_ACTIVE_STATUSES))})",
+                (cutoff, *_ACTIVE_STATUSES)
+            ).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_job(row, include_portfolio: bool = False) -> Dict[str, Any]:
+        job = dict(row)
+        portfolio = job.pop("portfolio")
+        if include_portfolio:
+            job["portfolio"] = json.loads(portfolio)
+        for field in ("incumbent", "result"):
+            job[field] = json.loads(job[field]) if job[field] else None
+        return job
+
+
+# ============== Job Runner ==============
+
+# Jobs being solved by this process
+_running_jobs: Dict[str, asyncio.Task] = {}
+
+
+class _JobFlight:
+    """The jobs waiting on one solve of a portfolio, and what they've been told so far"""
+    __slots__ = ("job_ids", "running", "incumbent")
+
+    def __init__(self):
+        self.job_ids: Set[str] = set()
+        self.running = False
+        self.incumbent: Optional[Dict[str, Any]] = None
+
+
+# portfolio_key -> the jobs sharing its solve. The runtime coalesces
+# identical solves, so only the first job's solve function runs; it marks
+# and feeds every job attached here (jobs that join a /generate-plan solve
+# see only its result). Touched from solver threads too.
+_job_flights: Dict[str, _JobFlight] = {}
+_job_flights_lock = threading.Lock()
+
+
+def _attach_job(store: PlanJobStore, key: str, job_id: str) -> _JobFlight:
+    """Joins the jobs waiting on key's solve, catching up on its progress"""
+    with _job_flights_lock:
+        flight = _job_flights.setdefault(key, _JobFlight())
+        flight.job_ids.add(job_id)
+        running, incumbent = flight.running, flight.incumbent
+    if running:
+        store.mark_running([job_id])
+    if incumbent is not None:
+        store.save_incumbent([job_id], incumbent)
+    return flight
+
+
+def _detach_job(key: str, flight: _JobFlight, job_id: str) -> None:
+    with _job_flights_lock:
+        flight.job_ids.discard(job_id)
+        if not flight.job_ids and _job_flights.get(key) is flight:
+            del _job_flights[key]
+
+
+def _incumbent_record(incumbent: Incumbent) -> Dict[str, Any]:
+    record = asdict(incumbent)
+    record["relative_gap"] = abs(incumbent.objective_value - incumbent.best_objective_bound) / \
+        max(1.0, abs(incumbent.objective_value))
+    record["found_at"] = time.time()
+    return record
+
+
+async def _run_plan_job(
+    store: PlanJobStore,
+    job_id: str,
+    portfolio: schemas.DebtPortfolio,
+    priority: str,
+    solve_fn: PlanSolveFn
+) -> None:
+    key = portfolio_key(portfolio)
+    flight = _attach_job(store, key, job_id)
+
+    def on_incumbent(incumbent: Incumbent) -> None:
+        record = _incumbent_record(incumbent)
+        with _job_flights_lock:
+            flight.incumbent = record
+            job_ids = list(flight.job_ids)
+        store.save_incumbent(job_ids, record)
+
+    def solve(portfolio: schemas.DebtPortfolio, handle: SolveHandle) -> schemas.OptimizationPlanResponse:
+        # Runs on a solver worker once the job is admitted, for every job attached to the key
+        with _job_flights_lock:
+            flight.running = True
+            job_ids = list(flight.job_ids)
+        store.mark_running(job_ids)
+        try:
+            return solve_fn(portfolio, handle, on_incumbent)
+        finally:
+            # Jobs submitted from here on start (or join) a fresh solve
+            with _job_flights_lock:
+                if _job_flights.get(key) is flight:
+                    del _job_flights[key]
+
+    handle = SolveHandle()
+    try:
+        result, shared = await get_solver_runtime().run(
+            key, solve, portfolio, handle, priority=priority, handle=handle
+        )
+        store.save_result(job_id, result.model_dump(mode="json"))
+        print(f"[Plan Jobs] Job {job_id} finished: {result.status}{' (shared solve)' if shared else ''}")
+    except SolverSaturatedError as e:
+        store.set_status(job_id, JOB_REJECTED, str(e), e.retry_after)
+        raise  # Reported to the submitter by start_plan_job
+    except asyncio.CancelledError:
+        store.set_status(job_id, JOB_INTERRUPTED)
+        raise
+    except Exception as e:
+        print(f"[Plan Jobs] Job {job_id} failed: {e}")
+        store.set_status(job_id, JOB_FAILED, str(e))
+    finally:
+        _detach_job(key, flight, job_id)
+        _running_jobs.pop(job_id, None)
+
+
+async def start_plan_job(
+    store: PlanJobStore,
+    portfolio: schemas.DebtPortfolio,
+    solve_fn: PlanSolveFn,
+    user_id: Optional[str] = None,
+    priority: str = PRIORITY_INTERACTIVE,
+    reuse: bool = True
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Start solving `portfolio` in the background and return (job, reused).
+
+    With reuse, the user's finished plan for an identical portfolio, or a job
+    for it still being solved by this process, is returned instead of
+    starting another solve.
+
+    Raises:
+        SolverSaturatedError if the solver can't admit the job
+    """
+    key = portfolio_key(portfolio)
+    if reuse:
+        existing = store.find_job(key, user_id, (JOB_COMPLETE, *_ACTIVE_STATUSES))
+        if existing is not None and (existing["status"] == JOB_COMPLETE or existing["job_id"] in _running_jobs):
+            print(f"[Plan Jobs] Reusing job {existing['job_id']} ({existing['status']})")
+            return existing, True
+
+    job_id = store.create_job(portfolio, user_id, priority)
+    task = asyncio.create_task(_run_plan_job(store, job_id, portfolio, priority, solve_fn))
+    _running_jobs[job_id] = task
+
+    # Admission is decided synchronously on the job's first step
+    await asyncio.sleep(0)
+    if task.done() and not task.cancelled() and isinstance(task.exception(), SolverSaturatedError):
+        raise task.exception()
+    print(f"[Plan Jobs] Started job {job_id} ({priority})")
+    return store.get_job(job_id), False
+
+
+def is_plan_job_running(job_id: str) -> bool:
+    return job_id in _running_jobs
+
+
+async def cancel_plan_jobs() -> None:
+    """Stop this process's jobs (on shutdown); they are left interrupted"""
+    tasks = list(_running_jobs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# ============== Shared Store ==============
+
+_shared_plan_job_store: Optional[PlanJobStore] = None
+
+
+def get_plan_job_store() -> PlanJobStore:
+    global _shared_plan_job_store
+    if _shared_plan_job_store is None:
+        _shared_plan_job_store = PlanJobStore()
+    return _shared_plan_job_store
+
+
+def close_plan_job_store() -> None:
+    global _shared_plan_job_store
+    if _shared_plan_job_store is not None:
+        _shared_plan_job_store.close()
+        _shared_plan_job_store = None
@@ -0,0 +1,200 @@
+# recurrence_detector.py - Local recurrence detection for fallback mode and cache hits
+# Finds weekly / fortnightly / monthly / quarterly / annual payments without Ntropy
+
+import re
+from collections import Counter, deque
+from datetime import date
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+# ============== Detection Parameters ==============
+
+# Candidate periods: (frequency, min interval days, max interval days, min occurrences)
+PERIODS: List[Tuple[str, int, int, int]] = [
+    ("weekly", 6, 8, 3),
+    ("fortnightly", 12, 16, 3),
+    ("monthly", 26, 35, 3),
+    ("quarterly", 84, 98, 2),
+    ("annual", 350, 380, 2),
+]
+
+# Share of intervals that must fall inside the period window
+MIN_REGULAR_INTERVAL_SHARE = 0.75
+
+# Amounts within this relative (or absolute, in cents) distance of a band's
+# smallest amount share the band, so e.g. a phone bill that moves by a few
+# pence is still one series but a drifting weekly shop is not
+AMOUNT_BAND_RATIO = 0.10
+AMOUNT_BAND_MIN_CENTS = 100
+
+# Latest occurrences kept per (direction, merchant) when a history is scanned
+# piece by piece (SeriesWindow): two years of a monthly bill
+SERIES_WINDOW_SIZE = 24
+
+# Tokens that carry no merchant identity (payment rails, references, filler)
+_NOISE_TOKENS = frozenset({
+    "dd", "so", "fp", "bgc", "pos", "card", "payment", "to", "from", "ref",
+    "direct", "debit", "standing", "order", "visa", "contactless", "purchase",
+    "on", "at", "gbp", "ltd", "www", "com", "co", "uk", "the",
+})
+_NON_LETTERS_RE = re.compile(r"[^a-z]+")
+MERCHANT_KEY_TOKENS = 3
+
+
+def merchant_key(description: str) -> str:
+    """
+    Normalise a raw bank description to a merchant grouping key, e.g.
+    'DD NETFLIX.COM 8812' -> 'netflix', 'KLARNA*ASOS 12/03' -> 'klarna asos'.
+    """
+    tokens = [
+        token for token in _NON_LETTERS_RE.split(description.lower())
+        if len(token) > 1 and token not in _NOISE_TOKENS
+    ]
+    return " ".join(tokens[:MERCHANT_KEY_TOKENS])
+
+
+def _parse_ordinal(date_str: str) -> Optional[int]:
+    try:
+        return date.fromisoformat(date_str).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def _amount_bands(indices: List[int], amount_cents: List[int]) -> List[List[int]]:
+    """
+    Split indices (sorted by amount) into bands measured from each band's
+    first (smallest) amount, so small steps can't chain into one wide band
+    """
+    bands: List[List[int]] = []
+    current: List[int] = []
+    first = None
+    for i in indices:
+        amount = amount_cents[i]
+        if first is not None and amount - first > max(AMOUNT_BAND_MIN_CENTS, first * AMOUNT_BAND_RATIO):
+            bands.append(current)
+            current = []
+            first = None
+        if first is None:
+            first = amount
+        current.append(i)
+    if current:
+        bands.append(current)
+    return bands
+
+
+def _detect_period(ordinals: List[int]) -> Optional[str]:
+    """Match sorted, de-duplicated occurrence dates to a candidate period"""
+    if len(ordinals) < 2:
+        return None
+    intervals = [b - a for a, b in zip(ordinals, ordinals[1:])]
+    median = sorted(intervals)[len(intervals) // 2]
+
+    for frequency, low, high, min_occurrences in PERIODS:
+        if not (low <= median <= high):
+            continue
+        if len(ordinals) < min_occurrences:
+            return None
+        regular = sum(1 for gap in intervals if low <= gap <= high)
+        if regular / len(intervals) >= MIN_REGULAR_INTERVAL_SHARE:
+            return frequency
+        return None
+    return None
+
+
+def detect_recurrence(
+    descriptions: List[str],
+    amount_cents: List[int],
+    entry_types: List[str],
+    dates: List[str],
+) -> Tuple[List[Optional[str]], List[Optional[int]]]:
+    """
+    Detect recurring series across a transaction history.
+
+    Transactions are grouped by direction and merchant key, split into amount
+    bands, and each band's inter-arrival times are tested against the
+    candidate periods. Everything is sort-and-scan, O(n log n) overall.
+
+    Returns:
+        (recurrence_frequency, recurrence_day) per transaction. The day is the
+        usual day of the month for monthly and longer periods, None otherwise.
+    """
+    count = len(descriptions)
+    frequencies: List[Optional[str]] = [None] * count
+    days: List[Optional[int]] = [None] * count
+
+    ordinals: List[Optional[int]] = [_parse_ordinal(d) for d in dates]
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for i in range(count):
+        if ordinals[i] is None or amount_cents[i] <= 0:
+            continue
+        key = merchant_key(descriptions[i])
+        if key:
+            groups.setdefault((entry_types[i], key), []).append(i)
+
+    for indices in groups.values():
+        if len(indices) < 2:
+            continue
+        indices.sort(key=amount_cents.__getitem__)
+        for band in _amount_bands(indices, amount_cents):
+            band_ordinals = sorted({ordinals[i] for i in band})
+            frequency = _detect_period(band_ordinals)
+            if frequency is None:
+                continue
+
+            day = None
+            if frequency in ("monthly", "quarterly", "annual"):
+                day_counts = Counter(date.fromordinal(o).day for o in band_ordinals)
+                day = min(day_counts, key=lambda d: (-day_counts[d], d))
+
+            for i in band:
+                frequencies[i] = frequency
+                days[i] = day
+
+    return frequencies, days
+
+
+# ============== Incremental Detection ==============
+
+class SeriesWindow:
+    """
+    detect_recurrence for a history that arrives in pieces (a streamed
+    upload). Only the latest SERIES_WINDOW_SIZE occurrences of each
+    (direction, merchant) are kept, so memory grows with the number of
+    merchants rather than the length of the history. Each piece is matched
+    against the earlier occurrences of its merchants; rows already detected
+    are not revisited.
+    """
+
+    def __init__(self, size: int = SERIES_WINDOW_SIZE):
+        self.size = size
+        self._windows: Dict[Tuple[str, str], Deque[Tuple[str, int, str, str]]] = {}
+
+    def detect(
+        self,
+        descriptions: List[str],
+        amount_cents: List[int],
+        entry_types: List[str],
+        dates: List[str],
+    ) -> Tuple[List[Optional[str]], List[Optional[int]]]:
+        """Same arguments and result as detect_recurrence, for the next piece of the history"""
+        count = len(descriptions)
+        frequencies: List[Optional[str]] = [None] * count
+        days: List[Optional[int]] = [None] * count
+
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for i in range(count):
+            key = merchant_key(descriptions[i])
+            if key:
+                groups.setdefault((entry_types[i], key), []).append(i)
+
+        for group, indices in groups.items():
+            window = self._windows.setdefault(group, deque(maxlen=self.size))
+            rows = list(window) + [(descriptions[i], amount_cents[i], entry_types[i], dates[i]) for i in indices]
+            found_frequencies, found_days = detect_recurrence(*(list(column) for column in zip(*rows)))
+            offset = len(window)
+            for j, i in enumerate(indices):
+                frequencies[i] = found_frequencies[offset + j]
+                days[i] = found_days[offset + j]
+            window.extend(rows[offset:])
+
+        return frequencies, days
@@ -148,6 +148,23 @@ class UserPreferences(BaseModel):
     strategy: OptimizationStrategy
     payment_shape: PaymentShape
 
+class SolveOptions(BaseModel):
+    """
+    Per-request solver controls. The search stops at the first of: a proven
+    optimum, either gap limit, or the time budget. An interactive caller can
+    ask for a quick "good enough" plan, e.g. {"max_time_seconds": 2,
+    "relative_gap_limit": 0.01}; batch jobs can keep the full budget.
+    """
+    max_time_seconds: float = Field(default=60.0, gt=0, le=600)
+    relative_gap_limit: Optional[float] = Field(default=None, ge=0, le=1) # e.g. 0.01 = within 1% of optimal
+    absolute_gap_limit: Optional[float] = Field(default=None, ge=0) # In objective units
+    num_workers: Optional[int] = Field(default=None, ge=1, le=64) # Search threads; default one per core
+    # "lexicographic": minimize the strategy's primary term (e.g. interest), then its tie-breaker
+    objective_mode: str = Field(default="weighted", pattern="^(weighted|lexicographic)$")
+    lexicographic_tolerance: float = Field(default=0.0, ge=0, le=1) # Primary may worsen by this fraction in phase 2
+    # "linear": interest and minimum payments as linear inequalities instead of division/min/max; same plans
+    formulation: str = Field(default="division", pattern="^(division|linear)$")
+
 # schemas.py (continued)
 
 class DebtPortfolio(BaseModel):
@@ -156,6 +173,7 @@ class DebtPortfolio(BaseModel):
     budget: Budget
     preferences: UserPreferences
     plan_start_date: date = Field(default_factory=date.today) # Default to today if not provided
+    solve_options: Optional[SolveOptions] = None # Default: 60s budget, search to optimality
 
 class MonthlyResult(BaseModel):
     """Pydantic model for a single month's RAW result from the solver."""
@@ -165,6 +183,27 @@ class MonthlyResult(BaseModel):
     interest_charged_cents: int = Field(..., ge=0)
     ending_balance_cents: int # Can be negative if overpaid
 
+class SolveStats(BaseModel):
+    """How hard the solver searched; relative_gap 0.0 means proven optimal."""
+    objective_value: Optional[float] = None
+    best_objective_bound: Optional[float] = None
+    relative_gap: Optional[float] = None
+    wall_time_seconds: float
+    num_workers: int
+    num_branches: int
+    num_conflicts: int
+
+class PlanAlternative(BaseModel):
+    """A good plan that differs meaningfully from the best one."""
+    rank: int = Field(..., ge=1)
+    objective_value: float
+    objective_increase: float # Relative to the best plan, e.g. 0.03 = 3% worse by the strategy's objective
+    total_interest_cents: int
+    payoff_month: int
+    difference_cents: int # Sum over accounts and months of |payment - best plan's payment|
+    termination_reason: str # How its search ended, or "incumbent" if found on the way to the best plan
+    plan: List[MonthlyResult]
+
 # --- API Response Model ---
 
 class OptimizationPlanResponse(BaseModel):
@@ -176,5 +215,27 @@ class OptimizationPlanResponse(BaseModel):
     status: str # e.g., "OPTIMAL", "FEASIBLE", "INFEASIBLE", "ERROR"
     message: Optional[str] = None
     plan: Optional[List[MonthlyResult]] = None # The raw plan from the solver
+    # How the search ended: "optimal", "gap_limit", "time_limit", "infeasible", "model_invalid"
+    termination_reason: Optional[str] = None
+    solve_stats: Optional[SolveStats] = None
+    alternatives: Optional[List[PlanAlternative]] = None # Only when requested (?alternatives=k)
     # Future: Add summary fields (total_interest, payoff_month)
     # Future: Add structured dashboard_data field
+
+class FrontierPoint(BaseModel):
+    """The least-interest plan found with no month's total payment above payment_cap_cents."""
+    payment_cap_cents: int
+    status: str # CP-SAT status; UNKNOWN / INFEASIBLE points have no plan
+    termination_reason: str
+    total_interest_cents: Optional[int] = None
+    peak_payment_cents: Optional[int] = None
+    average_payment_cents: Optional[int] = None
+    payoff_month: Optional[int] = None
+    on_frontier: bool # False if another point pays less interest for no higher peak payment
+    solve_stats: Optional[SolveStats] = None
+    plan: Optional[List[MonthlyResult]] = None
+
+class ParetoFrontierResponse(BaseModel):
+    """Total interest vs. peak monthly payment, from the highest payment cap to the lowest."""
+    points: List[FrontierPoint]
+    wall_time_seconds: float
@@ -798,7 +798,8 @@ export async function registerRoutes(app: Express): Promise<Server> {
       let status = pythonResult.status;
       let errorMessage = pythonResult.error_message || null;
 
-      if (pythonResult.status === "OPTIMAL" && pythonResult.plan) {
+      // FEASIBLE = best plan found before the time budget / gap limit stopped the search
+      if ((pythonResult.status === "OPTIMAL" || pythonResult.status === "FEASIBLE") && pythonResult.plan) {
         planData = pythonResult.plan.map((result: any) => ({
           month: result.month,
           lenderName: result.lender_name,
@@ -1,8 +1,13 @@
+import math
+import os
 import sys
-from dataclasses import dataclass, field
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from datetime import date
 from enum import Enum
-from typing import List, Optional, Dict, Tuple
+from typing import Callable, List, Optional, Dict, Tuple
 
 # Ensure we are using Python 3.10+
 assert sys.version_info >= (3, 10), "Python 3.10 or higher is required."
@@ -210,6 +215,46 @@ class UserPreferences:
     payment_shape: PaymentShape
 
 
+# --- Objective modes ---
+OBJECTIVE_WEIGHTED = "weighted"
+OBJECTIVE_LEXICOGRAPHIC = "lexicographic"
+
+# --- Model formulations ---
+FORMULATION_DIVISION = "division"
+FORMULATION_LINEAR = "linear"
+
+
+@dataclass
+class SolveOptions:
+    """
+    Per-request controls for the CP-SAT search. The solver stops at whichever
+    comes first: a proven optimum, a gap limit, or the time budget.
+    """
+    # Wall-clock budget for the search.
+    max_time_seconds: float = 60.0
+
+    # Stop once |objective - bound| / max(1, |objective|) is within this.
+    relative_gap_limit: Optional[float] = None
+
+    # Stop once |objective - bound| is within this (objective units).
+    absolute_gap_limit: Optional[float] = None
+
+    # Search threads; None leaves CP-SAT's default (one per core).
+    num_workers: Optional[int] = None
+
+    # OBJECTIVE_WEIGHTED searches the strategy's weighted sum once;
+    # OBJECTIVE_LEXICOGRAPHIC minimizes its primary term, then the
+    # tie-breaker with the primary held within lexicographic_tolerance
+    # (relative) of the first phase's value.
+    objective_mode: str = OBJECTIVE_WEIGHTED
+    lexicographic_tolerance: float = 0.0
+
+    # How interest and minimum payments are modelled: FORMULATION_DIVISION
+    # (division, min and max constraints) or FORMULATION_LINEAR (the same
+    # values as bounded linear inequalities). Plans are identical.
+    formulation: str = FORMULATION_DIVISION
+
+
 @dataclass
 class DebtPortfolio:
     """
@@ -219,10 +264,13 @@ class DebtPortfolio:
     accounts: List[Account]
     budget: Budget
     preferences: UserPreferences
-    
+
     # The starting date for the optimization plan.
     plan_start_date: date = field(default_factory=date.today)
 
+    # How long and how hard to search.
+    solve_options: SolveOptions = field(default_factory=SolveOptions)
+
 @dataclass
 class MonthlyResult:
     """
@@ -235,7 +283,121 @@ class MonthlyResult:
     ending_balance_cents: int
 
 
-# --- Solver Function ---
+# --- How a solve ended ---
+TERMINATION_OPTIMAL = "optimal"          # Proven optimal
+TERMINATION_GAP_LIMIT = "gap_limit"      # Within the requested optimality gap
+TERMINATION_TIME_LIMIT = "time_limit"    # Time budget ran out (best plan so far, if any)
+TERMINATION_INFEASIBLE = "infeasible"
+TERMINATION_MODEL_INVALID = "model_invalid"
+TERMINATION_CANCELLED = "cancelled"      # Stopped via SolveHandle.cancel()
+
+
+@dataclass
+class SolveStats:
+    """
+    Search statistics for a solve. The gap is CP-SAT's relative gap between
+    the plan's objective and the best proven bound (0.0 = proven optimal).
+    """
+    objective_value: Optional[float]
+    best_objective_bound: Optional[float]
+    relative_gap: Optional[float]
+    wall_time_seconds: float
+    num_workers: int
+    num_branches: int
+    num_conflicts: int
+
+
+@dataclass
+class PlanSolveResult:
+    """
+    Outcome of solve_payment_plan. `status` is CP-SAT's status name
+    (OPTIMAL, FEASIBLE, INFEASIBLE, UNKNOWN, MODEL_INVALID); `plan` is None
+    when no plan was found.
+    """
+    status: str
+    termination_reason: str
+    plan: Optional[List[MonthlyResult]]
+    stats: Optional[SolveStats] = None
+
+
+@dataclass
+class Incumbent:
+    """The best plan found so far during a search."""
+    objective_value: float
+    best_objective_bound: float
+    wall_time_seconds: float
+    plan: List[MonthlyResult]
+
+
+# Incumbents are reported at most this often (the first one immediately)
+INCUMBENT_MIN_INTERVAL_SECONDS = 1.0
+
+
+class SolveHandle:
+    """
+    Stops a solve from another thread. Cancelled before the search starts,
+    the solve returns without searching; during the search, cancel() calls
+    CpSolver.StopSearch() and the solver returns its best plan so far. A
+    solve made of concurrent searches (the Pareto frontier) attaches each.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # id(solver) -> (solver, started_at, time budget, workers)
+        self._searches: Dict[int, Tuple[cp_model.CpSolver, float, float, int]] = {}
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> float:
+        """
+        Stops the solve. Returns the CPU seconds reclaimed from searches that
+        were running: each one's unused time budget times its workers (an
+        upper bound, since a search may have finished sooner on its own).
+        """
+        with self._lock:
+            self._cancelled = True
+            reclaimed = 0.0
+            now = time.monotonic()
+            for solver, started_at, time_budget, workers in self._searches.values():
+                solver.StopSearch()
+                reclaimed += max(0.0, time_budget - (now - started_at)) * workers
+            return reclaimed
+
+    def attach(self, solver: cp_model.CpSolver, options: SolveOptions) -> bool:
+        """Registers a solver about to search; False if already cancelled."""
+        with self._lock:
+            if self._cancelled:
+                return False
+            workers = solver.parameters.num_workers or (os.cpu_count() or 1)
+            self._searches[id(solver)] = (solver, time.monotonic(), options.max_time_seconds, workers)
+            return True
+
+    def detach(self, solver: cp_model.CpSolver) -> None:
+        with self._lock:
+            self._searches.pop(id(solver), None)
+
+
+@dataclass
+class PlanModel:
+    """
+    A built CP-SAT model and the variables a solution is read back from.
+    """
+    model: cp_model.CpModel
+    max_months: int
+    payments: Dict[Tuple[str, int], cp_model.IntVar]
+    balances: Dict[Tuple[str, int], cp_model.IntVar]
+    interest_charged: Dict[Tuple[str, int], cp_model.IntVar]
+    # Upper bound of every payment and balance variable
+    max_balance_cents: int
+    # The strategy's objective terms, most important first, when it has a
+    # tie-breaker; the model's objective is their weighted sum
+    objective_terms: List[cp_model.LinearExpr] = field(default_factory=list)
+
+
+# --- Solver Functions ---
 
 def generate_payment_plan(portfolio: DebtPortfolio) -> Optional[List[MonthlyResult]]:
     """
@@ -247,9 +409,628 @@ def generate_payment_plan(portfolio: DebtPortfolio) -> Optional[List[MonthlyResu
         A list of MonthlyResult objects representing the plan, or None if no
         solution is found.
     """
+    return solve_payment_plan(portfolio).plan
+
+
+def solve_payment_plan(
+    portfolio: DebtPortfolio,
+    options: Optional[SolveOptions] = None,
+    handle: Optional[SolveHandle] = None,
+    on_incumbent: Optional[Callable[[Incumbent], None]] = None
+) -> PlanSolveResult:
+    """
+    Builds and solves the plan model under the portfolio's solve options
+    (or `options`), reporting how the search ended. `handle` lets another
+    thread stop the solve early (termination_reason TERMINATION_CANCELLED).
+    `on_incumbent` is called from the search thread as better plans are
+    found (throttled to INCUMBENT_MIN_INTERVAL_SECONDS).
+    Returns:
+        A PlanSolveResult. Its plan is the best plan found, which is only
+        proven optimal when termination_reason is TERMINATION_OPTIMAL.
+    """
+    options = options or portfolio.solve_options
+    plan_model = build_payment_model(portfolio, options.formulation)
+    if plan_model is None:
+        return PlanSolveResult(status="OPTIMAL", termination_reason=TERMINATION_OPTIMAL, plan=[])
+
+    # --- 7. Solve the Model and Process Results ---
+    print("\n--- Solving the Model ---")
+    model = plan_model.model
+
+    # Add model validation for better error logging
+    try:
+        validation_error = model.Validate()
+        if validation_error:
+            print(f"!!! Model Validation Error: {validation_error}", file=sys.stderr)
+            # You could optionally print the full model proto for deep debugging:
+            #
+            print(model.Proto(), file=sys.stderr)
+    except Exception as e:
+        print(f"!!! An exception occurred during model.Validate(): {e}", file=sys.stderr)
+
+    callback = _IncumbentCallback(plan_model, portfolio, on_incumbent) if on_incumbent is not None else None
+    if options.objective_mode == OBJECTIVE_LEXICOGRAPHIC and len(plan_model.objective_terms) > 1:
+        solver, status, stats, reason = _search_lexicographic(plan_model, options, handle, callback)
+    else:
+        solver, status, stats, reason = _search(plan_model, options, handle, callback)
+    if status is None:
+        print("Solve cancelled before the search started.")
+        return PlanSolveResult(status="UNKNOWN", termination_reason=TERMINATION_CANCELLED, plan=None)
+
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        print(f"\n✅ Solution Found! Status: {solver.StatusName(status)}")
+        results_list = _extract_plan(solver, plan_model, portfolio)
+        _print_plan_summary(results_list, portfolio)
+        return PlanSolveResult(
+            status=solver.StatusName(status), termination_reason=reason, plan=results_list, stats=stats
+        )
+
+    else:
+        # Handle cases where no- solution is found.
+        print(f"\n❌ Solution Not Found. Status: {solver.StatusName(status)}")
+        if status == cp_model.INFEASIBLE:
+            print("Model is INFEASIBLE. This often means the monthly budget is less than the")
+            print("sum of the minimum payments, or the payoff constraint could not be met.")
+        elif status == cp_model.MODEL_INVALID:
+            print("Model is INVALID. This is a critical error in the solver's constraint logic.")
+
+            print("The most recent change (e.g., complex minimum payments) likely introduced")
+            print("a contradictory or malformed rule (e.g., type ambiguity, circular dependency).")
+            print("Please review the `model.Validate()` output above.")
+        elif reason == TERMINATION_CANCELLED:
+            print("The search was cancelled before a solution was found.")
+        else:
+            print(f"The solver stopped for an unknown reason: {solver.StatusName(status)}")
+        return PlanSolveResult(
+            status=solver.StatusName(status), termination_reason=reason, plan=None, stats=stats
+        )
+
+
+def _search(
+    plan_model: PlanModel,
+    options: SolveOptions,
+    handle: Optional[SolveHandle] = None,
+    callback: Optional[cp_model.CpSolverSolutionCallback] = None,
+    repair_hint: bool = False
+) -> Tuple[cp_model.CpSolver, Optional[int], Optional[SolveStats], str]:
+    """
+    Runs one CP-SAT search over a built model. With repair_hint, an
+    infeasible hint is repaired into a first solution rather than dropped.
+    Returns:
+        (solver, status, stats, termination reason); status and stats are
+        None if the handle was cancelled before the search started.
+    """
+    solver = configure_solver(options)
+    solver.parameters.repair_hint = repair_hint
+    if handle is not None and not handle.attach(solver, options):
+        return solver, None, None, TERMINATION_CANCELLED
+    try:
+        if callback is not None:
+            status = solver.Solve(plan_model.model, callback)
+        else:
+            status = solver.Solve(plan_model.model)
+    finally:
+        if handle is not None:
+            handle.detach(solver)
+    stats = _solve_stats(solver, status)
+    reason = TERMINATION_CANCELLED if handle is not None and handle.cancelled else \
+        _termination_reason(status, stats, options)
+    print(f"Search ended: {reason} (status {solver.StatusName(status)}, "
+          f"{stats.wall_time_seconds:.2f}s, gap {stats.relative_gap})")
+    return solver, status, stats, reason
+
+
+def _search_lexicographic(
+    plan_model: PlanModel,
+    options: SolveOptions,
+    handle: Optional[SolveHandle] = None,
+    callback: Optional[cp_model.CpSolverSolutionCallback] = None
+) -> Tuple[cp_model.CpSolver, Optional[int], Optional[SolveStats], str]:
+    """
+    Two-phase search over plan_model.objective_terms: minimize the primary
+    term, bound it by the value found (plus lexicographic_tolerance), then
+    minimize the tie-breaker hinted with the first phase's solution. Both
+    phases share options.max_time_seconds, and the second is skipped if
+    the first used all of it.
+    Returns:
+        As _search. Stats are the second phase's with both phases' time,
+        branches and conflicts; the termination reason is the first phase's
+        unless it proved its optimum. If the second phase is skipped or
+        finds nothing, the first phase's solver and plan are returned as
+        FEASIBLE, with the second phase's reason if the first was optimal.
+    """
+    model = plan_model.model
+    primary, tie_breaker = plan_model.objective_terms[:2]
+
+    print("Lexicographic phase 1: primary objective")
+    model.Minimize(primary)
+    first, status, first_stats, first_reason = _search(plan_model, options, handle, callback)
+    if status is None or status not in (cp_model.OPTIMAL, cp_model.FEASIBLE) or first_reason == TERMINATION_CANCELLED:
+        return first, status, first_stats, first_reason
+
+    remaining = options.max_time_seconds - first_stats.wall_time_seconds
+    if remaining <= 0:
+        # The tie-breaker was never searched, so the plan is not proven lexicographically optimal
+        print("Lexicographic phase 2 skipped: the time budget is spent")
+        reason = TERMINATION_TIME_LIMIT if first_reason == TERMINATION_OPTIMAL else first_reason
+        return first, cp_model.FEASIBLE, first_stats, reason
+
+    bound = math.floor(first_stats.objective_value * (1 + options.lexicographic_tolerance))
+    model.Add(primary <= bound)
+    model.Minimize(tie_breaker)
+    # The first phase's solution satisfies the bound, so it is a complete, feasible start
+    model.ClearHints()
+    for index, value in enumerate(first.ResponseProto().solution):
+        model.AddHint(model.GetIntVarFromProtoIndex(index), value)
+
+    print(f"Lexicographic phase 2: tie-breaker with primary <= {bound:,}")
+    second, second_status, second_stats, second_reason = _search(
+        plan_model, replace(options, max_time_seconds=remaining), handle, callback
+    )
+    if second_status is None or second_status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        reason = second_reason if first_reason == TERMINATION_OPTIMAL else first_reason
+        return first, cp_model.FEASIBLE, first_stats, reason
+
+    second_stats.wall_time_seconds += first_stats.wall_time_seconds
+    second_stats.num_branches += first_stats.num_branches
+    second_stats.num_conflicts += first_stats.num_conflicts
+    reason = second_reason if first_reason == TERMINATION_OPTIMAL else first_reason
+    status = second_status if status == cp_model.OPTIMAL else status
+    return second, status, second_stats, reason
+
+
+# --- Plan Alternatives ---
+
+# Default diversity: alternatives move at least this share of the starting
+# debt (in bps) between accounts or months, summed as |payment difference|
+DEFAULT_ALTERNATIVE_DIFFERENCE_BPS = 1000
+
+# Each follow-up search gets this share of the best plan's search time (at
+# least ALTERNATIVE_MIN_SECONDS) and stops within this gap unless the caller
+# set one: alternatives need to be good, not proven best. Presolve and the
+# hint repair take most of a second on one core, hence the floor
+ALTERNATIVE_TIME_FRACTION = 1.0
+ALTERNATIVE_MIN_SECONDS = 2.0
+ALTERNATIVE_RELATIVE_GAP = 0.01
+
+# termination_reason of an alternative taken from the best plan's own search
+ALTERNATIVE_FROM_INCUMBENT = "incumbent"
+
+
+@dataclass
+class PlanAlternative:
+    """A good plan that differs meaningfully from the best one."""
+    plan: List[MonthlyResult]
+    objective_value: float
+    termination_reason: str
+    # Sum over accounts and months of |payment - best plan's payment|
+    difference_cents: int
+
+
+def solve_plan_alternatives(
+    portfolio: DebtPortfolio,
+    count: int,
+    options: Optional[SolveOptions] = None,
+    handle: Optional[SolveHandle] = None,
+    min_difference_cents: Optional[int] = None
+) -> Tuple[PlanSolveResult, List[PlanAlternative]]:
+    """
+    Solves for the best plan, then for up to `count` alternatives.
+
+    Alternatives must differ from the best plan and from each other by at
+    least min_difference_cents of payments. They come first from the
+    incumbents the best plan's search passed through, then from short
+    follow-up searches on the same model with that diversity constraint,
+    hinted with the last plan found. Follow-ups stop at a loose gap and never
+    run longer than the first search, so k alternatives cost at most k more
+    solves, usually less, where k independent solves would all return the
+    same plan.
+
+    In the lexicographic objective mode the best plan comes from the
+    two-phase search, and alternatives keep its primary term within
+    lexicographic_tolerance of the optimum; their objective_value is the
+    tie-breaker's. With no tolerance there is often no other plan.
+    Returns:
+        (the best plan's PlanSolveResult, alternatives best first for the
+        incumbents, then in the order found). Fewer than `count` come back if
+        no sufficiently different plan is found or the search is cancelled.
+    """
+    options = options or portfolio.solve_options
+    plan_model = build_payment_model(portfolio, options.formulation)
+    if plan_model is None:
+        return PlanSolveResult(status="OPTIMAL", termination_reason=TERMINATION_OPTIMAL, plan=[]), []
+
+    print("\n--- Solving the Model (best plan) ---")
+    recorder = _SolutionRecorder(plan_model, portfolio)
+    if options.objective_mode == OBJECTIVE_LEXICOGRAPHIC and len(plan_model.objective_terms) > 1:
+        # Leaves the primary term bounded and the tie-breaker as the model's
+        # objective, so the follow-ups below are ranked the same way. The
+        # first phase's incumbents may break that bound; they aren't kept
+        solver, status, stats, reason = _search_lexicographic(plan_model, options, handle)
+    else:
+        solver, status, stats, reason = _search(plan_model, options, handle, recorder)
+    if status is None or status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return PlanSolveResult(
+            status=solver.StatusName(status) if status is not None else "UNKNOWN",
+            termination_reason=reason, plan=None, stats=stats
+        ), []
+    best = PlanSolveResult(
+        status=solver.StatusName(status), termination_reason=reason,
+        plan=_extract_plan(solver, plan_model, portfolio), stats=stats
+    )
+
+    if min_difference_cents is None:
+        total_balance = sum(acc.current_balance_cents for acc in portfolio.accounts)
+        min_difference_cents = max(1, total_balance * DEFAULT_ALTERNATIVE_DIFFERENCE_BPS // 10000)
+
+    payments = plan_model.payments
+    best_payments = {key: solver.Value(var) for key, var in payments.items()}
+    chosen = [best_payments]
+    alternatives: List[PlanAlternative] = []
+
+    def far_enough(candidate: Dict[Tuple[str, int], int]) -> bool:
+        return all(_payment_distance(candidate, other) >= min_difference_cents for other in chosen)
+
+    # Plans the search improved on are alternatives at no extra cost
+    for objective, found_payments, plan in sorted(recorder.solutions, key=lambda solution: solution[0]):
+        if len(alternatives) == count:
+            break
+        if far_enough(found_payments):
+            chosen.append(found_payments)
+            alternatives.append(PlanAlternative(
+                plan=plan, objective_value=objective, termination_reason=ALTERNATIVE_FROM_INCUMBENT,
+                difference_cents=_payment_distance(found_payments, best_payments),
+            ))
+    if alternatives:
+        print(f"Took {len(alternatives)} alternative(s) from the search's incumbents.")
+
+    follow_up = replace(
+        options,
+        max_time_seconds=min(options.max_time_seconds,
+                             max(ALTERNATIVE_MIN_SECONDS, stats.wall_time_seconds * ALTERNATIVE_TIME_FRACTION)),
+        relative_gap_limit=options.relative_gap_limit if options.relative_gap_limit is not None else ALTERNATIVE_RELATIVE_GAP,
+    )
+    model = plan_model.model
+    constrained = 0
+
+    while len(alternatives) < count:
+        # Differ from every plan so far (the best plan and earlier alternatives)
+        for other in chosen[constrained:]:
+            deviations = []
+            for key, var in payments.items():
+                deviation = model.NewIntVar(0, plan_model.max_balance_cents, f'alt{constrained}_dev_{key}')
+                model.AddAbsEquality(deviation, var - other[key])
+                deviations.append(deviation)
+            model.Add(sum(deviations) >= min_difference_cents)
+            constrained += 1
+
+        # The last plan breaks the new constraint; CP-SAT repairs it into a start
+        model.ClearHints()
+        for key, var in payments.items():
+            model.AddHint(var, chosen[-1][key])
+
+        print(f"\n--- Solving for alternative {len(alternatives) + 1} of {count} ---")
+        solver, status, stats, reason = _search(plan_model, follow_up, handle, repair_hint=True)
+        if status is None or status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            print(f"No further alternative ({reason}).")
+            break
+        found_payments = {key: solver.Value(var) for key, var in payments.items()}
+        chosen.append(found_payments)
+        alternatives.append(PlanAlternative(
+            plan=_extract_plan(solver, plan_model, portfolio, log=False),
+            objective_value=stats.objective_value,
+            termination_reason=reason,
+            difference_cents=_payment_distance(found_payments, best_payments),
+        ))
+        if reason == TERMINATION_CANCELLED:
+            break
+
+    print(f"Found {len(alternatives)} alternative(s) to the best plan (objective {best.stats.objective_value:,.0f}).")
+    return best, alternatives
+
+
+def _payment_distance(a: Dict[Tuple[str, int], int], b: Dict[Tuple[str, int], int]) -> int:
+    return sum(abs(a[key] - b[key]) for key in a)
+
+
+class _SolutionRecorder(cp_model.CpSolverSolutionCallback):
+    """Keeps every solution the search finds: (objective, payments, plan)."""
+
+    def __init__(self, plan_model: PlanModel, portfolio: DebtPortfolio):
+        super().__init__()
+        self._plan_model = plan_model
+        self._portfolio = portfolio
+        self.solutions: List[Tuple[float, Dict[Tuple[str, int], int], List[MonthlyResult]]] = []
+
+    def on_solution_callback(self) -> None:
+        self.solutions.append((
+            self.ObjectiveValue(),
+            {key: self.Value(var) for key, var in self._plan_model.payments.items()},
+            _extract_plan(self, self._plan_model, self._portfolio, log=False),
+        ))
+
+
+# --- Pareto Frontier ---
+
+# Interest vs. peak monthly payment. The frontier's cheap end is the plan
+# with the least interest; below it, each point caps every month's total
+# payment (the epsilon constraint) and minimizes interest under that cap.
+DEFAULT_FRONTIER_POINTS = 6
+
+# The lowest cap tried is this many times the level payments that would
+# clear each account over the whole horizon (and at least the first month's
+# minimums). Caps near the true minimum pay off over most of the horizon;
+# those searches are slow and rarely the trade-off anyone wants.
+FRONTIER_FLOOR_FACTOR = 2.0
+
+# Frontier points need to be close, not proven best
+FRONTIER_RELATIVE_GAP = 0.01
+
+# The least-interest search gets at most this share of the time budget;
+# the capped searches share what is left (at least FRONTIER_MIN_SECONDS)
+# and run in parallel
+FRONTIER_ANCHOR_TIME_FRACTION = 0.5
+FRONTIER_MIN_SECONDS = 2.0
+
+
+@dataclass
+class FrontierPoint:
+    """The least-interest plan found with no month's total payment above the cap."""
+    payment_cap_cents: int
+    status: str
+    termination_reason: str
+    plan: Optional[List[MonthlyResult]]
+    stats: Optional[SolveStats] = None
+    total_interest_cents: Optional[int] = None
+    peak_payment_cents: Optional[int] = None
+    average_payment_cents: Optional[int] = None
+    payoff_month: Optional[int] = None
+    # False if another point has no higher peak payment and less interest
+    on_frontier: bool = False
+
+
+def solve_pareto_frontier(
+    portfolio: DebtPortfolio,
+    points: int = DEFAULT_FRONTIER_POINTS,
+    options: Optional[SolveOptions] = None,
+    handle: Optional[SolveHandle] = None,
+    max_parallel: Optional[int] = None
+) -> List[FrontierPoint]:
+    """
+    Approximates the trade-off between total interest and peak monthly
+    payment with `points` epsilon-constraint solves.
+
+    The least-interest plan is solved first; its peak payment is the highest
+    cap. The other caps are spaced evenly down to the floor and solved in
+    parallel (max_parallel at a time, default all), splitting the workers
+    between them, each hinted with the least-interest plan. The whole
+    frontier runs within options.max_time_seconds, give or take waves when
+    max_parallel is below the number of caps.
+    Returns:
+        Points from the highest cap to the lowest. Points whose search found
+        no plan in time (or proved the cap infeasible) have plan None.
+    """
+    options = options or portfolio.solve_options
+    started = time.monotonic()
+
+    print(f"\n--- Pareto frontier: {points} point(s) ---")
+    anchor_options = replace(
+        options,
+        max_time_seconds=options.max_time_seconds * FRONTIER_ANCHOR_TIME_FRACTION,
+        relative_gap_limit=options.relative_gap_limit if options.relative_gap_limit is not None else FRONTIER_RELATIVE_GAP,
+    )
+    plan_model = _frontier_model(portfolio, None, options.formulation)
+    if plan_model is None:
+        return [FrontierPoint(payment_cap_cents=0, status="OPTIMAL", termination_reason=TERMINATION_OPTIMAL, plan=[],
+                              total_interest_cents=0, peak_payment_cents=0, average_payment_cents=0, payoff_month=0,
+                              on_frontier=True)]
+    solver, status, stats, reason = _search(plan_model, anchor_options, handle)
+    if status is None or status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return [FrontierPoint(payment_cap_cents=portfolio.budget.monthly_budget_cents,
+                              status=solver.StatusName(status) if status is not None else "UNKNOWN",
+                              termination_reason=reason, plan=None, stats=stats)]
+    anchor = _frontier_point(solver, status, stats, reason, plan_model, portfolio, cap_cents=None)
+    hint = {key: solver.Value(var) for key, var in plan_model.payments.items()}
+
+    floor_cents = _frontier_floor_cents(portfolio, plan_model.max_months)
+    caps: List[int] = []
+    if points > 1 and floor_cents < anchor.peak_payment_cents:
+        step = (anchor.peak_payment_cents - floor_cents) / (points - 1)
+        caps = sorted({round(floor_cents + step * i) for i in range(points - 1)}, reverse=True)
+
+    capped: List[FrontierPoint] = []
+    if caps and not (handle is not None and handle.cancelled):
+        parallel = min(len(caps), max_parallel or len(caps))
+        total_workers = options.num_workers or (os.cpu_count() or 1)
+        capped_options = replace(
+            anchor_options,
+            max_time_seconds=max(FRONTIER_MIN_SECONDS, options.max_time_seconds - (time.monotonic() - started)),
+            num_workers=max(1, total_workers // parallel),
+        )
+        print(f"Solving {len(caps)} capped point(s), {parallel} at a time "
+              f"({capped_options.num_workers} worker(s) each, {capped_options.max_time_seconds:.1f}s)...")
+
+        def solve_capped(cap_cents: int) -> FrontierPoint:
+            capped_model = _frontier_model(portfolio, cap_cents, options.formulation)
+            # The least-interest plan breaks the cap; CP-SAT repairs it into a start
+            for key, var in capped_model.payments.items():
+                capped_model.model.AddHint(var, hint[key])
+            capped_solver, capped_status, capped_stats, capped_reason = _search(
+                capped_model, capped_options, handle, repair_hint=True
+            )
+            return _frontier_point(capped_solver, capped_status, capped_stats, capped_reason,
+                                   capped_model, portfolio, cap_cents)
+
+        with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="frontier") as executor:
+            capped = list(executor.map(solve_capped, caps))
+
+    frontier = [anchor] + capped
+    for point in frontier:
+        point.on_frontier = point.plan is not None and not any(
+            other.plan is not None
+            and other.peak_payment_cents <= point.peak_payment_cents
+            and other.total_interest_cents < point.total_interest_cents
+            for other in frontier
+        )
+    solved = sum(1 for point in frontier if point.plan is not None)
+    print(f"Pareto frontier: {solved}/{len(frontier)} point(s) solved in {time.monotonic() - started:.2f}s.")
+    return frontier
+
+
+def _frontier_model(portfolio: DebtPortfolio, cap_cents: Optional[int], formulation: str) -> Optional[PlanModel]:
+    """The payment model minimizing total interest, every month's total payment capped."""
+    plan_model = build_payment_model(portfolio, formulation)
+    if plan_model is None:
+        return None
+    model = plan_model.model
+    if cap_cents is not None:
+        for month in range(plan_model.max_months):
+            model.Add(sum(plan_model.payments[(acc.lender_name, month)] for acc in portfolio.accounts) <= cap_cents)
+    model.Minimize(sum(plan_model.interest_charged.values()))
+    return plan_model
+
+
+def _frontier_floor_cents(portfolio: DebtPortfolio, months: int) -> int:
+    level_payments = 0.0
+    first_minimums = 0
+    for account in portfolio.accounts:
+        balance = account.current_balance_cents
+        rate = account.apr_standard_bps / 120000
+        level_payments += balance / months if rate == 0 else balance * rate / (1 - (1 + rate) ** -months)
+        rule = account.min_payment_rule
+        first_minimums += min(balance, max(rule.fixed_cents, balance * rule.percentage_bps // 10000))
+    return max(first_minimums, math.ceil(level_payments * FRONTIER_FLOOR_FACTOR))
+
+
+def _frontier_point(
+    solver: cp_model.CpSolver,
+    status: Optional[int],
+    stats: Optional[SolveStats],
+    reason: str,
+    plan_model: PlanModel,
+    portfolio: DebtPortfolio,
+    cap_cents: Optional[int]
+) -> FrontierPoint:
+    if status is None or status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return FrontierPoint(payment_cap_cents=cap_cents,
+                             status=solver.StatusName(status) if status is not None else "UNKNOWN",
+                             termination_reason=reason, plan=None, stats=stats)
+    plan = _extract_plan(solver, plan_model, portfolio, log=False)
+    monthly_totals: Dict[int, int] = {}
+    for monthly in plan:
+        monthly_totals[monthly.month] = monthly_totals.get(monthly.month, 0) + monthly.payment_cents
+    peak = max(monthly_totals.values(), default=0)
+    return FrontierPoint(
+        # The least-interest plan's cap is its own peak
+        payment_cap_cents=cap_cents if cap_cents is not None else peak,
+        status=solver.StatusName(status),
+        termination_reason=reason,
+        plan=plan,
+        stats=stats,
+        total_interest_cents=sum(monthly.interest_charged_cents for monthly in plan),
+        peak_payment_cents=peak,
+        average_payment_cents=sum(monthly_totals.values()) // max(1, len(monthly_totals)),
+        payoff_month=max(monthly_totals, default=0),
+    )
+
+
+class _IncumbentCallback(cp_model.CpSolverSolutionCallback):
+    """Reports improving solutions to on_incumbent as they are found."""
+
+    def __init__(self, plan_model: PlanModel, portfolio: DebtPortfolio, on_incumbent: Callable[[Incumbent], None]):
+        super().__init__()
+        self._plan_model = plan_model
+        self._portfolio = portfolio
+        self._on_incumbent = on_incumbent
+        self._last_reported = float("-inf")
+
+    def on_solution_callback(self) -> None:
+        now = time.monotonic()
+        if now - self._last_reported < INCUMBENT_MIN_INTERVAL_SECONDS:
+            return
+        self._last_reported = now
+        try:
+            self._on_incumbent(Incumbent(
+                objective_value=self.ObjectiveValue(),
+                best_objective_bound=self.BestObjectiveBound(),
+                wall_time_seconds=self.WallTime(),
+                plan=_extract_plan(self, self._plan_model, self._portfolio, log=False),
+            ))
+        except Exception as e:
+            # Never let a reporting problem abort the search
+            print(f"!!! Incumbent callback failed: {e}", file=sys.stderr)
+
+
+def configure_solver(options: SolveOptions) -> cp_model.CpSolver:
+    """A CpSolver with the time budget, gap limits and worker count applied."""
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = options.max_time_seconds
+    if options.relative_gap_limit is not None:
+        solver.parameters.relative_gap_limit = options.relative_gap_limit
+    if options.absolute_gap_limit is not None:
+        solver.parameters.absolute_gap_limit = options.absolute_gap_limit
+    if options.num_workers is not None:
+        solver.parameters.num_workers = options.num_workers
+    return solver
+
+
+def _solve_stats(solver: cp_model.CpSolver, status: int) -> SolveStats:
+    objective = bound = gap = None
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        objective = solver.ObjectiveValue()
+        bound = solver.BestObjectiveBound()
+        # CP-SAT's own definition of the relative gap
+        gap = abs(objective - bound) / max(1.0, abs(objective))
+    return SolveStats(
+        objective_value=objective,
+        best_objective_bound=bound,
+        relative_gap=gap,
+        wall_time_seconds=solver.WallTime(),
+        # 0 = CP-SAT's default of one worker per core
+        num_workers=solver.parameters.num_workers or (os.cpu_count() or 1),
+        num_branches=solver.NumBranches(),
+        num_conflicts=solver.NumConflicts(),
+    )
+
+
+def _termination_reason(status: int, stats: SolveStats, options: SolveOptions) -> str:
+    """
+    CP-SAT reports OPTIMAL both for a proven optimum and for a stop on a gap
+    limit, so the two are told apart by the remaining gap.
+    """
+    if status == cp_model.INFEASIBLE:
+        return TERMINATION_INFEASIBLE
+    if status == cp_model.MODEL_INVALID:
+        return TERMINATION_MODEL_INVALID
+    if status == cp_model.UNKNOWN or stats.objective_value is None:
+        return TERMINATION_TIME_LIMIT
+
+    absolute_gap = abs(stats.objective_value - stats.best_objective_bound)
+    if absolute_gap < 1e-9:
+        return TERMINATION_OPTIMAL
+    if (options.relative_gap_limit is not None and stats.relative_gap <= options.relative_gap_limit) or \
+       (options.absolute_gap_limit is not None and absolute_gap <= options.absolute_gap_limit):
+        return TERMINATION_GAP_LIMIT
+    if status == cp_model.OPTIMAL:
+        # Stopped by CP-SAT's default absolute gap (1e-4); effectively optimal
+        return TERMINATION_OPTIMAL
+    return TERMINATION_TIME_LIMIT
+
+
+def build_payment_model(portfolio: DebtPortfolio, formulation: Optional[str] = None) -> Optional[PlanModel]:
+    """
+    Builds the CP-SAT model (variables, constraints and the strategy's
+    objective) for a portfolio without solving it, in `formulation`
+    (default: the portfolio's solve options).
+    Returns:
+        The PlanModel, or None if every balance is already zero.
+    Raises:
+        ValueError / NotImplementedError for strategies the portfolio can't use.
+    """
     # 1. Create the main model object.
     model = cp_model.CpModel()
-    print("Model canvas created. Ready to define variables.")
+    linear = (formulation or portfolio.solve_options.formulation) == FORMULATION_LINEAR
+    print(f"Model canvas created ({'linear' if linear else 'division'} formulation). Ready to define variables.")
 
     # 2. Define the time horizon for the plan.
     max_months: int = 120 # 10 years
@@ -263,7 +1044,7 @@ def generate_payment_plan(portfolio: DebtPortfolio) -> Optional[List[MonthlyResu
     max_possible_cents = sum(acc.current_balance_cents for acc in portfolio.accounts)
     if max_possible_cents == 0:
         print("All accounts have a zero balance. Nothing to plan.")
-        return []
+        return None
     
     # Add a buffer for interest calculations. This domain is larger than the
     # original sum to safely accommodate accrued interest over time.
@@ -424,14 +1205,21 @@ def generate_payment_plan(portfolio: DebtPortfolio) -> Optional[List[MonthlyResu
                 current_month_date = portfolio.plan_start_date + relativedelta(months=month)
                 apr_bps_for_month = account.get_effective_apr_bps(current_month_date) if account.buckets else account.apr_standard_bps
             
-                # Use the pre-calculated, absolute max domain for numerators
-                numerator_var = model.NewIntVar(0, max_numerator_domain, f'num_{key}')
-                
-                # (IntVar == IntVar * constant)
-                model.Add(numerator_var == previous_balance_var * apr_bps_for_month)
-                
-                # This division runs unconditionally.
-                model.AddDivisionEquality(interest_charged[key], numerator_var, 120000)
+                if linear:
+                    # interest = floor(balance * apr / 120000) as two inequalities:
+                    # 120000 * interest <= balance * apr <= 120000 * interest + 119999
+                    numerator = previous_balance_var * apr_bps_for_month
+                    model.Add(120000 * interest_charged[key] <= numerator)
+                    model.Add(numerator <= 120000 * interest_charged[key] + 119999)
+                else:
+                    # Use the pre-calculated, absolute max domain for numerators
+                    numerator_var = model.NewIntVar(0, max_numerator_domain, f'num_{key}')
+
+                    # (IntVar == IntVar * constant)
+                    model.Add(numerator_var == previous_balance_var * apr_bps_for_month)
+
+                    # This division runs unconditionally.
+                    model.AddDivisionEquality(interest_charged[key], numerator_var, 120000)
 
             # This constraint handles the case where the account is inactive.
             # It is now OUTSIDE the if/else block, as it applies to both cases.
@@ -455,7 +1243,13 @@ def generate_payment_plan(portfolio: DebtPortfolio) -> Optional[List[MonthlyResu
                 model.Add(base_for_percentage == previous_balance_var)
 
             # 3. Calculate the percentage component: (base * bps / 10000)
-            if account.min_payment_rule.percentage_bps > 0:
+            if account.min_payment_rule.percentage_bps > 0 and linear:
+                # Floor division as bounded inequalities, as for interest
+                perc_numerator = base_for_percentage * account.min_payment_rule.percentage_bps
+                model.Add(10000 * percentage_component_var <= perc_numerator)
+                model.Add(perc_numerator <= 10000 * percentage_component_var + 9999)
+
+            elif account.min_payment_rule.percentage_bps > 0:
               
                 perc_numerator_var = model.NewIntVar(0, max_numerator_domain, f'perc_num_{key}')
                 
@@ -472,7 +1266,28 @@ def generate_payment_plan(portfolio: DebtPortfolio) -> Optional[List[MonthlyResu
             else:
             
                 model.Add(percentage_component_var == 0)
-            
+
+            if linear and account.min_payment_rule.percentage_bps <= 10000:
+                # 4-7 without the max/min constraints. The percentage is of at
+                # most the amount owed, so it never exceeds it, and
+                #   min(max(fixed, percentage), owed) = max(min(fixed, owed), percentage)
+                # payment >= that maximum is payment >= each term. For
+                # min(fixed, owed): pays_fixed lets payment >= fixed, otherwise
+                # payment == owed. Either way payment >= min(fixed, owed), and
+                # owed < fixed leaves only paying it off, so the solver
+                # can't use the choice to pay less than the minimum.
+                total_owed = previous_balance_var + interest_charged[key]
+                model.Add(payments[key] <= total_owed)
+                model.Add(payments[key] >= percentage_component_var)
+                if fixed_component > 0:
+                    pays_fixed = model.NewBoolVar(f'pays_fixed_min_{key}')
+                    model.Add(payments[key] >= fixed_component).OnlyEnforceIf(pays_fixed)
+                    model.Add(payments[key] >= total_owed).OnlyEnforceIf(pays_fixed.Not())
+
+                # 5.2.d. Balance Update
+                model.Add(balances[key] == previous_balance_var + interest_charged[key] - payments[key])
+                continue
+
             # 4. Calculate the 'raw' minimum: max(fixed, percentage)
             raw_minimum_payment_var = model.NewIntVar(0, domain_max_raw_min_pay, f'raw_min_pay_{key}')
             model.AddMaxEquality(
@@ -581,6 +1396,8 @@ def generate_payment_plan(portfolio: DebtPortfolio) -> Optional[List[MonthlyResu
     # --- 6. Define the Optimization Objective ---
     
     strategy = portfolio.preferences.strategy
+    # Lexicographic order of the terms for strategies with a tie-breaker
+    objective_terms: List[cp_model.LinearExpr] = []
     
     # This is the base objective component for all strategies (except MINIMIZE_MONTHLY_SPEND).
     all_interest_variables: List[cp_model.IntVar] = list(interest_charged.values())
@@ -598,6 +1415,7 @@ def generate_payment_plan(portfolio: DebtPortfolio) -> Optional[List[MonthlyResu
         # Interest might be $500 = 50,000 cents. Weight 100x = 5,000,000.
         # This ensures interest is primary but balances provide tie-breaking
         model.Minimize(total_interest_cost * 100 + total_balances_over_time)
+        objective_terms = [total_interest_cost, total_balances_over_time]
         print(f"Objective set to: {strategy.value} (minimize interest + minimize time with debt)")
     
     elif strategy == OptimizationStrategy.TARGET_MAX_BUDGET:
@@ -610,6 +1428,7 @@ def generate_payment_plan(portfolio: DebtPortfolio) -> Optional[List[MonthlyResu
         # Weight balances much higher since the goal is to pay off ASAP
         # Balances in cents, interest in cents - balance weight 10x interest weight
         model.Minimize(total_balances_over_time * 10 + total_interest_cost)
+        objective_terms = [total_balances_over_time, total_interest_cost]
         print(f"Objective set to: {strategy.value} (minimize time with debt, then interest)")
     
     elif strategy == OptimizationStrategy.PAY_OFF_IN_PROMO:
@@ -689,143 +1508,130 @@ def generate_payment_plan(portfolio: DebtPortfolio) -> Optional[List[MonthlyResu
         # Fallback in case a strategy is not implemented
         raise NotImplementedError(f"Strategy '{strategy.value}' is not yet implemented in the solver.")
 
-    # --- 7. Solve the Model and Process Results ---
-    print("\n--- Solving the Model ---")
-    
-    # Add model validation for better error logging
-    try:
-        validation_error = model.Validate()
-        if validation_error:
-            print(f"!!! Model Validation Error: {validation_error}", file=sys.stderr)
-            # You could optionally print the full model proto for deep debugging:
-            # 
-            print(model.Proto(), file=sys.stderr)
-    except Exception as e:
-        print(f"!!! An exception occurred during model.Validate(): {e}", file=sys.stderr)
-        
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 60.0
-    status = solver.Solve(model)
-    
-    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        print(f"\n✅ Solution Found! Status: {solver.StatusName(status)}")
-        
-        # a. Create an empty list for results.
-        results_list: List[MonthlyResult] = []
-       
+    return PlanModel(
+        model=model,
+        max_months=max_months,
+        payments=payments,
+        balances=balances,
+        interest_charged=interest_charged,
+        max_balance_cents=max_possible_balance,
+        objective_terms=objective_terms,
+    )
+
+
+def _extract_plan(solver, plan_model: PlanModel, portfolio: DebtPortfolio, log: bool = True) -> List[MonthlyResult]:
+    """
+    Reads the month-by-month plan out of a solved model. `solver` is a
+    CpSolver, or a solution callback during the search.
+    """
+    max_months = plan_model.max_months
+    payments = plan_model.payments
+    balances = plan_model.balances
+    interest_charged = plan_model.interest_charged
+
+    # a. Create an empty list for results.
+    results_list: List[MonthlyResult] = []
+   
  
-        # b/c. Populate the results list from the solver's solution.
-        for month in range(max_months):
-            # Optimization: if all balances are zero, we can stop.
-            total_balance_at_month_start = 0
-            for account in portfolio.accounts:
-                if month == 0:
-  
-                  total_balance_at_month_start += account.current_balance_cents
-                else:
-                     total_balance_at_month_start += solver.Value(balances[(account.lender_name, month - 1)])
-            
-            if total_balance_at_month_start <= 0:
-           
+    # b/c. Populate the results list from the solver's solution.
+    for month in range(max_months):
+        # Optimization: if all balances are zero, we can stop.
+        total_balance_at_month_start = 0
+        for account in portfolio.accounts:
+            if month == 0:
+                total_balance_at_month_start += account.current_balance_cents
+            else:
+                total_balance_at_month_start += solver.Value(balances[(account.lender_name, month - 1)])
+        
+        if total_balance_at_month_start <= 0:
+            if log:
                 print(f"All balances at zero or below. Stopping at month {month + 1}.")
-                break
+            break
 
-            for account in portfolio.accounts:
-                key = (account.lender_name, month)
-                
-                # DEBUG: Check for minimum payment violations
-                prev_bal_key = (account.lender_name, month - 1) if month > 0 else None
-                prev_balance = solver.Value(balances[prev_bal_key]) if prev_bal_key else account.current_balance_cents
-                payment = int(solver.Value(payments[key]))
-                
-                if prev_balance > 0 and payment == 0:
-                    print(f"⚠️  WARNING: {account.lender_name} month {month+1} has prev_balance=${prev_balance/100:.2f} but payment=$0.00!")
-                
-                result = MonthlyResult(
-                    month=month + 1,
+        for account in portfolio.accounts:
+            key = (account.lender_name, month)
+            
+            # DEBUG: Check for minimum payment violations
+            prev_bal_key = (account.lender_name, month - 1) if month > 0 else None
+            prev_balance = solver.Value(balances[prev_bal_key]) if prev_bal_key else account.current_balance_cents
+            payment = int(solver.Value(payments[key]))
+            
+            if log and prev_balance > 0 and payment == 0:
+                print(f"⚠️  WARNING: {account.lender_name} month {month+1} has prev_balance=${prev_balance/100:.2f} but payment=$0.00!")
+            
+            result = MonthlyResult(
+                month=month + 1,
+ 
+                lender_name=account.lender_name,
+                payment_cents=payment,
+                interest_charged_cents=int(solver.Value(interest_charged[key])),
+                ending_balance_cents=int(solver.Value(balances[key])),
+            )
      
-                    lender_name=account.lender_name,
-                    payment_cents=payment,
-                    interest_charged_cents=int(solver.Value(interest_charged[key])),
-                    ending_balance_cents=int(solver.Value(balances[key])),
-                )
-         
-       
-                # Only append if there's activity. This cleans up the final log.
-                is_active_last_month = (month > 0 and solver.Value(balances[(account.lender_name, month - 1)]) > 0)
-                if result.payment_cents > 0 or result.ending_balance_cents > 0 or result.interest_charged_cents > 0 or is_active_last_month:
-          
-                    results_list.append(result)
-        
-        # d. Process the results_list to print summaries.
-        print("\n--- Plan Summary ---")
-        
-        # i. Total interest for the entire plan..
-        total_interest = sum(r.interest_charged_cents for r in results_list)
-        print(f"Minimized Total Interest Paid: ${total_interest / 100.0:,.2f}")
-        
-        # ii. Total interest per account.
-        print("\nInterest Breakdown by Account:")
-        interest_by_account: Dict[str, int] = {acc.lender_name: 0 for acc in portfolio.accounts}
-        for res in results_list:
-            interest_by_account[res.lender_name] += res.interest_charged_cents
-        for name, total_cents in interest_by_account.items():
-             print(f"  - {name}: ${total_cents / 100.0:,.2f}")
-             
-       
-        # iii. Total interest per year.
-        print("\nInterest Breakdown by Year:")
-        interest_by_year: Dict[int, int] = {}
-        for res in results_list:
-            year = (res.month - 1) // 12 + 1
-            interest_by_year[year] = interest_by_year.get(year, 0) + res.interest_charged_cents
-        for year, total_cents in sorted(interest_by_year.items()):
-            print(f"  - Year {year}: ${total_cents / 100.0:,.2f}")
-        
-        # e. Print the detailed month-by-month plan.
-        print("\n--- Optimized Payment Plan Details ---")
-        last_month_printed = -1
-        
-        payoff_month = 0
-        if results_list:
-            # The payoff month is the highest month number in the results list,
-            # because the loop breaks when all balances hit zero.
-            payoff_month = max(r.month for r in results_list)
-
-        for res in results_list:
-            # Only print rows where a payment was made
-            if res.payment_cents > 0:
-                if res.month != last_month_printed:
-                    print(f'\n--- Month {res.month} ---')
+   
+            # Only append if there's activity. This cleans up the final log.
+            is_active_last_month = (month > 0 and solver.Value(balances[(account.lender_name, month - 1)]) > 0)
+            if result.payment_cents > 0 or result.ending_balance_cents > 0 or result.interest_charged_cents > 0 or is_active_last_month:
       
-                    last_month_printed = res.month
-                
-                payment_str = f"${res.payment_cents / 100.0:,.2f}"
-                interest_str = f"${res.interest_charged_cents / 100.0:,.2f}"
-                balance_str = f"${res.ending_balance_cents / 100.0:,.2f}"
-        
-                print(f"  - {res.lender_name}: Pay {payment_str} "
-                      f"(Interest: {interest_str}, New Balance: {balance_str})")
+                results_list.append(result)
 
-        print(f"\n🎉 All accounts paid off in {payoff_month} months!")
+    return results_list
 
-        return results_list
 
-    else:
-        # Handle cases where no- solution is found.
-        print(f"\n❌ Solution Not Found. Status: {solver.StatusName(status)}")
-        if status == cp_model.INFEASIBLE:
-            print("Model is INFEASIBLE. This often means the monthly budget is less than the")
-            print("sum of the minimum payments, or the payoff constraint could not be met.")
-        elif status == cp_model.MODEL_INVALID:
-            print("Model is INVALID. This is a critical error in the solver's constraint logic.")
- 
-            print("The most recent change (e.g., complex minimum payments) likely introduced")
-            print("a contradictory or malformed rule (e.g., type ambiguity, circular dependency).")
-            print("Please review the `model.Validate()` output above.")
-        else:
-            print(f"The solver stopped for an unknown reason: {solver.StatusName(status)}")
-        return None
+def _print_plan_summary(results_list: List[MonthlyResult], portfolio: DebtPortfolio) -> None:
+    """Logs interest totals and the month-by-month plan."""
+    # d. Process the results_list to print summaries.
+    print("\n--- Plan Summary ---")
+    
+    # i. Total interest for the entire plan..
+    total_interest = sum(r.interest_charged_cents for r in results_list)
+    print(f"Minimized Total Interest Paid: ${total_interest / 100.0:,.2f}")
+    
+    # ii. Total interest per account.
+    print("\nInterest Breakdown by Account:")
+    interest_by_account: Dict[str, int] = {acc.lender_name: 0 for acc in portfolio.accounts}
+    for res in results_list:
+        interest_by_account[res.lender_name] += res.interest_charged_cents
+    for name, total_cents in interest_by_account.items():
+         print(f"  - {name}: ${total_cents / 100.0:,.2f}")
+         
+   
+    # iii. Total interest per year.
+    print("\nInterest Breakdown by Year:")
+    interest_by_year: Dict[int, int] = {}
+    for res in results_list:
+        year = (res.month - 1) // 12 + 1
+        interest_by_year[year] = interest_by_year.get(year, 0) + res.interest_charged_cents
+    for year, total_cents in sorted(interest_by_year.items()):
+        print(f"  - Year {year}: ${total_cents / 100.0:,.2f}")
+    
+    # e. Print the detailed month-by-month plan.
+    print("\n--- Optimized Payment Plan Details ---")
+    last_month_printed = -1
+    
+    payoff_month = 0
+    if results_list:
+        # The payoff month is the highest month number in the results list,
+        # because the loop breaks when all balances hit zero.
+        payoff_month = max(r.month for r in results_list)
+
+    for res in results_list:
+        # Only print rows where a payment was made
+        if res.payment_cents > 0:
+            if res.month != last_month_printed:
+                print(f'\n--- Month {res.month} ---')
+  
+                last_month_printed = res.month
+            
+            payment_str = f"${res.payment_cents / 100.0:,.2f}"
+            interest_str = f"${res.interest_charged_cents / 100.0:,.2f}"
+            balance_str = f"${res.ending_balance_cents / 100.0:,.2f}"
+    
+            print(f"  - {res.lender_name}: Pay {payment_str} "
+                  f"(Interest: {interest_str}, New Balance: {balance_str})")
+
+    print(f"\n🎉 All accounts paid off in {payoff_month} months!")
+
 
 # --- VALIDATION TEST: MINIMIZE SPEND TO CLEAR PROMOS ---
 if __name__ == "__main__":
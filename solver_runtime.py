@@ -0,0 +1,317 @@
+# solver_runtime.py - Where plan solves run
+# Admission control, priority queueing and single-flight coalescing for solver capacity
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import schemas
+from solver_engine import SolveHandle
+
+
+# Solves running at once (each CP-SAT solve also uses several search threads)
+SOLVER_MAX_CONCURRENT_SOLVES = int(os.environ.get("SOLVER_MAX_CONCURRENT_SOLVES", "2"))
+
+# Solves waiting for a slot; beyond this, requests are turned away with 503
+SOLVER_MAX_QUEUE = int(os.environ.get("SOLVER_MAX_QUEUE", "8"))
+
+# Background requests are turned away (429) once this many solves are queued,
+# keeping the rest of the queue for interactive requests
+SOLVER_BACKGROUND_QUEUE_LIMIT = int(os.environ.get("SOLVER_BACKGROUND_QUEUE_LIMIT", str(SOLVER_MAX_QUEUE // 2)))
+
+# Solve time assumed for Retry-After until real solves have been timed
+SOLVER_EXPECTED_SOLVE_SECONDS = 10.0
+
+# Lower runs first
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+PRIORITIES = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 1}
+
+# Queue waits kept for the percentiles in stats()
+_WAIT_SAMPLES = 500
+_SOLVE_TIME_SMOOTHING = 0.2
+
+
+class _Flight:
+    """One queued or running solve and the callers waiting on it"""
+    __slots__ = ("solve", "ticket", "handle", "callers", "started", "abandoned")
+
+    def __init__(self, ticket: Optional[asyncio.Future], handle: Optional[SolveHandle]):
+        self.solve: Optional[asyncio.Future] = None
+        self.ticket = ticket
+        self.handle = handle
+        self.callers = 1
+        self.started = False
+        self.abandoned = False
+
+
+class SolverSaturatedError(RuntimeError):
+    """No capacity to accept the solve; retry after retry_after seconds"""
+
+    def __init__(self, status_code: int, retry_after: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def portfolio_key(portfolio: schemas.DebtPortfolio) -> str:
+    """
+    Canonical hash of a validated portfolio: the same accounts, budget,
+    preferences and start date give the same key however the JSON was written
+    (key order, 2500 vs 2500.0, omitted defaults).
+    """
+    canonical = json.dumps(portfolio.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class SolverRuntime:
+    """
+    Runs blocking solves off the event loop under admission control.
+
+    - At most max_concurrent solves run at once; the rest wait in a priority
+      queue (interactive before background, FIFO within a priority).
+    - A request that would overfill the queue is rejected immediately with
+      SolverSaturatedError: 503 when the queue is full, 429 for background
+      requests once background_queue_limit solves are queued. Both carry a
+      Retry-After estimate from recent solve times.
+    - Single flight: while a solve for a key is queued or running, later
+      callers with the same key join it (taking no extra capacity) and get its
+      result or exception. An interactive caller joining a queued background
+      solve moves it up to interactive priority.
+    - Abandoned solves stop: once every caller waiting on a solve is
+      cancelled (client disconnected), a queued solve gives up its place and
+      a running one is stopped through its SolveHandle, freeing the worker.
+
+    All state is touched from the event loop only.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = SOLVER_MAX_CONCURRENT_SOLVES,
+        max_queue: int = SOLVER_MAX_QUEUE,
+        background_queue_limit: int = SOLVER_BACKGROUND_QUEUE_LIMIT
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.background_queue_limit = min(self.max_queue, max(0, background_queue_limit))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="solver")
+
+        self._running = 0
+        self._queued = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._enqueued_at: Dict[asyncio.Future, float] = {}
+        self._sequence = itertools.count()
+        self._inflight: Dict[str, _Flight] = {}
+
+        self.solves_started = 0
+        self.coalesced = 0
+        self.rejected_busy = 0
+        self.rejected_full = 0
+        self.cancelled_queued = 0
+        self.cancelled_running = 0
+        self.reclaimed_cpu_seconds = 0.0
+        self._avg_solve_seconds: Optional[float] = None
+        self._queue_waits_ms: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+    # ---------- Public API ----------
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: str = PRIORITY_INTERACTIVE,
+        handle: Optional[SolveHandle] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Run fn(*args) for key once capacity allows, or join the identical
+        solve already queued or running. `handle` is the SolveHandle fn was
+        given, used to stop the search if every caller goes away.
+
+        Returns:
+            (result, True if this caller joined an existing solve)
+        Raises:
+            SolverSaturatedError if the request can't be queued
+        """
+        rank = PRIORITIES[priority]
+        flight = self._inflight.get(key)
+        if flight is not None:
+            flight.callers += 1
+            self.coalesced += 1
+            if flight.ticket is not None and not flight.ticket.done():
+                # Re-queue at the joiner's priority; the stale entry is skipped
+                heapq.heappush(self._waiters, (rank, next(self._sequence), flight.ticket))
+            print(f"[Solver] Joined in-flight solve {key[:12]}")
+            return await self._wait(key, flight), True
+
+        flight = _Flight(self._admit(rank), handle)
+        flight.solve = asyncio.ensure_future(self._solve(fn, args, flight))
+        self._inflight[key] = flight
+        flight.solve.add_done_callback(lambda done: self._finished(key, done))
+        return await self._wait(key, flight), False
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._queue_waits_ms)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": self._running,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "in_flight": len(self._inflight),
+            "background_queue_limit": self.background_queue_limit,
+            "solves_started": self.solves_started,
+            "coalesced_requests": self.coalesced,
+            "rejected_busy": self.rejected_busy,
+            "rejected_full": self.rejected_full,
+            "cancelled_solves": self.cancelled_queued + self.cancelled_running,
+            "cancelled_while_queued": self.cancelled_queued,
+            "cancelled_while_running": self.cancelled_running,
+            "reclaimed_cpu_seconds": round(self.reclaimed_cpu_seconds, 2),
+            "queue_wait_ms": {
+                "p50": round(_percentile(waits, 50), 1),
+                "p95": round(_percentile(waits, 95), 1),
+                "max": round(waits[-1], 1) if waits else 0.0,
+            },
+            "avg_solve_seconds": round(self._avg_solve_seconds, 3) if self._avg_solve_seconds else None,
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until a queued request would likely start, for Retry-After"""
+        per_solve = self._avg_solve_seconds or SOLVER_EXPECTED_SOLVE_SECONDS
+        return max(1, math.ceil(per_solve * (self._queued / self.max_concurrent + 1)))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- Scheduling ----------
+
+    def _admit(self, rank: int) -> Optional[asyncio.Future]:
+        """
+        Take a slot now (None) or a queue ticket resolved when one frees up.
+        Synchronous, so a burst can't overshoot the queue bound.
+        """
+        if self._running < self.max_concurrent and self._queued == 0:
+            self._running += 1
+            return None
+        if self._queued >= self.max_queue:
+            self.rejected_full += 1
+            raise SolverSaturatedError(503, self.retry_after(), "Solver queue is full, try again shortly")
+        if rank > 0 and self._queued >= self.background_queue_limit:
+            self.rejected_busy += 1
+            raise SolverSaturatedError(429, self.retry_after(), "Solver is busy with interactive requests, retry later")
+
+        ticket = asyncio.get_running_loop().create_future()
+        self._enqueued_at[ticket] = time.monotonic()
+        self._queued += 1
+        heapq.heappush(self._waiters, (rank, next(self._sequence), ticket))
+        return ticket
+
+    def _release(self) -> None:
+        """Hand the finished solve's slot to the next waiter, or free it"""
+        while self._waiters:
+            _, _, ticket = heapq.heappop(self._waiters)
+            if ticket.done():
+                continue
+            self._queued -= 1
+            self._queue_waits_ms.append((time.monotonic() - self._enqueued_at.pop(ticket)) * 1000)
+            ticket.set_result(None)
+            return
+        self._running -= 1
+
+    async def _wait(self, key: str, flight: _Flight) -> Any:
+        """Await the shared solve; the last caller to leave abandons it"""
+        try:
+            return await asyncio.shield(flight.solve)
+        except asyncio.CancelledError:
+            flight.callers -= 1
+            if flight.callers == 0 and not flight.solve.done():
+                self._abandon(key, flight)
+            raise
+
+    def _abandon(self, key: str, flight: _Flight) -> None:
+        """No one is waiting for this solve any more: drop or stop it"""
+        flight.abandoned = True
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]  # Later callers start a fresh solve
+        if not flight.started:
+            self.cancelled_queued += 1
+            if flight.ticket is not None and not flight.ticket.done():
+                flight.ticket.cancel()
+            print(f"[Solver] Dropped queued solve {key[:12]}: no callers left")
+        elif flight.handle is not None:
+            self.cancelled_running += 1
+            reclaimed = flight.handle.cancel()
+            self.reclaimed_cpu_seconds += reclaimed
+            print(f"[Solver] Stopped solve {key[:12]}: no callers left (~{reclaimed:.1f} CPU s reclaimed)")
+
+    async def _solve(self, fn: Callable[..., Any], args: Tuple[Any, ...], flight: _Flight) -> Any:
+        ticket = flight.ticket
+        if ticket is None:
+            self._queue_waits_ms.append(0.0)
+        else:
+            try:
+                await ticket
+            except asyncio.CancelledError:
+                if ticket.cancelled():
+                    self._queued -= 1
+                    self._enqueued_at.pop(ticket, None)
+                else:
+                    self._release()  # The slot was handed over just as we were cancelled
+                raise
+        if flight.abandoned:
+            # Abandoned between getting the slot and starting
+            self._release()
+            raise asyncio.CancelledError()
+
+        flight.started = True
+        self.solves_started += 1
+        started = time.monotonic()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            elapsed = time.monotonic() - started
+            if not flight.abandoned:  # A stopped search says nothing about solve times
+                self._avg_solve_seconds = elapsed if self._avg_solve_seconds is None else (
+                    (1 - _SOLVE_TIME_SMOOTHING) * self._avg_solve_seconds + _SOLVE_TIME_SMOOTHING * elapsed
+                )
+            self._release()
+
+    def _finished(self, key: str, solve: asyncio.Future) -> None:
+        flight = self._inflight.get(key)
+        if flight is not None and flight.solve is solve:
+            del self._inflight[key]
+        if not solve.cancelled():
+            solve.exception()  # Mark retrieved even if every caller went away
+
+
+# ============== Shared Runtime ==============
+
+_shared_runtime: Optional[SolverRuntime] = None
+
+
+def get_solver_runtime() -> SolverRuntime:
+    global _shared_runtime
+    if _shared_runtime is None:
+        _shared_runtime = SolverRuntime()
+    return _shared_runtime
+
+
+def close_solver_runtime() -> None:
+    global _shared_runtime
+    if _shared_runtime is not None:
+        _shared_runtime.close()
+        _shared_runtime = None
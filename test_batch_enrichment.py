@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test multi-user batch enrichment: users share the worker pool fairly and
+results stream back as each user finishes.
+"""
+
+import asyncio
+import threading
+import time
+
+import enrichment_service
+from budget_store import BudgetAggregateStore
+from enrichment_service import EnrichmentService, enrich_and_analyze_budgets
+from local_store import IN_MEMORY
+from merchant_cache import MerchantCache
+
+CALL_SECONDS = 0.02
+
+
+class RecordingTransactions:
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(CALL_SECONDS)
+        with self.lock:
+            self.in_flight -= 1
+            self.calls.append(kwargs["account_holder_id"])
+
+        class Result:
+            def model_dump(self):
+                return {"labels": ["shopping"], "merchant": {"name": "Shop"}, "recurrence": {}}
+        return Result()
+
+
+class RecordingSDK:
+    def __init__(self):
+        self.transactions = RecordingTransactions()
+
+
+def transactions(prefix, count):
+    return [
+        {"transaction_id": f"{prefix}_{i}", "description": f"SHOP {chr(97 + i % 26)}{chr(97 + i // 26)}",
+         "amount": -5, "transaction_type": "DEBIT", "timestamp": "2025-03-01T00:00:00Z"}
+        for i in range(count)
+    ]
+
+
+def run_batch(service, users, **kwargs):
+    async def run():
+        return [item async for item in enrich_and_analyze_budgets(users, service=service, **kwargs)]
+    return asyncio.run(run())
+
+
+def test_small_users_are_not_starved():
+    previous = enrichment_service.NTROPY_AVAILABLE
+    enrichment_service.NTROPY_AVAILABLE = True
+    try:
+        service = EnrichmentService(max_concurrency=2, merchant_cache=MerchantCache(capacity=0),
+                                    budget_store=BudgetAggregateStore(IN_MEMORY))
+        service.sdk = RecordingSDK()
+        users = [
+            {"user_id": "big", "transactions": transactions("big", 40)},
+            {"user_id": "small", "transactions": transactions("small", 4)},
+        ]
+
+        finished = run_batch(service, users)
+        service.close()
+
+        order = [user_id for user_id, _ in finished]
+        print(f"  finish order {order}")
+        assert order == ["small", "big"], "the small user must not wait behind the big one"
+        assert finished[1][1]["budget_analysis"]["transactionCount"] == 40
+
+        # Both users' calls are interleaved while both are active
+        calls = service.sdk.transactions.calls
+        small_id = service._hash_user_id("small")
+        last_small_call = max(i for i, holder in enumerate(calls) if holder == small_id)
+        assert last_small_call < 12, last_small_call
+
+        # The pool stayed busy: both workers were calling at once, and every call was made once
+        assert service.sdk.transactions.max_in_flight == 2
+        assert len(calls) == 44
+    finally:
+        enrichment_service.NTROPY_AVAILABLE = previous
+
+
+def test_failed_user_does_not_stop_the_batch():
+    service = EnrichmentService(budget_store=BudgetAggregateStore(IN_MEMORY))
+    users = [
+        {"user_id": "ok", "transactions": transactions("ok", 3)},
+        {"user_id": "broken", "transactions": [{"transaction_id": "x", "amount": "not a number"}]},
+    ]
+    results = dict(run_batch(service, users))
+    assert results["ok"]["budget_analysis"]["transactionCount"] == 3
+    assert isinstance(results["broken"], Exception)
+
+
+if __name__ == "__main__":
+    test_small_users_are_not_starved()
+    test_failed_user_does_not_stop_the_batch()
+    print("✅ Batch enrichment shares the pool fairly")
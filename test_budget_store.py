@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Test the persistent per-user budget aggregates (budget_store.py): resent
+transactions replace their earlier contribution, pending rows are retracted
+by their booked copies across syncs, and averages cover the days with data.
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+from datetime import date
+
+import budget_store
+from budget_store import BudgetAggregateStore
+from enrichment_service import EnrichmentService, enrich_and_analyze_budget
+from local_store import IN_MEMORY, STATE_DIR_ENV
+
+
+def record(tx_id, date, cents, entry_type="outgoing", category="discretionary", description="", **fields):
+    return {"transaction_id": tx_id, "transaction_date": date, "amount_cents": cents,
+            "entry_type": entry_type, "budget_category": category, "original_description": description, **fields}
+
+
+HISTORY = [
+    record("s1", "2025-01-28", 300000, "incoming", "income"),
+    record("s2", "2025-02-28", 300000, "incoming", "income"),
+    record("s3", "2025-03-28", 330000, "incoming", "income"),
+    record("r1", "2025-01-01", 90000, category="fixed"),
+    record("r2", "2025-02-01", 90000, category="fixed"),
+    record("r3", "2025-03-01", 90000, category="fixed"),
+    record("k1", "2025-03-05", 5000, category="debt"),
+    record("d1", "2025-02-14", 4500),
+    record("d2", "2025-03-14", 7500),
+]
+
+
+def test_breakdown_uses_actual_span():
+    store = BudgetAggregateStore(IN_MEMORY)
+    assert store.add_transactions("u1", HISTORY) == len(HISTORY)
+
+    full = store.breakdown("u1", months=12)
+    print(f"  12-month window: {full}")
+    # 1 January to the end of March, not 12 months
+    assert (full["daysAnalyzed"], full["monthsAnalyzed"]) == (90, 3)
+    assert full["averageMonthlyIncomeCents"] == 310000
+    assert full["fixedCostsCents"] == 90000
+    assert full["discretionaryCents"] == 4000
+    assert full["debtPaymentsCents"] == round(5000 / 3)
+    assert full["transactionCount"] == len(HISTORY)
+
+    last = store.breakdown("u1", months=1)
+    assert (last["fromMonth"], last["toMonth"], last["monthsAnalyzed"]) == ("2025-03", "2025-03", 1)
+    assert last["averageMonthlyIncomeCents"] == 330000
+    assert last["safeToSpendCents"] == 330000 - 90000 - 5000
+
+    february = store.breakdown("u1", months=1, end_month="2025-02")
+    assert february["discretionaryCents"] == 4500
+
+
+def test_partial_edge_months_count_by_their_days():
+    store = BudgetAggregateStore(IN_MEMORY)
+    # History from 20 March, synced on 5 April: two calendar months, 17 days
+    store.add_transactions("u1", [record("a", "2025-03-20", 60000), record("b", "2025-04-05", 30000)])
+    short = store.breakdown("u1", months=3, as_of=date(2025, 4, 5))
+    assert (short["daysAnalyzed"], short["monthsAnalyzed"], short["discretionaryCents"]) == (17, 1, 90000)
+
+    # Once April is over it counts in full; the first month is still 12 of 31 days
+    assert store.breakdown("u1", months=3)["monthsAnalyzed"] == round(12 / 31 + 1, 2)
+
+    # Synced on 19 June
+    store.add_transactions("u1", [record("c", "2025-06-19", 90000)])
+    longer = store.breakdown("u1", months=12, as_of=date(2025, 6, 19))
+    covered = round(12 / 31 + 1 + 1 + 19 / 30, 2)
+    assert (longer["daysAnalyzed"], longer["monthsAnalyzed"]) == (92, covered)
+    assert longer["discretionaryCents"] == round(180000 / covered)
+    print(f"✓ 17 days average over 1 month, 92 days over {longer['monthsAnalyzed']}")
+
+
+def test_incremental_updates_are_idempotent():
+    store = BudgetAggregateStore(IN_MEMORY)
+    store.add_transactions("u1", HISTORY[:5])
+    # A later sync resends overlapping history plus new rows
+    assert store.add_transactions("u1", HISTORY) == len(HISTORY) - 5
+    assert store.add_transactions("u1", HISTORY) == 0
+    assert store.breakdown("u1")["transactionCount"] == len(HISTORY)
+
+    # Users are independent; rows without a date can't be placed in a month
+    assert store.add_transactions("u2", HISTORY[:1] + [record("x", "", 100)]) == 1
+    assert store.breakdown("u2")["transactionCount"] == 1
+    assert store.breakdown("nobody")["monthsAnalyzed"] == 0
+
+
+def test_aggregates_persist_in_state_dir():
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = os.environ.get(STATE_DIR_ENV)
+        os.environ[STATE_DIR_ENV] = tmp
+        try:
+            store = BudgetAggregateStore()
+            store.add_transactions("u1", HISTORY)
+            store.close()
+            reopened = BudgetAggregateStore()
+            assert reopened.breakdown("u1", months=12)["transactionCount"] == len(HISTORY)
+            reopened.close()
+        finally:
+            if previous is None:
+                del os.environ[STATE_DIR_ENV]
+            else:
+                os.environ[STATE_DIR_ENV] = previous
+
+
+def test_resent_rows_replace_their_contribution():
+    store = BudgetAggregateStore(IN_MEMORY)
+    # Deadline ran out: classified locally as discretionary
+    store.add_transactions("u1", [record("bill", "2025-03-01", 9000, needs_reenrichment=True),
+                                  record("pay", "2025-03-28", 300000, "incoming", "income")])
+    assert store.breakdown("u1")["discretionaryCents"] == 9000
+
+    # The background re-enrichment moves it to fixed costs
+    assert store.add_transactions("u1", [record("bill", "2025-03-01", 9000, category="fixed")]) == 1
+    corrected = store.breakdown("u1")
+    assert (corrected["discretionaryCents"], corrected["fixedCostsCents"], corrected["transactionCount"]) == (0, 9000, 2)
+
+    # A later deadline fallback never overwrites the provider's classification
+    assert store.add_transactions("u1", [record("bill", "2025-03-01", 9000, needs_reenrichment=True)]) == 0
+    assert store.breakdown("u1")["fixedCostsCents"] == 9000
+
+    # A row that moves month leaves no empty month behind
+    store.add_transactions("u1", [record("bill", "2025-02-27", 9000, category="fixed")])
+    assert [row["month"] for row in store.monthly_totals("u1") if row["budget_category"] == "fixed"] == ["2025-02"]
+    print("✓ re-enriched rows corrected, fallback never overwrites the provider")
+
+
+def test_pending_rows_are_retracted_across_syncs():
+    store = BudgetAggregateStore(IN_MEMORY)
+    pending = record("p1", "2025-03-10", 2350, description="TESCO STORES")
+    store.add_transactions("u1", [pending, record("x", "2025-03-01", 100)], pending_ids={"p1"})
+    assert store.breakdown("u1")["discretionaryCents"] == 2450
+
+    # Next sync: the booked copy arrives under a new ID, with its reference suffix
+    booked = record("b1", "2025-03-12", 2350, description="TESCO STORES 3297 LONDON")
+    store.add_transactions("u1", [pending, booked], pending_ids={"p1"})
+    merged = store.breakdown("u1")
+    assert (merged["discretionaryCents"], merged["transactionCount"]) == (2450, 2)
+
+    # Resending either copy changes nothing
+    assert store.add_transactions("u1", [pending], pending_ids={"p1"}) == 0
+    assert store.add_transactions("u1", [booked]) == 0
+    assert store.breakdown("u1")["discretionaryCents"] == 2450
+
+    # A pending row whose booked copy was synced first isn't counted at all
+    store.add_transactions("u1", [record("b2", "2025-03-20", 1500, description="PRET A MANGER")])
+    store.add_transactions("u1", [record("p2", "2025-03-18", 1500, description="PRET")], pending_ids={"p2"})
+    assert store.breakdown("u1")["discretionaryCents"] == 3950
+
+    # Out of the window, or another amount, is a different purchase
+    store.add_transactions("u1", [record("p3", "2025-03-01", 4000, description="ASOS"),
+                                  record("p4", "2025-03-01", 700, description="ASOS")], pending_ids={"p3", "p4"})
+    store.add_transactions("u1", [record("b3", "2025-03-15", 4000, description="ASOS"),
+                                  record("b4", "2025-03-02", 750, description="ASOS")])
+    assert store.breakdown("u1")["discretionaryCents"] == 3950 + 4000 + 700 + 4000 + 750
+    print("✓ booked copies retract their pending rows in either order")
+
+
+def test_enrich_and_analyze_budget_accumulates_across_syncs():
+    service = EnrichmentService(budget_store=BudgetAggregateStore(IN_MEMORY))
+    january = [{"transaction_id": "j", "description": "SALARY ACME", "amount": 3000, "transaction_type": "CREDIT",
+                "timestamp": "2025-01-01T09:00:00Z"}]
+    february = [{"transaction_id": "f", "description": "SALARY ACME", "amount": 3300, "transaction_type": "CREDIT",
+                 "timestamp": "2025-02-01T09:00:00Z"},
+                {"transaction_id": "g", "description": "TESCO STORES", "amount": -20, "transaction_type": "DEBIT",
+                 "timestamp": "2025-02-28T18:00:00Z"}]
+
+    first = asyncio.run(enrich_and_analyze_budget(january, "u1", analysis_months=3, service=service))
+    assert first["budget_analysis"]["averageMonthlyIncomeCents"] == 300000
+    assert first["budget_analysis"]["monthsAnalyzed"] == 1
+
+    second = asyncio.run(enrich_and_analyze_budget(february, "u1", analysis_months=3, service=service))
+    assert second["budget_analysis"]["monthsAnalyzed"] == 2
+    assert second["budget_analysis"]["averageMonthlyIncomeCents"] == 315000
+    assert second["budget_analysis"]["transactionCount"] == 2  # this sync's rows
+
+
+def test_pending_row_in_an_earlier_sync_is_not_counted_twice():
+    service = EnrichmentService(budget_store=BudgetAggregateStore(IN_MEMORY))
+    pending = {"transaction_id": "tl-pending-1", "description": "AMAZON", "amount": -45.99,
+               "transaction_type": "DEBIT", "timestamp": "2025-03-10T12:00:00Z", "status": "pending"}
+    booked = {"transaction_id": "tl-booked-9", "description": "AMAZON MKTPLACE 2Y7 LUX", "amount": -45.99,
+              "transaction_type": "DEBIT", "timestamp": "2025-03-12T00:00:00Z"}
+
+    asyncio.run(enrich_and_analyze_budget([pending], "u1", service=service))
+    asyncio.run(enrich_and_analyze_budget([booked], "u1", service=service))
+    breakdown = service.budget_store.breakdown("u1")
+    assert breakdown["transactionCount"] == 1
+    assert breakdown["discretionaryCents"] + breakdown["fixedCostsCents"] + breakdown["debtPaymentsCents"] == 4599
+
+
+
+def test_one_call_matches_rows_against_each_other_in_chunks():
+    previous = budget_store.LOOKUP_CHUNK_SIZE
+    budget_store.LOOKUP_CHUNK_SIZE = 2  # Several lookup queries per call
+    try:
+        store = BudgetAggregateStore(IN_MEMORY)
+        store.add_transactions("u1", [record(f"x{i}", "2025-03-01", 100) for i in range(5)]
+                               + [record("p0", "2025-03-05", 900, description="BOOTS")], pending_ids={"p0"})
+        rows = [
+            # Pending first, then its booked copy; and the other way round
+            record("p1", "2025-03-10", 2350, description="TESCO STORES"),
+            record("b1", "2025-03-12", 2350, description="TESCO STORES 3297 LONDON"),
+            record("b2", "2025-03-20", 1500, description="PRET A MANGER"),
+            record("p2", "2025-03-18", 1500, description="PRET"),
+            # Retracts the pending row from the earlier call
+            record("b0", "2025-03-06", 900, description="BOOTS 55"),
+            # Resent unchanged, and with a corrected amount
+            record("x0", "2025-03-01", 100),
+            record("x1", "2025-03-01", 400),
+        ]
+        assert store.add_transactions("u1", rows, pending_ids={"p1", "p2"}) == 5
+        breakdown = store.breakdown("u1")
+        assert (breakdown["discretionaryCents"], breakdown["transactionCount"]) == (100 * 4 + 400 + 2350 + 1500 + 900, 8)
+        assert store.add_transactions("u1", rows, pending_ids={"p1", "p2"}) == 0
+    finally:
+        budget_store.LOOKUP_CHUNK_SIZE = previous
+    print("✓ one call matches its own rows and the store's, lookups chunked")
+
+
+def test_streaming_writes_aggregates_off_the_event_loop():
+    threads = set()
+
+    class RecordingStore(BudgetAggregateStore):
+        def add_transactions(self, *args, **kwargs):
+            threads.add(threading.current_thread())
+            return super().add_transactions(*args, **kwargs)
+
+    service = EnrichmentService(budget_store=RecordingStore(IN_MEMORY))
+    raw = [{"transaction_id": "s1", "description": "TESCO STORES", "amount": -20, "transaction_type": "DEBIT",
+            "timestamp": "2025-02-28T18:00:00Z"}]
+
+    async def run():
+        events = [e async for e in service.enrich_transactions_streaming(raw, "u1")]
+        await enrich_and_analyze_budget(raw, "u2", service=service)
+        return events, threading.current_thread()
+
+    events, loop_thread = asyncio.run(run())
+    assert events[-1]["type"] == "complete" and threads and loop_thread not in threads
+    assert service.budget_store.breakdown("u2")["transactionCount"] == 1
+    print("✓ aggregates written on a worker thread")
+
+
+if __name__ == "__main__":
+    test_breakdown_uses_actual_span()
+    test_partial_edge_months_count_by_their_days()
+    test_incremental_updates_are_idempotent()
+    test_aggregates_persist_in_state_dir()
+    test_resent_rows_replace_their_contribution()
+    test_pending_rows_are_retracted_across_syncs()
+    test_enrich_and_analyze_budget_accumulates_across_syncs()
+    test_pending_row_in_an_earlier_sync_is_not_counted_twice()
+    test_one_call_matches_rows_against_each_other_in_chunks()
+    test_streaming_writes_aggregates_off_the_event_loop()
+    print("✅ Budget aggregate store works")
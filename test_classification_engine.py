@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Equivalence test: the KeywordMatcher engine must classify exactly like
+the original per-keyword substring loops in EnrichmentService.
+"""
+
+import random
+
+from classification_engine import (
+    DEBT_LABELS,
+    FIXED_COST_LABELS,
+    DISCRETIONARY_LABELS,
+    RECURRING_KEYWORDS,
+    KeywordMatcher,
+    has_recurring_keyword,
+)
+from enrichment_service import EnrichmentService
+
+
+# --- Reference implementations (the loops the matcher replaced) ---
+
+def legacy_classify_transaction(labels, is_recurring, entry_type):
+    labels_text = " ".join([l.lower() for l in labels])
+    for kw in DEBT_LABELS:
+        if kw in labels_text:
+            return "debt"
+    for kw in FIXED_COST_LABELS:
+        if kw in labels_text:
+            return "fixed"
+    if is_recurring and entry_type == "outgoing":
+        return "fixed"
+    if entry_type == "outgoing":
+        return "discretionary"
+    return "income"
+
+
+def legacy_classify_by_keywords(description, labels, is_recurring, entry_type):
+    combined_text = description + " " + " ".join([l.lower() for l in labels])
+    for kw in DEBT_LABELS:
+        if kw in combined_text:
+            return "debt"
+    for kw in FIXED_COST_LABELS:
+        if kw in combined_text:
+            return "fixed"
+    if is_recurring and entry_type == "outgoing":
+        return "fixed"
+    if entry_type == "outgoing":
+        return "discretionary"
+    return "income"
+
+
+def legacy_is_recurring(desc_lower):
+    return any(kw in desc_lower for kw in RECURRING_KEYWORDS)
+
+
+# Fragments chosen to produce overlaps, prefixes and label-boundary matches
+# (e.g. "credit" + "card" only matches once the labels are joined)
+FRAGMENTS = (
+    DEBT_LABELS + FIXED_COST_LABELS + DISCRETIONARY_LABELS + RECURRING_KEYWORDS + [
+        'tesco', 'KLARNA*ASOS', 'Netflix.com', 'TFL TRAVEL CH', 'credit', 'card',
+        'car', 'mortgag', 'gasworks', 'studios', 'dd', 'DD ', 's/', 'o',
+        'Mortgage Payment', 'PAYPAL', 'Credit', 'utilit', '', ' ', '123', 'ltd',
+    ]
+)
+
+
+def random_text(rng, max_parts=4):
+    return " ".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, max_parts)))
+
+
+def random_labels(rng):
+    return [rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 3))]
+
+
+def test_classify_transaction_matches_legacy():
+    rng = random.Random(28)
+    service = EnrichmentService()
+    for _ in range(20000):
+        labels = random_labels(rng)
+        is_recurring = rng.random() < 0.3
+        entry_type = rng.choice(["outgoing", "incoming"])
+        assert service.classify_transaction(labels, is_recurring, entry_type) == \
+            legacy_classify_transaction(labels, is_recurring, entry_type), labels
+
+
+def test_classify_by_keywords_matches_legacy():
+    rng = random.Random(280)
+    service = EnrichmentService()
+    for _ in range(20000):
+        description = random_text(rng).lower()
+        labels = random_labels(rng)
+        is_recurring = rng.random() < 0.3
+        entry_type = rng.choice(["outgoing", "incoming"])
+        assert service._classify_by_keywords(description, labels, is_recurring, entry_type) == \
+            legacy_classify_by_keywords(description, labels, is_recurring, entry_type), (description, labels)
+
+
+def test_recurring_keywords_match_legacy():
+    rng = random.Random(2800)
+    for _ in range(20000):
+        desc_lower = random_text(rng).lower()
+        assert has_recurring_keyword(desc_lower) == legacy_is_recurring(desc_lower), desc_lower
+
+
+def test_every_keyword_is_matched_on_its_own():
+    service = EnrichmentService()
+    for kw in DEBT_LABELS:
+        assert service.classify_transaction([kw], False, "outgoing") == "debt", kw
+    for kw in FIXED_COST_LABELS:
+        expected = legacy_classify_transaction([kw], False, "outgoing")
+        assert service.classify_transaction([kw], False, "outgoing") == expected, kw
+    for kw in RECURRING_KEYWORDS:
+        assert has_recurring_keyword(kw), kw
+
+
+
+def test_matcher_keeps_priority_and_evicts_least_recent():
+    matcher = KeywordMatcher([("debt", ["card", "loan"]), ("fixed", ["car", "gas"])], cache_size=2)
+    # The fixed keyword comes first in the text, but debt has priority
+    assert matcher.match("car gas credit card") == "debt"
+    assert matcher.match("gasworks") == "fixed"
+    assert matcher.match("groceries") is None
+
+    # A full cache drops its least recently used entry, not everything
+    matcher.clear_cache()
+    matcher.match("hot loan")
+    for i in range(10):
+        matcher.match("hot loan")
+        matcher.match(f"ref {i}")
+    info = matcher.match.cache_info()
+    assert info.currsize == 2 and info.hits == 10
+
+    uncached = KeywordMatcher([("recurring", ["dd "])], cache_size=0)
+    assert uncached.match("dd netflix") == "recurring" and uncached.match("netflix") is None
+    uncached.clear_cache()
+
+
+if __name__ == "__main__":
+    test_classify_transaction_matches_legacy()
+    test_classify_by_keywords_matches_legacy()
+    test_recurring_keywords_match_legacy()
+    test_every_keyword_is_matched_on_its_own()
+    test_matcher_keeps_priority_and_evicts_least_recent()
+    print("✅ KeywordMatcher matches the legacy keyword loops")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test duplicate removal before enrichment: repeated IDs, stable content-hash
+IDs that keep identical ID-less purchases apart, and pending → booked merging.
+"""
+
+import asyncio
+import subprocess
+import sys
+
+from budget_store import BudgetAggregateStore
+from enrichment_service import EnrichmentService, enrich_and_analyze_budget
+from local_store import IN_MEMORY
+
+
+def tx(tx_id, description, amount, timestamp, **extra):
+    raw = {"description": description, "amount": amount, "transaction_type": "DEBIT" if amount < 0 else "CREDIT",
+           "timestamp": timestamp}
+    if tx_id is not None:
+        raw["transaction_id"] = tx_id
+    raw.update(extra)
+    return raw
+
+
+def test_content_hash_id_is_stable_across_processes():
+    service = EnrichmentService()
+    raw = tx(None, "TESCO STORES 3412", -23.5, "2025-03-01T10:00:00Z")
+    local_id = service.normalize_truelayer_transaction(raw).transaction_id
+
+    # hash() is salted per process; the content ID must not be
+    code = (
+        "from enrichment_service import EnrichmentService;"
+        "print(EnrichmentService().normalize_truelayer_transaction("
+        "{'description': 'TESCO STORES 3412', 'amount': -23.5, 'transaction_type': 'DEBIT',"
+        " 'timestamp': '2025-03-01T10:00:00Z'}).transaction_id)"
+    )
+    other_id = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert other_id.stdout.strip().splitlines()[-1] == local_id
+
+    assert local_id.startswith("tx_")
+    assert local_id != service.normalize_truelayer_transaction(
+        tx(None, "TESCO STORES 3412", -23.5, "2025-03-02T10:00:00Z")
+    ).transaction_id
+    assert service.normalize_truelayer_columns([raw]).transaction_ids == [local_id]
+
+
+def test_repeated_ids_are_dropped_and_booked_wins():
+    service = EnrichmentService()
+    raw = [
+        tx("a", "NETFLIX.COM", -10.99, "2025-03-01", status="pending"),
+        tx("b", "PRET A MANGER", -4.5, "2025-03-01"),
+        tx("a", "NETFLIX.COM", -10.99, "2025-03-02"),
+        tx("b", "PRET A MANGER", -4.5, "2025-03-01"),
+    ]
+    kept, removed = service.deduplicate_transactions(raw)
+    assert removed == 2
+    assert [r["transaction_id"] for r in kept] == ["a", "b"]
+    assert "status" not in kept[0], "booked copy should replace the pending one"
+
+
+def test_pending_rows_merge_into_booked_rows():
+    service = EnrichmentService()
+    raw = [
+        tx("p1", "TESCO STORES", -23.5, "2025-03-01", status="PENDING"),
+        tx("p2", "TESCO STORES", -23.5, "2025-03-01", pending=True),
+        tx("b1", "TESCO STORES 3412 LONDON", -23.5, "2025-03-03"),
+        tx("p3", "SHELL GARAGE", -40.0, "2025-03-01", status="pending"),  # never booked
+        tx("b2", "SHELL GARAGE", -40.0, "2025-03-20"),  # too late to be the same one
+        tx("b3", "TESCO STORES 3412 LONDON", -23.5, "2025-03-03"),
+    ]
+    kept, removed = service.deduplicate_transactions(raw)
+    print(f"  kept: {[r['transaction_id'] for r in kept]}")
+    # Each booked row absorbs one pending row
+    assert [r["transaction_id"] for r in kept] == ["b1", "p3", "b2", "b3"]
+    assert removed == 2
+
+
+def test_identical_booked_rows_with_different_ids_are_kept():
+    service = EnrichmentService()
+    raw = [tx("c1", "COSTA COFFEE", -3.2, "2025-03-01"), tx("c2", "COSTA COFFEE", -3.2, "2025-03-01")]
+    kept, removed = service.deduplicate_transactions(raw)
+    assert removed == 0 and kept == raw
+
+
+def test_identical_rows_without_ids_are_separate_purchases():
+    service = EnrichmentService(budget_store=BudgetAggregateStore(IN_MEMORY))
+    coffee = tx(None, "COSTA COFFEE", -3.2, "2025-03-01")
+    raw = [coffee, dict(coffee), tx(None, "PRET A MANGER", -4.5, "2025-03-01")]
+    kept, removed = service.deduplicate_transactions(raw)
+    assert removed == 0 and len(kept) == 3
+    ids = [r["transaction_id"] for r in kept]
+    assert len(set(ids)) == 3
+    # The first of each keeps the single-row content ID
+    assert ids[0] == service.normalize_truelayer_transaction(coffee).transaction_id
+    assert "transaction_id" not in coffee, "the caller's rows are not modified"
+
+    # The same delivery sent again gets the same IDs, which both normalisers keep
+    assert [r["transaction_id"] for r in service.deduplicate_transactions(raw)[0]] == ids
+    assert service.normalize_truelayer_columns(kept).transaction_ids == ids
+    assert [service.normalize_truelayer_transaction(r).transaction_id for r in kept] == ids
+
+    # Both coffees count once each; a re-sync of the same rows adds nothing
+    first = asyncio.run(enrich_and_analyze_budget(raw, user_id="user_033b", analysis_months=1, service=service))
+    assert first["budget_analysis"]["transactionCount"] == 3
+    again = asyncio.run(enrich_and_analyze_budget(raw, user_id="user_033b", analysis_months=1, service=service))
+    assert again["budget_analysis"]["transactionCount"] == 3
+
+
+def test_budget_totals_do_not_double_count():
+    raw = [
+        tx("s1", "SALARY ACME", 3000.0, "2025-03-01"),
+        tx("s1", "SALARY ACME", 3000.0, "2025-03-01"),
+        tx("r1", "STANDING ORDER RENT", -900.0, "2025-03-02"),
+        tx("r0", "STANDING ORDER RENT", -900.0, "2025-03-01", status="pending"),
+    ]
+    service = EnrichmentService(budget_store=BudgetAggregateStore(IN_MEMORY))
+    result = asyncio.run(enrich_and_analyze_budget(raw, user_id="user_033", analysis_months=1, service=service))
+    assert result["duplicates_removed"] == 2
+    assert result["budget_analysis"]["transactionCount"] == 2
+    assert result["budget_analysis"]["averageMonthlyIncomeCents"] == 300000
+    assert result["budget_analysis"]["fixedCostsCents"] == 90000
+
+
+def test_streaming_reports_duplicates_removed():
+    service = EnrichmentService(budget_store=BudgetAggregateStore(IN_MEMORY))
+    raw = [tx("x", "NETFLIX.COM", -10.99, "2025-03-01")] * 3
+
+    async def run():
+        return [event async for event in service.enrich_transactions_streaming(raw, "user_033")]
+
+    complete = asyncio.run(run())[-1]["result"]
+    assert complete["duplicates_removed"] == 2
+    assert len(complete["enriched_transactions"]) == 1
+
+
+if __name__ == "__main__":
+    test_content_hash_id_is_stable_across_processes()
+    test_repeated_ids_are_dropped_and_booked_wins()
+    test_pending_rows_merge_into_booked_rows()
+    test_identical_booked_rows_with_different_ids_are_kept()
+    test_identical_rows_without_ids_are_separate_purchases()
+    test_budget_totals_do_not_double_count()
+    test_streaming_reports_duplicates_removed()
+    print("✅ Deduplication works")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test deadline-aware enrichment: once deadline_ms runs out, whatever Ntropy
+hasn't returned is classified locally and flagged needs_reenrichment.
+"""
+
+import asyncio
+import threading
+
+import enrichment_service
+from budget_store import BudgetAggregateStore
+from enrichment_service import EnrichmentService, enrich_and_analyze_budget
+from local_store import IN_MEMORY
+from merchant_cache import MerchantCache
+
+# A SLOW call that is never released answers after this long, so a service
+# that ignores its deadline fails the test instead of hanging it
+GATE_TIMEOUT_SECONDS = 10.0
+
+
+class GatedTransactions:
+    """Merchants named FAST answer at once; SLOW ones wait until the gate opens"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.slow_answered = 0
+
+    def create(self, **kwargs):
+        if kwargs["description"].startswith("SLOW"):
+            self.gate.wait(GATE_TIMEOUT_SECONDS)
+            self.slow_answered += 1
+
+        class Result:
+            def model_dump(self):
+                return {"labels": ["subscription"], "merchant": {"name": "Provider"}, "recurrence": {}}
+        return Result()
+
+
+class GatedSDK:
+    def __init__(self):
+        self.transactions = GatedTransactions()
+
+
+def make_service():
+    service = EnrichmentService(merchant_cache=MerchantCache(capacity=0),
+                                budget_store=BudgetAggregateStore(IN_MEMORY))
+    service.sdk = GatedSDK()
+    return service
+
+
+def release_and_close(service):
+    """Lets the abandoned provider calls finish so the pool can shut down"""
+    service.sdk.transactions.gate.set()
+    service.close()
+
+
+def raw(i, speed):
+    word = chr(97 + i % 26) + chr(97 + i // 26)
+    return {"transaction_id": f"tx_{i}", "description": f"{speed} {word}", "amount": -5,
+            "transaction_type": "DEBIT", "timestamp": "2025-03-01T00:00:00Z"}
+
+
+def with_ntropy(test):
+    def wrapper():
+        previous = enrichment_service.NTROPY_AVAILABLE
+        enrichment_service.NTROPY_AVAILABLE = True
+        try:
+            test()
+        finally:
+            enrichment_service.NTROPY_AVAILABLE = previous
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@with_ntropy
+def test_enrich_transactions_returns_by_deadline():
+    service = make_service()
+    transactions = [raw(i, "FAST" if i % 2 else "SLOW") for i in range(8)]
+
+    result = asyncio.run(enrich_and_analyze_budget(transactions, "user_036", service=service, deadline_ms=150))
+    # Returned while every SLOW call was still waiting on the provider
+    assert service.sdk.transactions.slow_answered == 0
+    release_and_close(service)
+
+    by_id = {tx["transaction_id"]: tx for tx in result["enriched_transactions"]}
+    for i in range(8):
+        tx = by_id[f"tx_{i}"]
+        if i % 2:
+            assert not tx["needs_reenrichment"] and tx["merchant_clean_name"] == "Provider"
+        else:
+            assert tx["needs_reenrichment"] and tx["merchant_clean_name"] is None
+    assert result["needs_reenrichment_count"] == 4
+
+
+@with_ntropy
+def test_streaming_falls_back_for_remaining_batches():
+    service = make_service()
+    transactions = [raw(i, "SLOW") for i in range(35)]
+
+    async def run():
+        return [e async for e in service.enrich_transactions_streaming(
+            transactions, "user_036", stream_transactions=True, deadline_ms=100
+        )]
+
+    events = asyncio.run(run())
+    assert service.sdk.transactions.slow_answered == 0
+    release_and_close(service)
+
+    rows = [tx for e in events if e["type"] == "transactions" for tx in e["transactions"]]
+    assert [tx["transaction_id"] for tx in rows] == [f"tx_{i}" for i in range(35)]
+    assert all(tx["needs_reenrichment"] for tx in rows)
+    assert events[-1]["result"]["needs_reenrichment_count"] == 35
+
+
+@with_ntropy
+def test_no_deadline_waits_for_provider():
+    service = make_service()
+    # Opened before the call: without a deadline the answer is awaited however long it takes
+    service.sdk.transactions.gate.set()
+    result = asyncio.run(enrich_and_analyze_budget([raw(0, "SLOW")], "user_036", service=service))
+    service.close()
+    assert result["needs_reenrichment_count"] == 0
+    assert result["enriched_transactions"][0]["merchant_clean_name"] == "Provider"
+
+
+if __name__ == "__main__":
+    test_enrich_transactions_returns_by_deadline()
+    test_streaming_falls_back_for_remaining_batches()
+    test_no_deadline_waits_for_provider()
+    print("✅ Deadline-aware enrichment works")
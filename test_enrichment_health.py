@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test the enrichment readiness probe across the app lifespan: 503 before
+startup, healthy with a warmed-up worker pool while running, and 503 once
+shutdown has closed the shared service. /metrics follows the same lifespan.
+"""
+
+from fastapi.testclient import TestClient
+
+import enrichment_service
+import main
+
+
+def test_probe_follows_the_lifespan():
+    print("\n=== /health/enrichment across startup and shutdown ===")
+    previous = getattr(main.app.state, "enrichment_service", None)
+    if previous is not None:
+        del main.app.state.enrichment_service
+    try:
+        before = TestClient(main.app).get("/health/enrichment")
+        assert before.status_code == 503
+        assert before.json()["detail"]["status"] == "not_started"
+        assert TestClient(main.app).get("/metrics").json()["detail"]["status"] == "not_started"
+
+        with TestClient(main.app) as client:
+            service = main.app.state.enrichment_service
+            # warm_up() started every worker before the first request
+            assert len(service._executor._threads) == service.max_concurrency
+            running = client.get("/health/enrichment")
+            assert running.status_code == 200, running.text
+            assert running.json()["status"] == "healthy"
+            assert running.json()["mode"] == service.mode
+            metrics = client.get("/metrics")
+            assert metrics.status_code == 200 and "hit_rate" in metrics.json()["merchant_cache"]
+
+        # Shutdown closed the service; the probe must not quietly build a new one
+        after = TestClient(main.app).get("/health/enrichment")
+        assert after.status_code == 503
+        assert after.json()["detail"]["status"] == "closed"
+        scraped = TestClient(main.app).get("/metrics")
+        assert scraped.status_code == 503 and scraped.json()["detail"]["status"] == "closed"
+        assert enrichment_service._shared_service is None  # No replacement service was built
+        assert main.app.state.enrichment_service is service
+    finally:
+        if previous is not None:
+            main.app.state.enrichment_service = previous
+        elif hasattr(main.app.state, "enrichment_service"):
+            del main.app.state.enrichment_service
+    print(f"✓ 503 before startup, healthy ({service.max_concurrency} workers warm), 503 after shutdown (probe and /metrics)")
+
+
+if __name__ == "__main__":
+    test_probe_follows_the_lifespan()
+    print("\n✅ All enrichment health tests passed!")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test resumable enrichment jobs: a stream that drops half way resumes from
+its checkpoints and only enriches the remaining transactions.
+"""
+
+import asyncio
+
+import enrichment_service
+from budget_store import BudgetAggregateStore
+from enrichment_jobs import EnrichmentJobStore, stream_enrichment_job
+from enrichment_service import EnrichmentService
+from local_store import IN_MEMORY
+from merchant_cache import MerchantCache
+
+
+class CountingTransactions:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs["id"])
+
+        class Result:
+            def model_dump(self):
+                return {"labels": ["shopping"], "merchant": {"name": "Shop"}, "recurrence": {}}
+        return Result()
+
+
+class CountingSDK:
+    def __init__(self):
+        self.transactions = CountingTransactions()
+
+
+def make_service():
+    # No merchant cache and distinct merchants, so every transaction costs one provider call
+    service = EnrichmentService(merchant_cache=MerchantCache(capacity=0),
+                                budget_store=BudgetAggregateStore(IN_MEMORY))
+    service.sdk = CountingSDK()
+    return service
+
+
+RAW = [
+    {"transaction_id": f"tx_{i}", "description": f"SHOP {chr(97 + i % 26)}{chr(97 + i // 26)}", "amount": -10 - i,
+     "transaction_type": "DEBIT", "timestamp": "2025-03-01T00:00:00Z"}
+    for i in range(45)
+]
+
+
+async def collect(generator, stop_after_transactions=None):
+    events = []
+    async for event in generator:
+        events.append(event)
+        if stop_after_transactions and event["type"] == "transactions":
+            seen = sum(len(e["transactions"]) for e in events if e["type"] == "transactions")
+            if seen >= stop_after_transactions:
+                break
+    await generator.aclose()
+    return events
+
+
+def test_dropped_stream_resumes_from_checkpoint():
+    previous = enrichment_service.NTROPY_AVAILABLE
+    enrichment_service.NTROPY_AVAILABLE = True
+    try:
+        service = make_service()
+        calls = service.sdk.transactions.calls
+        store = EnrichmentJobStore(IN_MEMORY)
+        job_id = store.create_job("user_035", RAW, {"stream_transactions": True, "chunk_size": 10})
+
+        first = asyncio.run(collect(stream_enrichment_job(service, store, job_id), stop_after_transactions=20))
+        assert first[0] == {"type": "job", "job_id": job_id, "status": "running", "resumed": False,
+                            "completed": 0, "total": 45}
+        assert store.get_job(job_id)["status"] == "interrupted"
+        checkpointed = store.get_job(job_id)["completed"]
+        print(f"  dropped after {len(calls)} calls, {checkpointed} checkpointed")
+        assert checkpointed == len(calls) == 20
+
+        resumed = asyncio.run(collect(stream_enrichment_job(service, store, job_id)))
+        assert resumed[0]["resumed"] and resumed[0]["completed"] == 20
+        assert len(calls) == 45, "resume must only pay for the remaining transactions"
+        assert sorted(calls) == sorted(tx["transaction_id"] for tx in RAW)
+
+        streamed = [tx for e in resumed if e["type"] == "transactions" for tx in e["transactions"]]
+        assert [tx["transaction_id"] for tx in streamed] == [tx["transaction_id"] for tx in RAW]
+        complete = resumed[-1]
+        assert complete["type"] == "complete"
+        assert complete["result"]["transaction_count"] == 45
+        assert store.get_job(job_id)["status"] == "complete"
+
+        # Attaching to a finished job replays it without any provider calls
+        replay = asyncio.run(collect(stream_enrichment_job(service, store, job_id)))
+        assert len(calls) == 45
+        assert replay[-1]["result"] == complete["result"]
+    finally:
+        enrichment_service.NTROPY_AVAILABLE = previous
+
+
+def test_fallback_job_replays_collected_results():
+    service = EnrichmentService(budget_store=BudgetAggregateStore(IN_MEMORY))
+    store = EnrichmentJobStore(IN_MEMORY)
+    job_id = store.create_job("user_035", RAW, {"stream_transactions": False})
+
+    events = asyncio.run(collect(stream_enrichment_job(service, store, job_id)))
+    again = asyncio.run(collect(stream_enrichment_job(service, store, job_id)))
+    assert events[-1]["result"]["enriched_transactions"] == again[-1]["result"]["enriched_transactions"]
+    assert len(again[-1]["result"]["enriched_transactions"]) == 45
+
+
+if __name__ == "__main__":
+    test_dropped_stream_resumes_from_checkpoint()
+    test_fallback_job_replays_collected_results()
+    print("✅ Enrichment jobs resume from checkpoints")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test paced event delivery: progress coalescing, heartbeats while idle,
+bounded buffering with backpressure, and producer cleanup on disconnect.
+"""
+
+import asyncio
+import json
+from contextlib import aclosing
+
+from event_stream import SSE_HEARTBEAT, ndjson_line, paced_stream, sse_frame
+
+
+def progress(n):
+    return {"type": "progress", "current": n, "total": 100, "status": "enriching"}
+
+
+async def collect(stream):
+    return [frame async for frame in stream]
+
+
+def decode(frames):
+    return [json.loads(frame) for frame in frames if frame.strip()]
+
+
+def test_progress_is_coalesced():
+    async def events():
+        for n in range(100):
+            yield progress(n)
+        yield {"type": "complete", "result": {}}
+
+    frames = asyncio.run(collect(paced_stream(events(), ndjson_line, progress_interval_ms=10_000)))
+    # The first progress goes out at once; the rest are superseded by "complete"
+    assert decode(frames) == [progress(0), {"type": "complete", "result": {}}]
+
+    unthrottled = asyncio.run(collect(paced_stream(events(), ndjson_line, progress_interval_ms=0)))
+    assert len(unthrottled) == 101
+
+
+def test_latest_progress_flushed_before_other_events():
+    async def events():
+        yield progress(1)
+        yield progress(2)
+        yield progress(3)
+        yield {"type": "transactions", "transactions": []}
+
+    frames = asyncio.run(collect(paced_stream(events(), ndjson_line, progress_interval_ms=10_000)))
+    assert decode(frames) == [progress(1), progress(3), {"type": "transactions", "transactions": []}]
+
+
+def test_pending_progress_sent_when_interval_elapses():
+    async def events():
+        yield progress(1)
+        yield progress(2)
+        await asyncio.sleep(0.3)
+        yield {"type": "complete", "result": {}}
+
+    frames = asyncio.run(collect(paced_stream(events(), ndjson_line, progress_interval_ms=50)))
+    assert decode(frames) == [progress(1), progress(2), {"type": "complete", "result": {}}]
+
+
+def test_heartbeat_while_idle():
+    async def events():
+        yield progress(1)
+        await asyncio.sleep(0.35)
+        yield {"type": "complete", "result": {}}
+
+    frames = asyncio.run(collect(paced_stream(
+        events(), sse_frame, heartbeat_frame=SSE_HEARTBEAT, heartbeat_seconds=0.1
+    )))
+    heartbeats = frames.count(SSE_HEARTBEAT)
+    print(f"   heartbeats: {heartbeats}")
+    assert 2 <= heartbeats <= 4
+    assert frames[0] == sse_frame(progress(1)) and frames[-1] == sse_frame({"type": "complete", "result": {}})
+
+
+def test_backpressure_and_cleanup_on_disconnect():
+    produced = []
+    closed = []
+
+    async def events():
+        try:
+            for n in range(1000):
+                produced.append(n)
+                yield {"type": "transactions", "n": n}
+        finally:
+            closed.append(True)
+
+    async def slow_client():
+        stream = paced_stream(events(), ndjson_line, max_buffered=4)
+        first = await stream.__anext__()
+        # Client stalls: the producer fills the buffer and then waits
+        await asyncio.sleep(0.1)
+        stalled_at = len(produced)
+        print(f"   produced while stalled: {stalled_at}")
+        await stream.aclose()
+        return first, stalled_at
+
+    first, stalled_at = asyncio.run(slow_client())
+    assert json.loads(first)["n"] == 0
+    assert stalled_at <= 4 + 3, f"producer ran ahead of a stalled client: {stalled_at}"
+    assert closed == [True]
+
+
+def test_disconnect_closes_nested_sources_at_once():
+    state = []
+
+    async def job():
+        state.append("running")
+        try:
+            for n in range(1000):
+                yield {"type": "transactions", "n": n}
+        finally:
+            state.append("released")
+
+    async def events():
+        async with aclosing(job()) as source:
+            async for event in source:
+                yield event
+
+    async def disconnecting_client():
+        stream = paced_stream(events(), ndjson_line, max_buffered=2)
+        await stream.__anext__()
+        # The producer blocks on the full buffer, with events() suspended at a yield
+        await asyncio.sleep(0.05)
+        await stream.aclose()
+        return list(state)
+
+    # Released before aclose() returns, not whenever the generator is collected
+    assert asyncio.run(disconnecting_client()) == ["running", "released"]
+
+
+def test_producer_error_propagates():
+    async def events():
+        yield progress(1)
+        raise RuntimeError("boom")
+
+    try:
+        asyncio.run(collect(paced_stream(events(), ndjson_line)))
+        assert False, "expected the producer error"
+    except RuntimeError as e:
+        assert str(e) == "boom"
+
+
+if __name__ == "__main__":
+    test_progress_is_coalesced()
+    test_latest_progress_flushed_before_other_events()
+    test_pending_progress_sent_when_interval_elapses()
+    test_heartbeat_while_idle()
+    test_backpressure_and_cleanup_on_disconnect()
+    test_disconnect_closes_nested_sources_at_once()
+    test_producer_error_propagates()
+    print("✅ Streaming events are paced")
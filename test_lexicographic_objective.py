@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test the lexicographic objective mode: interest is minimized first and then
+held (within the tolerance) while the tie-breaker is minimized, strategies
+without a tie-breaker search once, and the mode is selectable per request.
+"""
+
+from fastapi.testclient import TestClient
+
+import main
+import schemas
+import solver_engine
+from solver_engine import (
+    FORMULATION_LINEAR,
+    OBJECTIVE_LEXICOGRAPHIC,
+    OptimizationStrategy,
+    SolveOptions,
+    TERMINATION_OPTIMAL,
+    TERMINATION_TIME_LIMIT,
+    build_payment_model,
+    solve_payment_plan,
+)
+from test_solve_options import make_portfolio
+from test_solver_runtime import portfolio_json
+
+
+def interest(plan):
+    return sum(row.interest_charged_cents for row in plan)
+
+
+def balances(plan):
+    return sum(row.ending_balance_cents for row in plan)
+
+
+def test_lexicographic_matches_weighted_optimum():
+    print("\n=== Single card: weighted vs lexicographic ===")
+    weighted = solve_payment_plan(make_portfolio([(250000, 2299)], 60000))
+    lexicographic = solve_payment_plan(
+        make_portfolio([(250000, 2299)], 60000, SolveOptions(objective_mode=OBJECTIVE_LEXICOGRAPHIC))
+    )
+
+    assert lexicographic.termination_reason == TERMINATION_OPTIMAL
+    # Interest comes first by construction, so it can't be worse than the weighted sum's
+    assert interest(lexicographic.plan) <= interest(weighted.plan)
+    assert balances(lexicographic.plan) == balances(weighted.plan)
+    # The reported objective is the tie-breaker's
+    assert lexicographic.stats.objective_value == balances(lexicographic.plan)
+    print(f"✓ interest {interest(lexicographic.plan)}, balances {balances(lexicographic.plan)} "
+          f"in {lexicographic.stats.wall_time_seconds:.2f}s (both phases)")
+
+
+def test_tolerance_trades_interest_for_faster_payoff():
+    print("\n=== Tolerance on the primary term ===")
+    strict = solve_payment_plan(
+        make_portfolio([(250000, 2299)], 60000, SolveOptions(objective_mode=OBJECTIVE_LEXICOGRAPHIC))
+    )
+    loose = solve_payment_plan(make_portfolio([(250000, 2299)], 60000, SolveOptions(
+        objective_mode=OBJECTIVE_LEXICOGRAPHIC, lexicographic_tolerance=0.05
+    )))
+
+    assert interest(loose.plan) <= interest(strict.plan) * 1.05
+    assert balances(loose.plan) <= balances(strict.plan)
+    print(f"✓ 5% tolerance: interest {interest(strict.plan)} → {interest(loose.plan)}, "
+          f"balances {balances(strict.plan)} → {balances(loose.plan)}")
+
+
+def test_single_term_strategies_search_once():
+    portfolio = make_portfolio([(250000, 2299)], 60000, SolveOptions(objective_mode=OBJECTIVE_LEXICOGRAPHIC))
+    assert len(build_payment_model(portfolio).objective_terms) == 2
+
+    portfolio.preferences.strategy = OptimizationStrategy.MINIMIZE_MONTHLY_SPEND
+    assert build_payment_model(portfolio).objective_terms == []
+    result = solve_payment_plan(portfolio)
+    assert result.status == "OPTIMAL" and result.plan
+    print("✓ no tie-breaker: one weighted search")
+
+
+def recording_search(searches, spend_budget=False):
+    """Wraps solver_engine._search to record each phase's options"""
+    real_search = solver_engine._search
+
+    def search(plan_model, options, *args, **kwargs):
+        searches.append(options)
+        solver, status, stats, reason = real_search(plan_model, options, *args, **kwargs)
+        if spend_budget:
+            stats.wall_time_seconds = options.max_time_seconds
+        return solver, status, stats, reason
+    return search
+
+
+def test_second_phase_keeps_options_within_the_budget():
+    print("\n=== Phase 2 options and budget ===")
+    options = SolveOptions(max_time_seconds=20, objective_mode=OBJECTIVE_LEXICOGRAPHIC, formulation=FORMULATION_LINEAR)
+    real_search = solver_engine._search
+    searches = []
+    solver_engine._search = recording_search(searches)
+    try:
+        result = solve_payment_plan(make_portfolio([(250000, 2299)], 60000, options))
+    finally:
+        solver_engine._search = real_search
+    assert len(searches) == 2 and result.plan
+    assert searches[1].formulation == FORMULATION_LINEAR
+    assert searches[1].max_time_seconds <= 20 and result.stats.wall_time_seconds <= 20
+
+    # A first phase that uses the whole budget leaves no second phase
+    searches = []
+    solver_engine._search = recording_search(searches, spend_budget=True)
+    try:
+        spent = solve_payment_plan(make_portfolio([(250000, 2299)], 60000, options))
+    finally:
+        solver_engine._search = real_search
+    assert len(searches) == 1
+    assert spent.plan and spent.status == "FEASIBLE" and spent.termination_reason == TERMINATION_TIME_LIMIT
+    print("✓ phase 2 keeps the formulation and the remaining budget; skipped once it is spent")
+
+
+def test_objective_mode_per_request():
+    client = TestClient(main.app)
+    payload = portfolio_json()
+    payload["solve_options"] = {"objective_mode": "lexicographic"}
+    response = client.post("/generate-plan", json=payload)
+    assert response.status_code == 200, response.text
+    assert response.json()["termination_reason"] == TERMINATION_OPTIMAL
+
+    portfolio = main.convert_schema_to_solver_portfolio(schemas.DebtPortfolio.model_validate(payload))
+    assert portfolio.solve_options.objective_mode == OBJECTIVE_LEXICOGRAPHIC
+
+    payload["solve_options"] = {"objective_mode": "pareto"}
+    assert client.post("/generate-plan", json=payload).status_code == 422
+    print("✓ objective_mode selectable per request; unknown modes rejected")
+
+
+if __name__ == "__main__":
+    test_lexicographic_matches_weighted_optimum()
+    test_tolerance_trades_interest_for_faster_payoff()
+    test_single_term_strategies_search_once()
+    test_second_phase_keeps_options_within_the_budget()
+    test_objective_mode_per_request()
+    print("\n✅ All lexicographic objective tests passed!")
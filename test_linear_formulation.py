@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test the linear formulation: floor division and the minimum-payment min/max
+as bounded linear inequalities. It must reach the same optimum, and its plans
+must be plans of the division model to the cent.
+"""
+
+from fastapi.testclient import TestClient
+from ortools.sat.python import cp_model
+
+import main
+from solver_engine import (
+    FORMULATION_DIVISION,
+    FORMULATION_LINEAR,
+    MinPaymentRule,
+    SolveOptions,
+    _extract_plan,
+    build_payment_model,
+    configure_solver,
+    solve_payment_plan,
+)
+from test_solve_options import make_portfolio
+from test_solver_runtime import portfolio_json
+
+
+CONSTRAINT_KINDS = ("int_div", "lin_max", "linear")
+
+
+def constraint_kinds(plan_model):
+    return {
+        kind for constraint in plan_model.model.Proto().constraints
+        for kind in CONSTRAINT_KINDS if getattr(constraint, f"has_{kind}")()
+    }
+
+
+def replay(portfolio, plan, formulation):
+    """Solves `formulation`'s model with every payment fixed to the plan's"""
+    plan_model = build_payment_model(portfolio, formulation)
+    paid = {(row.lender_name, row.month - 1): row.payment_cents for row in plan}
+    for key, var in plan_model.payments.items():
+        plan_model.model.Add(var == paid.get(key, 0))
+    solver = configure_solver(SolveOptions(max_time_seconds=30))
+    status = solver.Solve(plan_model.model)
+    assert status in (cp_model.OPTIMAL, cp_model.FEASIBLE), solver.StatusName(status)
+    return solver.ObjectiveValue(), _extract_plan(solver, plan_model, portfolio, log=False)
+
+
+def solve_both(portfolio):
+    return {
+        formulation: solve_payment_plan(portfolio, SolveOptions(formulation=formulation))
+        for formulation in (FORMULATION_DIVISION, FORMULATION_LINEAR)
+    }
+
+
+def test_no_division_min_or_max_constraints():
+    portfolio = make_portfolio([(250000, 2299), (90000, 2999)], 60000)
+    division = constraint_kinds(build_payment_model(portfolio, FORMULATION_DIVISION))
+    linear = constraint_kinds(build_payment_model(portfolio, FORMULATION_LINEAR))
+    assert {"int_div", "lin_max"} <= division
+    assert not {"int_div", "lin_max"} & linear
+    print(f"✓ linear model uses {sorted(linear)}")
+
+
+def test_identical_plans_single_card():
+    print("\n=== Single card: loose and tight budgets ===")
+    for budget_cents in (60000, 15000):
+        results = solve_both(make_portfolio([(250000, 2299)], budget_cents))
+        division, linear = results[FORMULATION_DIVISION], results[FORMULATION_LINEAR]
+        assert division.termination_reason == linear.termination_reason == "optimal"
+        assert linear.stats.objective_value == division.stats.objective_value
+        assert linear.plan == division.plan
+        print(f"✓ £{budget_cents // 100}/mo: identical {len(linear.plan)}-row plans")
+
+
+def test_minimum_payment_rule_variants():
+    print("\n=== Minimum payment rules: linear plans replayed in the division model ===")
+    rules = [
+        MinPaymentRule(fixed_cents=2500, percentage_bps=100, includes_interest=False),
+        MinPaymentRule(fixed_cents=0, percentage_bps=300, includes_interest=True),
+        MinPaymentRule(fixed_cents=10000, percentage_bps=0, includes_interest=False),
+    ]
+    for rule in rules:
+        # A tight budget so the minimums bind; the small card owes less than a 10000 fixed minimum
+        portfolio = make_portfolio([(250000, 2299), (9000, 2999)], 20000)
+        for account in portfolio.accounts:
+            account.min_payment_rule = rule
+        linear = solve_payment_plan(portfolio, SolveOptions(max_time_seconds=20, formulation=FORMULATION_LINEAR))
+        assert linear.plan
+        objective, replayed = replay(portfolio, linear.plan, FORMULATION_DIVISION)
+        assert objective == linear.stats.objective_value
+        assert replayed == linear.plan
+        print(f"✓ fixed {rule.fixed_cents}, {rule.percentage_bps} bps: objective {objective:,.0f} "
+              f"({linear.termination_reason} in {linear.stats.wall_time_seconds:.2f}s)")
+
+
+def test_linear_plans_replay_in_the_division_model():
+    print("\n=== Two cards: replay each plan in the other formulation ===")
+    portfolio = make_portfolio([(250000, 2299), (90000, 2999)], 60000)
+    results = solve_both(portfolio)
+    for formulation, other in ((FORMULATION_LINEAR, FORMULATION_DIVISION), (FORMULATION_DIVISION, FORMULATION_LINEAR)):
+        result = results[formulation]
+        objective, replayed = replay(portfolio, result.plan, other)
+        # Same payments give the same interest, balances and objective to the cent
+        assert objective == result.stats.objective_value
+        assert replayed == result.plan
+    assert results[FORMULATION_LINEAR].stats.objective_value == results[FORMULATION_DIVISION].stats.objective_value
+    print(f"✓ optimum {results[FORMULATION_LINEAR].stats.objective_value:,.0f} in both; "
+          f"division {results[FORMULATION_DIVISION].stats.wall_time_seconds:.2f}s, "
+          f"linear {results[FORMULATION_LINEAR].stats.wall_time_seconds:.2f}s")
+
+
+def test_formulation_per_request():
+    client = TestClient(main.app)
+    payload = portfolio_json()
+    payload["solve_options"] = {"formulation": "linear"}
+    response = client.post("/generate-plan", json=payload)
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "OPTIMAL" and response.json()["plan"]
+
+    payload["solve_options"] = {"formulation": "quadratic"}
+    assert client.post("/generate-plan", json=payload).status_code == 422
+    print("✓ formulation selectable per request; unknown values rejected")
+
+
+if __name__ == "__main__":
+    test_no_division_min_or_max_constraints()
+    test_identical_plans_single_card()
+    test_minimum_payment_rule_variants()
+    test_linear_plans_replay_in_the_division_model()
+    test_formulation_per_request()
+    print("\n✅ All linear formulation tests passed!")
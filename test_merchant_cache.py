@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test the process-wide merchant cache: LRU bounds, that the Ntropy path only
+calls the provider once per unseen merchant, and that a cache hit is budgeted
+the same as a provider answer.
+"""
+
+import asyncio
+import threading
+
+from enrichment_service import EnrichmentService
+from merchant_cache import MerchantCache, MerchantCacheEntry, merchant_fingerprint
+
+
+class FakeResult:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def model_dump(self):
+        return self.payload
+
+
+class FakeTransactions:
+    """Stands in for sdk.transactions; records every create() call"""
+
+    MERCHANTS = {
+        "netflix": ("Netflix", ["streaming", "subscription"]),
+        "klarna": ("Klarna", ["bnpl"]),
+        "tfl": ("Transport for London", ["transport"]),
+        "brightminds": ("Bright Minds Tutoring", ["education"]),
+    }
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.calls.append(kwargs["description"])
+        for needle, (name, labels) in self.MERCHANTS.items():
+            if needle in kwargs["description"].lower():
+                return FakeResult({
+                    "labels": labels,
+                    "merchant": {"name": name, "logo": f"https://logo/{needle}", "website": f"{needle}.com"},
+                    "recurrence": {"is_recurring": True, "frequency": "monthly", "day_of_month": 3},
+                })
+        raise RuntimeError("unknown merchant")
+
+
+class FakeSDK:
+    def __init__(self):
+        self.transactions = FakeTransactions()
+
+
+def make_service():
+    return EnrichmentService(merchant_cache=MerchantCache(capacity=100), sdk=FakeSDK())
+
+
+def enrich(service, descriptions):
+    normalized = [
+        service.normalize_truelayer_transaction({
+            "transaction_id": f"tx_{i}", "description": d, "amount": -9.99,
+            "transaction_type": "DEBIT", "timestamp": "2025-03-03T10:00:00Z",
+        })
+        for i, d in enumerate(descriptions)
+    ]
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(service._enrich_batch(normalized, "user_032", loop))
+    finally:
+        loop.close()
+
+
+def test_lru_evicts_least_recently_used():
+    cache = MerchantCache(capacity=2)
+    entry = MerchantCacheEntry("Netflix", None, None)
+    cache.put(("outgoing", "a"), entry)
+    cache.put(("outgoing", "b"), entry)
+    assert cache.get(("outgoing", "a")) is entry  # a is now most recent
+    cache.put(("outgoing", "c"), entry)
+    assert cache.get(("outgoing", "b")) is None
+    assert len(cache) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_fingerprint_ignores_references_but_not_direction():
+    assert merchant_fingerprint("NETFLIX.COM 8812", "outgoing") == merchant_fingerprint("DD NETFLIX.COM 1203", "outgoing")
+    assert merchant_fingerprint("NETFLIX.COM", "outgoing") != merchant_fingerprint("NETFLIX.COM", "incoming")
+    assert merchant_fingerprint("0000 1234", "outgoing") is None
+
+
+def test_provider_called_once_per_merchant():
+    service = make_service()
+    calls = service.sdk.transactions.calls
+
+    first = enrich(service, ["NETFLIX.COM 1", "NETFLIX.COM 2", "KLARNA*ASOS", "TFL TRAVEL CH"])
+    print(f"  first batch calls: {calls}")
+    assert len(calls) == 3
+    assert [r.merchant_clean_name for r in first] == ["Netflix", "Netflix", "Klarna", "Transport for London"]
+    assert first[2].budget_category == "debt"
+
+    second = enrich(service, ["NETFLIX.COM 3", "TFL TRAVEL CH", "KLARNA*ASOS"])
+    assert len(calls) == 3, "cache hits must not reach the provider"
+    assert [r.merchant_clean_name for r in second] == ["Netflix", "Transport for London", "Klarna"]
+    assert second[0].labels == ["streaming", "subscription"]
+    assert second[0].budget_category == "fixed"
+    assert [r.transaction_id for r in second] == ["tx_0", "tx_1", "tx_2"]
+
+    stats = service.merchant_cache.stats()
+    print(f"  cache stats: {stats}")
+    assert stats["hits"] == 3
+    assert stats["size"] == 3
+
+
+def monthly_history(user):
+    return [
+        {"transaction_id": f"{user}_{month}", "description": f"BRIGHTMINDS TUTOR {month}{month}", "amount": -60,
+         "transaction_type": "DEBIT", "timestamp": f"2025-{month:02d}-03T09:00:00Z"}
+        for month in (1, 2, 3, 4)
+    ]
+
+
+def test_cache_hit_and_miss_classify_a_recurring_merchant_alike():
+    def classified(results):
+        return [(r.merchant_clean_name, r.is_recurring, r.recurrence_frequency, r.recurrence_day, r.budget_category)
+                for r in results]
+
+    # Miss: the provider answers for this user's own rows
+    miss_service = make_service()
+    missed = asyncio.run(miss_service.enrich_transactions(monthly_history("a"), "user_a"))
+    assert len(miss_service.sdk.transactions.calls) == 1
+
+    # Hit: another user's single payment filled the cache first
+    hit_service = make_service()
+    asyncio.run(hit_service.enrich_transactions(monthly_history("b")[:1], "user_b"))
+    hit = asyncio.run(hit_service.enrich_transactions(monthly_history("a"), "user_a", batch_size=1))
+    assert len(hit_service.sdk.transactions.calls) == 1, "the second user is served from the cache"
+
+    print(f"  miss: {classified(missed)[0]}, hit: {classified(hit)[0]}")
+    assert classified(hit) == classified(missed) == [("Bright Minds Tutoring", True, "monthly", 3, "fixed")] * 4
+
+    # A one-off from the cache has no series to find
+    single = enrich(hit_service, ["BRIGHTMINDS TUTOR 99"])
+    assert (single[0].is_recurring, single[0].budget_category) == (False, "discretionary")
+
+
+def test_failed_provider_calls_are_not_cached():
+    service = make_service()
+    results = enrich(service, ["CORNER SHOP 1", "CORNER SHOP 2"])
+    assert [r.merchant_clean_name for r in results] == [None, None]
+    assert len(service.merchant_cache) == 0
+    enrich(service, ["CORNER SHOP 3"])
+    assert len(service.sdk.transactions.calls) == 2
+
+
+if __name__ == "__main__":
+    test_lru_evicts_least_recently_used()
+    test_fingerprint_ignores_references_but_not_direction()
+    test_provider_called_once_per_merchant()
+    test_cache_hit_and_miss_classify_a_recurring_merchant_alike()
+    test_failed_provider_calls_are_not_cached()
+    print("✅ Merchant cache works")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test the local Ntropy stand-in: deterministic labels, injected error and
+429 rates, and that an injected SDK puts the service in Ntropy mode without
+the real package installed.
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+
+from budget_store import BudgetAggregateStore
+from enrichment_service import NTROPY_MOCK_ENV, EnrichmentService, enrich_and_analyze_budget
+from local_store import IN_MEMORY
+from merchant_cache import MerchantCache
+from mock_ntropy import MockNtropyConfig, MockNtropySDK, MockRateLimitError, mock_enrichment
+
+
+def call(sdk, description, entry_type="outgoing"):
+    return sdk.transactions.create(
+        id="tx_1", description=description, amount=10.0, entry_type=entry_type,
+        currency="GBP", date="2025-03-14", account_holder_id="holder"
+    ).model_dump()
+
+
+def test_labels_are_deterministic():
+    sdk = MockNtropySDK(MockNtropyConfig(latency_ms=0, latency_sigma=0))
+    netflix = call(sdk, "DD NETFLIX.COM 8812")
+    assert netflix["merchant"]["name"] == "Netflix"
+    assert netflix["recurrence"] == {"is_recurring": True, "frequency": "monthly", "day_of_month": 14}
+
+    unknown = call(sdk, "CORNER BAKERY 12")
+    assert unknown == call(MockNtropySDK(MockNtropyConfig(latency_ms=0, seed=99)), "CORNER BAKERY 12")
+    assert unknown["labels"] == mock_enrichment("CORNER BAKERY 12", "outgoing")["labels"]
+    assert unknown["merchant"]["name"] == "Corner Bakery"
+
+
+def test_error_and_rate_limit_rates():
+    sdk = MockNtropySDK(MockNtropyConfig(latency_ms=0, latency_sigma=0, error_rate=0.2, rate_limit_rate=0.1))
+    failures = 0
+    for _ in range(2000):
+        try:
+            call(sdk, "TESCO STORES")
+        except Exception:
+            failures += 1
+    stats = sdk.stats()
+    print(f"   mock stats: {stats}")
+    assert stats["calls"] == 2000
+    assert stats["errors"] + stats["rate_limited"] == failures
+    assert 300 <= stats["errors"] <= 500
+    assert 120 <= stats["rate_limited"] <= 280
+
+
+def test_max_in_flight_answers_429():
+    sdk = MockNtropySDK(MockNtropyConfig(latency_ms=0, max_in_flight=0))
+    try:
+        call(sdk, "TESCO STORES")
+        assert False, "expected a 429"
+    except MockRateLimitError as e:
+        assert e.status_code == 429
+
+
+def test_injected_sdk_enables_ntropy_mode():
+    sdk = MockNtropySDK(MockNtropyConfig(latency_ms=1, latency_sigma=0))
+    service = EnrichmentService(merchant_cache=MerchantCache(), budget_store=BudgetAggregateStore(IN_MEMORY), sdk=sdk)
+    assert service.mode == "ntropy"
+
+    raw = [
+        {"transaction_id": f"tx_{i}", "description": description, "amount": -12.5,
+         "transaction_type": "DEBIT", "timestamp": "2025-03-14T00:00:00Z"}
+        for i, description in enumerate(["NETFLIX.COM", "KLARNA*ASOS", "TESCO STORES", "NETFLIX.COM"])
+    ]
+    result = asyncio.run(enrich_and_analyze_budget(raw, user_id="user_038", service=service))
+    by_id = {tx["transaction_id"]: tx for tx in result["enriched_transactions"]}
+    assert by_id["tx_0"]["merchant_clean_name"] == "Netflix"
+    assert by_id["tx_1"]["budget_category"] == "debt"
+    # The repeated merchant is coalesced into one provider call
+    assert sdk.stats()["calls"] == 3
+    service.close()
+
+
+def test_mock_from_env_warns_loudly():
+    previous = {name: os.environ.pop(name, None) for name in ("NTROPY_API_KEY", NTROPY_MOCK_ENV)}
+    os.environ[NTROPY_MOCK_ENV] = "1"
+    stderr = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(stderr):
+            service = EnrichmentService(merchant_cache=MerchantCache(), budget_store=BudgetAggregateStore(IN_MEMORY))
+            started = stderr.getvalue()
+            health = service.health()
+    finally:
+        for name, value in previous.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+    service.close()
+
+    assert service.uses_mock and health["mode"] == "ntropy"
+    assert "WARNING" in started and "mock" in started
+    # Every probe says so too
+    assert health["mock_sdk"] is True and "not Ntropy" in health["warning"]
+    assert stderr.getvalue().count("WARNING") == 2
+
+    real = EnrichmentService(merchant_cache=MerchantCache(), budget_store=BudgetAggregateStore(IN_MEMORY))
+    assert real.health()["mock_sdk"] is False and "warning" not in real.health()
+    real.close()
+
+
+if __name__ == "__main__":
+    test_labels_are_deterministic()
+    test_error_and_rate_limit_rates()
+    test_max_in_flight_answers_429()
+    test_injected_sdk_enables_ntropy_mode()
+    test_mock_from_env_warns_loudly()
+    print("✅ Mock Ntropy provider behaves deterministically")
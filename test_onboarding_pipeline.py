@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test the single-call onboarding pipeline: raw transactions and confirmed
+accounts in, NDJSON stage results out (enriched → budget → portfolio → plan).
+"""
+
+import json
+import os
+import tempfile
+
+os.environ.setdefault("RESOLVE_STATE_DIR", tempfile.mkdtemp(prefix="resolve-test-"))
+
+from fastapi.testclient import TestClient
+
+import enrichment_service
+from budget_store import BudgetAggregateStore
+from enrichment_service import EnrichmentService
+from local_store import IN_MEMORY
+from main import app
+
+
+def history():
+    transactions = []
+    for month in (1, 2, 3):
+        transactions += [
+            {"transaction_id": f"sal_{month}", "description": "SALARY ACME LTD", "amount": 3000,
+             "transaction_type": "CREDIT", "timestamp": f"2025-{month:02d}-25T00:00:00Z"},
+            {"transaction_id": f"rent_{month}", "description": "STANDING ORDER RENT", "amount": -1200,
+             "transaction_type": "STANDING_ORDER", "timestamp": f"2025-{month:02d}-01T00:00:00Z"},
+            {"transaction_id": f"bnpl_{month}", "description": "KLARNA*ASOS", "amount": -150,
+             "transaction_type": "DEBIT", "timestamp": f"2025-{month:02d}-15T00:00:00Z"},
+            {"transaction_id": f"shop_{month}", "description": "TESCO STORES", "amount": -100 * month,
+             "transaction_type": "DEBIT", "timestamp": f"2025-{month:02d}-10T00:00:00Z"},
+        ]
+    return transactions
+
+
+def request_body(**overrides):
+    body = {
+        "user_id": "user_041",
+        "transactions": history(),
+        "accounts": [{
+            "lender_name": "Barclaycard",
+            "account_type": "Credit Card",
+            "current_balance_cents": 250000,
+            "apr_standard_bps": 2299,
+            "payment_due_day": 15,
+            "min_payment_rule": {"fixed_cents": 2500, "percentage_bps": 100},
+        }],
+        "preferences": {
+            "strategy": "Minimize Total Interest",
+            "payment_shape": "Optimized (Variable Amounts)",
+        },
+        "plan_start_date": "2025-04-01",
+    }
+    body.update(overrides)
+    return body
+
+
+def run_pipeline(body):
+    enrichment_service.close_enrichment_service()
+    enrichment_service._shared_service = EnrichmentService(budget_store=BudgetAggregateStore(IN_MEMORY))
+    try:
+        with TestClient(app) as client:
+            response = client.post("/onboarding-plan", json=body)
+            assert response.status_code == 200
+            return [json.loads(line) for line in response.text.splitlines() if line.strip()]
+    finally:
+        enrichment_service.close_enrichment_service()
+
+
+def test_pipeline_streams_every_stage():
+    events = run_pipeline(request_body())
+    assert [e["type"] for e in events] == ["enriched", "budget", "portfolio", "plan", "complete"]
+
+    enriched, budget, portfolio, plan, complete = events
+    assert enriched["transaction_count"] == 12
+    assert len(enriched["enriched_transactions"]) == 12
+
+    # The derived budget is safe-to-spend: income minus fixed costs
+    analysis = budget["budget_analysis"]
+    assert analysis["averageMonthlyIncomeCents"] == 300000 and analysis["fixedCostsCents"] == 120000
+    assert budget["monthly_budget_cents"] == analysis["safeToSpendCents"] == 180000
+    assert {d["description"] for d in budget["detected_debts"]} == {"KLARNA*ASOS"}
+
+    assert portfolio == {"type": "portfolio", "account_count": 1, "total_balance_cents": 250000,
+                         "monthly_budget_cents": 180000, "plan_start_date": "2025-04-01"}
+    assert plan["status"] == "OPTIMAL"
+    assert plan["plan"][0]["lender_name"] == "Barclaycard"
+    assert plan["plan"][-1]["ending_balance_cents"] <= 0
+    assert set(complete["stage_ms"]) == {"enriched", "budget", "portfolio", "plan"}
+    print(f"   stage timings: {complete['stage_ms']}")
+
+
+def test_budget_override_and_lean_payload():
+    events = run_pipeline(request_body(monthly_budget_cents=50000, include_transactions=False))
+    enriched, budget, portfolio = events[:3]
+    assert "enriched_transactions" not in enriched
+    assert budget["monthly_budget_cents"] == portfolio["monthly_budget_cents"] == 50000
+    assert events[-1]["type"] == "complete"
+
+
+def test_invalid_portfolio_ends_with_stage_error():
+    events = run_pipeline(request_body(lump_sum_payments=[["2025-06-01", -100]]))
+    assert [e["type"] for e in events] == ["enriched", "budget", "error"]
+    assert events[-1]["stage"] == "portfolio"
+
+
+if __name__ == "__main__":
+    test_pipeline_streams_every_stage()
+    test_budget_override_and_lean_payload()
+    test_invalid_portfolio_ends_with_stage_error()
+    print("✅ Onboarding pipeline streams every stage")
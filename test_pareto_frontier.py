@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test the Pareto frontier: the least-interest plan anchors the top, capped
+solves run in parallel below it, every plan respects its monthly cap, and
+one SolveHandle stops all of the concurrent searches.
+"""
+
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from ortools.sat.python import cp_model
+
+import main
+import solver_engine
+from solver_engine import FORMULATION_LINEAR, SolveHandle, SolveOptions, TERMINATION_CANCELLED, solve_pareto_frontier
+from test_solve_cancellation import hard_portfolio
+from test_solve_options import make_portfolio
+from test_solver_runtime import portfolio_json
+
+
+def monthly_totals(plan):
+    totals = {}
+    for row in plan:
+        totals[row.month] = totals.get(row.month, 0) + row.payment_cents
+    return totals
+
+
+def test_frontier_trades_interest_for_lower_payments():
+    print("\n=== One card, 6 points ===")
+    portfolio = make_portfolio([(250000, 2299)], 60000, SolveOptions(max_time_seconds=20))
+    started = time.monotonic()
+    frontier = solve_pareto_frontier(portfolio, 6)
+    elapsed = time.monotonic() - started
+
+    assert len(frontier) == 6
+    caps = [point.payment_cap_cents for point in frontier]
+    assert caps == sorted(caps, reverse=True) and len(set(caps)) == 6
+    assert caps[0] <= 60000  # The least-interest plan stays within the budget
+
+    solved = [point for point in frontier if point.plan is not None]
+    assert len(solved) >= 5
+    for point in solved:
+        totals = monthly_totals(point.plan)
+        assert max(totals.values()) == point.peak_payment_cents <= point.payment_cap_cents
+        assert point.total_interest_cents == sum(row.interest_charged_cents for row in point.plan)
+        assert point.average_payment_cents <= point.peak_payment_cents
+        print(f"   cap ${point.payment_cap_cents / 100:,.2f}: interest ${point.total_interest_cents / 100:,.2f}, "
+              f"paid off month {point.payoff_month} ({point.termination_reason})")
+
+    # Lower caps cost more interest and take longer
+    frontier_points = [point for point in solved if point.on_frontier]
+    assert frontier_points[0] is frontier[0]
+    assert [p.total_interest_cents for p in frontier_points] == sorted(p.total_interest_cents for p in frontier_points)
+    assert frontier_points[-1].payoff_month > frontier_points[0].payoff_month
+    assert elapsed < 20 + 5.0
+    print(f"✓ {len(frontier_points)} frontier points in {elapsed:.1f}s")
+
+
+def test_frontier_uses_the_requested_formulation():
+    print("\n=== Linear formulation, 3 points ===")
+    portfolio = make_portfolio([(250000, 2299)], 60000, SolveOptions(max_time_seconds=10, formulation=FORMULATION_LINEAR))
+    real_build = solver_engine.build_payment_model
+    formulations = []
+
+    def build(portfolio, formulation=None):
+        formulations.append(formulation)
+        return real_build(portfolio, formulation)
+
+    solver_engine.build_payment_model = build
+    try:
+        frontier = solve_pareto_frontier(portfolio, 3)
+    finally:
+        solver_engine.build_payment_model = real_build
+
+    # The anchor and every capped point
+    assert formulations == [FORMULATION_LINEAR] * 3
+    for point in frontier:
+        if point.plan is not None:
+            assert max(monthly_totals(point.plan).values()) <= point.payment_cap_cents
+    print(f"✓ {len(formulations)} linear models built")
+
+
+def test_handle_stops_every_search():
+    print("\n=== SolveHandle with concurrent searches ===")
+    handle = SolveHandle()
+    options = SolveOptions(max_time_seconds=10.0)
+    first, second = cp_model.CpSolver(), cp_model.CpSolver()
+    first.parameters.num_workers = second.parameters.num_workers = 2
+    assert handle.attach(first, options) and handle.attach(second, options)
+    handle.detach(second)
+    # Only the search still attached counts
+    assert 19.0 < handle.cancel() <= 20.0
+    assert not handle.attach(cp_model.CpSolver(), options)
+
+    handle = SolveHandle()
+    outcome = {}
+    worker = threading.Thread(target=lambda: outcome.update(frontier=solve_pareto_frontier(hard_portfolio(), 4, handle=handle)))
+    started = time.monotonic()
+    worker.start()
+    time.sleep(1.0)
+    handle.cancel()
+    worker.join(timeout=10)
+
+    assert not worker.is_alive() and time.monotonic() - started < 5.0
+    assert outcome["frontier"][0].termination_reason == TERMINATION_CANCELLED
+    print(f"✓ frontier stopped after {time.monotonic() - started:.2f}s")
+
+
+def test_pareto_frontier_endpoint():
+    print("\n=== /pareto-frontier?points=3 ===")
+    client = TestClient(main.app)
+
+    response = client.post("/pareto-frontier?points=3", json=portfolio_json())
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert len(body["points"]) == 3
+    top = body["points"][0]
+    assert top["on_frontier"] and top["plan"] and top["solve_stats"]["num_workers"] >= 1
+    assert top["total_interest_cents"] <= min(p["total_interest_cents"] for p in body["points"] if p["plan"])
+
+    assert client.post("/pareto-frontier?points=1", json=portfolio_json()).status_code == 422
+    assert client.post("/pareto-frontier?points=13", json=portfolio_json()).status_code == 422
+    print(f"✓ {len(body['points'])} points in {body['wall_time_seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    test_frontier_trades_interest_for_lower_payments()
+    test_frontier_uses_the_requested_formulation()
+    test_handle_stops_every_search()
+    test_pareto_frontier_endpoint()
+    print("\n✅ All Pareto frontier tests passed!")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test plan alternatives: after the best plan, short follow-up searches on the
+same model return plans that differ from it (and each other) by at least the
+requested amount, with their objective values.
+"""
+
+from fastapi.testclient import TestClient
+
+import main
+from solver_engine import (
+    ALTERNATIVE_FROM_INCUMBENT,
+    OBJECTIVE_LEXICOGRAPHIC,
+    SolveOptions,
+    TERMINATION_OPTIMAL,
+    solve_plan_alternatives,
+)
+from test_solve_options import make_portfolio
+from test_solver_runtime import portfolio_json
+
+
+def payments(plan):
+    return {(row.lender_name, row.month): row.payment_cents for row in plan}
+
+
+def distance(plan_a, plan_b):
+    a, b = payments(plan_a), payments(plan_b)
+    return sum(abs(a.get(key, 0) - b.get(key, 0)) for key in set(a) | set(b))
+
+
+def test_alternatives_differ_from_the_best_plan():
+    print("\n=== Two cards, up to 3 alternatives ===")
+    portfolio = make_portfolio([(250000, 2299), (90000, 2999)], 60000)
+    best, alternatives = solve_plan_alternatives(portfolio, 3, min_difference_cents=20000)
+
+    assert best.termination_reason == TERMINATION_OPTIMAL
+    # Follow-ups are time-limited, so a loaded machine may find fewer than asked for
+    assert 1 <= len(alternatives) <= 3
+    plans = [best.plan] + [alternative.plan for alternative in alternatives]
+    for i, alternative in enumerate(alternatives):
+        # No better than the proven optimum, and at least the requested distance from every earlier plan
+        assert alternative.objective_value >= best.stats.objective_value
+        assert alternative.difference_cents == distance(alternative.plan, best.plan) >= 20000
+        for earlier in plans[:i + 1]:
+            assert distance(alternative.plan, earlier) >= 20000
+        print(f"   alternative {i + 1}: objective +{alternative.objective_value / best.stats.objective_value - 1:.1%}, "
+              f"{alternative.difference_cents / 100:,.0f} moved, {alternative.termination_reason}")
+
+    # Incumbents from the best plan's search come first, best first
+    reasons = [alternative.termination_reason for alternative in alternatives]
+    assert reasons == sorted(reasons, key=lambda reason: reason != ALTERNATIVE_FROM_INCUMBENT)
+    incumbents = [a.objective_value for a in alternatives if a.termination_reason == ALTERNATIVE_FROM_INCUMBENT]
+    assert incumbents == sorted(incumbents)
+
+
+def test_no_alternative_when_none_is_far_enough():
+    print("\n=== Impossible diversity ===")
+    portfolio = make_portfolio([(250000, 2299)], 60000)
+    # Can't move more payment than the debt plus its interest, twice over
+    best, alternatives = solve_plan_alternatives(portfolio, 2, min_difference_cents=10_000_000)
+    assert best.plan and alternatives == []
+    print("✓ best plan returned alone")
+
+
+def test_lexicographic_alternatives_hold_the_primary_term():
+    print("\n=== Lexicographic mode, 5% tolerance ===")
+    options = SolveOptions(objective_mode=OBJECTIVE_LEXICOGRAPHIC, lexicographic_tolerance=0.05)
+    lexicographic_best, alternatives = solve_plan_alternatives(
+        make_portfolio([(250000, 2299), (90000, 2999)], 60000, options), 1, min_difference_cents=20000
+    )
+    least_interest = sum(row.interest_charged_cents for row in lexicographic_best.plan)
+
+    assert lexicographic_best.termination_reason == TERMINATION_OPTIMAL and len(alternatives) == 1
+    alternative = alternatives[0]
+    # Interest stays within the tolerance; plans are ranked by the tie-breaker (ending balances)
+    assert sum(row.interest_charged_cents for row in alternative.plan) <= least_interest * 1.05
+    assert alternative.objective_value == sum(row.ending_balance_cents for row in alternative.plan)
+    assert alternative.objective_value >= lexicographic_best.stats.objective_value
+    assert distance(alternative.plan, lexicographic_best.plan) >= 20000
+    print(f"✓ alternative within 5% of the least interest, tie-breaker +{alternative.objective_value - lexicographic_best.stats.objective_value:,.0f}")
+
+
+def test_generate_plan_with_alternatives():
+    print("\n=== /generate-plan?alternatives=2 ===")
+    client = TestClient(main.app)
+
+    response = client.post("/generate-plan?alternatives=2", json=portfolio_json())
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["status"] == "OPTIMAL" and body["plan"]
+    assert [alternative["rank"] for alternative in body["alternatives"]] == list(range(1, len(body["alternatives"]) + 1))
+    assert 1 <= len(body["alternatives"]) <= 2
+    for alternative in body["alternatives"]:
+        assert alternative["objective_increase"] >= 0
+        assert alternative["plan"] and alternative["difference_cents"] > 0
+        assert alternative["payoff_month"] == max(row["month"] for row in alternative["plan"])
+
+    # Without the parameter, no alternatives are searched for
+    assert client.post("/generate-plan", json=portfolio_json()).json()["alternatives"] is None
+    assert client.post("/generate-plan?alternatives=6", json=portfolio_json()).status_code == 422
+    print(f"✓ {len(body['alternatives'])} alternatives returned")
+
+
+if __name__ == "__main__":
+    test_alternatives_differ_from_the_best_plan()
+    test_no_alternative_when_none_is_far_enough()
+    test_lexicographic_alternatives_hold_the_primary_term()
+    test_generate_plan_with_alternatives()
+    print("\n✅ All plan alternative tests passed!")
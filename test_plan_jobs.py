@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Test plan jobs: POST /plan-jobs returns at once, GET /plan-jobs/{id} shows
+the incumbent while solving and the result when done, finished plans are
+reused and survive a worker restart, and saturation is refused up front.
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import httpx
+
+import main
+import plan_jobs
+import solver_runtime
+from plan_jobs import JOB_COMPLETE, JOB_INTERRUPTED, JOB_RUNNING, PlanJobStore
+from solver_engine import Incumbent, MonthlyResult
+from solver_runtime import SolverRuntime
+from test_solver_runtime import portfolio_json
+import schemas
+
+
+def fresh_store():
+    path = os.path.join(tempfile.mkdtemp(prefix="plan-jobs-test-"), "plan_jobs.db")
+    return path, PlanJobStore(path)
+
+
+def install(store, runtime=None):
+    previous = (plan_jobs._shared_plan_job_store, solver_runtime._shared_runtime)
+    plan_jobs._shared_plan_job_store = store
+    solver_runtime._shared_runtime = runtime or SolverRuntime()
+    return previous
+
+
+def restore(previous):
+    solver_runtime._shared_runtime.close()
+    plan_jobs._shared_plan_job_store, solver_runtime._shared_runtime = previous
+
+
+async def poll(client, job_id, until, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = (await client.get(f"/plan-jobs/{job_id}")).json()
+        if until(job):
+            return job
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"job {job_id} stuck: {job}")
+
+
+def test_store_survives_restart():
+    print("\n=== Store: restart ===")
+    path, store = fresh_store()
+    portfolio = schemas.DebtPortfolio.model_validate(portfolio_json())
+    done = store.create_job(portfolio, "user_1", "interactive")
+    store.save_result(done, {"status": "OPTIMAL", "plan": []})
+    unfinished = store.create_job(schemas.DebtPortfolio.model_validate(portfolio_json(61000)), "user_1", "interactive")
+    store.set_status(unfinished, JOB_RUNNING)
+    store.close()
+
+    reopened = PlanJobStore(path)
+    assert reopened.get_job(done)["status"] == JOB_COMPLETE
+    assert reopened.get_job(done)["result"] == {"status": "OPTIMAL", "plan": []}
+    assert reopened.get_job(unfinished)["status"] == JOB_INTERRUPTED
+    assert reopened.latest_complete("user_1")["job_id"] == done
+    assert reopened.latest_complete("user_2") is None
+    assert reopened.get_job(done, include_portfolio=True)["portfolio"]["budget"]["monthly_budget_cents"] == 60000
+    reopened.close()
+    print("✓ finished plan kept, unfinished job marked interrupted")
+
+
+def test_job_reports_incumbent_then_result():
+    print("\n=== Job: incumbent while running, then result ===")
+    real_solve = main.solve_portfolio
+    release = threading.Event()
+
+    def solve_with_incumbent(portfolio, handle=None, on_incumbent=None):
+        on_incumbent(Incumbent(
+            objective_value=1200.0, best_objective_bound=1000.0, wall_time_seconds=0.5,
+            plan=[MonthlyResult(month=1, lender_name="Barclaycard", payment_cents=60000,
+                                interest_charged_cents=0, ending_balance_cents=190000)],
+        ))
+        release.wait(10)
+        return real_solve(portfolio, handle)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/plan-jobs", json={"user_id": "user_1", "portfolio": portfolio_json()})
+            assert response.status_code == 202, response.text
+            job_id = response.json()["job_id"]
+            assert response.json()["reused"] is False
+
+            running = await poll(client, job_id, lambda job: job["incumbent"] is not None)
+            release.set()
+            finished = await poll(client, job_id, lambda job: job["status"] == JOB_COMPLETE)
+
+            again = (await client.post("/plan-jobs", json={"user_id": "user_1", "portfolio": portfolio_json()})).json()
+            latest = (await client.get("/plan-jobs/latest", params={"user_id": "user_1"})).json()
+            missing = await client.get("/plan-jobs/not-a-job")
+            return running, finished, again, latest, missing
+
+    _, store = fresh_store()
+    previous = install(store)
+    main.solve_portfolio = solve_with_incumbent
+    try:
+        running, finished, again, latest, missing = asyncio.run(scenario())
+    finally:
+        main.solve_portfolio = real_solve
+        restore(previous)
+
+    assert running["status"] == JOB_RUNNING
+    assert running["incumbent"]["objective_value"] == 1200.0
+    assert abs(running["incumbent"]["relative_gap"] - 200 / 1200) < 1e-9
+    assert running["incumbent"]["plan"][0]["payment_cents"] == 60000
+    assert finished["result"]["status"] == "OPTIMAL" and finished["result"]["plan"]
+    assert again["reused"] is True and again["job_id"] == finished["job_id"]
+    assert latest["job_id"] == finished["job_id"]
+    assert missing.status_code == 404
+    store.close()
+    print(f"✓ job {finished['job_id'][:8]}: incumbent → {finished['result']['termination_reason']}, reused on resubmit")
+
+
+def test_coalesced_jobs_all_report_progress():
+    print("\n=== Jobs: identical portfolios share one solve ===")
+    real_solve = main.solve_portfolio
+    release = threading.Event()
+    solves = []
+
+    def solve_with_incumbent(portfolio, handle=None, on_incumbent=None):
+        solves.append(portfolio)
+        on_incumbent(Incumbent(
+            objective_value=1200.0, best_objective_bound=1000.0, wall_time_seconds=0.5,
+            plan=[MonthlyResult(month=1, lender_name="Barclaycard", payment_cents=60000,
+                                interest_charged_cents=0, ending_balance_cents=190000)],
+        ))
+        release.wait(10)
+        on_incumbent(Incumbent(objective_value=1100.0, best_objective_bound=1000.0, wall_time_seconds=1.0, plan=[]))
+        return real_solve(portfolio, handle)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            leader = (await client.post("/plan-jobs", json={"user_id": "user_1", "portfolio": portfolio_json()})).json()
+            await poll(client, leader["job_id"], lambda job: job["incumbent"] is not None)
+            # Another user's identical portfolio joins the running solve
+            follower = (await client.post("/plan-jobs", json={"user_id": "user_2", "portfolio": portfolio_json()})).json()
+            joined = await poll(client, follower["job_id"], lambda job: job["incumbent"] is not None)
+            release.set()
+            finished = [
+                await poll(client, job["job_id"], lambda job: job["status"] == JOB_COMPLETE)
+                for job in (leader, follower)
+            ]
+            return joined, finished
+
+    _, store = fresh_store()
+    previous = install(store)
+    main.solve_portfolio = solve_with_incumbent
+    try:
+        joined, finished = asyncio.run(scenario())
+    finally:
+        main.solve_portfolio = real_solve
+        restore(previous)
+
+    assert len(solves) == 1
+    # The follower caught up on the running solve's status and incumbent
+    assert joined["status"] == JOB_RUNNING and joined["incumbent"]["objective_value"] == 1200.0
+    for job in finished:
+        assert job["incumbent"]["objective_value"] == 1100.0
+        assert job["result"]["status"] == "OPTIMAL"
+    assert not plan_jobs._job_flights
+    store.close()
+    print("✓ one solve; both jobs running with every incumbent, then complete")
+
+
+def test_real_solve_and_read_after_restart():
+    print("\n=== Job: real solve, read back after restart ===")
+
+    async def submit_and_wait():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            job_id = (await client.post("/plan-jobs", json={"user_id": "user_9", "portfolio": portfolio_json()})).json()["job_id"]
+            return await poll(client, job_id, lambda job: job["status"] == JOB_COMPLETE)
+
+    async def read_latest():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return (await client.get("/plan-jobs/latest", params={"user_id": "user_9"})).json()
+
+    path, store = fresh_store()
+    previous = install(store)
+    try:
+        finished = asyncio.run(submit_and_wait())
+        # A new worker opens the same database
+        store.close()
+        plan_jobs._shared_plan_job_store = PlanJobStore(path)
+        solves_before = solver_runtime._shared_runtime.stats()["solves_started"]
+        latest = asyncio.run(read_latest())
+        assert solver_runtime._shared_runtime.stats()["solves_started"] == solves_before
+    finally:
+        plan_jobs._shared_plan_job_store.close()
+        restore(previous)
+
+    assert finished["result"]["termination_reason"] == "optimal"
+    assert latest["job_id"] == finished["job_id"]
+    assert latest["result"]["plan"] == finished["result"]["plan"]
+    print(f"✓ {len(latest['result']['plan'])} plan rows read back without solving")
+
+
+def test_saturated_solver_rejects_job():
+    print("\n=== Job: solver saturated ===")
+    real_solve = main.solve_portfolio
+
+    def slow_solve(portfolio, handle=None, on_incumbent=None):
+        time.sleep(0.3)
+        return real_solve(portfolio, handle)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/plan-jobs", json={"portfolio": portfolio_json(60000)})
+            second = await client.post("/plan-jobs", json={"portfolio": portfolio_json(61000)})
+            await poll(client, first.json()["job_id"], lambda job: job["status"] == JOB_COMPLETE)
+            return first, second
+
+    _, store = fresh_store()
+    previous = install(store, SolverRuntime(max_concurrent=1, max_queue=0))
+    main.solve_portfolio = slow_solve
+    try:
+        first, second = asyncio.run(scenario())
+    finally:
+        main.solve_portfolio = real_solve
+        restore(previous)
+        store.close()
+
+    assert first.status_code == 202
+    assert second.status_code == 503 and int(second.headers["Retry-After"]) >= 1
+    print("✓ second job refused with 503 + Retry-After")
+
+
+if __name__ == "__main__":
+    test_store_survives_restart()
+    test_job_reports_incumbent_then_result()
+    test_coalesced_jobs_all_report_progress()
+    test_real_solve_and_read_after_restart()
+    test_saturated_solver_rejects_job()
+    print("\n✅ All plan job tests passed!")
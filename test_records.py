@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test that the slotted pipeline records dump to exactly what the Pydantic
+schemas would, that normalisation coerces raw input the models used to, and
+that the API still validates raw transactions and its response at the boundary.
+"""
+
+from fastapi.testclient import TestClient
+
+import enrichment_service
+import main
+from budget_store import BudgetAggregateStore
+from local_store import IN_MEMORY
+from merchant_cache import MerchantCache
+from enrichment_service import EnrichedRecord, EnrichmentService, NtropyOutputModel, TrueLayerIngestModel
+
+
+def test_enriched_record_dump_matches_model():
+    fields = {
+        "transaction_id": "tx_1", "original_description": "NETFLIX.COM",
+        "merchant_clean_name": "Netflix", "labels": ["subscription"], "is_recurring": True,
+        "recurrence_frequency": "monthly", "recurrence_day": 3, "amount_cents": 1099,
+        "entry_type": "outgoing", "budget_category": "fixed", "transaction_date": "2025-03-03",
+    }
+    record = EnrichedRecord(**fields)
+    assert record.model_dump() == NtropyOutputModel(**fields).model_dump()
+    assert record.to_model() == NtropyOutputModel(**fields)
+    assert EnrichedRecord(**record.model_dump()) == record
+
+    # Dumps are independent copies
+    record.model_dump()["labels"].append("changed")
+    assert record.labels == ["subscription"]
+
+
+def test_normalize_coerces_like_the_model():
+    service = EnrichmentService()
+    raw = {"transaction_id": "tx_2", "description": "TESCO", "amount": -25,
+           "transaction_type": "debit", "timestamp": "2025-03-14T09:12:00+00:00"}
+    record = service.normalize_truelayer_transaction(raw)
+    model = TrueLayerIngestModel(
+        transaction_id="tx_2", description="TESCO", amount=25, transaction_type="DEBIT",
+        transaction_classification=[], timestamp="2025-03-14",
+    )
+    assert {name: getattr(record, name) for name in TrueLayerIngestModel.model_fields} == model.model_dump()
+    assert isinstance(record.amount, float)
+
+    # A missing description no longer fails the whole request
+    assert service.normalize_truelayer_transaction({**raw, "description": None}).description == ""
+    service.close()
+
+
+def test_api_validates_raw_transactions():
+    previous = enrichment_service._shared_service
+    enrichment_service._shared_service = EnrichmentService(
+        merchant_cache=MerchantCache(), budget_store=BudgetAggregateStore(IN_MEMORY)
+    )
+    try:
+        client = TestClient(main.app)
+        row = {"transaction_id": "tx_3", "description": "TESCO STORES", "amount": -25.5,
+               "transaction_type": "DEBIT", "timestamp": "2025-03-14T09:12:00+00:00",
+               "running_balance": {"amount": 100.0}}
+
+        def post(**changes):
+            return client.post("/enrich-transactions", json={"user_id": "user_039", "transactions": [{**row, **changes}]})
+
+        # Other TrueLayer fields pass through; the response rows are validated models
+        response = post()
+        assert response.status_code == 200, response.text
+        enriched = response.json()["enriched_transactions"]
+        assert [NtropyOutputModel(**tx).transaction_id for tx in enriched] == ["tx_3"]
+        assert enriched[0]["amount_cents"] == 2550
+
+        for changes in ({"transaction_id": 3}, {"currency": None}, {"amount": "-25.50"}, {"amount": True},
+                        {"timestamp": None}):
+            assert post(**changes).status_code == 422, changes
+        # The streaming endpoints share the request model
+        assert client.post("/enrich-transactions-ndjson", json={
+            "user_id": "user_039", "transactions": [{**row, "amount": "-25.50"}]
+        }).status_code == 422
+    finally:
+        enrichment_service._shared_service.close()
+        enrichment_service._shared_service = previous
+    print("✓ bad raw transactions rejected with 422, response rows validated")
+
+
+if __name__ == "__main__":
+    test_enriched_record_dump_matches_model()
+    test_normalize_coerces_like_the_model()
+    test_api_validates_raw_transactions()
+    print("✅ Pipeline records match the Pydantic schemas")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test local recurrence detection (recurrence_detector.py) and its use in the
+columnar fallback classifier.
+"""
+
+from datetime import date, timedelta
+
+from classification_engine import TransactionColumns, classify_fallback_columns
+from recurrence_detector import SeriesWindow, detect_recurrence, merchant_key
+
+
+def series(description, amount_cents, start, step_days, count, entry_type="outgoing"):
+    first = date.fromisoformat(start)
+    return [
+        (description, amount_cents, entry_type, (first + timedelta(days=step_days * i)).isoformat())
+        for i in range(count)
+    ]
+
+
+def monthly(description, amount_cents, day, months, entry_type="outgoing"):
+    return [
+        (description, amount_cents, entry_type, date(2025, month, day).isoformat())
+        for month in range(1, months + 1)
+    ]
+
+
+def run(rows):
+    descriptions, amounts, entry_types, dates = (list(col) for col in zip(*rows))
+    return detect_recurrence(descriptions, amounts, entry_types, dates)
+
+
+def test_merchant_key_strips_rails_and_references():
+    assert merchant_key("DD NETFLIX.COM 8812") == "netflix"
+    assert merchant_key("NETFLIX.COM REF 55102") == "netflix"
+    assert merchant_key("KLARNA*ASOS 12/03") == "klarna asos"
+    assert merchant_key("STANDING ORDER TO J SMITH RENT") == "smith rent"
+    assert merchant_key("12345 /") == ""
+
+
+def test_detects_each_period():
+    cases = {
+        "weekly": series("GYM CLASS", 800, "2025-01-03", 7, 8),
+        "fortnightly": series("CLEANER", 6000, "2025-01-03", 14, 6),
+        "monthly": monthly("VODAFONE LTD", 2500, 15, 6),
+        "quarterly": series("WATER CO", 9000, "2024-01-10", 91, 4),
+        "annual": series("TV LICENCE", 15950, "2022-04-01", 365, 3),
+    }
+    for expected, rows in cases.items():
+        frequencies, _ = run(rows)
+        assert frequencies == [expected] * len(rows), (expected, frequencies)
+
+
+def test_recurrence_day_is_usual_day_of_month():
+    rows = monthly("SPOTIFY", 1199, 3, 4) + [("SPOTIFY", 1199, "outgoing", "2025-05-05")]
+    frequencies, days = run(rows)
+    print(f"  spotify: {set(frequencies)} day {set(days)}")
+    assert set(frequencies) == {"monthly"}
+    assert set(days) == {3}
+
+    frequencies, days = run(series("GYM CLASS", 800, "2025-01-03", 7, 5))
+    assert days == [None] * 5
+
+
+def test_amount_bands_split_different_series():
+    # Same merchant: a monthly subscription plus irregular one-off purchases
+    rows = monthly("AMAZON", 899, 10, 5) + [
+        ("AMAZON", 4599, "outgoing", "2025-01-21"),
+        ("AMAZON", 13000, "outgoing", "2025-02-02"),
+        ("AMAZON", 2250, "outgoing", "2025-04-18"),
+    ]
+    frequencies, _ = run(rows)
+    assert frequencies[:5] == ["monthly"] * 5
+    assert frequencies[5:] == [None] * 3
+
+
+def test_amount_bands_do_not_chain_drifting_amounts():
+    # A weekly shop whose amounts drift within 10% of each other step by step,
+    # but span 40% overall, is not one series
+    amounts = [4000, 5200, 4400, 6100, 4800, 5600, 6500, 4200]
+    shop = series("TESCO STORES 3412", 0, "2025-01-04", 7, len(amounts))
+    shop = [(d, amount, e, day) for (d, _, e, day), amount in zip(shop, amounts)]
+    assert run(shop)[0] == [None] * len(amounts)
+
+    # A bill that rises once by no more than the band width stays one series
+    bill = monthly("VODAFONE LTD", 999, 15, 3) + [
+        ("VODAFONE LTD", 1099, "outgoing", date(2025, month, 15).isoformat()) for month in (4, 5, 6)
+    ]
+    assert run(bill)[0] == ["monthly"] * 6
+
+
+def test_irregular_and_short_histories_are_not_recurring():
+    irregular = [
+        ("TESCO STORES 3412", 4000 + i * 37, "outgoing", d)
+        for i, d in enumerate(["2025-01-02", "2025-01-05", "2025-01-19", "2025-02-20", "2025-02-22"])
+    ]
+    assert run(irregular)[0] == [None] * len(irregular)
+    # Two monthly payments are not enough evidence
+    assert run(monthly("NEW SUBSCRIPTION", 500, 1, 2))[0] == [None, None]
+    # Same merchant and amount but opposite directions are separate series
+    mixed = [
+        ("ACME", 1000, "outgoing" if i % 2 else "incoming", date(2025, i + 1, 1).isoformat())
+        for i in range(6)
+    ]
+    assert run(mixed)[0] == [None] * 6
+
+
+def test_columnar_fallback_uses_detected_series():
+    rows = monthly("VODAFONE LTD", 2500, 15, 4) + [("PRET A MANGER", 450, "outgoing", "2025-02-02")]
+    columns = TransactionColumns(
+        transaction_ids=[f"tx_{i}" for i in range(len(rows))],
+        descriptions=[r[0] for r in rows],
+        amounts=[r[1] / 100 for r in rows],
+        transaction_types=["DEBIT"] * len(rows),
+        dates=[r[3] for r in rows],
+        labels=[[] for _ in rows],
+    )
+    records = list(classify_fallback_columns(columns).records())
+
+    for record in records[:4]:
+        assert record["is_recurring"] and record["recurrence_frequency"] == "monthly"
+        assert record["recurrence_day"] == 15
+        assert record["budget_category"] == "fixed"
+    assert not records[4]["is_recurring"]
+    assert records[4]["budget_category"] == "discretionary"
+
+    # Without detection only the keyword rules apply
+    plain = list(classify_fallback_columns(columns, detect_series=False).records())
+    assert all(not r["is_recurring"] and r["budget_category"] == "discretionary" for r in plain)
+
+
+def test_series_window_detects_across_pieces():
+    window = SeriesWindow(size=4)
+    rows = monthly("VODAFONE LTD", 2500, 15, 6)
+    found = []
+    for piece in (rows[:2], rows[2:3], rows[3:]):
+        frequencies, days = window.detect(*(list(column) for column in zip(*piece)))
+        found += list(zip(frequencies, days))
+    # Two payments aren't a series yet; the third completes it
+    assert found == [(None, None)] * 2 + [("monthly", 15)] * 4
+    # Only the latest occurrences per merchant are kept
+    assert [len(kept) for kept in window._windows.values()] == [4]
+
+
+if __name__ == "__main__":
+    test_merchant_key_strips_rails_and_references()
+    test_detects_each_period()
+    test_recurrence_day_is_usual_day_of_month()
+    test_amount_bands_split_different_series()
+    test_amount_bands_do_not_chain_drifting_amounts()
+    test_irregular_and_short_histories_are_not_recurring()
+    test_columnar_fallback_uses_detected_series()
+    test_series_window_detects_across_pieces()
+    print("✅ Recurrence detection works")
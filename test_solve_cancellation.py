@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test cancelling solves: a SolveHandle stops a running CP-SAT search, the
+runtime stops or drops a solve once every caller has gone, and
+/generate-plan abandons its solve when the HTTP client disconnects.
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import main
+import solver_runtime
+from solver_engine import SolveHandle, SolveOptions, TERMINATION_CANCELLED, solve_payment_plan
+from solver_runtime import SolverRuntime
+from test_solve_options import make_portfolio
+
+# Three cards on a tight budget: takes CP-SAT well over the test's patience
+HARD_BALANCES = [(350000, 2299), (180000, 2999), (520000, 1899)]
+
+
+def hard_portfolio(max_time_seconds=30.0):
+    return make_portfolio(HARD_BALANCES, 60000, SolveOptions(max_time_seconds=max_time_seconds, num_workers=1))
+
+
+def hard_portfolio_json(max_time_seconds=30):
+    return {
+        "accounts": [{
+            "lender_name": f"Card {i + 1}",
+            "account_type": "Credit Card",
+            "current_balance_cents": balance,
+            "apr_standard_bps": apr,
+            "payment_due_day": 5,
+            "min_payment_rule": {"fixed_cents": 2500, "percentage_bps": 100, "includes_interest": True},
+        } for i, (balance, apr) in enumerate(HARD_BALANCES)],
+        "budget": {"monthly_budget_cents": 60000},
+        "preferences": {"strategy": "Minimize Total Interest", "payment_shape": "Optimized (Variable Amounts)"},
+        "plan_start_date": "2025-01-01",
+        "solve_options": {"max_time_seconds": max_time_seconds, "num_workers": 1},
+    }
+
+
+def test_handle_stops_a_running_search():
+    print("\n=== SolveHandle.cancel() during the search ===")
+    handle = SolveHandle()
+    outcome = {}
+
+    def solve():
+        outcome["result"] = solve_payment_plan(hard_portfolio(), handle=handle)
+
+    worker = threading.Thread(target=solve)
+    started = time.monotonic()
+    worker.start()
+    time.sleep(1.0)
+    reclaimed = handle.cancel()
+    worker.join(timeout=10)
+
+    assert not worker.is_alive()
+    assert time.monotonic() - started < 5.0
+    assert outcome["result"].termination_reason == TERMINATION_CANCELLED
+    assert 20.0 < reclaimed <= 30.0  # Unused budget of a 1-worker, 30s search
+    print(f"✓ stopped after {time.monotonic() - started:.2f}s, {reclaimed:.1f} CPU s reclaimed")
+
+
+def test_handle_cancelled_before_the_search():
+    handle = SolveHandle()
+    assert handle.cancel() == 0.0
+    started = time.monotonic()
+    result = solve_payment_plan(hard_portfolio(), handle=handle)
+    assert result.termination_reason == TERMINATION_CANCELLED
+    assert result.plan is None and result.stats is None
+    assert time.monotonic() - started < 5.0
+    print("✓ cancelled before the search: no search run")
+
+
+def test_runtime_stops_abandoned_solves():
+    print("\n=== Runtime: every caller gone ===")
+    runtime = SolverRuntime(max_concurrent=1, max_queue=4)
+
+    def solve(portfolio, handle):
+        return solve_payment_plan(portfolio, handle=handle)
+
+    async def caller(key):
+        handle = SolveHandle()
+        return await runtime.run(key, solve, hard_portfolio(), handle, handle=handle)
+
+    async def scenario():
+        running = asyncio.ensure_future(caller("running"))
+        joined = asyncio.ensure_future(caller("running"))
+        await asyncio.sleep(0.2)
+        queued = asyncio.ensure_future(caller("queued"))
+        await asyncio.sleep(0.8)
+
+        # One of two callers leaving doesn't stop the shared solve
+        joined.cancel()
+        await asyncio.sleep(0.2)
+        assert runtime.stats()["cancelled_solves"] == 0
+
+        queued.cancel()
+        running.cancel()
+        started = time.monotonic()
+        # The freed worker takes new work straight away
+        result, _ = await runtime.run("next", lambda: "done")
+        return result, time.monotonic() - started
+
+    result, waited = asyncio.run(scenario())
+    stats = runtime.stats()
+    print(f"   solver stats: {stats}")
+    assert result == "done" and waited < 5.0
+    assert stats["cancelled_while_running"] == 1
+    assert stats["cancelled_while_queued"] == 1
+    assert stats["cancelled_solves"] == 2
+    assert stats["reclaimed_cpu_seconds"] > 20.0
+    assert stats["running"] == 0 and stats["queued"] == 0 and stats["in_flight"] == 0
+    runtime.close()
+    print(f"✓ next solve started {waited:.2f}s after the callers left")
+
+
+def test_generate_plan_stops_on_client_disconnect():
+    print("\n=== /generate-plan: client disconnects ===")
+    body = json.dumps(hard_portfolio_json()).encode()
+    disconnected = asyncio.Event()
+    sent = []
+
+    async def receive():
+        if not receive.body_sent:
+            receive.body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        if not disconnected.is_set():
+            await disconnected.wait()
+        return {"type": "http.disconnect"}
+    receive.body_sent = False
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/generate-plan", "raw_path": b"/generate-plan",
+        "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/json")],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+
+    async def scenario():
+        request = asyncio.ensure_future(main.app(scope, receive, send))
+        await asyncio.sleep(1.0)
+        disconnected.set()
+        started = time.monotonic()
+        await request
+        return time.monotonic() - started
+
+    previous = solver_runtime._shared_runtime
+    runtime = solver_runtime._shared_runtime = SolverRuntime(max_concurrent=1)
+    try:
+        waited = asyncio.run(scenario())
+        # The stopped search hands its worker back promptly
+        deadline = time.monotonic() + 5.0
+        while runtime.stats()["running"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stats = runtime.stats()
+    finally:
+        runtime.close()
+        solver_runtime._shared_runtime = previous
+
+    print(f"   solver stats: {stats}")
+    assert waited < 3.0
+    assert sent[0]["status"] == 499
+    assert stats["cancelled_while_running"] == 1
+    assert stats["running"] == 0
+    print(f"✓ request ended {waited:.2f}s after the disconnect; solve stopped")
+
+
+if __name__ == "__main__":
+    test_handle_stops_a_running_search()
+    test_handle_cancelled_before_the_search()
+    test_runtime_stops_abandoned_solves()
+    test_generate_plan_stops_on_client_disconnect()
+    print("\n✅ All solve cancellation tests passed!")
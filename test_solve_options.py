@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test per-request solve options: the time budget and gap limits reach CP-SAT,
+and the response says how the search ended (optimal, gap limit, time limit).
+"""
+
+from datetime import date
+
+from fastapi.testclient import TestClient
+from ortools.sat.python import cp_model
+
+import main
+import schemas
+from solver_engine import (
+    Account,
+    AccountType,
+    Budget,
+    DebtPortfolio,
+    MinPaymentRule,
+    OptimizationStrategy,
+    PaymentShape,
+    SolveOptions,
+    SolveStats,
+    TERMINATION_GAP_LIMIT,
+    TERMINATION_INFEASIBLE,
+    TERMINATION_OPTIMAL,
+    TERMINATION_TIME_LIMIT,
+    UserPreferences,
+    _termination_reason,
+    configure_solver,
+    generate_payment_plan,
+    solve_payment_plan,
+)
+from solver_runtime import portfolio_key
+from test_solver_runtime import portfolio_json
+
+
+def make_portfolio(balances, budget_cents, options=None):
+    accounts = [
+        Account(
+            lender_name=f"Card {i + 1}",
+            account_type=AccountType.CREDIT_CARD,
+            current_balance_cents=balance,
+            apr_standard_bps=apr,
+            min_payment_rule=MinPaymentRule(fixed_cents=2500, percentage_bps=100, includes_interest=True),
+            payment_due_day=5,
+        )
+        for i, (balance, apr) in enumerate(balances)
+    ]
+    return DebtPortfolio(
+        accounts=accounts,
+        budget=Budget(monthly_budget_cents=budget_cents),
+        preferences=UserPreferences(
+            strategy=OptimizationStrategy.MINIMIZE_TOTAL_INTEREST,
+            payment_shape=PaymentShape.OPTIMIZED_MONTH_TO_MONTH,
+        ),
+        plan_start_date=date(2025, 1, 1),
+        solve_options=options or SolveOptions(),
+    )
+
+
+def stats(objective, bound):
+    gap = abs(objective - bound) / max(1.0, abs(objective)) if objective is not None else None
+    return SolveStats(objective_value=objective, best_objective_bound=bound, relative_gap=gap,
+                      wall_time_seconds=1.0, num_workers=1, num_branches=0, num_conflicts=0)
+
+
+def test_termination_reasons():
+    print("\n=== Termination reasons ===")
+    default = SolveOptions()
+    loose = SolveOptions(relative_gap_limit=0.01)
+
+    assert _termination_reason(cp_model.OPTIMAL, stats(1000.0, 1000.0), default) == TERMINATION_OPTIMAL
+    # CP-SAT reports OPTIMAL when it stops on a gap limit too
+    assert _termination_reason(cp_model.OPTIMAL, stats(1000.0, 995.0), loose) == TERMINATION_GAP_LIMIT
+    assert _termination_reason(cp_model.FEASIBLE, stats(1000.0, 995.0), loose) == TERMINATION_GAP_LIMIT
+    assert _termination_reason(cp_model.FEASIBLE, stats(1000.0, 900.0), loose) == TERMINATION_TIME_LIMIT
+    assert _termination_reason(cp_model.FEASIBLE, stats(1000.0, 990.0),
+                               SolveOptions(absolute_gap_limit=10)) == TERMINATION_GAP_LIMIT
+    assert _termination_reason(cp_model.UNKNOWN, stats(None, None), default) == TERMINATION_TIME_LIMIT
+    assert _termination_reason(cp_model.INFEASIBLE, stats(None, None), default) == TERMINATION_INFEASIBLE
+    print("✓ optimal / gap / time limit told apart")
+
+
+def test_options_reach_the_solver():
+    solver = configure_solver(SolveOptions(max_time_seconds=2.5, relative_gap_limit=0.02,
+                                           absolute_gap_limit=500, num_workers=3))
+    assert solver.parameters.max_time_in_seconds == 2.5
+    assert abs(solver.parameters.relative_gap_limit - 0.02) < 1e-12
+    assert solver.parameters.absolute_gap_limit == 500
+    assert solver.parameters.num_workers == 3
+
+    # Unset limits keep CP-SAT's defaults
+    solver = configure_solver(SolveOptions())
+    assert solver.parameters.max_time_in_seconds == 60.0
+    assert solver.parameters.relative_gap_limit == 0.0
+    assert solver.parameters.num_workers == 0
+    print("✓ time budget, gap limits and workers applied")
+
+
+def test_small_portfolio_solves_to_optimal():
+    print("\n=== Single account, default options ===")
+    portfolio = make_portfolio([(250000, 2299)], 60000)
+    result = solve_payment_plan(portfolio)
+
+    assert result.status == "OPTIMAL"
+    assert result.termination_reason == TERMINATION_OPTIMAL
+    assert result.stats.relative_gap == 0.0
+    assert result.stats.objective_value == result.stats.best_objective_bound
+    assert result.plan and result.plan == generate_payment_plan(portfolio)
+    print(f"✓ optimal in {result.stats.wall_time_seconds:.2f}s, {len(result.plan)} plan rows")
+
+
+def test_time_budget_bounds_the_search():
+    print("\n=== Three accounts, 0.5s budget ===")
+    portfolio = make_portfolio([(350000, 2299), (180000, 2999), (520000, 1899)], 60000,
+                               SolveOptions(max_time_seconds=0.5, num_workers=1))
+    result = solve_payment_plan(portfolio)
+
+    assert result.termination_reason == TERMINATION_TIME_LIMIT
+    assert result.status in ("FEASIBLE", "UNKNOWN")
+    assert (result.plan is None) == (result.status == "UNKNOWN")
+    assert result.stats.wall_time_seconds < 3.0
+    print(f"✓ stopped after {result.stats.wall_time_seconds:.2f}s ({result.status})")
+
+
+def test_endpoint_reports_how_the_solve_ended():
+    print("\n=== /generate-plan with solve_options ===")
+    client = TestClient(main.app)
+    payload = portfolio_json()
+    payload["solve_options"] = {"max_time_seconds": 30, "relative_gap_limit": 0.01, "num_workers": 2}
+
+    response = client.post("/generate-plan", json=payload)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["status"] == "OPTIMAL"
+    assert body["termination_reason"] in (TERMINATION_OPTIMAL, TERMINATION_GAP_LIMIT)
+    assert body["solve_stats"]["num_workers"] == 2
+    assert body["solve_stats"]["relative_gap"] <= 0.01
+    assert body["plan"]
+
+    # Out-of-range options are rejected before any solve
+    payload["solve_options"] = {"max_time_seconds": 0}
+    assert client.post("/generate-plan", json=payload).status_code == 422
+
+    # A quick solve and a full solve of the same portfolio aren't coalesced
+    quick = schemas.DebtPortfolio.model_validate({**portfolio_json(), "solve_options": {"max_time_seconds": 2}})
+    assert portfolio_key(quick) != portfolio_key(schemas.DebtPortfolio.model_validate(portfolio_json()))
+    print(f"✓ {body['termination_reason']} in {body['solve_stats']['wall_time_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    test_termination_reasons()
+    test_options_reach_the_solver()
+    test_small_portfolio_solves_to_optimal()
+    test_time_budget_bounds_the_search()
+    test_endpoint_reports_how_the_solve_ended()
+    print("\n✅ All solve option tests passed!")
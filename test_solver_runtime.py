@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Test the solver runtime: identical in-flight portfolios share one solve
+(keyed by the canonical portfolio hash), solves are admitted by priority,
+and saturation is refused fast with 429/503 and Retry-After.
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+
+import main
+import schemas
+import solver_runtime
+from solver_runtime import SolverRuntime, SolverSaturatedError, portfolio_key
+
+
+def portfolio_json(budget_cents=60000):
+    return {
+        "accounts": [{
+            "lender_name": "Barclaycard",
+            "account_type": "Credit Card",
+            "current_balance_cents": 250000,
+            "apr_standard_bps": 2299,
+            "payment_due_day": 15,
+            "min_payment_rule": {"fixed_cents": 2500, "percentage_bps": 100},
+        }],
+        "budget": {"monthly_budget_cents": budget_cents},
+        "preferences": {"strategy": "Minimize Total Interest", "payment_shape": "Optimized (Variable Amounts)"},
+        "plan_start_date": "2025-04-01",
+    }
+
+
+def test_portfolio_key_is_canonical():
+    base = schemas.DebtPortfolio.model_validate(portfolio_json())
+    reordered = portfolio_json()
+    reordered["accounts"][0] = dict(reversed(list(reordered["accounts"][0].items())))
+    reordered["accounts"][0]["buckets"] = []  # explicit default
+    assert portfolio_key(schemas.DebtPortfolio.model_validate(reordered)) == portfolio_key(base)
+    assert portfolio_key(schemas.DebtPortfolio.model_validate(portfolio_json(60001))) != portfolio_key(base)
+
+
+def test_identical_requests_share_one_solve():
+    runtime = SolverRuntime(max_concurrent=4)
+    calls = []
+    lock = threading.Lock()
+
+    def slow_solve(value):
+        with lock:
+            calls.append(value)
+        time.sleep(0.3)
+        return value * 2
+
+    async def scenario():
+        same = [runtime.run("key-a", slow_solve, 21) for _ in range(5)]
+        other = runtime.run("key-b", slow_solve, 5)
+        return await asyncio.gather(*same, other)
+
+    results = asyncio.run(scenario())
+    assert [r for r, _ in results] == [42] * 5 + [10]
+    assert sorted(shared for _, shared in results[:5]) == [False, True, True, True, True]
+    assert sorted(calls) == [5, 21]
+    assert runtime.stats()["coalesced_requests"] == 4
+    assert runtime.stats()["in_flight"] == 0
+
+    # Finished solves aren't cached: the next request solves again
+    asyncio.run(runtime.run("key-a", slow_solve, 21))
+    assert len(calls) == 3
+    runtime.close()
+
+
+def test_errors_reach_every_caller():
+    runtime = SolverRuntime(max_concurrent=1)
+
+    def failing():
+        time.sleep(0.1)
+        raise ValueError("bad portfolio")
+
+    async def scenario():
+        return await asyncio.gather(*[runtime.run("key", failing) for _ in range(3)], return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert all(isinstance(e, ValueError) for e in errors)
+    runtime.close()
+
+
+def test_priority_order_and_admission():
+    runtime = SolverRuntime(max_concurrent=1, max_queue=3, background_queue_limit=2)
+    order = []
+
+    def solve(name):
+        order.append(name)
+        time.sleep(0.05)
+        return name
+
+    async def scenario():
+        first = asyncio.ensure_future(runtime.run("first", solve, "first"))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.ensure_future(runtime.run("bg1", solve, "bg1", priority="background")),
+            asyncio.ensure_future(runtime.run("bg2", solve, "bg2", priority="background")),
+        ]
+        await asyncio.sleep(0)
+        # Background share of the queue is used up
+        try:
+            await runtime.run("bg3", solve, "bg3", priority="background")
+            assert False, "expected 429"
+        except SolverSaturatedError as e:
+            assert e.status_code == 429 and e.retry_after >= 1
+        queued.append(asyncio.ensure_future(runtime.run("int1", solve, "int1")))
+        await asyncio.sleep(0)
+        # Queue full: even interactive requests are refused
+        try:
+            await runtime.run("int2", solve, "int2")
+            assert False, "expected 503"
+        except SolverSaturatedError as e:
+            assert e.status_code == 503
+        # An interactive caller joining bg2 moves it ahead of bg1
+        queued.append(asyncio.ensure_future(runtime.run("bg2", solve, "bg2")))
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(scenario())
+    assert order == ["first", "int1", "bg2", "bg1"]
+    stats = runtime.stats()
+    print(f"   solver stats: {stats}")
+    assert stats["rejected_busy"] == 1 and stats["rejected_full"] == 1
+    assert stats["running"] == 0 and stats["queued"] == 0
+    assert stats["queue_wait_ms"]["max"] > 0
+    runtime.close()
+
+
+def test_generate_plan_saturation_returns_retry_after():
+    real_solve = main.solve_portfolio
+
+    def slow_solve(portfolio, handle=None):
+        time.sleep(0.3)
+        return real_solve(portfolio, handle)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                client.post("/generate-plan", json=portfolio_json(60000)),
+                client.post("/generate-plan", json=portfolio_json(61000)),
+                client.post("/generate-plan?priority=background", json=portfolio_json(62000)),
+            )
+
+    previous = solver_runtime._shared_runtime
+    solver_runtime._shared_runtime = SolverRuntime(max_concurrent=1, max_queue=0)
+    main.solve_portfolio = slow_solve
+    try:
+        responses = asyncio.run(scenario())
+    finally:
+        main.solve_portfolio = real_solve
+        solver_runtime._shared_runtime.close()
+        solver_runtime._shared_runtime = previous
+
+    assert sorted(r.status_code for r in responses) == [200, 503, 503]
+    rejected = [r for r in responses if r.status_code == 503]
+    assert all(int(r.headers["Retry-After"]) >= 1 for r in rejected)
+
+
+def test_generate_plan_coalesces_duplicates():
+    real_solve = main.solve_portfolio
+    solves = []
+
+    def counted_solve(portfolio, handle=None):
+        solves.append(portfolio)
+        time.sleep(0.3)
+        return real_solve(portfolio, handle)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        # /metrics reads the service the lifespan starts
+        async with main.app.router.lifespan_context(main.app), \
+                httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*[
+                client.post("/generate-plan", json=portfolio_json()) for _ in range(4)
+            ])
+            metrics = (await client.get("/metrics")).json()
+        return responses, metrics
+
+    main.solve_portfolio = counted_solve
+    try:
+        responses, metrics = asyncio.run(scenario())
+    finally:
+        main.solve_portfolio = real_solve
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert len({r.text for r in responses}) == 1
+    assert responses[0].json()["status"] == "OPTIMAL"
+    assert len(solves) == 1
+    print(f"   solver metrics: {metrics['solver']}")
+
+
+if __name__ == "__main__":
+    test_portfolio_key_is_canonical()
+    test_identical_requests_share_one_solve()
+    test_errors_reach_every_caller()
+    test_priority_order_and_admission()
+    test_generate_plan_saturation_returns_retry_after()
+    test_generate_plan_coalesces_duplicates()
+    print("✅ Identical in-flight solves are coalesced")
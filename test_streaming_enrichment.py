@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test incremental result streaming: enrich_transactions_streaming emits
+"transactions" events of chunk_size rows in input order, each batch's rows
+before its progress event, only runs as far ahead as the consumer reads, and
+/enrich-transactions-ndjson streams the same events line by line.
+"""
+
+import asyncio
+import json
+import threading
+
+from fastapi.testclient import TestClient
+
+import enrichment_service
+import main
+from budget_store import BudgetAggregateStore
+from enrichment_service import EnrichmentService
+from event_stream import ndjson_line, paced_stream
+from local_store import IN_MEMORY
+from merchant_cache import MerchantCache
+
+
+class CountingTransactions:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.calls.append(kwargs["id"])
+
+        class Result:
+            def model_dump(self):
+                return {"labels": ["shopping"], "merchant": {"name": "Shop"}, "recurrence": {}}
+        return Result()
+
+
+class CountingSDK:
+    def __init__(self):
+        self.transactions = CountingTransactions()
+
+
+def make_service(sdk=None):
+    return EnrichmentService(merchant_cache=MerchantCache(), budget_store=BudgetAggregateStore(IN_MEMORY), sdk=sdk)
+
+
+def raw(count):
+    # Distinct merchants, so every transaction costs one provider call
+    return [
+        {"transaction_id": f"tx_{i}", "description": f"SHOP {chr(97 + i % 26)}{chr(97 + i // 26)}", "amount": -10 - i,
+         "transaction_type": "DEBIT", "timestamp": "2025-03-01T00:00:00Z"}
+        for i in range(count)
+    ]
+
+
+def streamed(service, transactions, **kwargs):
+    async def run():
+        return [e async for e in service.enrich_transactions_streaming(transactions, "user_026", **kwargs)]
+    return asyncio.run(run())
+
+
+def chunk_sizes(events):
+    return [len(e["transactions"]) for e in events if e["type"] == "transactions"]
+
+
+def streamed_ids(events):
+    return [tx["transaction_id"] for e in events if e["type"] == "transactions" for tx in e["transactions"]]
+
+
+def test_fallback_chunks_follow_chunk_size():
+    service = make_service()
+    events = streamed(service, raw(10), stream_transactions=True, chunk_size=4)
+
+    assert events[0]["type"] == "progress" and events[0]["status"] == "extracting"
+    assert events[-1]["type"] == "complete"
+    assert chunk_sizes(events) == [4, 4, 2]
+    assert streamed_ids(events) == [f"tx_{i}" for i in range(10)]
+    # The rows went out in chunks, so the final event doesn't repeat them
+    result = events[-1]["result"]
+    assert result["transaction_count"] == 10 and "enriched_transactions" not in result
+
+    collected = streamed(make_service(), raw(10), chunk_size=4)
+    assert chunk_sizes(collected) == []
+    assert [tx["transaction_id"] for tx in collected[-1]["result"]["enriched_transactions"]] == streamed_ids(events)
+    print(f"✓ fallback: chunks {chunk_sizes(events)}, same rows as the collected result")
+
+
+def test_provider_batches_stream_before_their_progress():
+    service = make_service(CountingSDK())
+    events = streamed(service, raw(23), stream_transactions=True, chunk_size=4)
+
+    # Chunks cut across the provider's batches of 10; the remainder comes last
+    assert chunk_sizes(events) == [4, 4, 4, 4, 4, 3]
+    assert streamed_ids(events) == [f"tx_{i}" for i in range(23)]
+    assert events[-1]["type"] == "complete" and events[-2]["type"] == "progress"
+
+    # Each batch's full chunks are out before its progress event; fewer than
+    # chunk_size rows are ever held back
+    sent = 0
+    for event in events:
+        if event["type"] == "transactions":
+            sent += len(event["transactions"])
+        elif event["type"] == "progress" and event["status"] == "enriching" and event["current"]:
+            assert 0 <= event["current"] - sent < 4, (event["current"], sent)
+    print(f"✓ provider: chunks {chunk_sizes(events)} in order, emitted before each progress event")
+
+
+def test_stream_only_runs_as_far_as_it_is_read():
+    service = make_service(CountingSDK())
+    calls = service.sdk.transactions.calls
+
+    async def run():
+        events = service.enrich_transactions_streaming(raw(100), "user_026", stream_transactions=True, chunk_size=10)
+        async for event in events:
+            if event["type"] == "transactions":
+                break
+        # One batch of 10 enriched for the first chunk, nothing ahead of the reader
+        first_chunk_calls = len(calls)
+        await asyncio.sleep(0.2)
+        assert len(calls) == first_chunk_calls == 10
+        await events.aclose()
+
+        # Behind paced_stream, a client that stops reading stalls enrichment
+        # once max_buffered events are waiting
+        service.merchant_cache.clear()
+        calls.clear()
+        frames = paced_stream(
+            service.enrich_transactions_streaming(raw(100), "user_026", stream_transactions=True, chunk_size=10),
+            ndjson_line, progress_interval_ms=0, max_buffered=2
+        )
+        await frames.__anext__()
+        await asyncio.sleep(0.3)
+        stalled = len(calls)
+        rest = [json.loads(frame) async for frame in frames]
+        return stalled, rest
+
+    stalled, rest = asyncio.run(run())
+    print(f"   provider calls while the client waited: {stalled} of 100")
+    assert stalled <= 40
+    assert len(calls) == 100 and rest[-1]["type"] == "complete"
+    print("✓ enrichment waits for the reader")
+
+
+def test_ndjson_endpoint_streams_chunks_in_order():
+    previous = enrichment_service._shared_service
+    enrichment_service._shared_service = make_service()
+    try:
+        client = TestClient(main.app)
+        body = {"user_id": "user_026", "transactions": raw(7), "chunk_size": 3, "progress_interval_ms": 0}
+        response = client.post("/enrich-transactions-ndjson", json=body)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        events = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+
+        assert chunk_sizes(events) == [3, 3, 1]
+        assert streamed_ids(events) == [f"tx_{i}" for i in range(7)]
+        assert events[-1]["type"] == "complete" and events[-1]["result"]["transaction_count"] == 7
+        assert all(e["type"] in ("progress", "transactions") for e in events[:-1])
+
+        assert client.post("/enrich-transactions-ndjson", json={**body, "chunk_size": 0}).status_code == 422
+    finally:
+        enrichment_service._shared_service = previous
+    print(f"✓ /enrich-transactions-ndjson: {len(events)} lines, chunks {chunk_sizes(events)}")
+
+
+if __name__ == "__main__":
+    test_fallback_chunks_follow_chunk_size()
+    test_provider_batches_stream_before_their_progress()
+    test_stream_only_runs_as_far_as_it_is_read()
+    test_ndjson_endpoint_streams_chunks_in_order()
+    print("\n✅ All streaming enrichment tests passed!")
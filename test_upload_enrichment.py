@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Test /enrich-transactions-upload: NDJSON parsing at the edges (blank,
+malformed and non-object lines, a final line without a newline), a client
+that disconnects mid-upload, fallback classification batch by batch, and
+background tasks on the upload response.
+"""
+
+import asyncio
+import json
+import threading
+
+from fastapi.testclient import TestClient
+from starlette.background import BackgroundTask
+
+import enrichment_service
+import main
+from budget_store import BudgetAggregateStore
+from enrichment_service import EnrichmentService
+from local_store import IN_MEMORY
+from merchant_cache import MerchantCache
+
+
+class CountingTransactions:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.calls.append(kwargs["id"])
+
+        class Result:
+            def model_dump(self):
+                return {"labels": ["shopping"], "merchant": {"name": "Shop"}, "recurrence": {}}
+        return Result()
+
+
+class CountingSDK:
+    def __init__(self):
+        self.transactions = CountingTransactions()
+
+
+def line(i):
+    return json.dumps({
+        "transaction_id": f"tx_{i}", "description": f"SHOP {chr(97 + i % 26)}{chr(97 + i // 26)}", "amount": -10 - i,
+        "transaction_type": "DEBIT", "timestamp": "2025-03-01T00:00:00Z",
+    }).encode()
+
+
+def with_service(sdk=None):
+    """Runs the test against a fresh shared service with an in-memory budget store"""
+    def decorate(test):
+        def wrapper():
+            previous = enrichment_service._shared_service
+            service = EnrichmentService(merchant_cache=MerchantCache(),
+                                        budget_store=BudgetAggregateStore(IN_MEMORY), sdk=sdk and sdk())
+            enrichment_service._shared_service = service
+            try:
+                test(service)
+            finally:
+                enrichment_service._shared_service = previous
+        wrapper.__name__ = test.__name__
+        return wrapper
+    return decorate
+
+
+def upload(body):
+    response = TestClient(main.app).post(
+        "/enrich-transactions-upload?user_id=user_027&progress_interval_ms=0", content=body,
+        headers={"content-type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    return [json.loads(text) for text in response.text.splitlines() if text.strip()]
+
+
+def streamed_ids(events):
+    return [tx["transaction_id"] for e in events if e["type"] == "transactions" for tx in e["transactions"]]
+
+
+@with_service()
+def test_final_line_without_newline_and_blank_lines(service):
+    events = upload(b"\n".join([line(0), b"", b"  ", line(1), line(2)]))
+    assert events[-1]["type"] == "complete" and events[-1]["result"]["transaction_count"] == 3
+    assert streamed_ids(events) == ["tx_0", "tx_1", "tx_2"]
+    print("✓ blank lines skipped, unterminated last line kept")
+
+
+@with_service()
+def test_malformed_and_non_object_lines_end_with_an_error(service):
+    events = upload(b"\n".join([line(0), b'{"transaction_id": "tx_1", ', line(2)]) + b"\n")
+    assert events[-1]["type"] == "error" and events[-1]["message"].startswith("Line 2: invalid JSON")
+    assert not any(e["type"] == "complete" for e in events)
+
+    # Line numbers count blank lines too
+    events = upload(b"\n".join([line(0), b"", b"[1, 2]", line(3)]))
+    assert events[-1] == {"type": "error", "message": "Line 3: expected one transaction object per line, got list"}
+    assert upload(b"42")[-1]["message"] == "Line 1: expected one transaction object per line, got int"
+    # Nothing from a rejected upload is counted
+    assert service.budget_store.breakdown("user_027")["transactionCount"] == 0
+    print("✓ bad lines reported by number")
+
+
+async def call_upload(chunks, disconnect_after=None, query=b"user_id=user_027&progress_interval_ms=0"):
+    """Drives the endpoint over raw ASGI; the client disconnects after `disconnect_after` chunks"""
+    sent = []
+    remaining = list(chunks)
+    delivered = 0
+
+    async def receive():
+        nonlocal delivered
+        if disconnect_after is not None and delivered >= disconnect_after:
+            return {"type": "http.disconnect"}
+        delivered += 1
+        await asyncio.sleep(0.01)
+        body = remaining.pop(0)
+        return {"type": "http.request", "body": body, "more_body": bool(remaining)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/enrich-transactions-upload", "raw_path": b"/enrich-transactions-upload",
+        "query_string": query, "root_path": "",
+        "headers": [(b"content-type", b"application/x-ndjson")], "client": ("test", 1), "server": ("test", 80),
+    }
+    await asyncio.wait_for(main.app(scope, receive, send), timeout=10)
+    body = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+    return sent, [json.loads(text) for text in body.splitlines() if text.strip()]
+
+
+@with_service(CountingSDK)
+def test_disconnect_mid_upload_stops_enrichment(service):
+    # 25 rows, one per chunk; the client goes away after 15 of them
+    chunks = [line(i) + b"\n" for i in range(25)]
+    sent, events = asyncio.run(call_upload(chunks, disconnect_after=15))
+
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+    assert not any(e["type"] in ("complete", "error") for e in events)
+    # Only the full batch read before the disconnect reached the provider
+    assert len(service.sdk.transactions.calls) == 10
+    ids = streamed_ids(events)
+    assert ids == [f"tx_{i}" for i in range(len(ids))]
+
+    # The same upload, read to the end
+    service.merchant_cache.clear()
+    _, events = asyncio.run(call_upload(chunks))
+    assert events[-1]["type"] == "complete" and events[-1]["result"]["transaction_count"] == 25
+    print("✓ disconnect after 15 rows: 10 provider calls, response closed")
+
+
+@with_service()
+def test_fallback_upload_classifies_as_it_reads(service):
+    bills = [json.dumps({
+        "transaction_id": f"bill_{month}", "description": "ACME WIDGETS", "amount": -25,
+        "transaction_type": "DEBIT", "timestamp": f"2025-{month:02d}-15T00:00:00Z",
+    }).encode() + b"\n" for month in range(1, 13)]
+    query = b"user_id=user_027&progress_interval_ms=0&chunk_size=1"
+    previous = enrichment_service.FALLBACK_INGEST_BATCH_SIZE
+    enrichment_service.FALLBACK_INGEST_BATCH_SIZE = 2
+    try:
+        # Rows are classified per batch, not held until the body ends
+        _, events = asyncio.run(call_upload(bills, disconnect_after=5, query=query))
+        assert streamed_ids(events) == [f"bill_{month}" for month in range(1, 5)]
+
+        pending = json.dumps({
+            "transaction_id": "bill_13p", "description": "ACME WIDGETS", "amount": -25, "status": "pending",
+            "transaction_type": "DEBIT", "timestamp": "2026-01-14T00:00:00Z",
+        }).encode() + b"\n"
+        booked = bills[0].replace(b"bill_1", b"bill_13").replace(b"2025-01-15", b"2026-01-15")
+        _, events = asyncio.run(call_upload(bills + [pending, booked], query=query.replace(b"027", b"031")))
+    finally:
+        enrichment_service.FALLBACK_INGEST_BATCH_SIZE = previous
+
+    rows = [tx for e in events if e["type"] == "transactions" for tx in e["transactions"]]
+    # The series is found across batches once its third payment arrives
+    assert [tx["recurrence_frequency"] for tx in rows[:12]] == [None, None] + ["monthly"] * 10
+    # The pending row is retracted when its booked copy arrives
+    assert events[-1]["type"] == "complete"
+    assert service.budget_store.breakdown("user_031")["transactionCount"] == 13
+    print("✓ fallback upload: classified per batch, series found across batches")
+
+
+def test_upload_response_runs_background_tasks():
+    ran = []
+
+    async def frames():
+        yield "done\n"
+
+    async def run():
+        response = main._UploadStreamingResponse(frames(), background=BackgroundTask(ran.append, "background"))
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+        await response({"type": "http", "asgi": {"spec_version": "2.4"}}, None, send)
+        return sent
+
+    sent = asyncio.run(run())
+    assert ran == ["background"] and sent[-1]["more_body"] is False
+    print("✓ background task ran after the body")
+
+
+if __name__ == "__main__":
+    test_final_line_without_newline_and_blank_lines()
+    test_malformed_and_non_object_lines_end_with_an_error()
+    test_disconnect_mid_upload_stops_enrichment()
+    test_fallback_upload_classifies_as_it_reads()
+    test_upload_response_runs_background_tasks()
+    print("\n✅ All upload enrichment tests passed!")